@@ -16,7 +16,12 @@ script_dir = Path(__file__).parent
 sys.path.append(str(script_dir))
 
 # Import the BranchSweeper
+from scripts.branch_policy import load_policy
 from scripts.branch_sweeper import BranchSweeper
+from scripts.deadline import parse_timeouts
+from scripts.sharding import parse_shard
+from scripts.sweep_budget import SweepBudget
+from scripts.workspace import DEFAULT_URL_TEMPLATE, use_mirror_cache
 
 
 def main():
@@ -27,6 +32,69 @@ def main():
     parser.add_argument("--default-branch", default="", help="Default branch name")
     parser.add_argument("--repo", default=os.environ.get("GITHUB_REPOSITORY", ""), 
                         help="Repository name (owner/repo)")
+    parser.add_argument("--results", action="append", default=[], metavar="FORMAT:PATH",
+                        help="Stream per-branch results to a markdown, json or ndjson file (may be repeated)")
+    parser.add_argument("--summary-top-n", type=int, default=25,
+                        help="Number of oldest branches listed per category in the summary")
+    parser.add_argument("--summary-details", default="summary-details.ndjson.gz",
+                        help="Compressed file receiving the complete per-branch list (empty to disable)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile the run with cProfile and write a collapsed-stack file for flame graphs")
+    parser.add_argument("--profile-output", default="sweeper-profile",
+                        help="Path prefix for the .pstats and .collapsed profile files")
+    parser.add_argument("--trace", default="", metavar="PATH",
+                        help="Trace every git/gh subprocess to a Chrome trace-event JSON file")
+    parser.add_argument("--metrics-file", default=os.environ.get("SWEEPER_METRICS_FILE", ""), metavar="PATH",
+                        help="Write run metrics as OpenMetrics text (*.prom files use the node-exporter textfile format)")
+    parser.add_argument("--metrics-push-url", default=os.environ.get("SWEEPER_METRICS_PUSH_URL", ""), metavar="URL",
+                        help="Push run metrics to a Prometheus Pushgateway")
+    parser.add_argument("--discover-protected", action="store_true",
+                        help="Also protect the branches the GitHub API lists as protected or covered by rulesets "
+                             "(looked up during start-up)")
+    parser.add_argument("--protection-cache", default="", metavar="PATH",
+                        help="Cache the --discover-protected responses and revalidate them with ETags between runs")
+    parser.add_argument("--merge-engine", choices=["reference", "batched"], default="reference",
+                        help="Merge detection engine: per-branch commands or one batched index per run")
+    parser.add_argument("--lease", choices=["off", "exit", "wait"], default="off",
+                        help="Hold a lease on refs/janitor/lock; exit or wait when another sweep holds it")
+    parser.add_argument("--lease-ttl", type=int, default=300, help="Seconds a lease lasts between renewals")
+    parser.add_argument("--lease-wait", type=int, default=600, help="Seconds to wait for the lease with --lease=wait")
+    parser.add_argument("--delete-batch-size", type=int, default=20,
+                        help="Branches deleted per push by the deletion worker (0 deletes inline, one at a time)")
+    parser.add_argument("--delete-queue-size", type=int, default=100,
+                        help="Pending deletions queued before evaluation waits for the deletion worker")
+    parser.add_argument("--command-timeout", action="append", default=[], metavar="CATEGORY=SECONDS",
+                        help="Timeout of local git, network git or api commands (may be repeated, 0 disables)")
+    parser.add_argument("--deadline", type=float, default=0.0, metavar="SECONDS",
+                        help="Wall-clock budget of the run; no new work is started once it is nearly used up")
+    parser.add_argument("--deadline-reserve", type=float, default=30.0, metavar="SECONDS",
+                        help="Part of the deadline kept for flushing results and writing the summary")
+    parser.add_argument("--mirror-cache", default="", metavar="DIR",
+                        help="Sweep a bare blob-less mirror kept in DIR between runs instead of the current checkout")
+    parser.add_argument("--url-template", default=DEFAULT_URL_TEMPLATE,
+                        help="Clone URL of the mirrored repository, with {repo} replaced by owner/repo")
+    parser.add_argument("--shard", default="", metavar="I/N",
+                        help="Only evaluate and delete the branches of shard I of N (see merge_shards.py)")
+    parser.add_argument("--plan", default="", metavar="PATH",
+                        help="Write the branches a dry run would delete to a plan file (apply it with apply_plan.py)")
+    parser.add_argument("--journal", default="", metavar="PATH",
+                        help="Append every decision and deletion outcome to a crash-safe journal")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the interrupted run recorded in --journal instead of starting over")
+    parser.add_argument("--unmerged-days", type=int, default=30, metavar="DAYS",
+                        help="Age in days after which unmerged branches are deleted")
+    parser.add_argument("--snapshot", default="", metavar="PATH",
+                        help="Write the policy inputs of every evaluated branch for simulate_policy.py")
+    parser.add_argument("--pr-store", default="", metavar="PATH",
+                        help="Keep merged pull requests in a local store synced incrementally between runs")
+    parser.add_argument("--lazy-evidence", action="store_true",
+                        help="Only gather merge evidence that can change a decision, cheapest check first")
+    parser.add_argument("--policy", default="", metavar="PATH",
+                        help="JSON file of ordered branch rules with their own thresholds (see branch_policy.py)")
+    parser.add_argument("--time-budget", type=float, default=0.0, metavar="SECONDS",
+                        help="Evaluate oldest branches first and defer the rest once the run has taken SECONDS")
+    parser.add_argument("--max-deletions", type=int, default=0, metavar="N",
+                        help="Evaluate oldest branches first and defer the rest after N deletions")
     
     args = parser.parse_args()
     
@@ -42,6 +110,31 @@ def main():
         print("Error: weeks_threshold must be a positive number")
         return 1
         
+    if args.unmerged_days <= 0:
+        print("Error: --unmerged-days must be a positive number")
+        return 1
+        
+    try:
+        parse_timeouts(args.command_timeout)
+        parse_shard(args.shard)
+        SweepBudget(args.time_budget, args.max_deletions)
+        if args.policy:
+            load_policy(args.policy, weeks_threshold, args.unmerged_days)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+        
+    if args.resume and not args.journal:
+        print("Error: --resume needs the --journal of the interrupted run")
+        return 1
+        
+    # Sweep a cached mirror, refreshed with a ref-only fetch, instead of the current checkout
+    mirror = None
+    if args.mirror_cache:
+        mirror = use_mirror_cache(args.mirror_cache, args.repo, args.url_template)
+        if mirror is None:
+            return 1
+        
     # Create and run the branch sweeper
     sweeper = BranchSweeper(
         dry_run=dry_run,
@@ -51,6 +144,36 @@ def main():
         repo=args.repo,
         verbose=os.environ.get("DEBUG") == "true",
         test_mode=os.environ.get("GITHUB_TEST_MODE") == "true",
+        results=args.results,
+        summary_top_n=args.summary_top_n,
+        summary_details=args.summary_details,
+        profile_output=args.profile_output if args.profile else "",
+        trace_output=args.trace,
+        metrics_output=args.metrics_file,
+        metrics_push_url=args.metrics_push_url,
+        protected_lookup=args.discover_protected,
+        protection_cache=args.protection_cache,
+        merge_engine=args.merge_engine,
+        lease=args.lease,
+        lease_ttl=args.lease_ttl,
+        lease_wait=args.lease_wait,
+        delete_batch_size=args.delete_batch_size,
+        delete_queue_size=args.delete_queue_size,
+        command_timeouts=args.command_timeout,
+        deadline=args.deadline,
+        deadline_reserve=args.deadline_reserve,
+        shard=args.shard,
+        plan_output=args.plan,
+        journal=args.journal,
+        resume=args.resume,
+        time_budget=args.time_budget,
+        max_deletions=args.max_deletions,
+        unmerged_days=args.unmerged_days,
+        snapshot_output=args.snapshot,
+        pull_request_store=args.pr_store,
+        lazy_evidence=args.lazy_evidence,
+        policy=args.policy,
+        mirror=mirror,
     )
     
     return sweeper.run()
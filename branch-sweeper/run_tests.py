@@ -7,6 +7,7 @@ This is a wrapper script that provides a convenient way to run the tests.
 """
 
 import argparse
+import subprocess
 import sys
 from pathlib import Path
 
@@ -14,6 +15,50 @@ from pathlib import Path
 script_dir = Path(__file__).parent
 sys.path.append(str(script_dir))
 
+# Script-style suites run by --suites; each one runs in its own process because it changes HOME and the
+# working directory
+SUITES = [
+    "test_results_writer",
+    "test_summary_renderer",
+    "test_timing",
+    "test_command_trace",
+    "test_metrics",
+    "test_synthetic_repository",
+    "test_github_api",
+    "test_merge_equivalence",
+    "test_sweeper_daemon",
+    "test_lease_lock",
+    "test_deletion_pipeline",
+    "test_run_deadline",
+    "test_startup_graph",
+    "test_workspace",
+    "test_mirror_cache",
+    "test_sharding",
+    "test_deletion_plan",
+    "test_run_journal",
+    "test_sweep_budget",
+    "test_policy_snapshot",
+    "test_pull_request_store",
+    "test_evidence_planner",
+    "test_branch_policy",
+    "test_branch_protection",
+]
+
+
+def run_suites(names):
+    """Run the given test suites one after another; return 1 if any of them failed."""
+    failed = []
+    for name in names:
+        print(f"\n=== {name} ===")
+        result = subprocess.run([sys.executable, str(script_dir / "tests" / f"{name}.py")], check=False)
+        if result.returncode != 0:
+            failed.append(name)
+    
+    print(f"\n{len(names) - len(failed)}/{len(names)} suites passed")
+    if failed:
+        print(f"Failed suites: {' '.join(failed)}")
+    return 1 if failed else 0
+
 
 def main():
     """Run the branch sweeper tests."""
@@ -22,6 +67,11 @@ def main():
     parser.add_argument("--repo-name", default="repo-janitor-testing", help="Repository name for GitHub tests")
     parser.add_argument("--repo-owner", default="", help="Repository owner for GitHub tests")
     parser.add_argument("--run-all", action="store_true", help="Run all local tests")
+    parser.add_argument("--api", action="store_true", help="Run the GitHub API tests against the local stand-in")
+    parser.add_argument("--daemon", action="store_true", help="Run the webhook daemon tests")
+    parser.add_argument("--suites", action="store_true", help="Run every script-style test suite")
+    parser.add_argument("--suite", action="append", default=[], choices=SUITES, metavar="NAME",
+                        help="Run one script-style test suite (may be repeated)")
     
     args = parser.parse_args()
     
@@ -30,6 +80,21 @@ def main():
         # Import here to avoid import errors if GitHub CLI is not installed
         from tests.github_repo_tests.test_github_sweeping_repo import main as github_test_main
         return github_test_main(args.repo_name, args.repo_owner)
+    elif args.suites or args.suite:
+        print("Running test suites...")
+        return run_suites(args.suite or SUITES)
+    elif args.api:
+        print("Running GitHub API stand-in tests...")
+        sys.path.append(str(script_dir / "tests"))
+        from tests.test_github_api import main as api_test_main
+        sys.argv = [sys.argv[0]]
+        return api_test_main()
+    elif args.daemon:
+        print("Running sweeper daemon tests...")
+        sys.path.append(str(script_dir / "tests"))
+        from tests.test_sweeper_daemon import main as daemon_test_main
+        sys.argv = [sys.argv[0]]
+        return daemon_test_main()
     else:
         print("Running local tests...")
         from tests.test_sweeping import main as local_test_main
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/apply_plan.py
+
+"""
+Apply a reviewed deletion plan.
+
+The plan is written by a dry run with --plan PATH (see deletion_plan.py).
+Applying it does not evaluate any branch again: the repository, default
+branch, protected branches and threshold come from the plan, one listing of
+the remote heads checks that each planned tip is unchanged, and the branches
+that still match are deleted through the batched deletion path. Branches
+that moved or became protected are skipped and reported.
+
+Protection is resolved again from the GitHub API (protected branches and
+rulesets, as --discover-protected does for a sweep), so a branch protected
+since the review is not deleted; if that lookup fails the plan is rejected.
+"""
+
+import argparse
+import os
+import sys
+
+try:
+    from .branch_sweeper import BranchSweeper
+    from .deletion_plan import load_plan
+    from .lease_lock import LEASE_MODES
+except ImportError:
+    from branch_sweeper import BranchSweeper
+    from deletion_plan import load_plan
+    from lease_lock import LEASE_MODES
+
+
+def apply_plan(path: str, dry_run: bool = False, protection_cache: str = "", **sweeper_options) -> int:
+    """Delete the unchanged, unprotected branches of a plan file; return the sweeper's exit code."""
+    metadata, _ = load_plan(path)
+    sweeper = BranchSweeper(
+        dry_run=dry_run,
+        weeks_threshold=metadata.get("weeks_threshold", 2),
+        default_branch=metadata.get("default_branch", ""),
+        protected_branches=metadata.get("protected_branches", ""),
+        repo=metadata.get("repo", ""),
+        apply_plan=path,
+        protected_lookup=True,
+        protection_cache=protection_cache,
+        **sweeper_options,
+    )
+    return sweeper.run()
+
+
+def main():
+    """Parse command-line arguments and apply the plan."""
+    parser = argparse.ArgumentParser(description="Delete the branches of a reviewed deletion plan")
+    parser.add_argument("plan", help="Plan file written by a dry run with --plan")
+    parser.add_argument("--check", action="store_true",
+                        help="Only report which planned branches are unchanged and would be deleted")
+    parser.add_argument("--protection-cache", default="", metavar="PATH",
+                        help="Cache the protection lookup responses and revalidate them with ETags between runs")
+    parser.add_argument("--results", action="append", default=[], metavar="FORMAT:PATH",
+                        help="Stream per-branch results to a markdown, json or ndjson file (may be repeated)")
+    parser.add_argument("--summary-details", default="summary-details.ndjson.gz",
+                        help="Compressed file receiving the complete per-branch list (empty to disable)")
+    parser.add_argument("--lease", choices=LEASE_MODES, default="off",
+                        help="Hold a lease on refs/janitor/lock; exit or wait when another sweep holds it")
+    parser.add_argument("--delete-batch-size", type=int, default=20,
+                        help="Branches deleted per push by the deletion worker (0 deletes inline, one at a time)")
+
+    args = parser.parse_args()
+
+    try:
+        return apply_plan(
+            args.plan,
+            dry_run=args.check,
+            protection_cache=args.protection_cache,
+            verbose=os.environ.get("DEBUG") == "true",
+            results=args.results,
+            summary_details=args.summary_details,
+            lease=args.lease,
+            delete_batch_size=args.delete_batch_size,
+        )
+    except (OSError, ValueError) as e:
+        print(f"::error::Unable to apply the plan: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
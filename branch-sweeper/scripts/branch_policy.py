@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/branch_policy.py
+
+"""
+Per-pattern deletion thresholds from a declarative policy file.
+
+With --policy PATH the branches are matched against an ordered list of rules
+read from a JSON file; the first rule matching a branch decides its
+thresholds, and branches no rule matches use --weeks-threshold and
+--unmerged-days:
+
+    {"rules": [
+        {"name": "releases", "match": "release/*", "keep": true},
+        {"name": "dependabot", "match": "dependabot/**", "weeks_threshold": 1, "unmerged_days": 14},
+        {"name": "hotfixes", "regex": "hotfix/[0-9]+(-.+)?", "require_merged": true},
+        {"name": "personal", "match": "users/**", "exclude": "users/*/keep-*", "weeks_threshold": 12}
+    ]}
+
+A rule matches globs (`*` and `?` stay within one path segment, `**` spans
+segments) and/or regular expressions matched against the whole branch name,
+minus its exclusions. `keep` keeps matching branches, `require_merged` never
+deletes them unmerged, and missing thresholds default to the command line's.
+
+The rules are compiled into one regular expression, an alternation with a
+named group per rule in policy order, so classifying a branch is a single
+match whatever the number of rules.
+"""
+
+import hashlib
+import json
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+# Name of the rule applied to branches no rule of the policy matches
+DEFAULT_RULE = "default"
+
+RULE_KEYS = ("name", "match", "regex", "exclude", "exclude_regex",
+             "weeks_threshold", "unmerged_days", "require_merged", "keep")
+
+
+def glob_to_regex(glob: str) -> str:
+    """Translate a branch glob to a regular expression (`*` and `?` within a segment, `**` across)."""
+    parts = []
+    index = 0
+    while index < len(glob):
+        if glob.startswith("**/", index):
+            parts.append("(?:.*/)?")
+            index += 3
+        elif glob.startswith("**", index):
+            parts.append(".*")
+            index += 2
+        elif glob[index] == "*":
+            parts.append("[^/]*")
+            index += 1
+        elif glob[index] == "?":
+            parts.append("[^/]")
+            index += 1
+        else:
+            parts.append(re.escape(glob[index]))
+            index += 1
+    return "".join(parts)
+
+
+class PolicyRule:
+    """Thresholds applied to the branches one rule matches."""
+
+    def __init__(
+        self, name: str, weeks_threshold: int, unmerged_days: int, require_merged: bool = False, keep: bool = False
+    ):
+        """Create a rule; require_merged never deletes unmerged branches, keep never deletes any."""
+        self.name = name
+        self.weeks_threshold = weeks_threshold
+        self.unmerged_days = unmerged_days
+        self.require_merged = require_merged
+        self.keep = keep
+
+    def cutoffs(self, now: datetime) -> Tuple[int, int]:
+        """Return (cutoff, unmerged cutoff) as timestamps; an unmerged cutoff of 0 deletes nothing unmerged."""
+        cutoff_date = int((now - timedelta(weeks=self.weeks_threshold)).timestamp())
+        if self.require_merged:
+            return cutoff_date, 0
+        return cutoff_date, int((now - timedelta(days=self.unmerged_days)).timestamp())
+
+
+class BranchPolicy:
+    """Ordered rules compiled into a single matcher, with a default rule for the rest."""
+
+    def __init__(self, rules: List[PolicyRule], patterns: List[str], default: PolicyRule, fingerprint: str = ""):
+        """Compile the rules; patterns[i] is the regular expression of rules[i]."""
+        self.rules = rules
+        self.default = default
+        self.fingerprint = fingerprint
+        alternatives = [f"(?P<r{index}>{pattern})" for index, pattern in enumerate(patterns)]
+        try:
+            self.pattern = re.compile("|".join(alternatives)) if alternatives else None
+        except re.error as e:
+            raise ValueError(f"Unable to compile the policy rules: {e}") from e
+
+    def rule_for(self, branch_name: str) -> PolicyRule:
+        """Return the first rule matching the branch, or the default rule."""
+        match = self.pattern.fullmatch(branch_name) if self.pattern else None
+        if match is None:
+            return self.default
+        # Each rule's group encloses its whole alternative, so it is the last group to close
+        return self.rules[int(match.lastgroup[1:])]
+
+    def classify(self, branch_names: Iterable[str]) -> Dict[str, PolicyRule]:
+        """Return the rule of every branch, in one pass over the names."""
+        return {branch_name: self.rule_for(branch_name) for branch_name in branch_names}
+
+    def cutoffs(self, now: datetime) -> Dict[str, Tuple[int, int]]:
+        """Return the (cutoff, unmerged cutoff) of every rule, by name."""
+        return {rule.name: rule.cutoffs(now) for rule in self.rules + [self.default]}
+
+    def counts(self, assignments: Dict[str, PolicyRule]) -> Dict[str, int]:
+        """Count the branches of classify() per rule, in policy order."""
+        counts = {rule.name: 0 for rule in self.rules + [self.default]}
+        for rule in assignments.values():
+            counts[rule.name] += 1
+        return counts
+
+
+def _strings(rule: Dict, key: str, where: str) -> List[str]:
+    """Return a rule field given as a string or a list of strings."""
+    value = rule.get(key, [])
+    values = [value] if isinstance(value, str) else value
+    if not isinstance(values, list) or not all(isinstance(item, str) and item for item in values):
+        raise ValueError(f"{where}: '{key}' must be a string or a list of strings")
+    return values
+
+
+def _regex(pattern: str, where: str) -> str:
+    """Check a regular expression of the policy can be embedded in the combined matcher."""
+    try:
+        compiled = re.compile(pattern)
+    except re.error as e:
+        raise ValueError(f"{where}: invalid regex '{pattern}': {e}") from e
+    if compiled.groupindex or re.search(r"\\[1-9]|\(\?P=", pattern):
+        raise ValueError(f"{where}: named groups and backreferences are not supported in '{pattern}'")
+    return f"(?:{pattern})"
+
+
+def _threshold(rule: Dict, key: str, default: int, where: str) -> int:
+    """Return a positive whole-number threshold of a rule."""
+    value = rule.get(key, default)
+    if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+        raise ValueError(f"{where}: '{key}' must be a positive number")
+    return value
+
+
+def compile_rule(rule: Dict, index: int, weeks_threshold: int, unmerged_days: int) -> Tuple[PolicyRule, str]:
+    """Validate one rule of a policy file; return it with its regular expression."""
+    where = f"policy rule {index + 1}"
+    if not isinstance(rule, dict):
+        raise ValueError(f"{where} must be an object")
+    unknown = sorted(set(rule) - set(RULE_KEYS))
+    if unknown:
+        raise ValueError(f"{where}: unknown field {', '.join(unknown)} (expected: {', '.join(RULE_KEYS)})")
+    name = rule.get("name", f"rule {index + 1}")
+    if not isinstance(name, str) or not name or name == DEFAULT_RULE:
+        raise ValueError(f"{where}: 'name' must be a non-empty string other than '{DEFAULT_RULE}'")
+    where = f"policy rule '{name}'"
+
+    matches = [glob_to_regex(glob) for glob in _strings(rule, "match", where)]
+    matches += [_regex(pattern, where) for pattern in _strings(rule, "regex", where)]
+    if not matches:
+        raise ValueError(f"{where}: needs a 'match' glob or a 'regex'")
+    excludes = [glob_to_regex(glob) for glob in _strings(rule, "exclude", where)]
+    excludes += [_regex(pattern, where) for pattern in _strings(rule, "exclude_regex", where)]
+
+    pattern = f"(?:{'|'.join(matches)})"
+    if excludes:
+        # Excluded branches fall through to the later rules
+        pattern = f"(?!(?:{'|'.join(excludes)})\\Z){pattern}"
+    for flag in ("require_merged", "keep"):
+        if not isinstance(rule.get(flag, False), bool):
+            raise ValueError(f"{where}: '{flag}' must be true or false")
+
+    compiled = PolicyRule(
+        name,
+        _threshold(rule, "weeks_threshold", weeks_threshold, where),
+        _threshold(rule, "unmerged_days", unmerged_days, where),
+        require_merged=rule.get("require_merged", False),
+        keep=rule.get("keep", False),
+    )
+    return compiled, pattern
+
+
+def parse_policy(document: Dict, weeks_threshold: int, unmerged_days: int) -> BranchPolicy:
+    """Compile a policy document; branches no rule matches use the given thresholds."""
+    if not isinstance(document, dict) or not isinstance(document.get("rules"), list):
+        raise ValueError("A policy needs a list of 'rules'")
+    rules, patterns = [], []
+    for index, rule in enumerate(document["rules"]):
+        compiled, pattern = compile_rule(rule, index, weeks_threshold, unmerged_days)
+        if any(existing.name == compiled.name for existing in rules):
+            raise ValueError(f"Policy rule '{compiled.name}' is defined twice")
+        rules.append(compiled)
+        patterns.append(pattern)
+    canonical = json.dumps(document, sort_keys=True, separators=(",", ":"))
+    fingerprint = hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:12]
+    return BranchPolicy(rules, patterns, PolicyRule(DEFAULT_RULE, weeks_threshold, unmerged_days), fingerprint)
+
+
+def load_policy(path: str, weeks_threshold: int, unmerged_days: int) -> BranchPolicy:
+    """Read and compile the policy file at path."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            document = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Unable to read the policy file {path}: {e}") from e
+    try:
+        return parse_policy(document, weeks_threshold, unmerged_days)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from e
+
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/branch_protection.py
+
+"""
+Branch protection resolved from classic protection and rulesets.
+
+Classic protection names the protected branches (every page of
+/branches?protected=true). Rulesets of the repository and of its
+organization protect ref name patterns instead: an active branch ruleset
+with any rule other than "creation" protects the branches its ref_name
+condition includes and does not exclude. `*` in these patterns stays within
+one path segment, `**` spans segments, ~ALL matches every branch and
+~DEFAULT_BRANCH is left out because the default branch is always protected.
+
+ProtectionMatcher takes the place of the set of protected branch names: it
+holds the literal names, which merges are checked against, and the ruleset
+patterns compiled into one regular expression, so a membership test is a set
+lookup and at most one match.
+
+With a cache file (--protection-cache PATH) every response is kept with its
+ETag and requested again with If-None-Match. A run in which protection did
+not change gets 304 responses, which do not count against the rate limit,
+and rebuilds the matcher from the cache.
+"""
+
+import json
+import os
+import re
+import urllib.parse
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    from .branch_policy import glob_to_regex
+    from .github_api import APIError
+except ImportError:
+    from branch_policy import glob_to_regex
+    from github_api import APIError
+
+CACHE_VERSION = 1
+
+# Ruleset rules that do not protect existing branches
+NON_PROTECTING_RULES = ("creation",)
+
+
+def ref_pattern_regex(pattern: str) -> Optional[str]:
+    """Translate a ruleset ref_name pattern to a regular expression over branch names, or None if it names none."""
+    if pattern == "~ALL":
+        return ".*"
+    if pattern.startswith("~"):
+        # ~DEFAULT_BRANCH: the default branch is protected by name anyway
+        return None
+    if pattern.startswith("refs/heads/"):
+        pattern = pattern[len("refs/heads/"):]
+    elif pattern.startswith("refs/"):
+        return None
+    return glob_to_regex(pattern) if pattern else None
+
+
+class ProtectionMatcher:
+    """Protected branch names plus the compiled ref patterns of rulesets."""
+
+    def __init__(self, names: Iterable[str] = ()):
+        """Start with the given protected branch names and no rulesets."""
+        self.names: Set[str] = set(names)
+        self.rulesets: List[Tuple[str, List[str], str]] = []
+        self.pattern: Optional[re.Pattern] = None
+
+    def add(self, name: str) -> None:
+        """Protect a branch by name."""
+        self.names.add(name)
+
+    def update(self, names: Iterable[str]) -> None:
+        """Protect branches by name."""
+        self.names.update(names)
+
+    def add_ruleset(self, name: str, include: Iterable[str], exclude: Iterable[str] = ()) -> bool:
+        """Protect the branches a ruleset's ref_name condition covers; return whether it covers any pattern."""
+        includes = [regex for regex in map(ref_pattern_regex, include) if regex]
+        if not includes:
+            return False
+        excludes = [regex for regex in map(ref_pattern_regex, exclude) if regex]
+        regex = f"(?:{'|'.join(includes)})"
+        if excludes:
+            regex = f"(?!(?:{'|'.join(excludes)})\\Z){regex}"
+        self.rulesets.append((name, list(include), regex))
+        alternatives = [f"(?P<r{index}>{regex})" for index, (_, _, regex) in enumerate(self.rulesets)]
+        self.pattern = re.compile("|".join(alternatives))
+        return True
+
+    def ruleset_for(self, branch_name: str) -> str:
+        """Return the name of the first ruleset protecting the branch, or an empty string."""
+        match = self.pattern.fullmatch(branch_name) if self.pattern else None
+        return self.rulesets[int(match.lastgroup[1:])][0] if match else ""
+
+    def describe_rulesets(self) -> str:
+        """List the rulesets and their patterns."""
+        return ", ".join(f"{name} ({' '.join(include)})" for name, include, _ in self.rulesets)
+
+    def __contains__(self, branch_name: object) -> bool:
+        """Whether the branch is protected by name or by a ruleset."""
+        if branch_name in self.names:
+            return True
+        return bool(self.pattern and isinstance(branch_name, str) and self.pattern.fullmatch(branch_name))
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the branches protected by name."""
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        """Number of branches protected by name."""
+        return len(self.names)
+
+    def copy(self) -> Set[str]:
+        """Return the branches protected by name."""
+        return set(self.names)
+
+
+class ProtectionResolver:
+    """Read classic protection and rulesets through the API, with an optional ETag cache."""
+
+    def __init__(self, api, cache_path: str = "", per_page: int = 100):
+        """Load the cache at cache_path; a missing, unreadable or foreign cache starts empty."""
+        self.api = api
+        self.cache_path = cache_path
+        self.per_page = per_page
+        self.cached: Dict[str, Dict] = {}
+        self.responses: Dict[str, Dict] = {}
+        # Requests answered from the cache with a 304 (hits) and requests that transferred a body (misses)
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+        if cache_path and os.path.exists(cache_path):
+            self._load()
+
+    def _load(self) -> None:
+        """Read the cache file."""
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                document = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"::warning::Unable to read the protection cache {self.cache_path}, rebuilding it: {e}")
+            return
+        if document.get("version") != CACHE_VERSION or document.get("repo") != self.api.repo:
+            print(f"::warning::{self.cache_path} is not a version {CACHE_VERSION} cache of {self.api.repo}, "
+                  f"rebuilding it")
+            return
+        self.cached = document.get("responses", {})
+
+    def _get(self, path: str, params: Dict[str, str]) -> object:
+        """GET a resource, revalidating the cached response with its ETag."""
+        key = f"{path}?{urllib.parse.urlencode(sorted(params.items()))}"
+        cached = self.cached.get(key)
+        status, data, etag = self.api.conditional_get(path, params, cached["etag"] if cached else "")
+        self.requests += 1
+        if status == 304 and cached:
+            self.hits += 1
+            data = cached["body"]
+            etag = cached["etag"]
+        else:
+            self.misses += 1
+        if etag:
+            self.responses[key] = {"etag": etag, "body": data}
+        return data
+
+    def _pages(self, path: str, params: Dict[str, str]) -> List:
+        """Return the items of every page of a list endpoint, one page at a time."""
+        items: List = []
+        page = 1
+        while True:
+            data = self._get(path, dict(params, per_page=str(self.per_page), page=str(page))) or []
+            items.extend(data)
+            if len(data) < self.per_page:
+                return items
+            page += 1
+
+    def classic_branches(self) -> List[str]:
+        """Return the names of the branches with classic branch protection."""
+        branches = self._pages(f"repos/{self.api.repo}/branches", {"protected": "true"})
+        return [branch["name"] for branch in branches if branch.get("protected")]
+
+    def rulesets(self) -> List[Tuple[str, List[str], List[str]]]:
+        """Return (name, include, exclude) of every active branch ruleset that protects branches."""
+        path = f"repos/{self.api.repo}/rulesets"
+        found = []
+        for summary in self._pages(path, {"includes_parents": "true"}):
+            if summary.get("target", "branch") != "branch" or summary.get("enforcement", "active") != "active":
+                continue
+            ruleset = self._get(f"{path}/{summary['id']}", {"includes_parents": "true"}) or {}
+            if ruleset.get("enforcement", "active") != "active":
+                continue
+            if not any(rule.get("type") not in NON_PROTECTING_RULES for rule in ruleset.get("rules", [])):
+                continue
+            ref_name = (ruleset.get("conditions") or {}).get("ref_name") or {}
+            found.append((ruleset.get("name") or str(summary["id"]), ref_name.get("include", []),
+                          ref_name.get("exclude", [])))
+        return found
+
+    def resolve(self) -> Tuple[List[str], List[Tuple[str, List[str], List[str]]]]:
+        """Return the classically protected branch names and the protecting rulesets; ruleset errors only warn."""
+        names = self.classic_branches()
+        try:
+            rulesets = self.rulesets()
+        except APIError as e:
+            print(f"::warning::Unable to list rulesets, using classic branch protection only: {e}")
+            rulesets = []
+        return names, rulesets
+
+    def save(self) -> None:
+        """Write the responses of this run to the cache atomically (responses no longer requested are dropped)."""
+        if not self.cache_path:
+            return
+        document = {"version": CACHE_VERSION, "repo": self.api.repo, "responses": self.responses}
+        temporary = f"{self.cache_path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(document, f, separators=(",", ":"))
+        os.replace(temporary, self.cache_path)
@@ -2,16 +2,74 @@
 # filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/branch_sweeper.py
 
 import argparse
-import json
 import os
 import re
 import subprocess
 import sys
+import threading
 import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional, Set, Tuple, Union
 
+try:
+    from .branch_policy import BranchPolicy, PolicyRule, load_policy
+    from .branch_protection import ProtectionMatcher, ProtectionResolver
+    from .command_trace import CommandTracer, record_command, set_tracer
+    from .deadline import RunDeadline, command_category, parse_timeouts
+    from .deletion_pipeline import DeletionPipeline, DeletionRequest
+    from .deletion_plan import PlanSink, load_plan
+    from .evidence_planner import UNCHECKED_EVIDENCE, EvidencePlanner, evidence_needed, unchecked_decision
+    from .github_api import APIError, GitHubAPI
+    from .lease_lock import LEASE_MODES, LOCK_REF, LeaseError, LeaseLock
+    from .merge_index import MERGE_ENGINES, MergeIndex, commit_message_pattern
+    from .metrics import MetricsRegistry, set_registry
+    from .policy_snapshot import SnapshotWriter, policy_decision
+    from .pull_request_store import PullRequestStore
+    from .results_writer import NdjsonSink, ResultsWriter, create_sink
+    from .run_journal import JournalSink, has_evidence, is_settled
+    from .sharding import parse_shard, shard_label, shard_of
+    from .startup_graph import StartupGraph
+    from .summary_renderer import SummaryAggregator
+    from .sweep_budget import BUDGET_REASONS, SweepBudget, prioritized
+    from .timing import PhaseTimer, RunProfiler
+    from .workspace import DEFAULT_URL_TEMPLATE, MirrorCache, use_mirror_cache
+except ImportError:
+    from branch_policy import BranchPolicy, PolicyRule, load_policy
+    from branch_protection import ProtectionMatcher, ProtectionResolver
+    from command_trace import CommandTracer, record_command, set_tracer
+    from deadline import RunDeadline, command_category, parse_timeouts
+    from deletion_pipeline import DeletionPipeline, DeletionRequest
+    from deletion_plan import PlanSink, load_plan
+    from evidence_planner import UNCHECKED_EVIDENCE, EvidencePlanner, evidence_needed, unchecked_decision
+    from github_api import APIError, GitHubAPI
+    from lease_lock import LEASE_MODES, LOCK_REF, LeaseError, LeaseLock
+    from merge_index import MERGE_ENGINES, MergeIndex, commit_message_pattern
+    from metrics import MetricsRegistry, set_registry
+    from policy_snapshot import SnapshotWriter, policy_decision
+    from pull_request_store import PullRequestStore
+    from results_writer import NdjsonSink, ResultsWriter, create_sink
+    from run_journal import JournalSink, has_evidence, is_settled
+    from sharding import parse_shard, shard_label, shard_of
+    from startup_graph import StartupGraph
+    from summary_renderer import SummaryAggregator
+    from sweep_budget import BUDGET_REASONS, SweepBudget, prioritized
+    from timing import PhaseTimer, RunProfiler
+    from workspace import DEFAULT_URL_TEMPLATE, MirrorCache, use_mirror_cache
+
+
+class FakeResult:
+    """Stand-in for a CompletedProcess when a command could not run to completion."""
+
+    def __init__(self, returncode: int, stderr: str):
+        self.returncode = returncode
+        self.stdout = ""
+        self.stderr = stderr
+
+
+class FetchError(Exception):
+    """The branches of a shard could not be fetched, so they would be evaluated from stale refs."""
+
 
 class BranchSweeper:
     """
@@ -28,64 +86,270 @@ class BranchSweeper:
         repo: str = "",
         verbose: bool = False,
         test_mode: bool = False,
+        results: Optional[List[str]] = None,
+        summary_top_n: int = 25,
+        summary_details: str = "summary-details.ndjson.gz",
+        profile_output: str = "",
+        trace_output: str = "",
+        metrics_output: str = "",
+        metrics_push_url: str = "",
+        pull_request_lookup: bool = True,
+        protected_lookup: bool = False,
+        merge_engine: str = "reference",
+        lease: str = "off",
+        lease_ttl: int = 300,
+        lease_wait: int = 600,
+        delete_batch_size: int = 20,
+        delete_queue_size: int = 100,
+        command_timeouts: Optional[List[str]] = None,
+        deadline: float = 0.0,
+        deadline_reserve: float = 30.0,
+        shard: str = "",
+        plan_output: str = "",
+        apply_plan: str = "",
+        journal: str = "",
+        resume: bool = False,
+        time_budget: float = 0.0,
+        max_deletions: int = 0,
+        unmerged_days: int = 30,
+        snapshot_output: str = "",
+        pull_request_store: str = "",
+        lazy_evidence: bool = False,
+        policy: str = "",
+        protection_cache: str = "",
+        mirror: Optional[MirrorCache] = None,
     ):
         """Initialize the BranchSweeper with configuration parameters."""
         self.dry_run = dry_run
         self.weeks_threshold = weeks_threshold
+        if unmerged_days <= 0:
+            raise ValueError("unmerged_days must be a positive number")
+        self.unmerged_days = unmerged_days
+        # Per-pattern thresholds; branches no rule matches use the two above (see branch_policy.py)
+        self.policy_path = policy
+        self.policy: Optional[BranchPolicy] = load_policy(policy, weeks_threshold, unmerged_days) if policy else None
+        self.branch_rules: Dict[str, PolicyRule] = {}
+        self.rule_cutoffs: Dict[str, Tuple[int, int]] = {}
         self.repo = repo
         self.verbose = verbose or os.environ.get("DEBUG") == "true"
         self.test_mode = test_mode or os.environ.get("GITHUB_TEST_MODE") == "true"
+        # Look up merged PRs through the GitHub API (disabled for hermetic local runs such as benchmarks)
+        self.pull_request_lookup = pull_request_lookup
+        # Merged pull requests kept between runs and synced incrementally (see pull_request_store.py)
+        self.pr_store_path = pull_request_store
+        self.pr_store: Optional[PullRequestStore] = None
+        # Merge checks answered by the store with a merged pull request (hit) or without one (miss)
+        self.pr_store_lookups: Dict[str, int] = {"hit": 0, "miss": 0}
+        # Add the repository's protected branches and rulesets from the GitHub API during start-up,
+        # revalidating the responses cached in protection_cache with their ETags (see branch_protection.py)
+        self.protected_lookup = protected_lookup
+        self.protection_cache = protection_cache
+        
+        # Per-category command timeouts and the wall-clock budget of the whole run
+        self.command_timeouts = parse_timeouts(command_timeouts or [])
+        self.deadline = RunDeadline(deadline, deadline_reserve)
+        self.unfinished: Dict[str, int] = {}
+        
+        # Soft budgets: evaluate from a priority heap and defer what does not fit to the next run
+        self.budget = SweepBudget(time_budget, max_deletions)
+        self.deletions_requested = 0
+        self.deferred: Dict[str, List[str]] = {}
+        self.api = GitHubAPI(repo, run_command=self._run_command, timeout=self.command_timeouts["api"] or None,
+                             deadline=self.deadline)
+        
+        # Merge detection: per-branch commands ("reference") or one batched index ("batched")
+        if merge_engine not in MERGE_ENGINES:
+            raise ValueError(f"Unknown merge engine '{merge_engine}' (expected one of: {', '.join(MERGE_ENGINES)})")
+        self.merge_engine = merge_engine
+        self.merge_index: Optional[MergeIndex] = None
+        
+        # Only gather merge evidence that can change a decision, cheapest check first (see evidence_planner.py)
+        self.evidence_planner: Optional[EvidencePlanner] = None
+        if lazy_evidence:
+            self.evidence_planner = EvidencePlanner([
+                ("containment", self._containment_evidence),
+                ("pull_request", self._pull_request_evidence),
+                ("message", self._message_evidence),
+            ])
+        
+        # Lease on refs/janitor/lock so overlapping sweeps of a repository exit or wait
+        if lease not in LEASE_MODES:
+            raise ValueError(f"Unknown lease mode '{lease}' (expected one of: {', '.join(LEASE_MODES)})")
+        self.lease_mode = lease
+        self.lease_ttl = lease_ttl
+        self.lease_wait = lease_wait
+        self.lease: Optional[LeaseLock] = None
+        self.lease_holder = ""
+        
+        # Only evaluate the branches of one i/N slice of the namespace (see sharding.py)
+        self.shard = parse_shard(shard)
+        
+        # Deletions are batched on a worker thread while evaluation continues (0 deletes inline)
+        self.delete_batch_size = delete_batch_size
+        self.delete_queue_size = delete_queue_size
+        self.deletions: Optional[DeletionPipeline] = None
+        
+        # Plan/apply split: a dry run writes what it would delete; applying deletes a reviewed plan
+        # without evaluating anything, and only where the branch tip is still the planned one
+        self.plan_output = plan_output
+        self.apply_plan = apply_plan
+        self.plan: Optional[Tuple[Dict, List[Dict]]] = load_plan(apply_plan) if apply_plan else None
+        self.expected_tips: Dict[str, str] = {}
+        
+        # Append-only journal of decisions; resuming replays it instead of evaluating again (see run_journal.py)
+        if resume and not journal:
+            raise ValueError("Resuming a sweep needs the journal of the interrupted run")
+        self.journal_path = journal
+        self.resume = resume
+        self.journal: Optional[JournalSink] = None
+        # branch -> journaled decision whose merge evidence is reused on resume (see _evaluate_branch)
+        self.journaled_evidence: Dict[str, Dict] = {}
+        
+        # Policy inputs of every evaluated branch, for what-if runs of simulate_policy.py
+        self.snapshot_output = snapshot_output
+        self.snapshot: Optional[SnapshotWriter] = None
+        
+        # Fleet metrics (OpenMetrics textfile and/or Pushgateway), labelled by repository
+        self.metrics_output = metrics_output
+        self.metrics_push_url = metrics_push_url
+        self.metrics: Optional[MetricsRegistry] = None
+        if metrics_output or metrics_push_url:
+            self.metrics = MetricsRegistry({"repo": repo})
+        # Mirror cache refreshed before the run (see workspace.py), counted as a cache hit or rebuild
+        self.mirror = mirror
+        
+        # Per-phase timing spans; profile_output enables cProfile and stack sampling
+        self.timer = PhaseTimer(observer=self._observe_phase if self.metrics else None)
+        self.profile_output = profile_output
+        self.trace_output = trace_output
+        self.tracer: Optional[CommandTracer] = None
         
         # Calculate date thresholds
-        self.current_date = int(time.time())
-        self.cutoff_date = int(
-            (datetime.now() - timedelta(weeks=weeks_threshold)).timestamp()
-        )
-        self.month_cutoff_date = int(
-            (datetime.now() - timedelta(days=30)).timestamp()
-        )
+        self._refresh_cutoffs()
+        
+        # When each evaluated branch becomes eligible for deletion (see _evaluate_branch)
+        self.due_dates: Dict[str, int] = {}
         
-        # Set default branch if not provided
+        # Set protected branches; a default branch that was not provided is discovered during start-up
+        # (see _resolve_default_branch) together with the other lookups
         self.default_branch = default_branch
-        if not self.default_branch:
-            self.default_branch = self._get_default_branch()
-            
-        # Set protected branches
-        self.protected_branches = set(protected_branches.split() if protected_branches else [])
-        if self.default_branch not in self.protected_branches:
+        self.protected_branches = ProtectionMatcher(protected_branches.split() if protected_branches else [])
+        if self.default_branch:
             self.protected_branches.add(self.default_branch)
             
         # Branches to check for merge status (includes default branch and all protected branches)
         self.branches_to_check = self.protected_branches.copy()
+        self._startup_lock = threading.Lock()
+        self.startup: Optional[StartupGraph] = None
+        self.leased = False
         
-        # Arrays to track results
-        self.deleted_branches = []
-        self.skipped_branches = []
-        self.not_merged_branches = []
-        self.stale_unmerged_branches = []
+        # Structured per-branch results, streamed to the configured sinks during run().
+        # The summary only keeps bounded aggregates; the full list goes to summary_details.
+        self.results_specs = results or []
+        self.summary_details = summary_details
+        self.summary = SummaryAggregator(
+            top_n=summary_top_n, current_date=self.current_date, details_path=summary_details
+        )
+        self.results = ResultsWriter([self.summary])
+        self._results_lock = threading.Lock()
+
+    def _refresh_cutoffs(self) -> None:
+        """Recompute the date thresholds relative to the current time."""
+        self.current_date = int(time.time())
+        self.cutoff_date = int(
+            (datetime.now() - timedelta(weeks=self.weeks_threshold)).timestamp()
+        )
+        self.month_cutoff_date = int(
+            (datetime.now() - timedelta(days=self.unmerged_days)).timestamp()
+        )
+        if self.policy:
+            self.rule_cutoffs = self.policy.cutoffs(datetime.now())
 
-    def _run_command(self, cmd: List[str], capture_output: bool = True) -> subprocess.CompletedProcess:
-        """Run a shell command and return the result."""
+    def _run_command(self, cmd: List[str], capture_output: bool = True,
+                     input: Optional[str] = None) -> subprocess.CompletedProcess:
+        """Run a shell command, feeding it input on stdin if given, and return the result."""
         if self.verbose:
             print(f"DEBUG: Running command: {' '.join(cmd)}")
         
+        category = command_category(cmd)
+        timeout = self.deadline.clamp(self.command_timeouts[category] or None)
+        started = time.time()
         try:
             result = subprocess.run(
                 cmd,
                 capture_output=capture_output,
                 text=True,
-                check=False  # We'll handle errors manually
+                check=False,  # We'll handle errors manually
+                timeout=timeout,
+                input=input,
             )
-            return result
+        except subprocess.TimeoutExpired:
+            print(f"::warning::Command timed out after {timeout:.0f}s: {' '.join(cmd)}")
+            if self.metrics:
+                self.metrics.inc("command_timeouts", 1, "Commands killed after their timeout", category=category)
+            result = FakeResult(124, f"Command timed out after {timeout:.0f}s")
         except Exception as e:
             print(f"Error executing command: {e}")
-            # Create a fake result object for error handling
-            class FakeResult:
-                def __init__(self):
-                    self.returncode = 1
-                    self.stdout = ""
-                    self.stderr = str(e)
-            return FakeResult()
+            result = FakeResult(1, str(e))
+        
+        record_command(cmd, started, time.time(), result)
+        return result
+
+    def _results_metadata(self) -> Dict[str, Union[str, int, bool]]:
+        """Return the run configuration attached to every results file."""
+        return {
+            "dry_run": self.dry_run,
+            "weeks_threshold": self.weeks_threshold,
+            "unmerged_days": self.unmerged_days,
+            "policy": self.policy.fingerprint if self.policy else "",
+            "default_branch": self.default_branch,
+            "protected_branches": " ".join(self.protected_branches),
+            "repo": self.repo,
+            "shard": f"{self.shard[0]}/{self.shard[1]}" if self.shard else "",
+        }
+
+    def _record_result(self, branch_name: str, action: str, reason: str, **fields) -> None:
+        """Emit a structured result record for a single branch decision."""
+        # Records come from both the evaluation loop and the deletion worker
+        with self._results_lock:
+            self.results.record(branch_name, action, reason, dry_run=self.dry_run, **fields)
+        if self.metrics:
+            self.metrics.inc("branch_decisions", 1, "Branch decisions by action", action=action)
+            if fields.get("attempts", 1) > 1:
+                self.metrics.inc("delete_retries", fields["attempts"] - 1, "Deletion verification retries")
+
+    def _observe_phase(self, phase: str, seconds: float) -> None:
+        """Feed a finished phase span into the metrics registry."""
+        self.metrics.observe("phase_duration_seconds", seconds, "Duration of sweeper phase spans", phase=phase)
+
+    def _export_metrics(self, run_seconds: float, exit_code: int) -> None:
+        """Write the metrics textfile and/or push them to a gateway."""
+        self.metrics.observe("run_duration_seconds", run_seconds, "Wall time of a sweeper run")
+        self.metrics.inc("runs", 1, "Sweeper runs by mode and outcome", mode="dry_run" if self.dry_run else "delete",
+                         outcome="success" if exit_code == 0 else "failure")
+        if self.evidence_planner:
+            for check, count in self.evidence_planner.avoided.items():
+                self.metrics.inc("evidence_checks_avoided", count, "Merge evidence checks the planner did not run",
+                                 check=check)
+        if self.mirror:
+            self.metrics.inc("mirror_cache_refreshes", 1, "Mirror cache refreshes by outcome",
+                             outcome=self.mirror.outcome)
+            self.metrics.inc("mirror_cache_fetched_bytes", self.mirror.bytes_fetched,
+                             "Bytes fetched into the mirror cache")
+        if self.pr_store:
+            for result, count in self.pr_store_lookups.items():
+                self.metrics.inc("pull_request_store_lookups", count, "Merge checks answered by the pull request store",
+                                 result=result)
+        
+        if self.metrics_output:
+            try:
+                self.metrics.write_textfile(self.metrics_output)
+                print(f"Metrics written to {self.metrics_output}")
+            except OSError as e:
+                print(f"::warning::Unable to write metrics file: {e}")
+        if self.metrics_push_url:
+            if self.metrics.push(self.metrics_push_url):
+                print(f"Metrics pushed to {self.metrics_push_url}")
 
     def _get_default_branch(self) -> str:
         """Determine the default branch of the repository."""
@@ -105,25 +369,149 @@ class BranchSweeper:
                 
         return default_branch
 
+    def _add_protected_branches(self, branch_names: List[str]) -> None:
+        """Protect more branches and check merges against them."""
+        # Start-up phases discover protected branches concurrently
+        with self._startup_lock:
+            self.protected_branches.update(branch_names)
+            self.branches_to_check.update(branch_names)
+
+    def _resolve_default_branch(self) -> None:
+        """Discover the default branch if it was not provided, and protect it."""
+        if not self.default_branch:
+            self.default_branch = self._get_default_branch()
+        self._add_protected_branches([self.default_branch])
+
+    def _discover_protected_branches(self) -> None:
+        """Add the branches protected classically or by rulesets, as listed by the GitHub API."""
+        if not self.protected_lookup or self.test_mode:
+            return
+        resolver = ProtectionResolver(self.api, self.protection_cache)
+        try:
+            branch_names, rulesets = resolver.resolve()
+        except APIError as e:
+            if self.plan is not None:
+                # A plan may only delete branches that are not protected now
+                raise APIError(f"Unable to resolve branch protection, rejecting the plan: {e}", e.status)
+            print(f"::warning::Unable to list protected branches, using the configured ones: {e}")
+            return
+        self._add_protected_branches(branch_names)
+        with self._startup_lock:
+            for name, include, exclude in rulesets:
+                self.protected_branches.add_ruleset(name, include, exclude)
+        try:
+            resolver.save()
+        except OSError as e:
+            print(f"::warning::Unable to save the protection cache {self.protection_cache}: {e}")
+        if self.metrics:
+            for result, count in (("hit", resolver.hits), ("miss", resolver.misses)):
+                self.metrics.inc("protection_cache_lookups", count, "Protection lookups by ETag cache result",
+                                 result=result)
+        print(f"Protection: {len(branch_names)} protected branches, {len(rulesets)} rulesets "
+              f"(protection cache: {resolver.hits} hits, {resolver.misses} misses)")
+
+    def _sync_pull_request_store(self) -> None:
+        """Bring the local pull request store up to date; merge checks fall back to the API if that fails."""
+        store = PullRequestStore(self.pr_store_path, self.repo)
+        try:
+            transferred = store.sync(self.api)
+            store.save()
+        except (APIError, OSError) as e:
+            print(f"::warning::Unable to sync the pull request store {self.pr_store_path}: {e}")
+            return
+        self.timer.count("pr_store", transferred)
+        if self.metrics:
+            self.metrics.inc("pull_requests_transferred", transferred, "Pull requests transferred by the store sync")
+        print(f"Pull request store: {transferred} pull requests transferred since {store.cursor or 'the start'}, "
+              f"{len(store.pulls)} merged pull requests stored")
+        self.pr_store = store
+
     def _configure_git(self) -> None:
         """Configure Git with the GitHub Actions Bot identity."""
         self._run_command(["git", "config", "--global", "user.name", "GitHub Actions Bot"])
         self._run_command(["git", "config", "--global", "user.email", "actions@github.com"])
 
+    def _acquire_lease(self) -> bool:
+        """Take the repository lease; return False if another sweep holds it."""
+        if self.lease_mode == "off" or self.test_mode:
+            return True
+        
+        # Shards of one sweep run side by side; each one serializes with its own earlier runs
+        ref = f"{LOCK_REF}-{shard_label(self.shard)}" if self.shard else LOCK_REF
+        lease = LeaseLock(self._run_command, ttl=self.lease_ttl, ref=ref, verbose=self.verbose)
+        try:
+            acquired = lease.acquire(wait=self.lease_wait if self.lease_mode == "wait" else 0,
+                                     poll_interval=min(10.0, self.lease_ttl / 3.0))
+        except LeaseError as e:
+            print(f"::warning::Unable to take the sweep lease, continuing without it: {e}")
+            return True
+            
+        if not acquired:
+            self.lease_holder = lease.holder.get("owner", "unknown")
+            print(f"::warning::Another sweep ({self.lease_holder}) holds {lease.ref}, exiting")
+            if self.metrics:
+                self.metrics.inc("lease_contended", 1, "Runs that found the sweep lease held by another sweep")
+            return False
+            
+        self.lease = lease
+        self.lease.start_renewal()
+        return True
+
     def _branch_exists(self, branch_name: str) -> bool:
         """Check if a branch exists in the remote repository."""
         cmd = ["git", "ls-remote", "--exit-code", "--heads", "origin", branch_name]
         result = self._run_command(cmd, capture_output=True)
         return result.returncode == 0
 
+    def _in_shard(self, branch_name: str) -> bool:
+        """Whether a branch belongs to this run's shard (always true without sharding)."""
+        return not self.shard or shard_of(branch_name, self.shard[1]) == self.shard[0]
+
     def _fetch_all_branches(self) -> None:
         """Fetch all branches from the remote repository."""
+        if self.shard:
+            self._fetch_shard_branches()
+            return
         print("Fetching all branches...")
         self._run_command(["git", "fetch", "--all"])
 
-    def _get_branch_info(self) -> Dict[str, Dict[str, Union[str, int, bool]]]:
-        """Get information about all remote branches."""
-        cmd = ["git", "for-each-ref", "--format='%(refname:short) %(committerdate:unix)'", "refs/remotes/origin/"]
+    def _fetch_shard_branches(self) -> None:
+        """Fetch only the branches of this shard, and the branches merges are checked against."""
+        print(f"Fetching the branches of shard {self.shard[0]}/{self.shard[1]}...")
+        # --heads makes the server advertise refs/heads/ only (a ref-prefix with protocol v2)
+        result = self._run_command(["git", "ls-remote", "--heads", "origin"])
+        if result.returncode != 0:
+            print(f"::warning::Unable to list remote branches, fetching all of them: {result.stderr.strip()}")
+            self._run_command(["git", "fetch", "--all"])
+            return
+        
+        branch_names = []
+        for line in result.stdout.splitlines():
+            _, _, ref = line.partition("\t")
+            branch_name = ref[len("refs/heads/"):]
+            if branch_name in self.branches_to_check or self._in_shard(branch_name):
+                branch_names.append(branch_name)
+        if self.verbose:
+            print(f"DEBUG: Shard {self.shard[0]}/{self.shard[1]} fetches {len(branch_names)} branches")
+        if branch_names:
+            # One refspec per line on stdin: a large shard's refspecs would overflow the command line
+            refspecs = "".join(f"+refs/heads/{name}:refs/remotes/origin/{name}\n" for name in branch_names)
+            result = self._run_command(["git", "fetch", "--no-tags", "--stdin", "origin"], input=refspecs)
+            if result.returncode != 0:
+                raise FetchError(f"Unable to fetch the branches of shard {self.shard[0]}/{self.shard[1]}: "
+                                 f"{result.stderr.strip()}")
+
+    def _oldest_tip(self, branch_info: Dict[str, Dict[str, Union[str, int, bool]]]) -> int:
+        """Return the commit date of the oldest tip among the branches that can be evaluated (0 if none)."""
+        # Protected branches still being discovered only make the date older, never too recent
+        with self._startup_lock:
+            dates = [info["commit_date"] for name, info in branch_info.items() if name not in self.protected_branches]
+        return min(dates, default=0)
+
+    def _get_branch_info(self, branches: Optional[List[str]] = None) -> Dict[str, Dict[str, Union[str, int, bool]]]:
+        """Get information about all remote branches, or only the given ones."""
+        patterns = [f"refs/remotes/origin/{branch}" for branch in branches] if branches else ["refs/remotes/origin/"]
+        cmd = ["git", "for-each-ref", "--format='%(refname:short) %(committerdate:unix) %(objectname)'"] + patterns
         result = self._run_command(cmd)
         
         if result.returncode != 0:
@@ -136,7 +524,7 @@ class BranchSweeper:
             if not line or line.isspace():
                 continue
                 
-            # Parse each line (format: 'origin/branch_name timestamp')
+            # Parse each line (format: 'origin/branch_name timestamp sha')
             line = line.strip("'")
             parts = line.split()
             
@@ -156,6 +544,10 @@ class BranchSweeper:
             # Skip empty branch names and origin/HEAD
             if not branch_name or branch_name == "HEAD":
                 continue
+            
+            # Patterns also match refs below a branch name used as a directory
+            if branches and branch_name not in branches:
+                continue
                 
             try:
                 commit_date = int(parts[1])
@@ -171,6 +563,7 @@ class BranchSweeper:
                 "ref_name": ref_name,
                 "commit_date": commit_date,
                 "branch_age": branch_age,
+                "sha": parts[2] if len(parts) > 2 else "",
                 "is_merged": False,  # Will be determined later
             }
             
@@ -178,26 +571,52 @@ class BranchSweeper:
 
     def _check_if_branch_is_merged(self, branch_name: str) -> bool:
         """Check if a branch is merged into any protected branch."""
+        evidence = self._merge_evidence(branch_name)
+        if evidence:
+            print(evidence)
+        return evidence is not None
+
+    def _merge_evidence(self, branch_name: str) -> Optional[str]:
+        """Describe why a branch counts as merged into a protected branch, or return None."""
         if self.verbose:
             print(f"DEBUG: Looking for merge evidence for {branch_name}")
+        return (self._pull_request_evidence(branch_name) or self._containment_evidence(branch_name)
+                or self._message_evidence(branch_name))
+
+    def _pull_request_evidence(self, branch_name: str) -> Optional[str]:
+        """Evidence from a merged pull request whose head is the branch."""
+        evidence = self._lookup_pull_request(branch_name)
+        if self.pr_store:
+            self.pr_store_lookups["hit" if evidence else "miss"] += 1
+        return evidence
+
+    def _lookup_pull_request(self, branch_name: str) -> Optional[str]:
+        """Look up a merged pull request of the branch with whichever engine is in use."""
+        # The batched engine answers from the index built once per run
+        if self.merge_index:
+            return self.merge_index.pull_request_evidence(branch_name)
+            
+        # Check for merged PRs in the local store or through the GitHub API
+        if not self.test_mode and self.pull_request_lookup:
+            try:
+                pr_info = (self.pr_store or self.api).merged_pull_request(branch_name)
+            except APIError as e:
+                pr_info = None
+                if self.verbose:
+                    print(f"DEBUG: Pull request lookup failed for {branch_name}: {e}")
+            
+            if pr_info:
+                pr_number = pr_info.get("number", "unknown")
+                pr_title = pr_info.get("title", "unknown")
+                pr_merged_at = pr_info.get("merged_at", "unknown")
+                return f"Branch {branch_name} was merged via PR #{pr_number}: {pr_title} (merged at {pr_merged_at})"
+        return None
+
+    def _containment_evidence(self, branch_name: str) -> Optional[str]:
+        """Evidence that the branch tip is reachable from a protected branch."""
+        if self.merge_index:
+            return self.merge_index.containment_evidence(branch_name)
             
-        # First check for merged PRs using GitHub CLI
-        if not self.test_mode:
-            cmd = ["gh", "pr", "list", "--head", branch_name, "--state", "merged", "--json", "number,title,mergedAt", "--limit", "1"]
-            result = self._run_command(cmd)
-            
-            if result.returncode == 0 and result.stdout.strip() and result.stdout.strip() != "[]":
-                try:
-                    pr_info = json.loads(result.stdout)
-                    if pr_info and len(pr_info) > 0:
-                        pr_number = pr_info[0].get("number", "unknown")
-                        pr_title = pr_info[0].get("title", "unknown")
-                        pr_merged_at = pr_info[0].get("mergedAt", "unknown")
-                        print(f"Branch {branch_name} was merged via PR #{pr_number}: {pr_title} (merged at {pr_merged_at})")
-                        return True
-                except json.JSONDecodeError:
-                    print(f"Error parsing PR info for {branch_name}")
-        
         # Check if branch is fully merged into any protected branch using git merge-base
         for protected in self.branches_to_check:
             if self.verbose:
@@ -220,32 +639,39 @@ class BranchSweeper:
                 merge_base = merge_base_result.stdout.strip()
                 
                 if merge_base == branch_tip:
-                    print(f"Branch {branch_name} is fully merged into protected branch {protected} (fully contained)")
-                    return True
-                    
+                    return f"Branch {branch_name} is fully merged into protected branch {protected} (fully contained)"
+        return None
+
+    def _message_evidence(self, branch_name: str) -> Optional[str]:
+        """Evidence from merge commit messages and git branch --merged."""
+        if self.merge_index:
+            return self.merge_index.message_evidence(branch_name)
+            
         # Additional checks for merge commits in protected branches
         for protected in self.branches_to_check:
             # Check for merge commit messages
-            merge_pattern = f"Merge.*{branch_name}|Merge.*branch.*{branch_name}|Merge.*pull.*request.*{branch_name}|{branch_name}.*into"
+            merge_pattern = commit_message_pattern(branch_name)
             cmd = ["git", "log", f"origin/{protected}", f"--grep={merge_pattern}", "-n", "1", "--oneline"]
             merge_result = self._run_command(cmd)
             
             if merge_result.returncode == 0 and merge_result.stdout:
-                print(f"Branch {branch_name} appears to be merged into {protected} based on commit messages")
-                return True
+                return f"Branch {branch_name} appears to be merged into {protected} based on commit messages"
                 
             # Check using git branch --merged
             cmd = ["git", "branch", "-r", "--merged", f"origin/{protected}"]
             merged_result = self._run_command(cmd)
             
             if merged_result.returncode == 0 and f"origin/{branch_name}" in merged_result.stdout:
-                print(f"Branch {branch_name} is merged into {protected} according to git branch --merged")
-                return True
+                return f"Branch {branch_name} is merged into {protected} according to git branch --merged"
                 
-        return False
+        return None
 
-    def _delete_branch(self, branch_name: str, branch_age: str, reason: str) -> bool:
-        """Delete a branch and verify the deletion."""
+    def _delete_branch(
+        self, branch_name: str, branch_age: str, reason: str, commit_date: Optional[int] = None, **plan_fields
+    ) -> bool:
+        """Delete a branch and verify the deletion (plan_fields describe the decision in a dry run)."""
+        if self.plan is not None and not self.dry_run:
+            return self._delete_planned_branches([(branch_name, branch_age, reason, commit_date)]) == 1
         print(f"Attempting to delete branch: {branch_name} ({reason}: {branch_age})")
         
         # Check if branch exists
@@ -259,19 +685,19 @@ class BranchSweeper:
         # If this is a dry run, just log what would happen
         if self.dry_run:
             print(f"[DRY RUN] Would delete branch: {branch_name} ({reason}: {branch_age}) - not actually deleting in dry run mode")
-            self.deleted_branches.append(f"{branch_name} ({reason}: {branch_age}) - [NOT ACTUALLY DELETED - DRY RUN]")
+            self._record_result(
+                branch_name, "would_delete", reason, branch_age=branch_age, commit_date=commit_date, **plan_fields
+            )
             return True
             
         # If the branch no longer exists, mark as already deleted
         if not existed_before:
             print(f"Branch {branch_name} doesn't exist anymore, marking as already deleted")
-            self.deleted_branches.append(f"{branch_name} ({reason}: {branch_age}) - [ALREADY DELETED]")
+            self._record_result(branch_name, "already_deleted", reason, branch_age=branch_age, commit_date=commit_date)
             return True
             
         # Attempt to delete the branch
-        cmd = ["git", "push", "origin", "--delete", branch_name]
-        result = self._run_command(cmd)
-        
+        result = self._run_command(self._delete_command([branch_name]))
         if result.returncode != 0:
             print(f"::warning::Initial deletion command failed for branch: {branch_name}")
             
@@ -281,11 +707,13 @@ class BranchSweeper:
             print(f"Verifying deletion (attempt {attempt}/{max_attempts})...")
             
             # Fetch with prune to update local refs
-            self._run_command(["git", "fetch", "origin", "--prune"], capture_output=not self.verbose)
+            self._prune_remote_refs()
             
             if not self._branch_exists(branch_name):
                 print(f"Successfully deleted branch: {branch_name}")
-                self.deleted_branches.append(f"{branch_name} ({reason}: {branch_age})")
+                self._record_result(
+                    branch_name, "deleted", reason, branch_age=branch_age, commit_date=commit_date, attempts=attempt
+                )
                 return True
                 
             # If this is the last attempt, don't wait
@@ -295,71 +723,564 @@ class BranchSweeper:
             # Exponential backoff: 1s, 2s, 4s, 8s
             wait_time = 2 ** (attempt - 1)
             print(f"Branch still exists, waiting {wait_time}s before retry...")
-            time.sleep(wait_time)
+            with self.timer.phase("delete_wait"):
+                time.sleep(wait_time)
             
         print(f"::warning::Failed to delete branch after {max_attempts} attempts: {branch_name}")
-        self.skipped_branches.append(f"{branch_name} (deletion failed after {max_attempts} attempts)")
+        self._record_result(
+            branch_name, "delete_failed", f"deletion failed after {max_attempts} attempts",
+            branch_age=branch_age, commit_date=commit_date, attempts=max_attempts
+        )
         return False
 
+    def _delete_command(self, branch_names: List[str]) -> List[str]:
+        """The push deleting branches; branches of an applied plan are only deleted at their planned tip."""
+        leases = [f"--force-with-lease=refs/heads/{name}:{self.expected_tips[name]}"
+                  for name in branch_names if name in self.expected_tips]
+        return ["git", "push", "origin", "--delete"] + leases + branch_names
+
+    def _push_planned_deletions(self, branch_names: List[str]) -> Tuple[Set[str], Set[str], Set[str]]:
+        """Push the deletion of planned branches; return the branches the push deleted, found moved and found gone."""
+        cmd = self._delete_command(branch_names)
+        result = self._run_command(cmd[:2] + ["--porcelain"] + cmd[2:])
+        deleted = set(re.findall(r"^-\t:refs/heads/(\S+)\t\[deleted\]", result.stdout or "", re.MULTILINE))
+        moved = set(re.findall(r"^!\t[^\t]*:refs/heads/(\S+)\t\[rejected\] \(stale info\)", result.stdout or "",
+                               re.MULTILINE))
+        # A branch deleted since the snapshot makes git refuse the whole push before sending anything
+        gone = set(re.findall(r"unable to delete '([^']+)': remote ref does not exist", result.stderr or ""))
+        return deleted, moved, gone
+
+    def _delete_planned_branches(self, requests: List[DeletionRequest]) -> int:
+        """Delete branches of an applied plan, verified by the push's own report; return how many were deleted.
+
+        The plan was checked against one snapshot of the remote and each push only deletes a branch at its
+        planned tip, so the remote is not listed again.
+        """
+        for branch_name, branch_age, reason, _ in requests:
+            print(f"Attempting to delete branch: {branch_name} ({reason}: {branch_age})")
+        pending = list(requests)
+        deleted_count = 0
+        max_attempts = 5
+        for attempt in range(1, max_attempts + 1):
+            deleted, moved, gone = self._push_planned_deletions([request[0] for request in pending])
+            for branch_name, branch_age, reason, commit_date in pending:
+                if branch_name in deleted:
+                    print(f"Successfully deleted branch: {branch_name}")
+                    self._record_result(
+                        branch_name, "deleted", reason, branch_age=branch_age, commit_date=commit_date,
+                        attempts=attempt
+                    )
+                    deleted_count += 1
+                elif branch_name in moved:
+                    print(f"Skipping branch {branch_name}: its tip changed since the plan was made")
+                    self._record_result(
+                        branch_name, "skipped", "changed since the plan", branch_age=branch_age, commit_date=commit_date
+                    )
+                elif branch_name in gone:
+                    print(f"Branch {branch_name} doesn't exist anymore, marking as already deleted")
+                    self._record_result(
+                        branch_name, "already_deleted", reason, branch_age=branch_age, commit_date=commit_date
+                    )
+            pending = [request for request in pending if request[0] not in deleted | moved | gone]
+            if not pending or attempt == max_attempts:
+                break
+            if gone:
+                # The push was refused for the vanished branches only; the rest has not been tried yet
+                continue
+            
+            # Exponential backoff: 1s, 2s, 4s, 8s
+            wait_time = 2 ** (attempt - 1)
+            print(f"{len(pending)} branches still exist, waiting {wait_time}s before retry...")
+            with self.timer.phase("delete_wait"):
+                time.sleep(wait_time)
+        
+        for branch_name, branch_age, reason, commit_date in pending:
+            print(f"::warning::Failed to delete branch after {max_attempts} attempts: {branch_name}")
+            self._record_result(
+                branch_name, "delete_failed", f"deletion failed after {max_attempts} attempts",
+                branch_age=branch_age, commit_date=commit_date, attempts=max_attempts
+            )
+        return deleted_count
+
+    def _prune_remote_refs(self) -> None:
+        """Update the remote-tracking refs while deletions are verified."""
+        # The push already dropped the refs it deleted; shards must not fetch every other branch
+        if not self.shard:
+            self._run_command(["git", "fetch", "origin", "--prune"], capture_output=not self.verbose)
+
+    def _existing_branches(self, branch_names: List[str]) -> Set[str]:
+        """Return which of the branches still exist in the remote repository."""
+        cmd = ["git", "ls-remote", "--heads", "origin"] + branch_names
+        result = self._run_command(cmd)
+        if result.returncode != 0:
+            # Assume nothing was deleted if the remote cannot be listed
+            return set(branch_names)
+        
+        # ls-remote matches patterns against trailing path components, so compare full names
+        listed = {line.split("\t", 1)[-1] for line in result.stdout.splitlines() if "\t" in line}
+        return {name for name in branch_names if f"refs/heads/{name}" in listed}
+
+    def _delete_branches(self, requests: List[DeletionRequest]) -> None:
+        """Delete a batch of branches with one push and verify them together."""
+        with self.timer.phase("delete", items=len(requests)):
+            if self.plan is not None:
+                self._delete_planned_branches(requests)
+                return
+            existing = self._existing_branches([request[0] for request in requests])
+            pending = []
+            for branch_name, branch_age, reason, commit_date in requests:
+                if branch_name in existing:
+                    pending.append((branch_name, branch_age, reason, commit_date))
+                    print(f"Attempting to delete branch: {branch_name} ({reason}: {branch_age})")
+                else:
+                    print(f"Branch {branch_name} doesn't exist anymore, marking as already deleted")
+                    self._record_result(
+                        branch_name, "already_deleted", reason, branch_age=branch_age, commit_date=commit_date
+                    )
+            if not pending:
+                return
+            
+            # Branches are deleted independently: one rejected ref does not block the others
+            result = self._run_command(self._delete_command([request[0] for request in pending]))
+            if result.returncode != 0:
+                print(f"::warning::Initial deletion command failed for some of {len(pending)} branches")
+            
+            # Verify deletion with polling
+            max_attempts = 5
+            for attempt in range(1, max_attempts + 1):
+                print(f"Verifying deletion of {len(pending)} branches (attempt {attempt}/{max_attempts})...")
+                self._prune_remote_refs()
+                
+                remaining = self._existing_branches([request[0] for request in pending])
+                for branch_name, branch_age, reason, commit_date in pending:
+                    if branch_name not in remaining:
+                        print(f"Successfully deleted branch: {branch_name}")
+                        self._record_result(
+                            branch_name, "deleted", reason, branch_age=branch_age, commit_date=commit_date,
+                            attempts=attempt
+                        )
+                pending = [request for request in pending if request[0] in remaining]
+                
+                if not pending or attempt == max_attempts:
+                    break
+                    
+                # Exponential backoff: 1s, 2s, 4s, 8s
+                wait_time = 2 ** (attempt - 1)
+                print(f"{len(pending)} branches still exist, waiting {wait_time}s before retry...")
+                with self.timer.phase("delete_wait"):
+                    time.sleep(wait_time)
+            
+            for branch_name, branch_age, reason, commit_date in pending:
+                print(f"::warning::Failed to delete branch after {max_attempts} attempts: {branch_name}")
+                self._record_result(
+                    branch_name, "delete_failed", f"deletion failed after {max_attempts} attempts",
+                    branch_age=branch_age, commit_date=commit_date, attempts=max_attempts
+                )
+
+    def _abandon_deletions(self, requests: List[DeletionRequest], reason: str) -> None:
+        """Record queued deletions that will not be attempted."""
+        for branch_name, branch_age, _, commit_date in requests:
+            print(f"::warning::Not deleting branch {branch_name}: {reason}")
+            self._record_result(branch_name, "delete_failed", reason, branch_age=branch_age, commit_date=commit_date)
+
+    def _request_deletion(
+        self, branch_name: str, branch_age: str, reason: str, commit_date: int, **plan_fields
+    ) -> None:
+        """Hand a stale branch to the deletion pipeline, or delete it inline without one."""
+        self.deletions_requested += 1
+        if self.journal and not self.dry_run:
+            # A resumed run finishes the deletions that have no outcome in the journal
+            with self._results_lock:
+                self.journal.write_pending(branch_name, plan_fields.get("sha", ""), branch_age, reason, commit_date)
+        if self.deletions:
+            with self.timer.phase("delete_enqueue", items=1):
+                self.deletions.submit((branch_name, branch_age, reason, commit_date))
+        else:
+            with self.timer.phase("delete", items=1):
+                self._delete_branch(branch_name, branch_age, reason, commit_date, **plan_fields)
+
+    def _record_unfinished(self, branch_names: List[str], reason: str) -> None:
+        """Record branches that were left unevaluated, e.g. when the run deadline was reached."""
+        if not branch_names:
+            return
+        if reason in BUDGET_REASONS:
+            print(f"::warning::{reason}: {len(branch_names)} branches deferred to the next run")
+            # The summary names the branches the next run starts with
+            self.deferred[reason] = branch_names[:self.summary.top_n]
+        else:
+            print(f"::warning::{reason}: {len(branch_names)} branches were not evaluated")
+        self.unfinished[reason] = self.unfinished.get(reason, 0) + len(branch_names)
+        for branch_name in branch_names:
+            self._record_result(branch_name, "skipped", reason, unfinished=True)
+        if self.metrics:
+            self.metrics.inc("branches_unfinished", len(branch_names), "Branches left unevaluated", reason=reason)
+
+    def _stop_reason(self) -> str:
+        """Return why no new work may be started, or an empty string."""
+        if self.lease and not self.lease.held:
+            return "sweep lease lost"
+        if self.deadline.expired():
+            return "run deadline reached"
+        return ""
+
+    def _open_results(self) -> None:
+        """Open the structured results files (their metadata names the default and protected branches)."""
+        if self.summary_details:
+            self.results.add_sink(NdjsonSink(self.summary_details, self._results_metadata()))
+        for spec in self.results_specs:
+            self.results.add_sink(create_sink(spec, self._results_metadata()))
+        if self.plan_output:
+            self.results.add_sink(PlanSink(self.plan_output, self._results_metadata()))
+        if self.journal_path:
+            self.journal = JournalSink(self.journal_path, self._results_metadata(), resume=self.resume)
+            self.results.add_sink(self.journal)
+        if self.snapshot_output:
+            self.snapshot = SnapshotWriter(self.snapshot_output, self.current_date, self._results_metadata())
+
+    def _start_up(self) -> None:
+        """Run the start-up phases as a dependency graph so independent network and API work overlaps."""
+        def take_lease():
+            self.leased = self._acquire_lease()
+
+        # Work on the remote repository waits for the lease
+        def fetch():
+            # Applying a plan lists the remote itself and evaluates nothing
+            if self.leased and self.plan is None:
+                self._fetch_all_branches()
+
+        def pull_request_store():
+            if self.leased:
+                self._sync_pull_request_store()
+
+        def pull_requests():
+            if self.leased:
+                if self.pr_store:
+                    self.merge_index.api = self.pr_store
+                else:
+                    self.merge_index.oldest_tip = self._oldest_tip(self._get_branch_info())
+                self.merge_index.load_pull_requests()
+
+        def merge_index():
+            if self.leased:
+                self.merge_index.protected_branches = list(self.branches_to_check)
+                self.merge_index.load_git()
+
+        graph = self.startup = StartupGraph(self.timer)
+        graph.add("configure_git", self._configure_git)
+        graph.add("lease", take_lease)
+        graph.add("default_branch", self._resolve_default_branch)
+        graph.add("protected_branches", self._discover_protected_branches)
+        graph.add("open_results", self._open_results, after=["default_branch", "protected_branches"])
+        # A shard's fetch also needs every branch merges are checked against
+        graph.add("fetch", fetch, after=["lease", "default_branch", "protected_branches"] if self.shard else ["lease"])
+        use_store = bool(self.pr_store_path) and self.pull_request_lookup and not self.test_mode and self.plan is None
+        if use_store:
+            graph.add("pr_store", pull_request_store, after=["lease"])
+        if self.merge_engine == "batched" and not self.test_mode and self.plan is None:
+            lookup_api = self.api if self.pull_request_lookup else None
+            self.merge_index = MergeIndex(self._run_command, (), lookup_api, self.verbose)
+            # Without a store the listing stops at the oldest fetched branch, so it waits for the fetch
+            graph.add("pull_requests", pull_requests, after=["lease", "pr_store"] if use_store else ["lease", "fetch"])
+            graph.add("merge_index", merge_index,
+                      after=["fetch", "pull_requests", "default_branch", "protected_branches"])
+        
+        with self.timer.phase("startup"):
+            graph.run()
+        print(f"Start-up took {graph.wall_seconds:.3f}s for {graph.sequential_seconds:.3f}s of phases "
+              f"(critical path: {' -> '.join(graph.critical_path())})")
+
     def _process_branches(self) -> None:
         """Process all branches and delete the stale ones."""
         # Get information about all branches
-        branch_info = self._get_branch_info()
+        with self.timer.phase("list_refs"):
+            branch_info = self._get_branch_info()
+            if self.pr_store and branch_info and not self.shard:
+                # A shard only fetched its own branches, so it cannot tell which ones are gone
+                self._compact_pull_request_store(branch_info)
+            if self.shard:
+                # Other shards evaluate (and record) the rest, protected branches included
+                branch_info = {name: info for name, info in branch_info.items() if self._in_shard(name)}
+        self.timer.count("list_refs", len(branch_info))
+        if self.policy:
+            # One match of the compiled rules per branch
+            with self.timer.phase("policy", items=len(branch_info)):
+                self.branch_rules = self.policy.classify(branch_info)
+        if self.metrics:
+            self.metrics.inc("branches_scanned", len(branch_info), "Remote branches examined")
         
         if self.verbose:
             print(f"Found {len(branch_info)} branches to process")
+        
+        # Gather merge evidence for all branches at once (normally done during start-up)
+        if self.merge_engine == "batched" and self.merge_index is None:
+            with self.timer.phase("merge_index"):
+                lookup_api = (self.pr_store or self.api) if self.pull_request_lookup else None
+                self.merge_index = MergeIndex(self._run_command, self.branches_to_check, lookup_api, self.verbose)
+                self.merge_index.oldest_tip = self._oldest_tip(branch_info)
+                self.merge_index.build()
             
-        for branch_name, info in branch_info.items():
-            if self.verbose:
-                print(f"DEBUG: Processing ref={info['ref_name']}, branch={branch_name}")
-                
-            # Skip protected branches
-            if branch_name in self.protected_branches:
-                print(f"Skipping protected branch: {branch_name}")
-                self.skipped_branches.append(f"{branch_name} (protected)")
+        self._start_deletions()
+        try:
+            if self.journal and self.journal.resumed:
+                with self.timer.phase("resume"):
+                    branch_info = self._resume_from_journal(branch_info)
+            
+            if self.budget.enabled or self.deadline.enabled:
+                # Cheapest decisions and oldest branches first, so a run cut short did the work worth most
+                order = prioritized(branch_info, self.protected_branches, self.cutoff_date, self.month_cutoff_date,
+                                    self._branch_cutoffs())
+            else:
+                order = iter(list(branch_info))
+            for branch_name in order:
+                # Stop starting new work once the lease is lost, the deadline is near or the budget is used up
+                stop_reason = self._stop_reason() or self.budget.exhausted(self.deletions_requested)
+                if stop_reason:
+                    self._record_unfinished([branch_name] + list(order), stop_reason)
+                    break
+                self._evaluate_branch(branch_name, branch_info[branch_name])
+        finally:
+            self._finish_deletions()
+        if self.evidence_planner:
+            print(f"Evidence planner: {self.evidence_planner.describe()}")
+        if self.pr_store:
+            print(f"Pull request store: {self.pr_store_lookups['hit']} hits, {self.pr_store_lookups['miss']} misses")
+
+    def _compact_pull_request_store(self, branch_info: Dict[str, Dict[str, Union[str, int, bool]]]) -> None:
+        """Drop the stored pull requests of branches that no longer exist."""
+        dropped = self.pr_store.compact(branch_info)
+        if not dropped:
+            return
+        try:
+            self.pr_store.save()
+        except OSError as e:
+            print(f"::warning::Unable to save the pull request store {self.pr_store_path}: {e}")
+        if self.verbose:
+            print(f"DEBUG: Dropped {dropped} pull requests of deleted branches from the store")
+
+    def _branch_cutoffs(self) -> Dict[str, Tuple[int, int]]:
+        """The (cutoff, unmerged cutoff) of every branch a policy rule applies to; kept branches never pass them."""
+        return {name: (0, 0) if rule.keep else self.rule_cutoffs[rule.name]
+                for name, rule in self.branch_rules.items()}
+
+    def _resume_from_journal(
+        self, branch_info: Dict[str, Dict[str, Union[str, int, bool]]]
+    ) -> Dict[str, Dict[str, Union[str, int, bool]]]:
+        """Replay the journal of an interrupted run and finish its deletions; return the branches left."""
+        replayed = finished = 0
+        for branch_name, record in self.journal.decisions.items():
+            # Only deletions are replayed; every other decision depends on the time of the run
+            info = branch_info.get(branch_name)
+            sha = info["sha"] if info is not None else None
+            if not is_settled(record, sha):
+                if has_evidence(record, sha):
+                    self.journaled_evidence[branch_name] = record
                 continue
+            # Verification retries were counted by the interrupted run
+            fields = {key: value for key, value in record.items()
+                      if key not in ("branch", "action", "reason", "timestamp", "dry_run", "attempts")}
+            self._record_result(branch_name, record["action"], record["reason"], resumed=True, **fields)
+            branch_info.pop(branch_name, None)
+            replayed += 1
+        
+        for branch_name, entry in self.journal.pending.items():
+            info = branch_info.get(branch_name)
+            if info is None:
+                print(f"Branch {branch_name} doesn't exist anymore, marking as already deleted")
+                self._record_result(branch_name, "already_deleted", entry["reason"],
+                                    branch_age=entry["branch_age"], commit_date=entry["commit_date"])
+            elif info["sha"] == entry["sha"]:
+                # Decided before the interruption; only the deletion is left
+                del branch_info[branch_name]
+                self._request_deletion(branch_name, entry["branch_age"], entry["reason"], entry["commit_date"],
+                                       sha=entry["sha"])
+                finished += 1
+        
+        self.timer.count("resume", replayed + finished)
+        print(f"Resumed from {self.journal_path}: {replayed} deletions replayed, {finished} pending deletions "
+              f"finished, {len(branch_info)} branches left to evaluate "
+              f"({len(self.journaled_evidence)} with journaled merge evidence)")
+        return branch_info
+
+    def _start_deletions(self) -> None:
+        """Start the deletion worker, so real deletions overlap with evaluation."""
+        if not self.dry_run and self.delete_batch_size > 0:
+            self.deletions = DeletionPipeline(
+                self._delete_branches, self._abandon_deletions,
+                queue_size=self.delete_queue_size, batch_size=self.delete_batch_size,
+                guard=self._stop_reason,
+            )
+            self.deletions.start()
+
+    def _finish_deletions(self) -> None:
+        """Let the worker finish every queued deletion so each branch gets its result record."""
+        if self.deletions:
+            with self.timer.phase("delete_drain"):
+                self.deletions.close()
+            if self.verbose:
+                print(f"DEBUG: {self.deletions.submitted} deletions in {self.deletions.batches} batches, "
+                      f"evaluation blocked {self.deletions.blocked_seconds:.3f}s on a full queue")
+            self.deletions = None
+
+    def _apply_plan(self) -> None:
+        """Delete the branches of a plan whose tips are unchanged, without evaluating anything."""
+        metadata, entries = self.plan
+        print(f"Applying the plan {self.apply_plan} ({len(entries)} branches, created {metadata['created']})")
+        
+        # One snapshot of the remote heads re-validates every planned tip
+        with self.timer.phase("list_refs"):
+            result = self._run_command(["git", "ls-remote", "--heads", "origin"])
+        if result.returncode != 0:
+            print(f"::error::Unable to list remote branches: {result.stderr.strip()}")
+            self._record_unfinished([entry["branch"] for entry in entries], "remote branches could not be listed")
+            return
+        tips = {}
+        for line in result.stdout.splitlines():
+            sha, _, ref = line.partition("\t")
+            tips[ref[len("refs/heads/"):]] = sha
+        self.timer.count("list_refs", len(tips))
+        
+        if self.budget.enabled or self.deadline.enabled:
+            # Every planned branch is a deletion, so the oldest ones go first
+            entries = sorted(entries, key=lambda entry: entry["commit_date"] or 0)
+        
+        self._start_deletions()
+        try:
+            for index, entry in enumerate(entries):
+                stop_reason = self._stop_reason() or self.budget.exhausted(self.deletions_requested)
+                if stop_reason:
+                    self._record_unfinished([planned["branch"] for planned in entries[index:]], stop_reason)
+                    break
                 
-            # Check if branch is merged
-            info["is_merged"] = self._check_if_branch_is_merged(branch_name)
+                branch_name = entry["branch"]
+                fields = {"branch_age": entry["branch_age"], "commit_date": entry["commit_date"]}
+                if branch_name in self.protected_branches:
+                    ruleset = self.protected_branches.ruleset_for(branch_name)
+                    print(f"Skipping protected branch: {branch_name}" + (f" (ruleset {ruleset})" if ruleset else ""))
+                    self._record_result(branch_name, "skipped", "protected", **fields)
+                elif branch_name not in tips:
+                    print(f"Branch {branch_name} doesn't exist anymore, marking as already deleted")
+                    self._record_result(branch_name, "already_deleted", entry["reason"], **fields)
+                elif tips[branch_name] != entry["sha"]:
+                    print(f"Skipping branch {branch_name}: its tip changed since the plan was made")
+                    self._record_result(branch_name, "skipped", "changed since the plan", **fields)
+                else:
+                    self.expected_tips[branch_name] = entry["sha"]
+                    self._request_deletion(
+                        branch_name, entry["branch_age"], entry["reason"], entry["commit_date"],
+                        sha=entry["sha"], evidence=entry["evidence"],
+                    )
+        finally:
+            self._finish_deletions()
+
+    def _evaluate_branch(self, branch_name: str, info: Dict[str, Union[str, int, bool]]) -> Optional[int]:
+        """Apply the deletion policy to one branch; return when it becomes eligible if it was kept."""
+        if self.verbose:
+            print(f"DEBUG: Processing ref={info['ref_name']}, branch={branch_name}")
+        self.due_dates.pop(branch_name, None)
             
-            branch_age = info["branch_age"]
-            commit_date = info["commit_date"]
+        # Skip protected branches
+        if branch_name in self.protected_branches:
+            ruleset = self.protected_branches.ruleset_for(branch_name)
+            print(f"Skipping protected branch: {branch_name}" + (f" (ruleset {ruleset})" if ruleset else ""))
+            self._snapshot_branch(branch_name, info, None, protected=True)
+            self._record_result(
+                branch_name, "skipped", "protected",
+                branch_age=info["branch_age"], commit_date=info["commit_date"], sha=info["sha"]
+            )
+            return None
             
-            if info["is_merged"]:
-                # Branch is properly merged, check if it's stale
-                if commit_date < self.cutoff_date:
-                    self._delete_branch(branch_name, branch_age, "merged & stale")
-                else:
-                    print(f"Branch is merged but not stale yet: {branch_name} (last activity: {branch_age})")
-                    self.skipped_branches.append(f"{branch_name} (merged but not stale)")
-            else:
-                # Branch is not merged
-                self.not_merged_branches.append(branch_name)
+        branch_age = info["branch_age"]
+        commit_date = info["commit_date"]
+        cutoff_date, unmerged_cutoff_date = self.cutoff_date, self.month_cutoff_date
+        unmerged_days = self.unmerged_days
+        rule_fields = {}
+        if self.policy:
+            rule = self.branch_rules.get(branch_name) or self.policy.rule_for(branch_name)
+            rule_fields["rule"] = rule.name
+            if rule.keep:
+                print(f"Keeping branch {branch_name}: policy rule '{rule.name}'")
+                if self.snapshot:
+                    # Other policies may not keep it, so simulations need its evidence
+                    with self.timer.phase("merge_check", items=1):
+                        self._snapshot_branch(branch_name, info, self._merge_evidence(branch_name))
+                self._record_result(
+                    branch_name, "kept", f"kept by policy rule '{rule.name}'",
+                    branch_age=branch_age, commit_date=commit_date, sha=info["sha"], **rule_fields
+                )
+                return None
+            cutoff_date, unmerged_cutoff_date = self.rule_cutoffs[rule.name]
+            unmerged_days = rule.unmerged_days
+        
+        # A snapshot records the evidence of every branch, so nothing is skipped then
+        planner = None if self.snapshot else self.evidence_planner
+        journaled = self.journaled_evidence.pop(branch_name, None)
+        if planner and not evidence_needed(commit_date, cutoff_date, unmerged_cutoff_date):
+            # Deleted, or kept, whether or not the branch is merged
+            planner.skip()
+            merged, evidence = None, None
+            action, reason = unchecked_decision(commit_date, cutoff_date, unmerged_cutoff_date, unmerged_days)
+        elif journaled is not None:
+            # The interrupted run checked this same tip; only the cutoffs of this run are applied again
+            merged = info["is_merged"] = journaled["merged"]
+            evidence = journaled.get("evidence") if merged else None
+            if self.verbose:
+                print(f"DEBUG: Journaled merge evidence for {branch_name}: merged={merged}")
+            self._snapshot_branch(branch_name, info, evidence)
+            action, reason = policy_decision(merged, commit_date, cutoff_date, unmerged_cutoff_date, unmerged_days)
+        else:
+            # Check if branch is merged
+            with self.timer.phase("merge_check", items=1):
+                evidence = planner.evidence(branch_name) if planner else self._merge_evidence(branch_name)
+            if evidence:
+                print(evidence)
+            merged = info["is_merged"] = evidence is not None
+            self._snapshot_branch(branch_name, info, evidence)
+            if not merged:
                 print(f"Branch is not merged: {branch_name}")
-                
-                # Check if it's very old (older than a month)
-                if commit_date < self.month_cutoff_date:
-                    self._delete_branch(branch_name, branch_age, "older than a month")
-                elif commit_date < self.cutoff_date:
-                    # It's stale but not old enough for auto-deletion
-                    self.stale_unmerged_branches.append(f"{branch_name} (last activity: {branch_age})")
+            action, reason = policy_decision(merged, commit_date, cutoff_date, unmerged_cutoff_date, unmerged_days)
+        
+        if action == "delete":
+            if merged is None:
+                evidence = UNCHECKED_EVIDENCE
+            self._request_deletion(
+                branch_name, branch_age, reason, commit_date,
+                sha=info["sha"], evidence=evidence or "no merge evidence", merged=merged, **rule_fields
+            )
+            return None
+        
+        if merged is False:
+            # A rule requiring merged branches never deletes this one by age
+            due_date = commit_date + (self.current_date - unmerged_cutoff_date) + 1 if unmerged_cutoff_date else None
+        else:
+            # Merged (or not checked): eligible once stale, when it is evaluated again
+            if merged:
+                print(f"Branch is merged but not stale yet: {branch_name} (last activity: {branch_age})")
+            due_date = commit_date + (self.current_date - cutoff_date) + 1
+        self._record_result(
+            branch_name, action, reason,
+            branch_age=branch_age, commit_date=commit_date, merged=merged, evidence=evidence, sha=info["sha"],
+            **rule_fields
+        )
+        
+        if due_date is None:
+            return None
+        self.due_dates[branch_name] = due_date
+        return due_date
+
+    def _snapshot_branch(
+        self, branch_name: str, info: Dict[str, Union[str, int, bool]], evidence: Optional[str], protected: bool = False
+    ) -> None:
+        """Write the policy inputs of a branch to the snapshot, if one is requested."""
+        if self.snapshot:
+            self.snapshot.write({
+                "branch": branch_name, "sha": info["sha"], "commit_date": info["commit_date"],
+                "merged": evidence is not None, "evidence": evidence, "protected": protected,
+            })
 
     def _process_test_mode(self) -> None:
         """Process branches in test mode without using GitHub API."""
         print("Processing branches in test mode")
         
-        # Create a summary file
-        summary_file = "summary.md"
-        with open(summary_file, "w") as f:
-            f.write("# Branch Cleanup Summary\n")
-            f.write(f"Generated on: {datetime.now()}\n\n")
-            f.write("## Configuration\n")
-            f.write(f"- Dry run: {self.dry_run}\n")
-            f.write(f"- Weeks threshold: {self.weeks_threshold}\n")
-            f.write(f"- Default branch: {self.default_branch}\n")
-            f.write(f"- Protected branches: {' '.join(self.protected_branches)}\n\n")
-            f.write("## Results\n")
-            
         # Get local branches (excluding default branch)
         cmd = ["git", "branch"]
         result = self._run_command(cmd)
@@ -377,14 +1298,20 @@ class BranchSweeper:
                 if branch == self.default_branch:
                     continue
                     
+            if not self._in_shard(branch):
+                continue
+                
             if self.verbose:
                 print(f"DEBUG: Processing branch {branch}")
                 
             # Skip protected branches
             if branch in self.protected_branches:
                 print(f"Branch {branch} is protected, skipping")
-                with open(summary_file, "a") as f:
-                    f.write(f"- {branch}: Protected (skipped)\n")
+                self._record_result(branch, "skipped", "Protected")
+                continue
+            
+            if self.deadline.expired():
+                self._record_unfinished([branch], "run deadline reached")
                 continue
                 
             # Get last commit date
@@ -418,27 +1345,28 @@ class BranchSweeper:
             if should_delete:
                 if self.dry_run:
                     print(f"Would delete branch {branch}: {delete_reason} (dry run)")
-                    with open(summary_file, "a") as f:
-                        f.write(f"- {branch}: {delete_reason} (would be deleted - dry run)\n")
+                    self._record_result(
+                        branch, "would_delete", delete_reason, commit_date=commit_date, merged=branch_is_merged
+                    )
                 else:
                     print(f"Deleting branch {branch}: {delete_reason}")
-                    with open(summary_file, "a") as f:
-                        f.write(f"- {branch}: {delete_reason} (deleted)\n")
-                    # Delete the branch
-                    self._run_command(["git", "branch", "-D", branch])
-                    self.deleted_branches.append(branch)
+                    delete_result = self._run_command(["git", "branch", "-D", branch])
+                    if delete_result.returncode == 0:
+                        self._record_result(
+                            branch, "deleted", delete_reason, commit_date=commit_date, merged=branch_is_merged
+                        )
+                    else:
+                        print(f"::warning::Failed to delete branch {branch}: {delete_result.stderr.strip()}")
+                        self._record_result(
+                            branch, "delete_failed", "git branch -D failed", commit_date=commit_date,
+                            merged=branch_is_merged
+                        )
             else:
                 print(f"Keeping branch {branch}: Age {branch_age_days} days, Merged: {branch_is_merged}")
-                with open(summary_file, "a") as f:
-                    f.write(f"- {branch}: Keeping (Age: {branch_age_days} days, Merged: {branch_is_merged})\n")
-                    
-        # Write summary footer
-        with open(summary_file, "a") as f:
-            f.write("\n## Summary\n")
-            if self.dry_run:
-                f.write(f"Dry run completed. Would have deleted {len(self.deleted_branches)} branches.\n")
-            else:
-                f.write(f"Deleted {len(self.deleted_branches)} branches.\n")
+                self._record_result(
+                    branch, "kept", f"Age: {branch_age_days} days, Merged: {branch_is_merged}",
+                    commit_date=commit_date, merged=branch_is_merged
+                )
 
     def _create_summary_report(self) -> None:
         """Create a Markdown summary report of the branch cleanup."""
@@ -455,32 +1383,57 @@ class BranchSweeper:
             cutoff_date_str = datetime.fromtimestamp(self.cutoff_date).strftime('%Y-%m-%d')
             f.write(f"- Threshold: {self.weeks_threshold} weeks (before {cutoff_date_str})\n")
             f.write(f"- Default branch: {self.default_branch}\n")
-            f.write(f"- Protected branches: {' '.join(self.protected_branches)}\n\n")
-            
-            # Deleted branches
-            f.write("### Deleted Branches\n")
-            if not self.deleted_branches:
-                f.write("- No branches deleted\n")
-            else:
-                for branch in self.deleted_branches:
-                    f.write(f"- {branch}\n")
+            f.write(f"- Protected branches: {' '.join(self.protected_branches)}\n")
+            if self.protected_branches.rulesets:
+                f.write(f"- Protected by rulesets: {self.protected_branches.describe_rulesets()}\n")
+            if self.shard:
+                f.write(f"- Shard: {self.shard[0]}/{self.shard[1]}\n")
+            if self.plan is not None:
+                f.write(f"- Plan: {self.apply_plan} (created {self.plan[0]['created']}, "
+                        f"{len(self.plan[1])} branches)\n")
+            elif self.plan_output:
+                f.write(f"- Plan written to: {self.plan_output}\n")
+            if self.policy:
+                counts = self.policy.counts(self.branch_rules)
+                f.write(f"- Policy: {self.policy_path} ({len(self.policy.rules)} rules; branches per rule: "
+                        f"{', '.join(f'{name} {count}' for name, count in counts.items())})\n")
+            if self.evidence_planner:
+                f.write(f"- Evidence planner: {self.evidence_planner.describe()}\n")
+            if self.snapshot_output:
+                f.write(f"- Snapshot written to: {self.snapshot_output} (try other thresholds with simulate_policy.py)\n")
+            if self.lease_holder:
+                f.write(f"- Skipped: another sweep ({self.lease_holder}) holds the lease\n")
+            if self.budget.enabled:
+                limits = []
+                if self.budget.seconds:
+                    limits.append(f"{self.budget.seconds:.0f}s")
+                if self.budget.max_deletions:
+                    limits.append(f"{self.budget.max_deletions} deletions")
+                f.write(f"- Budget: {', '.join(limits)} ({self.deletions_requested} deletions requested)\n")
+            for reason, count in self.unfinished.items():
+                if reason in self.deferred:
+                    f.write(f"- Deferred to the next run: {count} branches ({reason}), "
+                            f"starting with {', '.join(self.deferred[reason])}\n")
+                else:
+                    f.write(f"- Unfinished: {count} branches not evaluated ({reason})\n")
             f.write("\n")
             
-            # Skipped branches
-            f.write("### Skipped Branches\n")
-            if not self.skipped_branches:
-                f.write("- No branches skipped\n")
-            else:
-                for branch in self.skipped_branches:
-                    f.write(f"- {branch}\n")
-            f.write("\n")
+            # Bounded overview; the complete list is in the details artifact
+            f.write(self.summary.render_markdown())
             
-            # Stale unmerged branches
-            if self.stale_unmerged_branches:
-                f.write("### Stale Unmerged Branches\n")
-                for branch in self.stale_unmerged_branches:
-                    f.write(f"- {branch}\n")
-                f.write("\n")
+            # Where the time went
+            f.write(self.timer.render_markdown())
+            if self.tracer:
+                f.write(self.tracer.render_markdown())
+
+    @property
+    def deleted_count(self) -> int:
+        """Value of the deleted_count output."""
+        # Test mode has always counted only the branches it actually deleted; other runs also count the
+        # branches a dry run would delete and the ones that were already gone
+        if self.test_mode:
+            return self.summary.counts.get("deleted", 0)
+        return self.summary.deleted_count
 
     def _set_github_outputs(self) -> None:
         """Set GitHub Actions outputs for use in subsequent steps."""
@@ -488,42 +1441,112 @@ class BranchSweeper:
         github_output = os.environ.get("GITHUB_OUTPUT")
         if github_output:
             with open(github_output, "a") as f:
-                f.write(f"deleted_count={len(self.deleted_branches)}\n")
+                f.write(f"deleted_count={self.deleted_count}\n")
+                f.write(f"unfinished_count={sum(self.unfinished.values())}\n")
+                f.write(f"deferred_count={sum(self.unfinished[reason] for reason in self.deferred)}\n")
 
     def run(self) -> int:
-        """Run the branch sweeper process."""
+        """Run the branch sweeper process, under the profiler if requested."""
+        if not self.profile_output:
+            return self._run()
+        
+        with RunProfiler(self.profile_output):
+            return self._run()
+
+    def _run(self) -> int:
+        """Run the branch sweeper phases, exporting metrics however the run ends."""
+        run_started = time.perf_counter()
+        exit_code = 1
+        try:
+            exit_code = self._sweep(run_started)
+            return exit_code
+        finally:
+            if self.metrics:
+                self._export_metrics(time.perf_counter() - run_started, exit_code)
+
+    def _sweep(self, run_started: float) -> int:
+        """Run the branch sweeper phases; return the exit code."""
+        self.deadline.start()
+        self.budget.deadline.start()
         print(f"Running BranchSweeper with: dry_run={self.dry_run}, weeks_threshold={self.weeks_threshold}")
-        print(f"Default branch: {self.default_branch}")
-        print(f"Protected branches: {' '.join(self.protected_branches)}")
         
         # Calculate and print date thresholds
         cutoff_date_str = datetime.fromtimestamp(self.cutoff_date).strftime('%Y-%m-%d')
         month_cutoff_date_str = datetime.fromtimestamp(self.month_cutoff_date).strftime('%Y-%m-%d')
         
         print(f"Deleting branches merged before: {cutoff_date_str}")
-        print(f"Deleting branches older than a month: {month_cutoff_date_str}")
+        print(f"Deleting unmerged branches older than {self.unmerged_days} days: {month_cutoff_date_str}")
+        if self.deadline.enabled:
+            print(f"Run deadline: {self.deadline.seconds:.0f}s ({self.deadline.reserve:.0f}s reserved for results)")
+        if self.budget.enabled:
+            print(f"Budget: {self.budget.seconds:.0f}s, {self.budget.max_deletions} deletions (0 means no limit); "
+                  f"evaluating the oldest and cheapest branches first")
         
-        # Configure git
-        self._configure_git()
+        # Collect metrics from the subprocess wrappers if requested
+        if self.metrics:
+            set_registry(self.metrics)
         
-        # Fetch branches
-        self._fetch_all_branches()
+        # Trace every git/gh subprocess if requested
+        if self.trace_output:
+            self.tracer = CommandTracer(self.trace_output, phase_source=lambda: self.timer.current_phase)
+            set_tracer(self.tracer)
         
-        # Process branches based on mode
-        if self.test_mode:
-            self._process_test_mode()
-        else:
-            self._process_branches()
+        try:
+            # Configure git, take the lease, fetch, discover branches and open the results files
+            try:
+                self._start_up()
+            except (ValueError, OSError) as e:
+                phase = self.startup.failed if self.startup else None
+                print(f"::error::Start-up phase '{phase or 'startup'}' failed: {e}")
+                return 1
+            except (FetchError, APIError) as e:
+                print(f"::error::{e}")
+                return 1
+            print(f"Default branch: {self.default_branch}")
+            print(f"Protected branches: {' '.join(self.protected_branches)}")
+            
+            if self.leased:
+                # Process branches based on mode
+                if self.test_mode:
+                    with self.timer.phase("test_mode"):
+                        self._process_test_mode()
+                elif self.plan is not None:
+                    with self.timer.phase("apply_plan"):
+                        self._apply_plan()
+                else:
+                    with self.timer.phase("process_branches"):
+                        self._process_branches()
+                if self.journal and not self.unfinished and not (self.lease and self.lease.lost.is_set()):
+                    # Nothing is left to resume
+                    self.journal.complete()
+        finally:
+            lease_lost = bool(self.lease and self.lease.lost.is_set())
+            if self.lease:
+                self.lease.release()
+            # Flush and close the streamed results before the summary is written
+            self.results.close()
+            if self.snapshot:
+                self.snapshot.close({})
+            if self.tracer:
+                set_tracer(None)
+                self.tracer.close()
+            if self.metrics:
+                set_registry(None)
             
         # Create summary report
-        self._create_summary_report()
+        with self.timer.phase("summary"):
+            self._create_summary_report()
         
         # Set GitHub outputs
         self._set_github_outputs()
         
-        # Print completion message
-        print(f"Branch cleanup completed. Deleted {len(self.deleted_branches)} branches.")
-        return 0
+        # Print timing and completion message
+        print(f"\nPhase timings:\n{self.timer.render_table()}")
+        if self.tracer:
+            print(f"\nSubprocess calls (trace written to {self.trace_output}):\n{self.tracer.render_table()}")
+        print(f"Total run time: {time.perf_counter() - run_started:.3f}s")
+        print(f"Branch cleanup completed. Deleted {self.deleted_count} branches.")
+        return 1 if lease_lost else 0
 
 
 def main():
@@ -534,6 +1557,69 @@ def main():
     parser.add_argument("default_branch", help="Default branch name")
     parser.add_argument("protected_branches", help="Space-separated list of protected branches")
     parser.add_argument("repo", help="Repository name (owner/repo)")
+    parser.add_argument("--results", action="append", default=[], metavar="FORMAT:PATH",
+                        help="Stream per-branch results to a markdown, json or ndjson file (may be repeated)")
+    parser.add_argument("--summary-top-n", type=int, default=25,
+                        help="Number of oldest branches listed per category in the summary")
+    parser.add_argument("--summary-details", default="summary-details.ndjson.gz",
+                        help="Compressed file receiving the complete per-branch list (empty to disable)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile the run with cProfile and write a collapsed-stack file for flame graphs")
+    parser.add_argument("--profile-output", default="sweeper-profile",
+                        help="Path prefix for the .pstats and .collapsed profile files")
+    parser.add_argument("--trace", default="", metavar="PATH",
+                        help="Trace every git/gh subprocess to a Chrome trace-event JSON file")
+    parser.add_argument("--metrics-file", default=os.environ.get("SWEEPER_METRICS_FILE", ""), metavar="PATH",
+                        help="Write run metrics as OpenMetrics text (*.prom files use the node-exporter textfile format)")
+    parser.add_argument("--metrics-push-url", default=os.environ.get("SWEEPER_METRICS_PUSH_URL", ""), metavar="URL",
+                        help="Push run metrics to a Prometheus Pushgateway")
+    parser.add_argument("--discover-protected", action="store_true",
+                        help="Also protect the branches the GitHub API lists as protected or covered by rulesets "
+                             "(looked up during start-up)")
+    parser.add_argument("--protection-cache", default="", metavar="PATH",
+                        help="Cache the --discover-protected responses and revalidate them with ETags between runs")
+    parser.add_argument("--merge-engine", choices=MERGE_ENGINES, default="reference",
+                        help="Merge detection engine: per-branch commands or one batched index per run")
+    parser.add_argument("--lease", choices=LEASE_MODES, default="off",
+                        help="Hold a lease on refs/janitor/lock; exit or wait when another sweep holds it")
+    parser.add_argument("--lease-ttl", type=int, default=300, help="Seconds a lease lasts between renewals")
+    parser.add_argument("--lease-wait", type=int, default=600, help="Seconds to wait for the lease with --lease=wait")
+    parser.add_argument("--delete-batch-size", type=int, default=20,
+                        help="Branches deleted per push by the deletion worker (0 deletes inline, one at a time)")
+    parser.add_argument("--delete-queue-size", type=int, default=100,
+                        help="Pending deletions queued before evaluation waits for the deletion worker")
+    parser.add_argument("--command-timeout", action="append", default=[], metavar="CATEGORY=SECONDS",
+                        help="Timeout of local git, network git or api commands (may be repeated, 0 disables)")
+    parser.add_argument("--deadline", type=float, default=0.0, metavar="SECONDS",
+                        help="Wall-clock budget of the run; no new work is started once it is nearly used up")
+    parser.add_argument("--deadline-reserve", type=float, default=30.0, metavar="SECONDS",
+                        help="Part of the deadline kept for flushing results and writing the summary")
+    parser.add_argument("--unmerged-days", type=int, default=30, metavar="DAYS",
+                        help="Age in days after which unmerged branches are deleted")
+    parser.add_argument("--snapshot", default="", metavar="PATH",
+                        help="Write the policy inputs of every evaluated branch for simulate_policy.py")
+    parser.add_argument("--pr-store", default="", metavar="PATH",
+                        help="Keep merged pull requests in a local store synced incrementally between runs")
+    parser.add_argument("--lazy-evidence", action="store_true",
+                        help="Only gather merge evidence that can change a decision, cheapest check first")
+    parser.add_argument("--policy", default="", metavar="PATH",
+                        help="JSON file of ordered branch rules with their own thresholds (see branch_policy.py)")
+    parser.add_argument("--time-budget", type=float, default=0.0, metavar="SECONDS",
+                        help="Evaluate oldest branches first and defer the rest once the run has taken SECONDS")
+    parser.add_argument("--max-deletions", type=int, default=0, metavar="N",
+                        help="Evaluate oldest branches first and defer the rest after N deletions")
+    parser.add_argument("--mirror-cache", default="", metavar="DIR",
+                        help="Sweep a bare blob-less mirror kept in DIR between runs instead of the current checkout")
+    parser.add_argument("--url-template", default=DEFAULT_URL_TEMPLATE,
+                        help="Clone URL of the mirrored repository, with {repo} replaced by owner/repo")
+    parser.add_argument("--shard", default="", metavar="I/N",
+                        help="Only evaluate and delete the branches of shard I of N (see merge_shards.py)")
+    parser.add_argument("--plan", default="", metavar="PATH",
+                        help="Write the branches a dry run would delete to a plan file (apply it with apply_plan.py)")
+    parser.add_argument("--journal", default="", metavar="PATH",
+                        help="Append every decision and deletion outcome to a crash-safe journal")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the interrupted run recorded in --journal instead of starting over")
     
     args = parser.parse_args()
     
@@ -549,6 +1635,31 @@ def main():
         print("::error::weeks_threshold must be a positive number")
         return 1
         
+    if args.unmerged_days <= 0:
+        print("::error::--unmerged-days must be a positive number")
+        return 1
+        
+    try:
+        parse_timeouts(args.command_timeout)
+        parse_shard(args.shard)
+        SweepBudget(args.time_budget, args.max_deletions)
+        if args.policy:
+            load_policy(args.policy, weeks_threshold, args.unmerged_days)
+    except ValueError as e:
+        print(f"::error::{e}")
+        return 1
+        
+    if args.resume and not args.journal:
+        print("::error::--resume needs the --journal of the interrupted run")
+        return 1
+        
+    # Sweep a cached mirror, refreshed with a ref-only fetch, instead of the current checkout
+    mirror = None
+    if args.mirror_cache:
+        mirror = use_mirror_cache(args.mirror_cache, args.repo, args.url_template)
+        if mirror is None:
+            return 1
+        
     # Create and run the branch sweeper
     sweeper = BranchSweeper(
         dry_run=dry_run,
@@ -558,6 +1669,36 @@ def main():
         repo=args.repo,
         verbose=os.environ.get("DEBUG") == "true",
         test_mode=os.environ.get("GITHUB_TEST_MODE") == "true",
+        results=args.results,
+        summary_top_n=args.summary_top_n,
+        summary_details=args.summary_details,
+        profile_output=args.profile_output if args.profile else "",
+        trace_output=args.trace,
+        metrics_output=args.metrics_file,
+        metrics_push_url=args.metrics_push_url,
+        protected_lookup=args.discover_protected,
+        protection_cache=args.protection_cache,
+        merge_engine=args.merge_engine,
+        lease=args.lease,
+        lease_ttl=args.lease_ttl,
+        lease_wait=args.lease_wait,
+        delete_batch_size=args.delete_batch_size,
+        delete_queue_size=args.delete_queue_size,
+        command_timeouts=args.command_timeout,
+        deadline=args.deadline,
+        deadline_reserve=args.deadline_reserve,
+        shard=args.shard,
+        plan_output=args.plan,
+        journal=args.journal,
+        resume=args.resume,
+        time_budget=args.time_budget,
+        max_deletions=args.max_deletions,
+        unmerged_days=args.unmerged_days,
+        snapshot_output=args.snapshot,
+        pull_request_store=args.pr_store,
+        lazy_evidence=args.lazy_evidence,
+        policy=args.policy,
+        mirror=mirror,
     )
     
     return sweeper.run()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/command_trace.py
+
+"""
+Opt-in tracing of every git/gh subprocess (and direct GitHub API request)
+started by the sweeper.
+
+Each traced call is streamed to a Chrome trace-event JSON file (viewable in
+chrome://tracing or Perfetto) with its command, timestamps, exit code,
+stdout/stderr sizes and the sweeper phase it was issued from. Per-command
+durations are aggregated into a calls / total / p95 table.
+
+record_command() is the single hook both subprocess wrappers report to; it
+feeds the tracer and, when enabled, the metrics registry.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, TextIO
+
+try:
+    from .deadline import GIT_OPTIONS_WITH_VALUE
+    from .metrics import get_registry
+    from .timing import render_markdown_table, render_table
+except ImportError:
+    from deadline import GIT_OPTIONS_WITH_VALUE
+    from metrics import get_registry
+    from timing import render_markdown_table, render_table
+
+# Tools whose second sub-command is part of the aggregation key (e.g. "gh pr list")
+NESTED_SUBCOMMAND_TOOLS = {"gh"}
+
+COMMAND_HEADER = ["Command", "Calls", "Total (s)", "Mean (ms)", "p95 (ms)"]
+
+# Header whose value (a token or an app JWT) must never reach a trace file
+SECRET_HEADER = "authorization:"
+
+_active_tracer: Optional["CommandTracer"] = None
+
+
+def get_tracer() -> Optional["CommandTracer"]:
+    """Return the active tracer, if tracing is enabled."""
+    return _active_tracer
+
+
+def set_tracer(tracer: Optional["CommandTracer"]) -> None:
+    """Install (or remove, with None) the process-wide tracer."""
+    global _active_tracer
+    _active_tracer = tracer
+
+
+def command_key(cmd: List[str]) -> str:
+    """Return the aggregation key of a command, e.g. "git merge-base" or "gh pr list"."""
+    if not cmd:
+        return ""
+    words = [os.path.basename(cmd[0])]
+    depth = 2 if words[0] in NESTED_SUBCOMMAND_TOOLS else 1
+    skip_value = False
+    for arg in cmd[1:]:
+        if len(words) > depth:
+            break
+        if skip_value:
+            skip_value = False
+        elif arg.startswith("-"):
+            # Leading options such as "git --no-pager" or "git -C <path>" are not part of the key
+            if len(words) > 1:
+                break
+            skip_value = words[0] == "git" and arg in GIT_OPTIONS_WITH_VALUE
+        else:
+            words.append(arg)
+    return " ".join(words)
+
+
+def record_command(cmd: List[str], started: float, finished: float, result) -> None:
+    """Report a finished subprocess call to the active tracer and metrics registry."""
+    tracer = _active_tracer
+    if tracer:
+        tracer.record(cmd, started, finished, result)
+
+    registry = get_registry()
+    if registry:
+        key = command_key(cmd)
+        registry.observe("subprocess_duration_seconds", finished - started,
+                         "Duration of git/gh subprocess calls", command=key)
+        if key.startswith("gh ") or key.startswith("http "):
+            status = "ok" if getattr(result, "returncode", 1) == 0 else "error"
+            registry.inc("api_calls", 1, "GitHub API calls made through gh or HTTP", command=key, status=status)
+
+
+def redact(cmd: List[str]) -> List[str]:
+    """Return the command with the values of Authorization headers (gh --header, git http.extraHeader) hidden."""
+    redacted = []
+    for arg in cmd:
+        index = arg.lower().find(SECRET_HEADER)
+        if index >= 0:
+            arg = f"{arg[:index + len(SECRET_HEADER)]} ***"
+        redacted.append(arg)
+    return redacted
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class CommandTracer:
+    """Record subprocess calls as Chrome trace events and aggregate their durations."""
+
+    def __init__(self, output_path: str, phase_source: Optional[Callable[[], str]] = None):
+        """Open the trace file; events are streamed to it as they are recorded."""
+        self.output_path = output_path
+        self.phase_source = phase_source
+        self.durations: Dict[str, List[float]] = {}
+        self.call_count = 0
+        self._origin = time.time()
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._first = True
+        self._file: Optional[TextIO] = open(output_path, "w", encoding="utf-8")
+        self._file.write('{"displayTimeUnit": "ms", "traceEvents": [')
+
+    def record(self, cmd: List[str], started: float, finished: float, result) -> None:
+        """Record one finished subprocess call."""
+        key = command_key(cmd)
+        phase = self.phase_source() if self.phase_source else ""
+        stdout = getattr(result, "stdout", None) or ""
+        stderr = getattr(result, "stderr", None) or ""
+        event = {
+            "name": key,
+            "cat": phase or "command",
+            "ph": "X",
+            "ts": round((started - self._origin) * 1e6),
+            "dur": round((finished - started) * 1e6),
+            "pid": self._pid,
+            "tid": threading.get_ident(),
+            "args": {
+                "cmd": " ".join(redact(cmd)),
+                "exit_code": getattr(result, "returncode", None),
+                "stdout_bytes": len(stdout.encode("utf-8", "replace")) if isinstance(stdout, str) else len(stdout),
+                "stderr_bytes": len(stderr.encode("utf-8", "replace")) if isinstance(stderr, str) else len(stderr),
+                "phase": phase,
+            },
+        }
+
+        with self._lock:
+            self.call_count += 1
+            self.durations.setdefault(key, []).append(finished - started)
+            if self._file:
+                self._file.write(("\n  " if self._first else ",\n  ") + json.dumps(event, separators=(",", ":")))
+                self._first = False
+
+    def close(self) -> None:
+        """Terminate the trace file."""
+        with self._lock:
+            if self._file:
+                self._file.write("\n]}\n")
+                self._file.close()
+                self._file = None
+
+    def _rows(self) -> List[List[str]]:
+        """Return aggregate rows sorted by total time, slowest first."""
+        rows = []
+        for key, values in sorted(self.durations.items(), key=lambda item: -sum(item[1])):
+            rows.append([
+                key,
+                str(len(values)),
+                f"{sum(values):.3f}",
+                f"{sum(values) / len(values) * 1000:.1f}",
+                f"{percentile(values, 0.95) * 1000:.1f}",
+            ])
+        return rows
+
+    def render_table(self) -> str:
+        """Render the per-command aggregate as a console table."""
+        return render_table(COMMAND_HEADER, self._rows())
+
+    def render_markdown(self) -> str:
+        """Render the per-command aggregate as a collapsible Markdown table."""
+        summary = f"{self.call_count} git/gh calls (trace: <code>{self.output_path}</code>)"
+        return render_markdown_table("Subprocess Calls", summary, COMMAND_HEADER, self._rows())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/deadline.py
+
+"""
+Per-command timeouts and a wall-clock deadline for a whole sweep.
+
+Every git/gh subprocess gets a timeout from its category:
+
+- local:   git commands that only read or write the local repository.
+- network: git commands that talk to the remote (fetch, push, ls-remote...).
+- api:     GitHub API calls (gh, or HTTP with SWEEPER_API_URL).
+
+A RunDeadline bounds the whole run. Once less than its reserve is left the
+sweeper starts no new work, so results and the summary can still be flushed,
+and every command timeout, including that of direct HTTP API requests, is
+clamped to the time remaining.
+"""
+
+import os
+import time
+from typing import Dict, List, Optional
+
+COMMAND_CATEGORIES = ("local", "network", "api")
+
+# Default per-command timeouts in seconds (0 disables the timeout of a category)
+DEFAULT_TIMEOUTS: Dict[str, float] = {"local": 300.0, "network": 900.0, "api": 120.0}
+
+# git subcommands that contact a remote
+NETWORK_GIT_SUBCOMMANDS = {"fetch", "pull", "push", "clone", "ls-remote"}
+
+# git remote actions that contact the remote (add, set-url, get-url... only edit the config)
+NETWORK_REMOTE_ACTIONS = {"update", "prune"}
+
+# git options that take their value as the following argument
+GIT_OPTIONS_WITH_VALUE = {"-c", "-C", "--git-dir", "--work-tree", "--namespace"}
+
+
+def command_category(cmd: List[str]) -> str:
+    """Return the timeout category of a command."""
+    if not cmd:
+        return "local"
+    tool = os.path.basename(cmd[0])
+    if tool in ("gh", "http"):
+        return "api"
+    if tool != "git":
+        return "local"
+
+    skip_value = False
+    for index, arg in enumerate(cmd[1:], start=1):
+        if skip_value:
+            skip_value = False
+        elif arg in GIT_OPTIONS_WITH_VALUE:
+            skip_value = True
+        elif arg == "remote":
+            action = next((word for word in cmd[index + 1:] if not word.startswith("-")), "")
+            return "network" if action in NETWORK_REMOTE_ACTIONS else "local"
+        elif not arg.startswith("-"):
+            return "network" if arg in NETWORK_GIT_SUBCOMMANDS else "local"
+    return "local"
+
+
+def parse_timeouts(specs: List[str]) -> Dict[str, float]:
+    """Parse CATEGORY=SECONDS overrides on top of the default timeouts."""
+    timeouts = dict(DEFAULT_TIMEOUTS)
+    for spec in specs:
+        category, separator, value = spec.partition("=")
+        if not separator or category not in COMMAND_CATEGORIES:
+            raise ValueError(
+                f"Invalid command timeout '{spec}' (expected CATEGORY=SECONDS with CATEGORY one of: "
+                f"{', '.join(COMMAND_CATEGORIES)})"
+            )
+        try:
+            timeouts[category] = float(value)
+        except ValueError:
+            raise ValueError(f"Invalid command timeout '{spec}': {value} is not a number of seconds")
+        if timeouts[category] < 0:
+            raise ValueError(f"Invalid command timeout '{spec}': seconds must not be negative")
+    return timeouts
+
+
+class RunDeadline:
+    """Wall-clock budget for a run, with a reserve kept for flushing results."""
+
+    def __init__(self, seconds: float = 0.0, reserve: float = 30.0):
+        """Configure the budget; 0 seconds means no deadline."""
+        self.seconds = seconds
+        self.reserve = reserve
+        self.started = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the run has a deadline at all."""
+        return self.seconds > 0
+
+    def start(self) -> None:
+        """Start the clock."""
+        self.started = time.monotonic()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left until the deadline, or None without one."""
+        if not self.enabled:
+            return None
+        return self.seconds - (time.monotonic() - self.started)
+
+    def expired(self) -> bool:
+        """Whether no new work should be started (only the reserve is left)."""
+        remaining = self.remaining()
+        return remaining is not None and remaining <= self.reserve
+
+    def clamp(self, timeout: Optional[float]) -> Optional[float]:
+        """Limit a command timeout to the time remaining (at least one second)."""
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        remaining = max(remaining, 1.0)
+        return remaining if timeout is None else min(timeout, remaining)
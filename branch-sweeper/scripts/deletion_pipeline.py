@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/deletion_pipeline.py
+
+"""
+Producer/consumer pipeline between branch evaluation and branch deletion.
+
+Deleting a branch is network-bound and its verification can back off for up
+to 15 seconds, so the sweeper no longer deletes inline. The evaluation loop
+submits each delete decision to a bounded queue and moves on to the next
+branch; a worker thread drains the queue in batches and hands each batch to
+the sweeper, which deletes it with a single push and verifies it with a
+single listing.
+
+- Backpressure: submit() blocks while the queue is full, so a slow remote
+  throttles evaluation instead of buffering an unbounded backlog.
+- Graceful shutdown: close() lets the worker drain every queued decision
+  before returning, so every submitted branch ends up with a result record.
+- Guard: when the guard callback returns a stop reason (the sweep lease was
+  lost, the run deadline is near) the remaining batches are abandoned with
+  that reason rather than deleted.
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+# A deletion decision: (branch name, branch age, reason, commit date)
+DeletionRequest = Tuple[str, str, str, Optional[int]]
+
+_STOP = None
+
+
+class DeletionPipeline:
+    """Bounded queue of deletion decisions drained in batches by one worker thread."""
+
+    def __init__(
+        self,
+        delete_batch: Callable[[List[DeletionRequest]], None],
+        abandon_batch: Callable[[List[DeletionRequest], str], None],
+        queue_size: int = 100,
+        batch_size: int = 20,
+        batch_wait: float = 0.5,
+        guard: Optional[Callable[[], str]] = None,
+    ):
+        """Configure the pipeline; batch_wait is how long a partial batch waits for more decisions."""
+        self.delete_batch = delete_batch
+        self.abandon_batch = abandon_batch
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self.guard = guard
+        self.submitted = 0
+        self.batches = 0
+        self.blocked_seconds = 0.0
+        self._queue: "queue.Queue[Optional[DeletionRequest]]" = queue.Queue(maxsize=max(1, queue_size))
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the deletion worker."""
+        self._thread = threading.Thread(target=self._worker, name="deletion-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, request: DeletionRequest) -> None:
+        """Queue a deletion decision, blocking while the queue is full."""
+        started = time.perf_counter()
+        self._queue.put(request)
+        self.blocked_seconds += time.perf_counter() - started
+        self.submitted += 1
+
+    def close(self) -> None:
+        """Process every queued decision and stop the worker."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def _next_batch(self) -> Tuple[List[DeletionRequest], bool]:
+        """Collect up to batch_size decisions; return them and whether the stop marker was seen."""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            try:
+                request = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if request is _STOP:
+                return batch, True
+            batch.append(request)
+        return batch, False
+
+    def _worker(self) -> None:
+        """Drain the queue until the stop marker arrives."""
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if not batch:
+                continue
+            self.batches += 1
+
+            stop_reason = self.guard() if self.guard else ""
+            if stop_reason:
+                self.abandon_batch(batch, stop_reason)
+                continue
+            try:
+                self.delete_batch(batch)
+            except Exception as e:
+                print(f"::error::Deletion batch failed: {e}")
+                self.abandon_batch(batch, f"deletion error: {e}")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/deletion_plan.py
+
+"""
+Serialized deletion plans.
+
+A dry run with --plan PATH writes every branch it would delete, with the tip
+commit it saw, the reason and the merge evidence, to a compact versioned JSON
+file. apply_plan.py executes a reviewed plan through the batched deletion
+path without evaluating anything again: one listing of the remote heads
+re-validates that each tip is unchanged, and every push carries the planned
+tip as --force-with-lease, so a branch that moves after the listing is not
+deleted either.
+"""
+
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from .results_writer import Record, ResultSink
+except ImportError:
+    from results_writer import Record, ResultSink
+
+PLAN_VERSION = 1
+
+# Fields of every planned branch, in file order
+PLAN_FIELDS = ("branch", "sha", "reason", "evidence", "branch_age", "commit_date")
+
+
+class PlanSink(ResultSink):
+    """Results sink that streams the branches a dry run would delete into a plan file."""
+
+    def __init__(self, path: str, metadata: Optional[Dict] = None):
+        """Open the plan and write its header."""
+        super().__init__(path, metadata)
+        self.planned = 0
+        header = {"version": PLAN_VERSION, "created": datetime.now().isoformat(timespec="seconds"),
+                  "metadata": self.metadata}
+        self._file.write(json.dumps(header)[:-1] + ', "branches": [')
+
+    def write(self, record: Record) -> None:
+        """Add a would_delete record to the plan; other decisions are not part of it."""
+        if record["action"] != "would_delete":
+            return
+        entry = [record.get(field) for field in PLAN_FIELDS]
+        separator = "\n  " if not self.planned else ",\n  "
+        self._file.write(separator + json.dumps(entry, separators=(",", ":")))
+        self.planned += 1
+
+    def close(self, counts: Dict[str, int]) -> None:
+        """Close the branch list."""
+        if self._file:
+            self._file.write("\n]}\n")
+        super().close(counts)
+
+
+def load_plan(path: str) -> Tuple[Dict, List[Dict]]:
+    """Read a plan file; return its metadata and one dict per planned branch."""
+    with open(path, encoding="utf-8") as f:
+        document = json.load(f)
+    if document.get("version") != PLAN_VERSION:
+        raise ValueError(f"Unsupported plan version {document.get('version')} in {path} (expected {PLAN_VERSION})")
+
+    metadata = dict(document.get("metadata", {}), created=document.get("created", ""))
+    entries = [dict(zip(PLAN_FIELDS, entry)) for entry in document.get("branches", [])]
+    for entry in entries:
+        if not entry["branch"] or not entry["sha"]:
+            raise ValueError(f"Plan entry without a branch name or tip commit in {path}: {entry}")
+    return metadata, entries
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/evidence_planner.py
+
+"""
+Lazy, cost-ordered merge evidence for the branch sweeper.
+
+Merge evidence only matters when it changes whether a branch is deleted.
+evidence_needed() asks the deletion policy both ways: a recent branch is
+kept whether or not it is merged, and a branch past the unmerged cutoff (and
+the stale threshold) is deleted either way. Such branches are decided from
+their age alone and recorded with unchecked_decision().
+
+When evidence is needed, EvidencePlanner runs the checks cheapest first:
+
+- containment: the tip is reachable from a protected branch (local git);
+- pull_request: a merged pull request (store, index or API);
+- message: commit message matching and the git branch --merged listing.
+
+It stops at the first check that finds the branch merged, and counts every
+check it did not have to run.
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from .policy_snapshot import policy_decision
+except ImportError:
+    from policy_snapshot import policy_decision
+
+# Evidence checks in the order the planner runs them, cheapest first
+EVIDENCE_CHECKS = ("containment", "pull_request", "message")
+
+# Evidence recorded for a branch deleted without looking at its merge status
+UNCHECKED_EVIDENCE = "not checked (deleted by age alone)"
+
+
+def evidence_needed(commit_date: int, cutoff_date: int, unmerged_cutoff_date: int) -> bool:
+    """Whether merge evidence can change whether a branch of this age is deleted."""
+    # Only the actions are compared, so the threshold named in the reason does not matter
+    merged_action = policy_decision(True, commit_date, cutoff_date, unmerged_cutoff_date, 0)[0]
+    unmerged_action = policy_decision(False, commit_date, cutoff_date, unmerged_cutoff_date, 0)[0]
+    return (merged_action == "delete") != (unmerged_action == "delete")
+
+
+def unchecked_decision(
+    commit_date: int, cutoff_date: int, unmerged_cutoff_date: int, unmerged_days: int
+) -> Tuple[str, str]:
+    """Decide about a branch whose merge status does not matter; return (action, reason)."""
+    action, reason = policy_decision(False, commit_date, cutoff_date, unmerged_cutoff_date, unmerged_days)
+    if action == "delete":
+        # Past the unmerged cutoff, which holds whether or not the branch was merged
+        return action, reason
+    return "kept", "not stale"
+
+
+class EvidencePlanner:
+    """Run merge evidence checks cheapest first and account for the ones avoided."""
+
+    def __init__(self, checks: List[Tuple[str, Callable[[str], Optional[str]]]]):
+        """Take (name, check) pairs in the order they should run."""
+        self.checks = checks
+        self.run: Dict[str, int] = {name: 0 for name, _ in checks}
+        self.avoided: Dict[str, int] = {name: 0 for name, _ in checks}
+        self.decided_by_age = 0
+
+    def skip(self) -> None:
+        """Account for a branch decided without any evidence."""
+        self.decided_by_age += 1
+        for name, _ in self.checks:
+            self.avoided[name] += 1
+
+    def evidence(self, branch_name: str) -> Optional[str]:
+        """Return the first evidence found, cheapest check first, or None."""
+        for index, (name, check) in enumerate(self.checks):
+            self.run[name] += 1
+            found = check(branch_name)
+            if found:
+                for later, _ in self.checks[index + 1:]:
+                    self.avoided[later] += 1
+                return found
+        return None
+
+    def describe(self) -> str:
+        """One line of what the planner ran and avoided."""
+        avoided = ", ".join(f"{self.avoided[name]} {name}" for name, _ in self.checks)
+        run = ", ".join(f"{self.run[name]} {name}" for name, _ in self.checks)
+        return (f"{self.decided_by_age} branches decided by age alone; checks avoided: {avoided}; "
+                f"checks run: {run}")
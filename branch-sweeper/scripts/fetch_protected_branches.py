@@ -2,24 +2,26 @@
 # filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/fetch_protected_branches.py
 
 import argparse
-import json
 import os
-import subprocess
 import sys
 
+try:
+    from .github_api import APIError, GitHubAPI
+except ImportError:
+    from github_api import APIError, GitHubAPI
+
 
 def fetch_protected_branches(repo: str) -> str:
     """Fetch protected branches from GitHub repository."""
-    # Run gh api command to get branches
-    cmd = ["gh", "api", f"repos/{repo}/branches", "--jq", '.[] | select(.protected) | .name']
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    
-    if result.returncode != 0:
-        print(f"Error fetching protected branches: {result.stderr}")
+    # List every page of protected branches (gh api or SWEEPER_API_URL)
+    try:
+        branches = GitHubAPI(repo).protected_branches()
+    except APIError as e:
+        print(f"Error fetching protected branches: {e}")
         return ""
         
-    # Convert newline-separated list to space-separated
-    protected_branches = " ".join(result.stdout.strip().split("\n"))
+    # Convert the list to space-separated
+    protected_branches = " ".join(branches)
     print(f"Protected branches: {protected_branches}")
     
     # Set GitHub environment variable if running in GitHub Actions
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/github_api.py
+
+"""
+Thin GitHub REST client used by the sweeper, the protected-branch fetcher and
+the GitHub App authentication.
+
+Requests go through the GitHub CLI (`gh api`) by default. When SWEEPER_API_URL
+is set they are sent directly over HTTP to that base URL instead, which lets
+the local API stand-in in tests/ exercise the production code paths without
+network access. The HTTP transport follows Link pagination and retries rate
+limited requests, honouring Retry-After and X-RateLimit-Reset.
+"""
+
+import json
+import os
+import re
+import subprocess
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from .command_trace import record_command
+    from .metrics import get_registry
+except ImportError:
+    from command_trace import record_command
+    from metrics import get_registry
+
+# Statuses that are retried by the HTTP transport
+RETRY_STATUSES = {429, 502, 503, 504}
+
+LINK_NEXT_RE = re.compile(r'<([^>]+)>;\s*rel="next"')
+
+
+class APIError(Exception):
+    """A GitHub API request failed."""
+
+    def __init__(self, message: str, status: int = 0):
+        super().__init__(message)
+        self.status = status
+
+
+class GitHubAPI:
+    """GitHub REST API access through `gh api` or, with SWEEPER_API_URL, plain HTTP."""
+
+    def __init__(
+        self,
+        repo: str = "",
+        base_url: Optional[str] = None,
+        token: Optional[str] = None,
+        run_command: Optional[Callable[[List[str]], subprocess.CompletedProcess]] = None,
+        max_retries: int = 3,
+        max_retry_wait: float = 60.0,
+        timeout: float = 30.0,
+        deadline=None,
+    ):
+        """Initialize the client; base_url defaults to $SWEEPER_API_URL (empty selects gh).
+
+        deadline, a RunDeadline, clamps the timeout of every HTTP request to the time left in the run.
+        """
+        self.repo = repo
+        self.base_url = (os.environ.get("SWEEPER_API_URL", "") if base_url is None else base_url).rstrip("/")
+        self.token = token if token is not None else os.environ.get("GH_TOKEN") or os.environ.get("GITHUB_TOKEN", "")
+        self.max_retries = max_retries
+        self.max_retry_wait = max_retry_wait
+        self.timeout = timeout
+        self.deadline = deadline
+
+        if run_command is None:
+            try:
+                from .github_auth import run_command
+            except ImportError:
+                from github_auth import run_command
+        self.run_command = run_command
+
+    @property
+    def transport(self) -> str:
+        """Name of the transport in use: "http" or "gh"."""
+        return "http" if self.base_url else "gh"
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, str]] = None,
+        body: Optional[Dict] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Tuple[int, object, Dict[str, str]]:
+        """Send a request and return (status, decoded JSON body, response headers)."""
+        if self.transport == "http":
+            return self._http_request(method, path, params, body, headers)
+        return self._gh_request(method, path, params, body, headers)
+
+    def paginate(self, path: str, params: Optional[Dict[str, str]] = None) -> List:
+        """Return the concatenated items of every page of a list endpoint."""
+        params = dict(params or {})
+        params.setdefault("per_page", "100")
+
+        if self.transport == "gh":
+            return self._gh_request("GET", path, params, paginate=True)[1]
+
+        items: List = []
+        url: Optional[str] = self._url(path, params)
+        while url:
+            _, data, headers = self._http_request("GET", url)
+            items.extend(data or [])
+            match = LINK_NEXT_RE.search(headers.get("link", ""))
+            url = match.group(1) if match else None
+        return items
+
+    def protected_branches(self) -> List[str]:
+        """Return the names of the repository's protected branches."""
+        branches = self.paginate(f"repos/{self.repo}/branches", {"protected": "true"})
+        return [branch["name"] for branch in branches if branch.get("protected")]
+
+    def conditional_get(
+        self, path: str, params: Optional[Dict[str, str]] = None, etag: str = ""
+    ) -> Tuple[int, object, str]:
+        """GET a resource unless it still has the given ETag; return (status, body, ETag), status 304 if unchanged."""
+        headers = {"If-None-Match": etag} if etag else {}
+        if self.transport == "http":
+            status, data, response_headers = self._http_request("GET", path, params, headers=headers)
+            return status, data, response_headers.get("etag", "")
+
+        # gh api exits non-zero on 304, so the status line printed by --include tells them apart
+        cmd = ["gh", "api", "--method", "GET", "--include", self._url(path, params)]
+        for name, value in headers.items():
+            cmd.extend(["--header", f"{name}: {value}"])
+        result = self.run_command(cmd)
+        status, response_headers, body = self._split_included(result.stdout)
+        if status == 304:
+            return status, None, etag
+        if result.returncode != 0:
+            raise APIError(f"gh api GET {path} failed: {result.stderr.strip()}", status)
+        return status, self._decode_gh_output(body) if body.strip() else None, response_headers.get("etag", "")
+
+    def source_repository(self) -> str:
+        """Return the full name of the upstream a fork was created from, or the repository's own."""
+        _, data, _ = self.request("GET", f"repos/{self.repo}")
+        data = data or {}
+        return (data.get("source") or {}).get("full_name") or data.get("full_name") or self.repo
+
+    def merged_pull_request(self, branch: str) -> Optional[Dict]:
+        """
+        Return the most recent merged pull request whose head is the branch, if any.
+
+        This replaces `gh pr list --head BRANCH --state merged`. The request goes
+        through `gh api` (or SWEEPER_API_URL), so it uses the same gh authentication,
+        but it is a REST call rather than GraphQL and counts against the REST rate
+        limit. gh pr list matched the head branch name in any repository, while
+        head=OWNER:BRANCH only matches pull requests opened from this repository's
+        branch: a fork's pull request from a branch of the same name is not evidence
+        that this branch was merged.
+        """
+        owner = self.repo.split("/")[0]
+        _, pulls, _ = self.request(
+            "GET", f"repos/{self.repo}/pulls", {"state": "closed", "head": f"{owner}:{branch}", "per_page": "100"}
+        )
+        for pull in pulls or []:
+            if pull.get("merged_at"):
+                return {"number": pull.get("number"), "title": pull.get("title"), "merged_at": pull["merged_at"]}
+        return None
+
+    def merged_pull_requests(self, since: str = "") -> Dict[str, Dict]:
+        """
+        Return the most recent merged pull request of every head branch in the repository.
+
+        This is the bulk equivalent of calling merged_pull_request() for each branch:
+        closed pull requests are listed most recently updated first and the latest
+        merged one per same-repository head branch is kept. With since (ISO 8601)
+        the listing stops at the first pull request last updated before it, so the
+        history older than every branch of interest is never paged through.
+        """
+        owner = self.repo.split("/")[0]
+        merged: Dict[str, Dict] = {}
+        for pull in self.closed_pull_requests_since(since):
+            head = pull.get("head") or {}
+            label = head.get("label", "")
+            if not pull.get("merged_at") or not label.startswith(f"{owner}:"):
+                continue
+            branch = label[len(owner) + 1:]
+            if branch not in merged or pull["merged_at"] > merged[branch]["merged_at"]:
+                merged[branch] = {"number": pull.get("number"), "title": pull.get("title"),
+                                  "merged_at": pull["merged_at"]}
+        return merged
+
+    def closed_pull_requests_since(self, since: str = "", per_page: int = 100) -> List[Dict]:
+        """
+        Return the closed pull requests updated at or after since (ISO 8601), most recently updated first.
+
+        Pages are requested one at a time and the listing stops at the first
+        pull request updated before since, so an incremental sync transfers
+        only what changed; without since every closed pull request is listed.
+        """
+        path = f"repos/{self.repo}/pulls"
+        params = {"state": "closed", "sort": "updated", "direction": "desc", "per_page": str(per_page)}
+        if not since:
+            return self.paginate(path, params)
+
+        pulls: List[Dict] = []
+        page = 1
+        while True:
+            _, data, _ = self.request("GET", path, dict(params, page=str(page)))
+            data = data or []
+            recent = [pull for pull in data if (pull.get("updated_at") or "") >= since]
+            pulls.extend(recent)
+            if len(recent) < len(data) or len(data) < per_page:
+                return pulls
+            page += 1
+
+    def create_installation_token(self, jwt_token: str, installation_id: str) -> str:
+        """Exchange a GitHub App JWT for an installation access token."""
+        _, response, _ = self.request(
+            "POST", f"app/installations/{installation_id}/access_tokens",
+            headers={"Authorization": f"Bearer {jwt_token}"},
+        )
+        return (response or {}).get("token", "")
+
+    def _url(self, path: str, params: Optional[Dict[str, str]] = None) -> str:
+        """Build an absolute URL (HTTP) or a gh api endpoint path with a query string."""
+        if path.startswith("http://") or path.startswith("https://"):
+            url = path
+        elif self.transport == "http":
+            url = f"{self.base_url}/{path.lstrip('/')}"
+        else:
+            url = path.lstrip("/")
+        if params:
+            url += ("&" if "?" in url else "?") + urllib.parse.urlencode(params)
+        return url
+
+    def _gh_request(self, method, path, params=None, body=None, headers=None, paginate=False):
+        """Send a request through `gh api`."""
+        cmd = ["gh", "api", "--method", method, self._url(path, params)]
+        if paginate:
+            cmd.append("--paginate")
+        for name, value in (headers or {}).items():
+            cmd.extend(["--header", f"{name}: {value}"])
+        for name, value in (body or {}).items():
+            cmd.extend(["--raw-field", f"{name}={value}"])
+
+        result = self.run_command(cmd)
+        if result.returncode != 0:
+            raise APIError(f"gh api {method} {path} failed: {result.stderr.strip()}")
+        return 200, self._decode_gh_output(result.stdout), {}
+
+    @staticmethod
+    def _split_included(output: str) -> Tuple[int, Dict[str, str], str]:
+        """Split gh api --include output into (status, lowercase headers, body); without a status line it is all body."""
+        if not output.startswith("HTTP/"):
+            return 200, {}, output
+        head, _, body = output.replace("\r\n", "\n").partition("\n\n")
+        lines = head.splitlines()
+        fields = lines[0].split()
+        status = int(fields[1]) if len(fields) > 1 and fields[1].isdigit() else 200
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return status, headers, body
+
+    @staticmethod
+    def _decode_gh_output(output: str) -> object:
+        """Decode gh api output; --paginate prints one JSON document per page."""
+        decoder = json.JSONDecoder()
+        documents = []
+        position = 0
+        output = output.strip()
+        try:
+            while position < len(output):
+                document, position = decoder.raw_decode(output, position)
+                documents.append(document)
+                while position < len(output) and output[position].isspace():
+                    position += 1
+        except json.JSONDecodeError as e:
+            raise APIError(f"Unable to parse API response: {e}")
+
+        if len(documents) == 1:
+            return documents[0]
+        if all(isinstance(document, list) for document in documents):
+            return [item for document in documents for item in document]
+        return documents or None
+
+    def _retry_delay(self, status: int, headers: Dict[str, str], attempt: int) -> Optional[float]:
+        """Return how long to wait before retrying a response, or None if it must not be retried."""
+        rate_limited = status == 403 and (headers.get("retry-after") or headers.get("x-ratelimit-remaining") == "0")
+        if status not in RETRY_STATUSES and not rate_limited:
+            return None
+        if headers.get("retry-after"):
+            delay = float(headers["retry-after"])
+        elif headers.get("x-ratelimit-remaining") == "0" and headers.get("x-ratelimit-reset"):
+            delay = float(headers["x-ratelimit-reset"]) - time.time()
+        else:
+            delay = float(2 ** attempt)
+        return max(0.0, min(delay, self.max_retry_wait))
+
+    def _http_request(self, method, path, params=None, body=None, headers=None):
+        """Send a request directly over HTTP, retrying rate limited and transient failures."""
+        url = self._url(path, params)
+        route = urllib.parse.urlsplit(url).path
+        request_headers = {
+            "Accept": "application/vnd.github+json",
+            "X-GitHub-Api-Version": "2022-11-28",
+            "User-Agent": "branch-sweeper",
+        }
+        if self.token:
+            request_headers["Authorization"] = f"Bearer {self.token}"
+        request_headers.update(headers or {})
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        if data is not None:
+            request_headers["Content-Type"] = "application/json"
+
+        for attempt in range(self.max_retries + 1):
+            request = urllib.request.Request(url, data=data, method=method, headers=request_headers)
+            started = time.time()
+            try:
+                timeout = self.deadline.clamp(self.timeout) if self.deadline else self.timeout
+                with urllib.request.urlopen(request, timeout=timeout) as response:
+                    status = response.status
+                    payload = response.read().decode("utf-8", "replace")
+                    response_headers = {name.lower(): value for name, value in response.headers.items()}
+            except urllib.error.HTTPError as e:
+                status = e.code
+                payload = e.read().decode("utf-8", "replace")
+                response_headers = {name.lower(): value for name, value in e.headers.items()}
+            except (urllib.error.URLError, OSError) as e:
+                record_command(["http", method, route], started, time.time(),
+                               subprocess.CompletedProcess([], 1, "", str(e)))
+                raise APIError(f"{method} {url} failed: {e}")
+
+            record_command(["http", method, route], started, time.time(),
+                           subprocess.CompletedProcess([], 0 if status < 400 else status, payload, ""))
+
+            if status < 400:
+                try:
+                    return status, json.loads(payload) if payload.strip() else None, response_headers
+                except ValueError as e:
+                    # A proxy or an outage page answering in place of the API
+                    raise APIError(f"{method} {url} returned {status} with an unparsable body: {e}", status)
+
+            delay = self._retry_delay(status, response_headers, attempt)
+            if delay is None or attempt == self.max_retries:
+                break
+
+            registry = get_registry()
+            if registry:
+                registry.inc("api_retries", 1, "GitHub API requests retried after rate limiting or errors",
+                             status=str(status))
+            print(f"::warning::GitHub API returned {status} for {method} {route}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+        try:
+            message = json.loads(payload).get("message", payload)
+        except (ValueError, AttributeError):
+            message = payload
+        raise APIError(f"{method} {url} returned {status}: {message}", status)
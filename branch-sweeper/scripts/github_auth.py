@@ -10,25 +10,39 @@ import time
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Union
 
+try:
+    from .command_trace import record_command
+    from .deadline import DEFAULT_TIMEOUTS, command_category
+    from .github_api import APIError, GitHubAPI
+except ImportError:
+    from command_trace import record_command
+    from deadline import DEFAULT_TIMEOUTS, command_category
+    from github_api import APIError, GitHubAPI
+
 
 def b64_url_encode(data: str) -> str:
     """Base64 URL-safe encode a string."""
     return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
 
 
-def run_command(cmd: List[str], capture_output: bool = True, verbose: bool = False) -> subprocess.CompletedProcess:
-    """Run a shell command and return the result."""
+def run_command(
+    cmd: List[str], capture_output: bool = True, verbose: bool = False, timeout: Optional[float] = None
+) -> subprocess.CompletedProcess:
+    """Run a shell command and return the result; timeout defaults to the command's category timeout."""
     if verbose:
         print(f"DEBUG: Running command: {' '.join(cmd)}")
     
+    if timeout is None:
+        timeout = DEFAULT_TIMEOUTS[command_category(cmd)] or None
+    started = time.time()
     try:
         result = subprocess.run(
             cmd,
             capture_output=capture_output,
             text=True,
-            check=False  # We'll handle errors manually
+            check=False,  # We'll handle errors manually
+            timeout=timeout,
         )
-        return result
     except Exception as e:
         print(f"Error executing command: {e}")
         # Create a fake result object for error handling
@@ -37,7 +51,10 @@ def run_command(cmd: List[str], capture_output: bool = True, verbose: bool = Fal
                 self.returncode = 1
                 self.stdout = ""
                 self.stderr = str(e)
-        return FakeResult()
+        result = FakeResult()
+    
+    record_command(cmd, started, time.time(), result)
+    return result
 
 
 def get_operating_identity(verbose: bool = False) -> str:
@@ -121,30 +138,21 @@ def get_installation_token(jwt_token: str, installation_id: str, verbose: bool =
     if verbose:
         print(f"Generating installation access token for installation ID: {installation_id}")
     
-    # Use GitHub CLI for better error handling
-    cmd = [
-        "gh", "api", "--method", "POST", 
-        f"/app/installations/{installation_id}/access_tokens",
-        "--header", f"Authorization: Bearer {jwt_token}"
-    ]
-    
-    result = run_command(cmd, verbose=verbose)
+    # Use the GitHub CLI (or SWEEPER_API_URL) for better error handling
+    api = GitHubAPI(run_command=lambda cmd: run_command(cmd, verbose=verbose))
     
-    if result.returncode == 0 and result.stdout:
-        try:
-            # Parse the JSON response to get the token
-            response = json.loads(result.stdout)
-            token = response.get("token")
-            if token:
-                if verbose:
-                    print("Successfully received installation token")
-                return token
-        except json.JSONDecodeError:
+    try:
+        token = api.create_installation_token(jwt_token, installation_id)
+        if token:
             if verbose:
-                print(f"Error parsing token response: {result.stdout[:100]}...")
+                print("Successfully received installation token")
+            return token
+        error = "response did not contain a token"
+    except APIError as e:
+        error = str(e)
     
     if verbose:
-        print(f"Failed to get installation token: {result.stderr}")
+        print(f"Failed to get installation token: {error}")
         print("Falling back to JWT token")
     
     # Fallback to JWT token
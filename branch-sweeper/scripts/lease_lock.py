@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/lease_lock.py
+
+"""
+Coordination lease stored as a ref on the remote.
+
+Overlapping sweeps of one repository (a scheduled run and a manual dispatch)
+would otherwise evaluate every branch twice and race on `git push --delete`.
+The lease is a commit on refs/janitor/lock whose message records the owner and
+an expiry time. Every change to the ref is a compare-and-swap push
+(`--force-with-lease=<ref>:<expected>`), so exactly one sweeper can create,
+renew, take over or release it:
+
+- acquire: create the ref if it does not exist, or replace it if its lease has
+  expired; otherwise report that another sweeper holds it (or poll until it
+  is released or expires).
+- renew: a background thread pushes a new expiry every ttl/3 seconds. If the
+  swap fails someone else took the lease over and `lost` is set.
+- release: delete the ref if it is still ours.
+
+Expiry times come from the local clock; keep the ttl well above the clock
+skew between runners.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Remote ref holding the lease
+LOCK_REF = "refs/janitor/lock"
+
+# Object id of the empty tree, which the lease commits point to
+EMPTY_TREE = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+
+# Lease handling modes selectable with --lease
+LEASE_MODES = ("off", "exit", "wait")
+
+
+class LeaseError(Exception):
+    """The lease ref could not be read or written (as opposed to being held by someone else)."""
+
+
+class LeaseLock:
+    """A renewable lease on a ref of the remote repository."""
+
+    def __init__(
+        self,
+        run_command: Callable[[List[str]], object],
+        ttl: int = 300,
+        ref: str = LOCK_REF,
+        remote: str = "origin",
+        owner: str = "",
+        verbose: bool = False,
+    ):
+        """Prepare a lease; owner defaults to host, pid, workflow run and a random suffix."""
+        self.run_command = run_command
+        self.ttl = ttl
+        self.ref = ref
+        self.remote = remote
+        self.owner = owner or (
+            f"{socket.gethostname()}:{os.getpid()}:{os.environ.get('GITHUB_RUN_ID', 'local')}:{uuid.uuid4().hex[:8]}"
+        )
+        self.verbose = verbose
+        self.sha: Optional[str] = None
+        self.expires = 0
+        self.holder: Dict = {}
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def held(self) -> bool:
+        """Whether the lease is ours and has neither been taken over nor expired."""
+        return self.sha is not None and not self.lost.is_set() and time.time() < self.expires
+
+    def read(self) -> Tuple[Optional[str], Dict]:
+        """Return the current lease commit and its payload, or (None, {}) if there is no lease."""
+        result = self.run_command(["git", "ls-remote", self.remote, self.ref])
+        if result.returncode != 0:
+            raise LeaseError(f"Unable to read {self.ref}: {result.stderr.strip()}")
+        fields = result.stdout.split()
+        if not fields:
+            return None, {}
+        sha = fields[0]
+
+        result = self.run_command(["git", "fetch", "--no-tags", self.remote, f"+{self.ref}:{self.ref}"])
+        if result.returncode != 0:
+            raise LeaseError(f"Unable to fetch {self.ref}: {result.stderr.strip()}")
+        result = self.run_command(["git", "cat-file", "commit", sha])
+        message = result.stdout.split("\n\n", 1)[-1] if result.returncode == 0 else ""
+        try:
+            payload = json.loads(message)
+        except ValueError:
+            # An unreadable lease is treated as expired
+            payload = {}
+        return sha, payload if isinstance(payload, dict) else {}
+
+    def acquire(self, wait: float = 0.0, poll_interval: float = 10.0) -> bool:
+        """Take the lease, polling for up to `wait` seconds while someone else holds it."""
+        deadline = time.time() + wait
+        while True:
+            sha, payload = self.read()
+            self.holder = payload
+            expired = payload.get("expires", 0) <= time.time()
+
+            if sha is None or expired or payload.get("owner") == self.owner:
+                if sha is not None and expired and payload.get("owner") != self.owner:
+                    print(f"Taking over expired lease held by {payload.get('owner', 'unknown')}")
+                if self._swap(sha or "", self._lease_commit()):
+                    return True
+                # Lost a race with another sweeper; look again
+                continue
+
+            if time.time() >= deadline:
+                return False
+            remaining = payload.get("expires", 0) - time.time()
+            print(f"Lease held by {payload.get('owner', 'unknown')} for another {remaining:.0f}s, waiting...")
+            time.sleep(max(0.0, min(poll_interval, deadline - time.time())))
+
+    def renew(self) -> bool:
+        """Push a new expiry; sets `lost` and returns False if the lease was taken over."""
+        if self.sha is None or self.lost.is_set():
+            return False
+        try:
+            if self._swap(self.sha, self._lease_commit()):
+                return True
+        except LeaseError as e:
+            # A transient failure keeps the lease until its current expiry
+            print(f"::warning::Unable to renew lease: {e}")
+            if time.time() >= self.expires:
+                self.lost.set()
+            return False
+        print(f"::error::Lease {self.ref} was taken over by another sweeper")
+        self.lost.set()
+        return False
+
+    def release(self) -> None:
+        """Stop renewing and delete the lease ref if it is still ours."""
+        self.stop_renewal()
+        if self.sha is None or self.lost.is_set():
+            return
+        result = self.run_command([
+            "git", "push", "--porcelain", self.remote, f"--force-with-lease={self.ref}:{self.sha}", f":{self.ref}"
+        ])
+        if result.returncode != 0:
+            print(f"::warning::Unable to release lease {self.ref}: {result.stderr.strip() or result.stdout.strip()}")
+        self.sha = None
+
+    def start_renewal(self) -> None:
+        """Renew the lease every ttl/3 seconds on a background thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._renew_loop, daemon=True)
+        self._thread.start()
+
+    def stop_renewal(self) -> None:
+        """Stop the renewal thread."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _renew_loop(self) -> None:
+        """Body of the renewal thread."""
+        while not self._stop.wait(self.ttl / 3.0):
+            if not self.renew() and self.lost.is_set():
+                return
+
+    def _lease_commit(self) -> Tuple[str, int]:
+        """Create a lease commit expiring ttl seconds from now; return (sha, expiry)."""
+        expires = int(time.time()) + self.ttl
+        payload = {"owner": self.owner, "expires": expires, "ttl": self.ttl, "acquired": int(time.time())}
+
+        # The lease commits point at the empty tree, which may not exist yet in a fresh clone
+        self.run_command(["git", "hash-object", "-t", "tree", "-w", os.devnull])
+        result = self.run_command([
+            "git", "-c", "user.name=Branch Sweeper", "-c", "user.email=actions@github.com",
+            "commit-tree", EMPTY_TREE, "-m", json.dumps(payload, sort_keys=True),
+        ])
+        if result.returncode != 0 or not result.stdout.strip():
+            raise LeaseError(f"Unable to create lease commit: {result.stderr.strip()}")
+        return result.stdout.strip(), expires
+
+    def _swap(self, expected: str, lease: Tuple[str, int]) -> bool:
+        """Compare-and-swap the remote ref from expected ("" for absent) to the lease commit."""
+        sha, expires = lease
+        result = self.run_command([
+            "git", "push", "--porcelain", self.remote, f"--force-with-lease={self.ref}:{expected}", f"{sha}:{self.ref}"
+        ])
+        if result.returncode == 0:
+            self.sha, self.expires = sha, expires
+            if self.verbose:
+                print(f"DEBUG: Lease {self.ref} held until {time.strftime('%H:%M:%S', time.localtime(expires))}")
+            return True
+        if "stale info" in result.stdout or "fetch first" in result.stdout or "already exists" in result.stdout:
+            return False
+        raise LeaseError(f"Unable to update {self.ref}: {result.stderr.strip() or result.stdout.strip()}")
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/merge_index.py
+
+"""
+Batched merge detection for the branch sweeper.
+
+The reference evaluator (BranchSweeper._check_if_branch_is_merged) starts up to
+four git/gh processes per branch and protected branch. MergeIndex gathers the
+same evidence up front with one `git branch -r --merged` listing and one
+`git log` per protected branch plus one paginated pull request listing, and
+then answers each branch from memory with the same decisions:
+
+- merged pull request: the first merged PR whose head is owner:branch.
+- fully contained: the branch tip is reachable from the protected branch, which
+  is exactly membership in `git branch -r --merged origin/<protected>`.
+- commit message: the reference pattern is passed to `git log --grep` as a
+  POSIX basic regular expression, in which "|" is a literal character rather
+  than alternation. It is translated with that meaning, and since a match must
+  contain a literal "|", only message lines containing one are searched.
+- git branch --merged: the reference tests `origin/<branch>` as a substring of
+  the listing, so a branch whose name is a prefix of a merged branch counts as
+  merged too; that quirk is kept.
+
+tests/test_merge_equivalence.py checks the two engines against each other on
+randomized repositories.
+"""
+
+import re
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+try:
+    from .github_api import APIError
+except ImportError:
+    from github_api import APIError
+
+# Merge detection engines selectable with --merge-engine
+MERGE_ENGINES = ("reference", "batched")
+
+# Margin below the oldest branch tip for the pull request listing, covering committer clock skew
+PULL_REQUEST_SKEW_SECONDS = 86400
+
+
+def commit_message_pattern(branch_name: str) -> str:
+    """The commit message pattern the reference evaluator passes to git log --grep."""
+    return (f"Merge.*{branch_name}|Merge.*branch.*{branch_name}|"
+            f"Merge.*pull.*request.*{branch_name}|{branch_name}.*into")
+
+
+def basic_regex_to_python(pattern: str) -> str:
+    """
+    Translate a git --grep basic regular expression into a Python regex.
+
+    Ref names cannot contain "\\", "*", "?", "[", "^" or "~", so apart from "."
+    (any character) and ".*" every character of these patterns is literal.
+    "$" is only an anchor at the very end of a basic regex.
+    """
+    translated = []
+    for index, char in enumerate(pattern):
+        if char == ".":
+            translated.append(".")
+        elif char == "*" and index > 0:
+            translated.append("*")
+        elif char == "$" and index == len(pattern) - 1:
+            translated.append("$")
+        else:
+            translated.append(re.escape(char))
+    return "".join(translated)
+
+
+class MergeIndex:
+    """Merge evidence for every remote branch, gathered with a fixed number of commands."""
+
+    def __init__(
+        self,
+        run_command: Callable[[List[str]], object],
+        protected_branches: Iterable[str],
+        api=None,
+        verbose: bool = False,
+    ):
+        """Initialize an empty index; api is a GitHubAPI, or None to skip pull request lookups."""
+        self.run_command = run_command
+        self.protected_branches = list(protected_branches)
+        self.api = api
+        self.verbose = verbose
+        # Commit date of the oldest branch tip to decide; older pull requests are not listed (0 lists all)
+        self.oldest_tip = 0
+        self.pull_requests: Dict[str, Dict] = {}
+        self.merged_listing: Dict[str, str] = {}
+        self.merged_branches: Dict[str, set] = {}
+        self.message_lines: Dict[str, str] = {}
+
+    def build(self) -> None:
+        """Run the batched git and API queries."""
+        self.load_pull_requests()
+        self.load_git()
+
+    def load_pull_requests(self) -> None:
+        """List merged pull requests (independent of the local repository, so it can overlap the fetch)."""
+        if self.api is not None:
+            # A pull request that merged a branch was last updated after the branch tip was committed
+            since = ""
+            if self.oldest_tip:
+                since = datetime.fromtimestamp(self.oldest_tip - PULL_REQUEST_SKEW_SECONDS, timezone.utc)
+                since = since.strftime("%Y-%m-%dT%H:%M:%SZ")
+            try:
+                self.pull_requests = self.api.merged_pull_requests(since)
+            except APIError as e:
+                if self.verbose:
+                    print(f"DEBUG: Pull request listing failed: {e}")
+                self.pull_requests = {}
+
+    def load_git(self) -> None:
+        """Scan the fetched protected branches."""
+        for protected in self.protected_branches:
+            result = self.run_command(["git", "branch", "-r", "--merged", f"origin/{protected}"])
+            if result.returncode == 0:
+                self.merged_listing[protected] = result.stdout
+                self.merged_branches[protected] = {
+                    line.strip().split(" -> ")[0] for line in result.stdout.splitlines() if line.strip()
+                }
+
+            result = self.run_command(["git", "log", f"origin/{protected}", "--format=%B"])
+            if result.returncode == 0:
+                # Only lines containing a literal "|" can match the reference pattern
+                self.message_lines[protected] = "\n".join(
+                    line for line in result.stdout.splitlines() if "|" in line
+                )
+
+    def evidence(self, branch_name: str) -> Optional[str]:
+        """Return a description of why the branch counts as merged, or None."""
+        return (self.pull_request_evidence(branch_name) or self.containment_evidence(branch_name)
+                or self.message_evidence(branch_name))
+
+    def pull_request_evidence(self, branch_name: str) -> Optional[str]:
+        """Evidence from the merged pull request listing."""
+        pull = self.pull_requests.get(branch_name)
+        if pull:
+            return (f"Branch {branch_name} was merged via PR #{pull.get('number', 'unknown')}: "
+                    f"{pull.get('title', 'unknown')} (merged at {pull.get('merged_at', 'unknown')})")
+        return None
+
+    def containment_evidence(self, branch_name: str) -> Optional[str]:
+        """Evidence that the branch tip is reachable from a protected branch."""
+        ref_name = f"origin/{branch_name}"
+        for protected in self.protected_branches:
+            if ref_name in self.merged_branches.get(protected, ()):
+                return f"Branch {branch_name} is fully merged into protected branch {protected} (fully contained)"
+        return None
+
+    def message_evidence(self, branch_name: str) -> Optional[str]:
+        """Evidence from commit messages and the git branch --merged listing."""
+        ref_name = f"origin/{branch_name}"
+        message_re = None
+        for protected in self.protected_branches:
+            lines = self.message_lines.get(protected)
+            if lines:
+                if message_re is None:
+                    message_re = re.compile(basic_regex_to_python(commit_message_pattern(branch_name)), re.MULTILINE)
+                if message_re.search(lines):
+                    return f"Branch {branch_name} appears to be merged into {protected} based on commit messages"
+
+            if ref_name in self.merged_listing.get(protected, ""):
+                return f"Branch {branch_name} is merged into {protected} according to git branch --merged"
+
+        return None
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/merge_shards.py
+
+"""
+Merge the results of a sharded sweep.
+
+Each of the N jobs of a sharded sweep (--shard i/N) writes its own JSON
+results file (--results json:PATH). This script reads all of them, checks
+that they are the N shards of one sweep, and writes one combined summary, an
+optional combined results file and the deleted_count output.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from .results_writer import ResultSink, create_sink
+    from .sharding import parse_shard
+    from .summary_renderer import SummaryAggregator
+except ImportError:
+    from results_writer import ResultSink, create_sink
+    from sharding import parse_shard
+    from summary_renderer import SummaryAggregator
+
+
+def load_shard_results(path: str) -> Tuple[Dict, List[Dict]]:
+    """Read the metadata and records of one shard's JSON results file."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        document = json.load(f)
+    return document.get("metadata", {}), document.get("records", [])
+
+
+def merge_shards(
+    paths: List[str],
+    summary_path: str = "summary.md",
+    results: Optional[List[str]] = None,
+    summary_top_n: int = 25,
+) -> int:
+    """Combine the shards' results into one summary; return 1 if shards are missing or inconsistent."""
+    shards: Dict[int, Tuple[Dict, List[Dict]]] = {}
+    count = 0
+    for path in paths:
+        metadata, records = load_shard_results(path)
+        try:
+            shard = parse_shard(metadata.get("shard", ""))
+        except ValueError as e:
+            print(f"::error::{path}: {e}")
+            return 1
+        if shard is None:
+            print(f"::error::{path} is not the results file of a sharded sweep")
+            return 1
+        if count and shard[1] != count:
+            print(f"::error::{path} is shard {shard[0]}/{shard[1]} of a sweep with another shard count ({count})")
+            return 1
+        if shard[0] in shards:
+            print(f"::error::{path} repeats shard {shard[0]}/{shard[1]}")
+            return 1
+        count = shard[1]
+        shards[shard[0]] = (metadata, records)
+
+    missing = [str(index) for index in range(1, count + 1) if index not in shards]
+    if not shards or missing:
+        print(f"::error::Missing results of shard(s) {', '.join(missing) or '1'} of {count or 'N'}")
+        return 1
+
+    # Shards agree on the configuration, except for protected branches discovered during start-up
+    metadata = dict(shards[1][0])
+    protected = set()
+    for shard_metadata, _ in shards.values():
+        protected.update(shard_metadata.get("protected_branches", "").split())
+    metadata["protected_branches"] = " ".join(sorted(protected))
+    metadata["shard"] = ""
+    metadata["shards"] = count
+
+    summary = SummaryAggregator(top_n=summary_top_n)
+    sinks: List[ResultSink] = [create_sink(spec, metadata) for spec in results or []]
+    counts: Dict[str, int] = {}
+    seen = set()
+    for index in sorted(shards):
+        for record in shards[index][1]:
+            if record["branch"] in seen:
+                print(f"::warning::Branch {record['branch']} was recorded by more than one shard")
+            seen.add(record["branch"])
+            counts[record["action"]] = counts.get(record["action"], 0) + 1
+            summary.write(record)
+            for sink in sinks:
+                sink.write(record)
+    for sink in sinks:
+        sink.close(counts)
+
+    with open(summary_path, "w") as f:
+        f.write("## Branch Cleanup Summary\n")
+        f.write(f"- Mode: {'Dry Run' if metadata.get('dry_run') else 'Actual Deletion'}\n")
+        f.write(f"- Threshold: {metadata.get('weeks_threshold')} weeks\n")
+        f.write(f"- Default branch: {metadata.get('default_branch', '')}\n")
+        f.write(f"- Protected branches: {metadata['protected_branches']}\n")
+        f.write(f"- Shards: {count}\n")
+        f.write("\n")
+        f.write(summary.render_markdown())
+
+    github_output = os.environ.get("GITHUB_OUTPUT")
+    if github_output:
+        with open(github_output, "a") as f:
+            f.write(f"deleted_count={summary.deleted_count}\n")
+
+    print(f"Merged {count} shards: {summary.total} branches, {summary.deleted_count} deleted")
+    return 0
+
+
+def main():
+    """Parse command-line arguments and merge the shards' results."""
+    parser = argparse.ArgumentParser(description="Merge the results of a sharded branch sweep")
+    parser.add_argument("shard_results", nargs="+", metavar="PATH",
+                        help="JSON results file of each shard (written with --results json:PATH)")
+    parser.add_argument("--summary", default="summary.md", help="Path of the combined Markdown summary")
+    parser.add_argument("--results", action="append", default=[], metavar="FORMAT:PATH",
+                        help="Also write the combined records to a markdown, json or ndjson file (may be repeated)")
+    parser.add_argument("--summary-top-n", type=int, default=25,
+                        help="Number of oldest branches listed per category in the summary")
+
+    args = parser.parse_args()
+
+    try:
+        return merge_shards(args.shard_results, args.summary, args.results, args.summary_top_n)
+    except (OSError, ValueError) as e:
+        print(f"::error::Unable to merge the shards' results: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/metrics.py
+
+"""
+OpenMetrics export for fleet monitoring of sweeper runs.
+
+A small in-process registry of counters and histograms that is written as an
+OpenMetrics text file (or a classic *.prom file for the node-exporter textfile
+collector) and can
+optionally be pushed to a Prometheus Pushgateway. Only the standard library is
+used, so the sweeper keeps its zero-dependency promise.
+"""
+
+import base64
+import os
+import tempfile
+import threading
+import urllib.parse
+import urllib.request
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Default histogram buckets in seconds, tuned for subprocess and run durations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_active_registry: Optional["MetricsRegistry"] = None
+
+
+def get_registry() -> Optional["MetricsRegistry"]:
+    """Return the active registry, if metrics are enabled."""
+    return _active_registry
+
+
+def set_registry(registry: Optional["MetricsRegistry"]) -> None:
+    """Install (or remove, with None) the process-wide registry."""
+    global _active_registry
+    _active_registry = registry
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text exposition format."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    """Render a label set as {a="b",...}."""
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value, using integers where possible."""
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    """A monotonically increasing counter with labels."""
+
+    def __init__(self, name: str, help_text: str, const_labels: LabelKey):
+        self.name = name
+        self.help_text = help_text
+        self.const_labels = const_labels
+        self.values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """Increase the counter for the given label values."""
+        key = self.const_labels + tuple(sorted(labels.items()))
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self, openmetrics: bool = True) -> List[str]:
+        """Render the counter family (the classic text format names the family with _total)."""
+        family = self.name if openmetrics else f"{self.name}_total"
+        lines = [f"# TYPE {family} counter", f"# HELP {family} {self.help_text}"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}_total{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """A cumulative histogram with labels."""
+
+    def __init__(self, name: str, help_text: str, const_labels: LabelKey, buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.const_labels = const_labels
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[LabelKey, Dict[str, object]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record one observation for the given label values."""
+        key = self.const_labels + tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.values.get(key)
+            if series is None:
+                series = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self.values[key] = series
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self, openmetrics: bool = True) -> List[str]:
+        """Render the histogram family."""
+        lines = [f"# TYPE {self.name} histogram", f"# HELP {self.name} {self.help_text}"]
+        for key, series in sorted(self.values.items()):
+            for bound, count in zip(self.buckets, series["counts"]):
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', repr(float(bound)))])} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series['count']}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series['sum'])}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metric families sharing a set of constant labels (e.g. repo)."""
+
+    def __init__(self, const_labels: Optional[Dict[str, str]] = None, prefix: str = "branch_sweeper"):
+        """Initialize an empty registry."""
+        self.const_labels: LabelKey = tuple(sorted((const_labels or {}).items()))
+        self.prefix = prefix
+        self.families: Dict[str, object] = {}
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        """Return the counter with the given name, creating it if needed."""
+        full_name = f"{self.prefix}_{name}"
+        if full_name not in self.families:
+            self.families[full_name] = Counter(full_name, help_text, self.const_labels)
+        return self.families[full_name]
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Return the histogram with the given name, creating it if needed."""
+        full_name = f"{self.prefix}_{name}"
+        if full_name not in self.families:
+            self.families[full_name] = Histogram(full_name, help_text, self.const_labels, buckets)
+        return self.families[full_name]
+
+    def inc(self, name: str, amount: float = 1, help_text: str = "", **labels: str) -> None:
+        """Shorthand for counter(name).inc(amount, **labels)."""
+        self.counter(name, help_text or name.replace("_", " ")).inc(amount, **labels)
+
+    def observe(self, name: str, value: float, help_text: str = "", **labels: str) -> None:
+        """Shorthand for histogram(name).observe(value, **labels)."""
+        self.histogram(name, help_text or name.replace("_", " ")).observe(value, **labels)
+
+    def render(self, openmetrics: bool = True) -> str:
+        """Render every family in the OpenMetrics (or classic Prometheus) text format."""
+        lines: List[str] = []
+        for name in sorted(self.families):
+            lines.extend(self.families[name].render(openmetrics))
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str, openmetrics: Optional[bool] = None) -> None:
+        """
+        Atomically write the metrics file so collectors never read a partial file.
+
+        By default "*.prom" files use the classic Prometheus text format read by the
+        node-exporter textfile collector; any other path gets OpenMetrics.
+        """
+        if openmetrics is None:
+            openmetrics = not path.endswith(".prom")
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".branch-sweeper-", suffix=".prom.tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self.render(openmetrics))
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def push(self, gateway_url: str, job: str = "branch_sweeper", timeout: float = 10.0) -> bool:
+        """PUT the metrics to a Pushgateway, grouped by job and the constant labels."""
+        url = gateway_url.rstrip("/") + f"/metrics/job/{urllib.parse.quote(job, safe='')}"
+        for name, value in self.const_labels:
+            # Values such as owner/repo must use the base64 grouping-key form
+            encoded = base64.urlsafe_b64encode(value.encode("utf-8")).decode("ascii")
+            url += f"/{name}@base64/{encoded or '='}"
+
+        # Pushgateway expects the classic text format for PUT bodies
+        body = self.render(openmetrics=False).encode("utf-8")
+        request = urllib.request.Request(
+            url, data=body, method="PUT", headers={"Content-Type": "text/plain; version=0.0.4"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return 200 <= response.status < 300
+        except Exception as e:
+            print(f"::warning::Failed to push metrics to {gateway_url}: {e}")
+            return False
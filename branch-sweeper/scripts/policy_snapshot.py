@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/policy_snapshot.py
+
+"""
+Deletion policy and offline snapshots of its inputs.
+
+policy_decision() is the deletion policy itself, shared by the sweeper and by
+simulate_policy.py. With --snapshot PATH a sweep also writes everything the
+policy looked at for each evaluated branch (tip, commit date, merge evidence
+and whether it was protected) to a compact NDJSON file, one array per branch
+after a header line. Policy parameters can then be tried against the
+snapshot offline, without git or API access.
+"""
+
+import gzip
+import json
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from .results_writer import Record, ResultSink
+except ImportError:
+    from results_writer import Record, ResultSink
+
+SNAPSHOT_VERSION = 1
+
+# Fields of every branch in a snapshot, in file order
+SNAPSHOT_FIELDS = ("branch", "sha", "commit_date", "merged", "evidence", "protected")
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+def policy_decision(
+    merged: bool, commit_date: int, cutoff_date: int, unmerged_cutoff_date: int, unmerged_days: int
+) -> Tuple[str, str]:
+    """Decide about an unprotected branch; return ("delete", "skipped" or "kept", reason).
+
+    unmerged_days is the threshold unmerged_cutoff_date was computed from, named in the reason.
+    """
+    if merged:
+        if commit_date < cutoff_date:
+            return "delete", "merged & stale"
+        return "skipped", "merged but not stale"
+    if commit_date < unmerged_cutoff_date:
+        return "delete", f"unmerged for over {unmerged_days} days"
+    if commit_date < cutoff_date:
+        return "kept", "stale but unmerged"
+    return "kept", "not merged"
+
+
+class SnapshotWriter(ResultSink):
+    """Stream the policy inputs of every evaluated branch into a snapshot file."""
+
+    def __init__(self, path: str, created: int, metadata: Optional[Dict] = None):
+        """Open the snapshot and write its header (created is the time the cutoffs were computed from)."""
+        super().__init__(path, metadata)
+        self.branches = 0
+        header = {"snapshot": SNAPSHOT_VERSION, "created": created, "metadata": self.metadata}
+        self._file.write(json.dumps(header, separators=(",", ":")) + "\n")
+
+    def write(self, record: Record) -> None:
+        """Append one branch, given as a dict of SNAPSHOT_FIELDS."""
+        entry = [record.get(field) for field in SNAPSHOT_FIELDS]
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self.branches += 1
+
+
+def load_snapshot(path: str) -> Tuple[Dict, List[Dict]]:
+    """Read a snapshot (optionally gzip-compressed); return its header and one dict per branch."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    header = json.loads(lines[0]) if lines else {}
+    if header.get("snapshot") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {header.get('snapshot')} in {path} "
+                         f"(expected {SNAPSHOT_VERSION})")
+    branches = [dict(zip(SNAPSHOT_FIELDS, json.loads(line))) for line in lines[1:] if line]
+    return header, branches
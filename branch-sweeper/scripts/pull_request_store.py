@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/pull_request_store.py
+
+"""
+Local store of merged pull requests, synced incrementally between runs.
+
+With --pr-store PATH the merged pull requests of the repository (number,
+head ref, head SHA, merge commit, merged-at time and title) are kept in a
+JSON file together with the latest `updated_at` seen. Each run lists closed
+pull requests most recently updated first and stops at that cursor, so only
+pull requests changed since the previous run are transferred; the first run
+lists them all, like the bulk index.
+
+Merge checks read the store instead of the API. After the remote branches
+are listed, pull requests whose head branch no longer exists are compacted
+away, which keeps the store proportional to the live branches.
+"""
+
+import json
+import os
+from typing import Dict, Iterable, Optional
+
+STORE_VERSION = 1
+
+
+class PullRequestStore:
+    """Merged pull requests of one repository, keyed by number, with an updated-since cursor."""
+
+    def __init__(self, path: str, repo: str = ""):
+        """Load the store at path; a missing, unreadable or foreign store starts empty."""
+        self.path = path
+        self.repo = repo
+        self.cursor = ""
+        self.pulls: Dict[str, Dict] = {}
+        self.transferred = 0
+        self._by_head: Optional[Dict[str, Dict]] = None
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self) -> None:
+        """Read the store file."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                document = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"::warning::Unable to read the pull request store {self.path}, rebuilding it: {e}")
+            return
+        if document.get("version") != STORE_VERSION or document.get("repo") != self.repo:
+            print(f"::warning::{self.path} is not a version {STORE_VERSION} store of {self.repo}, rebuilding it")
+            return
+        self.cursor = document.get("cursor", "")
+        self.pulls = document.get("pulls", {})
+
+    def sync(self, api) -> int:
+        """Add the pull requests merged or updated since the last sync; return how many were transferred."""
+        owner = self.repo.split("/")[0]
+        pulls = api.closed_pull_requests_since(self.cursor)
+        self.transferred = len(pulls)
+        for pull in pulls:
+            head = pull.get("head") or {}
+            if pull.get("updated_at", "") > self.cursor:
+                self.cursor = pull["updated_at"]
+            # Only pull requests merged from a branch of this repository say anything about its branches
+            if not pull.get("merged_at") or not head.get("label", "").startswith(f"{owner}:"):
+                continue
+            self.pulls[str(pull["number"])] = {
+                "head": head.get("label", "")[len(owner) + 1:],
+                "head_sha": head.get("sha", ""),
+                "merge_commit": pull.get("merge_commit_sha", ""),
+                "merged_at": pull["merged_at"],
+                "title": pull.get("title", ""),
+            }
+        self._by_head = None
+        return self.transferred
+
+    def compact(self, branch_names: Iterable[str]) -> int:
+        """Drop the pull requests whose head branch no longer exists; return how many were dropped."""
+        existing = set(branch_names)
+        stale = [number for number, pull in self.pulls.items() if pull["head"] not in existing]
+        for number in stale:
+            del self.pulls[number]
+        if stale:
+            self._by_head = None
+        return len(stale)
+
+    def save(self) -> None:
+        """Write the store atomically."""
+        document = {"version": STORE_VERSION, "repo": self.repo, "cursor": self.cursor, "pulls": self.pulls}
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(document, f, separators=(",", ":"))
+        os.replace(temporary, self.path)
+
+    def _index(self) -> Dict[str, Dict]:
+        """The most recently merged pull request of every head branch."""
+        if self._by_head is None:
+            self._by_head = {}
+            for number, pull in self.pulls.items():
+                current = self._by_head.get(pull["head"])
+                if current is None or pull["merged_at"] > current["merged_at"]:
+                    self._by_head[pull["head"]] = dict(pull, number=int(number))
+        return self._by_head
+
+    def merged_pull_request(self, branch: str) -> Optional[Dict]:
+        """Return the most recent merged pull request whose head is the branch, like GitHubAPI does."""
+        pull = self._index().get(branch)
+        if pull is None:
+            return None
+        return {"number": pull["number"], "title": pull["title"], "merged_at": pull["merged_at"]}
+
+    def merged_pull_requests(self, since: str = "") -> Dict[str, Dict]:
+        """Return the most recent merged pull request of every head branch, like GitHubAPI does (since is ignored)."""
+        return {branch: self.merged_pull_request(branch) for branch in self._index()}
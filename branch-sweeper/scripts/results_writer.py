@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/results_writer.py
+
+"""
+Streaming writers for per-branch sweep results.
+
+Every branch decision is emitted as one structured record at the moment it is
+made. Records are written through buffered file handles that stay open for the
+whole run, so large sweeps never reopen files per branch and downstream tooling
+can consume NDJSON output while the sweep is still running.
+"""
+
+import abc
+import gzip
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, TextIO, Union
+
+# Size of the write buffer used for every result file
+BUFFER_SIZE = 64 * 1024
+
+# Human-readable labels for each action, used by the Markdown sink
+ACTION_LABELS = {
+    "deleted": "deleted",
+    "would_delete": "would be deleted - dry run",
+    "already_deleted": "already deleted",
+    "delete_failed": "deletion failed",
+    "skipped": "skipped",
+    "kept": "kept",
+}
+
+Record = Dict[str, Union[str, int, bool, None]]
+
+
+class ResultSink(abc.ABC):
+    """Base class for a file that receives branch result records."""
+
+    def __init__(self, path: str, metadata: Optional[Dict] = None):
+        """Open the sink file for buffered writing (gzip-compressed for .gz paths)."""
+        self.path = path
+        self.metadata = metadata or {}
+        if path.endswith(".gz"):
+            self._file: Optional[TextIO] = gzip.open(path, "wt", encoding="utf-8")
+        else:
+            self._file = open(path, "w", buffering=BUFFER_SIZE, encoding="utf-8")
+
+    @abc.abstractmethod
+    def write(self, record: Record) -> None:
+        """Write a single result record."""
+
+    def flush(self) -> None:
+        """Flush buffered records to disk."""
+        if self._file:
+            self._file.flush()
+
+    def close(self, counts: Dict[str, int]) -> None:
+        """Write any trailer and close the sink."""
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class NdjsonSink(ResultSink):
+    """Write one JSON object per line, flushing periodically for live consumers."""
+
+    def __init__(self, path: str, metadata: Optional[Dict] = None, flush_every: int = 100):
+        """Open the NDJSON file."""
+        super().__init__(path, metadata)
+        self.flush_every = flush_every
+        self._pending = 0
+
+    def write(self, record: Record) -> None:
+        """Append the record as a single JSON line."""
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+            self._pending = 0
+
+
+class JsonSink(ResultSink):
+    """Stream records into a single JSON document without holding them in memory."""
+
+    def __init__(self, path: str, metadata: Optional[Dict] = None):
+        """Open the JSON document and write its header."""
+        super().__init__(path, metadata)
+        self._first = True
+        self._file.write('{"metadata": ' + json.dumps(self.metadata) + ', "records": [')
+
+    def write(self, record: Record) -> None:
+        """Append the record to the records array."""
+        separator = "\n  " if self._first else ",\n  "
+        self._file.write(separator + json.dumps(record, separators=(",", ":")))
+        self._first = False
+
+    def close(self, counts: Dict[str, int]) -> None:
+        """Close the records array and write the final counts."""
+        if self._file:
+            self._file.write('\n], "counts": ' + json.dumps(counts) + "}\n")
+        super().close(counts)
+
+
+class MarkdownSink(ResultSink):
+    """Write a Markdown list with one line per branch decision."""
+
+    def __init__(self, path: str, metadata: Optional[Dict] = None, title: str = "Branch Cleanup Results"):
+        """Open the Markdown file and write the header and configuration."""
+        super().__init__(path, metadata)
+        self._file.write(f"# {title}\n")
+        self._file.write(f"Generated on: {datetime.now()}\n\n")
+        if self.metadata:
+            self._file.write("## Configuration\n")
+            for key, value in self.metadata.items():
+                self._file.write(f"- {key.replace('_', ' ').capitalize()}: {value}\n")
+            self._file.write("\n")
+        self._file.write("## Results\n")
+
+    def write(self, record: Record) -> None:
+        """Append the record as a list item."""
+        label = ACTION_LABELS.get(record["action"], record["action"])
+        self._file.write(f"- {record['branch']}: {record['reason']} ({label})\n")
+
+    def close(self, counts: Dict[str, int]) -> None:
+        """Write the totals and close the file."""
+        if self._file:
+            self._file.write("\n## Summary\n")
+            if not counts:
+                self._file.write("- No branches processed\n")
+            for action, count in sorted(counts.items()):
+                self._file.write(f"- {ACTION_LABELS.get(action, action).capitalize()}: {count}\n")
+        super().close(counts)
+
+
+SINK_TYPES = {
+    "markdown": MarkdownSink,
+    "md": MarkdownSink,
+    "json": JsonSink,
+    "ndjson": NdjsonSink,
+    "jsonl": NdjsonSink,
+}
+
+
+def create_sink(spec: str, metadata: Optional[Dict] = None) -> ResultSink:
+    """
+    Create a sink from a FORMAT:PATH specification.
+
+    The format may be omitted, in which case it is inferred from the file
+    extension (e.g. "results.ndjson").
+    """
+    fmt, sep, path = spec.partition(":")
+    if not sep:
+        path = spec
+        name = spec[:-len(".gz")] if spec.endswith(".gz") else spec
+        fmt = name.rsplit(".", 1)[-1] if "." in name else ""
+
+    sink_type = SINK_TYPES.get(fmt.lower())
+    if sink_type is None or not path:
+        raise ValueError(f"Unsupported results specification: {spec} (expected markdown|json|ndjson:PATH)")
+
+    return sink_type(path, metadata)
+
+
+class ResultsWriter:
+    """Fan out branch result records to any number of sinks."""
+
+    def __init__(self, sinks: Optional[List[ResultSink]] = None):
+        """Initialize the writer with an optional list of sinks."""
+        self.sinks: List[ResultSink] = list(sinks or [])
+        self.counts: Dict[str, int] = {}
+
+    def add_sink(self, sink: ResultSink) -> None:
+        """Attach another sink to the writer."""
+        self.sinks.append(sink)
+
+    def record(self, branch: str, action: str, reason: str, **fields) -> Record:
+        """Build a result record and emit it to every sink."""
+        record: Record = {
+            "branch": branch,
+            "action": action,
+            "reason": reason,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+        }
+        record.update(fields)
+
+        self.counts[action] = self.counts.get(action, 0) + 1
+        for sink in self.sinks:
+            sink.write(record)
+        return record
+
+    def flush(self) -> None:
+        """Flush all sinks."""
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self) -> None:
+        """Write trailers and close all sinks."""
+        for sink in self.sinks:
+            sink.close(dict(self.counts))
+
+    def __enter__(self) -> "ResultsWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
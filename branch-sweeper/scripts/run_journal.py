@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/run_journal.py
+
+"""
+Crash-safe journal of a sweep.
+
+With --journal PATH every branch decision and deletion outcome is appended
+to an NDJSON journal as it is made, together with a "pending" entry for each
+deletion handed to the deletion worker. Lines are fsync'd in batches, so a
+cancelled run or a dead runner loses at most the last batch.
+
+A rerun with --resume reads the journal back and:
+
+- replays the deletions that were finished, so the results and the summary
+  cover the whole sweep;
+- finishes the deletions that were pending when the run stopped;
+- decides every other branch again, since kept, skipped and would-delete
+  decisions depend on the time of the run, but reuses the merge evidence
+  journaled with a decision while the branch's tip is unchanged, so only the
+  cutoffs of the new run are applied and no merge check is repeated.
+
+Replayed records carry resumed=true and are not journaled a second time. A
+run that finishes appends a "completed" entry; resuming a completed journal
+starts over.
+"""
+
+import json
+import os
+import time
+from typing import Dict, Optional
+
+try:
+    from .results_writer import BUFFER_SIZE, Record, ResultSink
+except ImportError:
+    from results_writer import BUFFER_SIZE, Record, ResultSink
+
+JOURNAL_VERSION = 1
+
+# Configuration that must match for a journal to be resumed
+RESUME_KEYS = ("repo", "dry_run", "weeks_threshold", "unmerged_days", "policy", "default_branch", "shard")
+
+# Actions whose records are replayed on resume: outcomes that no later run can undo
+REPLAYED_ACTIONS = ("deleted", "already_deleted")
+
+
+def is_settled(record: Record, sha: Optional[str]) -> bool:
+    """Whether a journaled record is replayed for a branch whose tip is now sha (None once it is gone)."""
+    return record["action"] in REPLAYED_ACTIONS and (sha is None or record.get("sha") == sha)
+
+
+def has_evidence(record: Record, sha: Optional[str]) -> bool:
+    """Whether a journaled decision carries merge evidence that still holds for a branch whose tip is sha."""
+    return record.get("merged") is not None and sha is not None and record.get("sha") == sha
+
+
+class JournalSink(ResultSink):
+    """Append-only journal of decisions, fsync'd every sync_every lines."""
+
+    def __init__(self, path: str, metadata: Optional[Dict] = None, resume: bool = False, sync_every: int = 50):
+        """Open the journal, reading back the decisions of an earlier run when resuming."""
+        self.path = path
+        self.metadata = metadata or {}
+        self.sync_every = sync_every
+        self._unsynced = 0
+        # branch -> last decision record, and branch -> pending deletion without an outcome yet
+        self.decisions: Dict[str, Record] = {}
+        self.pending: Dict[str, Dict] = {}
+        self._torn = False
+        self.resumed = resume and os.path.exists(path) and self._load()
+
+        self._file = open(path, "a" if self.resumed else "w", buffering=BUFFER_SIZE, encoding="utf-8")
+        if self._torn:
+            # Terminate a line cut off by the crash so it does not swallow the next entry
+            self._file.write("\n")
+        if not self.resumed:
+            self._append({"journal": JOURNAL_VERSION, "metadata": self.metadata})
+            self.sync()
+
+    def _load(self) -> bool:
+        """Read an earlier journal; return False if it cannot be resumed."""
+        with open(self.path, encoding="utf-8") as f:
+            content = f.read()
+        lines = content.splitlines()
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except ValueError:
+            header = {}
+        if header.get("journal") != JOURNAL_VERSION:
+            print(f"::warning::{self.path} is not a version {JOURNAL_VERSION} journal, starting over")
+            return False
+        mismatched = [key for key in RESUME_KEYS
+                      if header.get("metadata", {}).get(key) != self.metadata.get(key)]
+        if mismatched:
+            print(f"::warning::{self.path} was written with another {', '.join(mismatched)}, starting over")
+            return False
+
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # The last line of a run that died mid-write
+                continue
+            if "completed" in entry:
+                print(f"{self.path} records a completed run, starting over")
+                self.decisions.clear()
+                self.pending.clear()
+                return False
+            if "pending" in entry:
+                self.pending[entry["pending"]] = entry
+                self.decisions.pop(entry["pending"], None)
+            elif "branch" in entry:
+                self.decisions[entry["branch"]] = entry
+                self.pending.pop(entry["branch"], None)
+        self._torn = not content.endswith("\n")
+        return True
+
+    def _append(self, entry: Dict) -> None:
+        """Append one line, syncing once a batch is complete."""
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        """Flush the journal and force it to disk."""
+        if self._file:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def write(self, record: Record) -> None:
+        """Journal a decision or deletion outcome (replayed ones are already in the journal)."""
+        if not record.get("resumed"):
+            self._append(record)
+
+    def write_pending(self, branch_name: str, sha: str, branch_age: str, reason: str, commit_date: int) -> None:
+        """Journal a deletion handed to the deletion worker."""
+        self._append({"pending": branch_name, "sha": sha, "branch_age": branch_age, "reason": reason,
+                      "commit_date": commit_date})
+
+    def complete(self) -> None:
+        """Mark the run as completed, so resuming this journal starts over."""
+        self._append({"completed": int(time.time())})
+        self.sync()
+
+    def flush(self) -> None:
+        """Sync whatever has been journaled so far."""
+        self.sync()
+
+    def close(self, counts: Dict[str, int]) -> None:
+        """Sync and close the journal."""
+        self.sync()
+        super().close(counts)
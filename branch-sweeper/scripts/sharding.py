@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/sharding.py
+
+"""
+Deterministic sharding of the branch namespace.
+
+With --shard i/N, N parallel sweeps (for example the jobs of a matrix) each
+evaluate and delete a disjoint slice of the branches: a branch belongs to
+shard crc32(name) % N + 1. The hash only depends on the branch name, so a
+branch stays in its shard across runs and runners, and every branch is in
+exactly one shard. merge_shards.py combines the shards' results.
+"""
+
+import zlib
+from typing import Optional, Tuple
+
+# (shard index starting at 1, shard count)
+Shard = Tuple[int, int]
+
+
+def parse_shard(spec: str) -> Optional[Shard]:
+    """Parse an i/N shard specification; an empty one means no sharding."""
+    if not spec:
+        return None
+    index, separator, count = spec.partition("/")
+    try:
+        shard = (int(index), int(count))
+    except ValueError:
+        shard = (0, 0)
+    if not separator or not 1 <= shard[0] <= shard[1]:
+        raise ValueError(f"Invalid shard '{spec}' (expected i/N with 1 <= i <= N)")
+    return shard
+
+
+def shard_of(branch_name: str, count: int) -> int:
+    """The shard (starting at 1) a branch belongs to."""
+    return zlib.crc32(branch_name.encode("utf-8")) % count + 1
+
+
+def shard_label(shard: Shard) -> str:
+    """File- and ref-safe name of a shard, e.g. shard-2-of-4."""
+    return f"shard-{shard[0]}-of-{shard[1]}"
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/simulate_policy.py
+
+"""
+What-if evaluation of the deletion policy against a snapshot.
+
+The snapshot is written by a sweep with --snapshot PATH (see
+policy_snapshot.py). Every combination of the given --weeks-threshold and
+--unmerged-days values is evaluated against it, as of the time the snapshot
+was taken unless --at says otherwise, and the resulting deletion counts (and
+with --list the branches) are printed. With --policy the rules of a policy
+file (see branch_policy.py) apply, and the thresholds given are those of the
+branches no rule matches. Nothing is fetched or looked up: a
+sweep of any size is re-evaluated in milliseconds.
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+try:
+    from .branch_policy import BranchPolicy, load_policy
+    from .policy_snapshot import DAY_SECONDS, load_snapshot, policy_decision
+except ImportError:
+    from branch_policy import BranchPolicy, load_policy
+    from policy_snapshot import DAY_SECONDS, load_snapshot, policy_decision
+
+Outcome = Dict[str, Dict[str, List[str]]]
+
+
+def simulate(
+    branches: List[Dict], weeks_threshold: int, unmerged_days: int = 30, now: int = 0, protected: Iterable[str] = (),
+    policy: Optional[BranchPolicy] = None,
+) -> Outcome:
+    """Apply the policy to the branches of a snapshot; return {action: {reason: [branch, ...]}}, oldest first."""
+    now = now or int(time.time())
+    cutoff_date = now - weeks_threshold * 7 * DAY_SECONDS
+    unmerged_cutoff_date = now - unmerged_days * DAY_SECONDS
+    protected = set(protected)
+    rule_cutoffs = policy.cutoffs(datetime.fromtimestamp(now)) if policy else {}
+
+    outcome: Outcome = {"delete": {}, "skipped": {}, "kept": {}}
+    for branch in sorted(branches, key=lambda entry: entry["commit_date"]):
+        rule = policy.rule_for(branch["branch"]) if policy else None
+        if branch["protected"] or branch["branch"] in protected:
+            action, reason = "skipped", "protected"
+        elif rule and rule.keep:
+            action, reason = "kept", f"kept by policy rule '{rule.name}'"
+        elif rule:
+            action, reason = policy_decision(branch["merged"], branch["commit_date"], *rule_cutoffs[rule.name],
+                                             rule.unmerged_days)
+        else:
+            action, reason = policy_decision(branch["merged"], branch["commit_date"], cutoff_date, unmerged_cutoff_date,
+                                             unmerged_days)
+        outcome[action].setdefault(reason, []).append(branch["branch"])
+    return outcome
+
+
+def describe(outcome: Outcome) -> str:
+    """One line of counts for an outcome."""
+    parts = []
+    for action, label in (("delete", "to delete"), ("kept", "kept"), ("skipped", "skipped")):
+        reasons = outcome[action]
+        total = sum(len(names) for names in reasons.values())
+        detail = ", ".join(f"{len(names)} {reason}" for reason, names in reasons.items())
+        parts.append(f"{total} {label}" + (f" ({detail})" if detail else ""))
+    return ", ".join(parts)
+
+
+def main():
+    """Parse command-line arguments and simulate the policy."""
+    parser = argparse.ArgumentParser(description="Evaluate deletion policy parameters against a sweep snapshot")
+    parser.add_argument("snapshot", help="Snapshot written by a sweep with --snapshot")
+    parser.add_argument("--weeks-threshold", type=int, action="append", default=[], metavar="WEEKS",
+                        help="Age threshold in weeks (may be repeated; defaults to the snapshot's)")
+    parser.add_argument("--unmerged-days", type=int, action="append", default=[], metavar="DAYS",
+                        help="Age in days after which unmerged branches are deleted (may be repeated)")
+    parser.add_argument("--policy", default="", metavar="PATH",
+                        help="Apply the rules of a policy file; the thresholds given are those of unmatched branches")
+    parser.add_argument("--protected", default="", help="Space-separated list of additional protected branches")
+    parser.add_argument("--at", default="", metavar="YYYY-MM-DD",
+                        help="Evaluate as of this date instead of the time the snapshot was taken")
+    parser.add_argument("--list", action="store_true", help="List the branches that would be deleted")
+    parser.add_argument("--json", action="store_true", help="Print every outcome as JSON")
+
+    args = parser.parse_args()
+
+    try:
+        header, branches = load_snapshot(args.snapshot)
+        now = int(datetime.strptime(args.at, "%Y-%m-%d").timestamp()) if args.at else header["created"]
+    except (OSError, ValueError) as e:
+        print(f"::error::Unable to read the snapshot: {e}")
+        return 1
+
+    metadata = header.get("metadata", {})
+    weeks_thresholds = args.weeks_threshold or [metadata.get("weeks_threshold", 2)]
+    unmerged_days = args.unmerged_days or [metadata.get("unmerged_days", 30)]
+    if min(weeks_thresholds) <= 0 or min(unmerged_days) <= 0:
+        print("::error::Thresholds must be positive numbers")
+        return 1
+
+    try:
+        policies = {(weeks, days): load_policy(args.policy, weeks, days) if args.policy else None
+                    for weeks, days in itertools.product(weeks_thresholds, unmerged_days)}
+    except ValueError as e:
+        print(f"::error::{e}")
+        return 1
+
+    started = time.perf_counter()
+    outcomes = [
+        (weeks, days, simulate(branches, weeks, days, now, args.protected.split(), policies[weeks, days]))
+        for weeks, days in policies
+    ]
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps([dict(outcome, weeks_threshold=weeks, unmerged_days=days)
+                          for weeks, days, outcome in outcomes], indent=2))
+        return 0
+
+    as_of = datetime.fromtimestamp(now).strftime('%Y-%m-%d')
+    print(f"Snapshot of {metadata.get('repo', 'unknown')}: {len(branches)} branches, evaluated as of {as_of}")
+    for weeks, days, outcome in outcomes:
+        print(f"weeks_threshold={weeks} unmerged_days={days}: {describe(outcome)}")
+        if args.list:
+            for reason, names in outcome["delete"].items():
+                print(f"  {reason}: {' '.join(names)}")
+    print(f"Simulated {len(outcomes)} parameter sets in {elapsed * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
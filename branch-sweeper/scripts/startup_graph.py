@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/startup_graph.py
+
+"""
+Dependency graph of the sweeper's start-up phases.
+
+Configuring git, taking the lease, fetching, discovering the default and
+protected branches and listing merged pull requests used to run one after
+another, although only a few of them depend on each other. Each phase now
+names the phases it needs; run() starts a phase as soon as those have
+finished, on a small thread pool, and returns once every phase is done. The
+start-up then takes as long as its critical path instead of the sum of its
+phases.
+
+- Failure: when a phase raises, the phases depending on it are skipped, the
+  others still run to completion, and run() re-raises the first error.
+- Timing: every phase is timed as a PhaseTimer span of its own name, and its
+  start and end offsets are kept so the critical path can be reported.
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from .timing import PhaseTimer
+except ImportError:
+    from timing import PhaseTimer
+
+
+class StartupGraph:
+    """Named phases with dependencies, each started as soon as its dependencies have finished."""
+
+    def __init__(self, timer: Optional[PhaseTimer] = None, max_workers: int = 4):
+        """Initialize an empty graph; timer receives one span per phase."""
+        self.timer = timer
+        self.max_workers = max(1, max_workers)
+        self.tasks: Dict[str, Tuple[Callable[[], object], Tuple[str, ...]]] = {}
+        self.results: Dict[str, object] = {}
+        self.spans: Dict[str, Tuple[float, float]] = {}
+        self.skipped: List[str] = []
+        # Name of the phase whose error run() re-raises
+        self.failed: Optional[str] = None
+        self.wall_seconds = 0.0
+        self._origin = 0.0
+
+    def add(self, name: str, func: Callable[[], object], after: Iterable[str] = ()) -> None:
+        """Add a phase that runs func once every phase named in after has finished."""
+        if name in self.tasks:
+            raise ValueError(f"Duplicate start-up phase '{name}'")
+        self.tasks[name] = (func, tuple(after))
+
+    def _validate(self) -> None:
+        """Reject unknown dependencies and dependency cycles."""
+        waiting = {}
+        for name, (_, after) in self.tasks.items():
+            for dependency in after:
+                if dependency not in self.tasks:
+                    raise ValueError(f"Start-up phase '{name}' depends on unknown phase '{dependency}'")
+            waiting[name] = set(after)
+
+        while waiting:
+            ready = [name for name, after in waiting.items() if not after]
+            if not ready:
+                raise ValueError(f"Start-up phases have a dependency cycle: {', '.join(sorted(waiting))}")
+            for name in ready:
+                del waiting[name]
+            for after in waiting.values():
+                after.difference_update(ready)
+
+    def _call(self, name: str) -> object:
+        """Run one phase inside its timing span."""
+        func, _ = self.tasks[name]
+        started = time.perf_counter() - self._origin
+        try:
+            with self.timer.phase(name) if self.timer else nullcontext():
+                return func()
+        finally:
+            self.spans[name] = (started, time.perf_counter() - self._origin)
+
+    def _skip_dependents(self, failed: str, waiting: Dict[str, Set[str]]) -> None:
+        """Drop every waiting phase that depends, directly or not, on a failed phase."""
+        failed_names = [failed]
+        while failed_names:
+            name = failed_names.pop()
+            for dependent in [dependent for dependent, after in waiting.items() if name in after]:
+                del waiting[dependent]
+                self.skipped.append(dependent)
+                failed_names.append(dependent)
+
+    def run(self) -> Dict[str, object]:
+        """Run every phase and return their results by name."""
+        self._validate()
+        self._origin = time.perf_counter()
+        waiting = {name: set(after) for name, (_, after) in self.tasks.items()}
+        running = {}
+        errors = []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="startup") as pool:
+            while True:
+                for name in [name for name, after in waiting.items() if not after]:
+                    del waiting[name]
+                    running[pool.submit(self._call, name)] = name
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        if not errors:
+                            self.failed = name
+                        errors.append(error)
+                        self._skip_dependents(name, waiting)
+                        continue
+                    self.results[name] = future.result()
+                    for after in waiting.values():
+                        after.discard(name)
+
+        self.wall_seconds = time.perf_counter() - self._origin
+        if errors:
+            raise errors[0]
+        return self.results
+
+    @property
+    def sequential_seconds(self) -> float:
+        """How long the finished phases would have taken one after another."""
+        return sum(end - start for start, end in self.spans.values())
+
+    def critical_path(self) -> List[str]:
+        """The chain of dependencies that ended last, in execution order."""
+        if not self.spans:
+            return []
+        name = max(self.spans, key=lambda phase: self.spans[phase][1])
+        path = [name]
+        while True:
+            finished = [dependency for dependency in self.tasks[name][1] if dependency in self.spans]
+            if not finished:
+                break
+            name = max(finished, key=lambda phase: self.spans[phase][1])
+            path.append(name)
+        return list(reversed(path))
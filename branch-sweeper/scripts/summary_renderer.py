@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/summary_renderer.py
+
+"""
+Size-bounded rendering of the branch cleanup summary.
+
+The summary posted to GITHUB_STEP_SUMMARY only contains counts, an age
+histogram and the N oldest branches of each category. The complete per-branch
+list is spilled to a compressed NDJSON artifact by a separate results sink, so
+the size of summary.md no longer grows with the number of branches.
+"""
+
+import heapq
+import itertools
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Category key -> section title, in display order
+CATEGORIES = [
+    ("deleted", "Deleted Branches"),
+    ("would_delete", "Would Be Deleted (Dry Run)"),
+    ("already_deleted", "Already Deleted Branches"),
+    ("delete_failed", "Failed Deletions"),
+    ("skipped", "Skipped Branches"),
+    ("stale_unmerged", "Stale Unmerged Branches"),
+    ("kept", "Kept Branches"),
+]
+
+# Actions that count towards the deleted_count output
+DELETED_ACTIONS = ("deleted", "would_delete", "already_deleted")
+
+# Histogram buckets as (label, upper bound in days)
+AGE_BUCKETS = [
+    ("< 1w", 7),
+    ("1-2w", 14),
+    ("2-4w", 28),
+    ("1-3mo", 90),
+    ("3-6mo", 180),
+    ("6-12mo", 365),
+    ("> 1y", None),
+]
+
+
+class SummaryAggregator:
+    """Results sink that keeps bounded statistics for the summary report."""
+
+    def __init__(self, top_n: int = 25, current_date: Optional[int] = None, details_path: str = ""):
+        """Initialize empty counters, histograms and top-N heaps."""
+        self.top_n = top_n
+        self.current_date = current_date or int(datetime.now().timestamp())
+        self.details_path = details_path
+        self.counts: Dict[str, int] = {}
+        self.histograms: Dict[str, List[int]] = {}
+        self.oldest: Dict[str, List[Tuple[int, int, str]]] = {}
+        self.oldest_date: Dict[str, int] = {}
+        self._sequence = itertools.count()
+
+    @staticmethod
+    def category_for(record: Dict) -> str:
+        """Return the summary category of a result record."""
+        if record["action"] == "kept" and record.get("reason") == "stale but unmerged":
+            return "stale_unmerged"
+        return record["action"]
+
+    def _age_bucket(self, commit_date: int) -> int:
+        """Return the histogram bucket index for a commit date."""
+        age_days = (self.current_date - commit_date) // 86400
+        for index, (_, limit) in enumerate(AGE_BUCKETS):
+            if limit is not None and age_days < limit:
+                return index
+        return len(AGE_BUCKETS) - 1
+
+    def write(self, record: Dict) -> None:
+        """Fold a single result record into the aggregate."""
+        category = self.category_for(record)
+        self.counts[category] = self.counts.get(category, 0) + 1
+
+        commit_date = record.get("commit_date")
+        if isinstance(commit_date, int):
+            histogram = self.histograms.setdefault(category, [0] * len(AGE_BUCKETS))
+            histogram[self._age_bucket(commit_date)] += 1
+            if commit_date < self.oldest_date.get(category, commit_date + 1):
+                self.oldest_date[category] = commit_date
+            sort_key = commit_date
+        else:
+            # Records without a date sort as the newest so they are dropped first
+            sort_key = self.current_date + 1
+
+        line = f"{record['branch']} ({record['reason']}"
+        if record.get("branch_age"):
+            line += f": {record['branch_age']}"
+        line += ")"
+
+        # Max-heap on commit date: the newest entry is evicted once the heap exceeds top_n
+        heap = self.oldest.setdefault(category, [])
+        heapq.heappush(heap, (-sort_key, next(self._sequence), line))
+        if len(heap) > self.top_n:
+            heapq.heappop(heap)
+
+    def flush(self) -> None:
+        """Nothing to flush; the aggregate lives in memory."""
+
+    def close(self, counts: Dict[str, int]) -> None:
+        """Nothing to close; rendering happens on demand."""
+
+    @property
+    def deleted_count(self) -> int:
+        """Number of branches deleted (or that would be deleted in a dry run)."""
+        return sum(self.counts.get(action, 0) for action in DELETED_ACTIONS)
+
+    @property
+    def total(self) -> int:
+        """Total number of branch decisions seen."""
+        return sum(self.counts.values())
+
+    def render_markdown(self) -> str:
+        """Render the overview, histogram and top-N sections as Markdown."""
+        lines = ["### Overview", "| Category | Branches | Oldest activity |", "|---|---:|---|"]
+        for key, title in CATEGORIES:
+            if key in self.counts:
+                oldest = self.oldest_date.get(key)
+                oldest_str = datetime.fromtimestamp(oldest).strftime("%Y-%m-%d") if oldest else "-"
+                lines.append(f"| {title} | {self.counts[key]} | {oldest_str} |")
+        if not self.counts:
+            lines.append("| No branches processed | 0 | - |")
+        lines.append("")
+
+        if self.histograms:
+            lines.append("### Age Distribution")
+            lines.append("| Category | " + " | ".join(label for label, _ in AGE_BUCKETS) + " |")
+            lines.append("|---|" + "---:|" * len(AGE_BUCKETS))
+            for key, title in CATEGORIES:
+                if key in self.histograms:
+                    lines.append(f"| {title} | " + " | ".join(str(n) for n in self.histograms[key]) + " |")
+            lines.append("")
+
+        if not self.deleted_count:
+            lines.extend(["### Deleted Branches", "- No branches deleted", ""])
+
+        for key, title in CATEGORIES:
+            count = self.counts.get(key, 0)
+            if not count:
+                continue
+
+            lines.append(f"### {title}")
+            entries = sorted(self.oldest[key], key=lambda item: (-item[0], item[1]))
+            shown = len(entries)
+            caption = f"{count} branches" if shown == count else f"{count} branches (showing the {shown} oldest)"
+            lines.append("<details>")
+            lines.append(f"<summary>{caption}</summary>")
+            lines.append("")
+            lines.extend(f"- {line}" for _, _, line in entries)
+            lines.append("")
+            lines.append("</details>")
+            lines.append("")
+
+        if self.details_path:
+            lines.append(f"Full per-branch details for all {self.total} branches: `{self.details_path}`")
+            lines.append("")
+
+        return "\n".join(lines)
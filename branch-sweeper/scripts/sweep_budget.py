@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/sweep_budget.py
+
+"""
+Time and deletion budgets for a sweep, and the order branches are evaluated in.
+
+With --time-budget or --max-deletions the sweeper evaluates branches from a
+priority heap instead of in listing order, so whatever fits in the budget is
+the work worth most:
+
+- protected branches first: they are skipped without any check;
+- then branches older than a month, oldest first: they are deleted whatever
+  the merge evidence says;
+- then stale branches, oldest first: they are deleted once they are merged;
+- recent branches last: they cannot be deleted in this run.
+
+With --policy the tiers of a branch follow the thresholds of the rule that
+applies to it, and branches a rule keeps come last.
+
+Once the budget is used up no new branch is evaluated; the rest is recorded
+as deferred to the next run. Unlike --deadline, the time budget does not cut
+commands short and deletions already queued are finished.
+"""
+
+import heapq
+from typing import Dict, Iterator, Optional, Set, Tuple, Union
+
+try:
+    from .deadline import RunDeadline
+except ImportError:
+    from deadline import RunDeadline
+
+# Reasons recorded for the branches left to the next run
+TIME_BUDGET_REASON = "time budget used up"
+DELETION_BUDGET_REASON = "deletion budget reached"
+BUDGET_REASONS = (TIME_BUDGET_REASON, DELETION_BUDGET_REASON)
+
+
+def branch_priority(
+    branch_name: str, commit_date: int, protected: Set[str], cutoff_date: int, month_cutoff_date: int
+) -> Tuple[int, int, str]:
+    """Heap key of a branch: cheapest decision and highest value first, oldest first within a tier."""
+    if branch_name in protected:
+        tier = 0
+    elif commit_date < month_cutoff_date:
+        tier = 1
+    elif commit_date < cutoff_date:
+        tier = 2
+    else:
+        tier = 3
+    return tier, commit_date, branch_name
+
+
+def prioritized(
+    branch_info: Dict[str, Dict[str, Union[str, int, bool]]],
+    protected: Set[str],
+    cutoff_date: int,
+    month_cutoff_date: int,
+    branch_cutoffs: Optional[Dict[str, Tuple[int, int]]] = None,
+) -> Iterator[str]:
+    """Yield branch names in priority order (heapified, so stopping early skips most of the sort).
+
+    branch_cutoffs holds the (cutoff, unmerged cutoff) of branches with thresholds of their own.
+    """
+    branch_cutoffs = branch_cutoffs or {}
+    heap = [branch_priority(name, int(info["commit_date"]), protected,
+                            *branch_cutoffs.get(name, (cutoff_date, month_cutoff_date)))
+            for name, info in branch_info.items()]
+    heapq.heapify(heap)
+    while heap:
+        yield heapq.heappop(heap)[-1]
+
+
+class SweepBudget:
+    """Soft limits on the evaluation time and the number of deletions of a run."""
+
+    def __init__(self, seconds: float = 0.0, max_deletions: int = 0):
+        """Configure the budget; 0 disables either limit."""
+        if seconds < 0:
+            raise ValueError("The time budget must not be negative")
+        if max_deletions < 0:
+            raise ValueError("The deletion budget must not be negative")
+        # The time budget is a deadline without a reserve, started with the run's deadline
+        self.deadline = RunDeadline(seconds, reserve=0.0)
+        self.max_deletions = max_deletions
+
+    @property
+    def seconds(self) -> float:
+        """The time budget, 0 without one."""
+        return self.deadline.seconds
+
+    @property
+    def enabled(self) -> bool:
+        """Whether either limit is set."""
+        return self.deadline.enabled or self.max_deletions > 0
+
+    def exhausted(self, deletions: int) -> str:
+        """Return why no further branch should be evaluated, or an empty string."""
+        if self.max_deletions and deletions >= self.max_deletions:
+            return DELETION_BUDGET_REASON
+        if self.deadline.expired():
+            return TIME_BUDGET_REASON
+        return ""
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/sweep_repositories.py
+
+"""
+Sweep many repositories in one run.
+
+Each repository is cloned into a shared workspace (see workspace.py), so
+forks and mirrors of one project reuse a single object store, and swept in
+its clone. Every repository's summary and summary details are written to the
+output directory, named after the repository, before its clone is removed.
+
+Repositories are given as owner/repo, or owner/repo=owner/upstream to name
+the project family instead of looking it up through the GitHub API. A
+repository that fails is reported and the run moves on to the next one.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+try:
+    from .branch_sweeper import BranchSweeper
+    from .lease_lock import LEASE_MODES
+    from .merge_index import MERGE_ENGINES
+    from .workspace import DEFAULT_URL_TEMPLATE, PRUNE_INTERVAL, WorkspaceManager, repository_key
+except ImportError:
+    from branch_sweeper import BranchSweeper
+    from lease_lock import LEASE_MODES
+    from merge_index import MERGE_ENGINES
+    from workspace import DEFAULT_URL_TEMPLATE, PRUNE_INTERVAL, WorkspaceManager, repository_key
+
+
+def parse_repository(spec: str) -> Tuple[str, str]:
+    """Split owner/repo[=family] into (repo, family)."""
+    repo, _, family = spec.partition("=")
+    if repo.count("/") != 1 or (family and family.count("/") != 1):
+        raise ValueError(f"Invalid repository '{spec}' (expected owner/repo or owner/repo=owner/upstream)")
+    return repo, family
+
+
+def _sweep_repository(spec: str, workspace: WorkspaceManager, output: Path, sweeper_options: Dict) -> Tuple[str, bool]:
+    """Sweep one repository in its workspace clone; return its outcome and whether it succeeded."""
+    repo, family = parse_repository(spec)
+    clone = workspace.checkout(repo, family)
+    if clone is None:
+        return "clone failed", False
+
+    key = repository_key(repo)
+    cwd = os.getcwd()
+    os.chdir(clone)
+    try:
+        sweeper = BranchSweeper(
+            repo=repo,
+            summary_details=str(output / f"{key}.summary-details.ndjson.gz"),
+            **sweeper_options,
+        )
+        exit_code = sweeper.run()
+        if os.path.exists("summary.md"):
+            shutil.move("summary.md", str(output / f"{key}.summary.md"))
+    finally:
+        os.chdir(cwd)
+        workspace.release(repo)
+
+    if exit_code != 0:
+        return f"exit code {exit_code}", False
+    return f"deleted {sweeper.deleted_count}", True
+
+
+def sweep_repositories(
+    specs: List[str],
+    workspace: WorkspaceManager,
+    output_dir: str,
+    **sweeper_options,
+) -> int:
+    """Sweep every repository in its workspace clone, going on after failures; return 1 if any of them failed."""
+    output = Path(output_dir).resolve()
+    output.mkdir(parents=True, exist_ok=True)
+    outcomes: Dict[str, str] = {}
+    failed = False
+
+    for spec in specs:
+        repo = spec.partition("=")[0]
+        print(f"\n=== {repo} ===")
+        try:
+            outcomes[repo], succeeded = _sweep_repository(spec, workspace, output, sweeper_options)
+        except Exception as e:
+            print(f"::error::Sweeping {repo} failed: {e}")
+            outcomes[repo], succeeded = f"failed: {e}", False
+        failed = failed or not succeeded
+
+    print("\nRepositories swept:")
+    for repo, outcome in outcomes.items():
+        print(f"- {repo}: {outcome}")
+    return 1 if failed else 0
+
+
+def main():
+    """Parse command-line arguments and sweep the repositories."""
+    parser = argparse.ArgumentParser(description="Clean up stale branches in many GitHub repositories")
+    parser.add_argument("dry_run", help="Run in dry-run mode (no actual deletions)")
+    parser.add_argument("weeks_threshold", help="Age threshold in weeks")
+    parser.add_argument("repositories", nargs="+", metavar="OWNER/REPO[=OWNER/UPSTREAM]",
+                        help="Repositories to sweep, optionally with the project family they belong to")
+    parser.add_argument("--workspace", default="",
+                        help="Directory keeping the shared object stores between runs (temporary if empty)")
+    parser.add_argument("--url-template", default=DEFAULT_URL_TEMPLATE,
+                        help="Clone URL of a repository, with {repo} replaced by owner/repo")
+    parser.add_argument("--output-dir", default="sweep-results",
+                        help="Directory receiving each repository's summary and summary details")
+    parser.add_argument("--prune-days", type=float, default=PRUNE_INTERVAL / 86400,
+                        help="Days between prunes of the unreachable objects in the workspace stores (0 never prunes)")
+    parser.add_argument("--discover-protected", action="store_true",
+                        help="Also protect the branches the GitHub API lists as protected (looked up during start-up)")
+    parser.add_argument("--merge-engine", choices=MERGE_ENGINES, default="reference",
+                        help="Merge detection engine: per-branch commands or one batched index per run")
+    parser.add_argument("--lease", choices=LEASE_MODES, default="off",
+                        help="Hold a lease on refs/janitor/lock; exit or wait when another sweep holds it")
+
+    args = parser.parse_args()
+
+    dry_run = args.dry_run.lower() == "true"
+    try:
+        weeks_threshold = int(args.weeks_threshold)
+        if weeks_threshold <= 0:
+            print("::error::weeks_threshold must be a positive number")
+            return 1
+    except ValueError:
+        print("::error::weeks_threshold must be a positive number")
+        return 1
+
+    try:
+        for spec in args.repositories:
+            parse_repository(spec)
+    except ValueError as e:
+        print(f"::error::{e}")
+        return 1
+
+    verbose = os.environ.get("DEBUG") == "true"
+    with WorkspaceManager(args.workspace, args.url_template, verbose=verbose,
+                          prune_interval=args.prune_days * 86400) as workspace:
+        return sweep_repositories(
+            args.repositories,
+            workspace,
+            args.output_dir,
+            dry_run=dry_run,
+            weeks_threshold=weeks_threshold,
+            verbose=verbose,
+            protected_lookup=args.discover_protected,
+            merge_engine=args.merge_engine,
+            lease=args.lease,
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
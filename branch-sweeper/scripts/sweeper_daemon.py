@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/sweeper_daemon.py
+
+"""
+Webhook-driven incremental branch sweeping.
+
+Instead of scanning every branch on a schedule, the daemon listens for GitHub
+webhooks on a local HTTP port and only evaluates the branches they mention:
+
+- pull_request (closed): the head branch is evaluated with the normal policy.
+- push: a pushed branch is re-evaluated (new commits move its deadline), a
+  deleted branch loses its timer.
+- delete: the deleted branch loses its timer.
+
+A branch that is kept gets a timer for the moment it crosses its threshold.
+Timers live in a JSON file so they survive restarts; when one fires the branch
+is fetched and evaluated again, so the policy decides with fresh data. A full
+sweep still runs periodically as a safety net and rebuilds all timers; it also
+starts a fresh evaluation sweeper, so protection and rulesets are looked up
+again and the per-branch results of the webhook evaluations do not pile up.
+
+Payloads must be signed with the webhook secret unless unsigned deliveries
+are explicitly allowed.
+
+All git work happens on a single worker thread; the HTTP handlers only verify
+and queue events.
+"""
+
+import argparse
+import hashlib
+import heapq
+import hmac
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from .branch_policy import load_policy
+    from .branch_sweeper import BranchSweeper
+    from .merge_index import MERGE_ENGINES
+except ImportError:
+    from branch_policy import load_policy
+    from branch_sweeper import BranchSweeper
+    from merge_index import MERGE_ENGINES
+
+# Delay before retrying a branch whose evaluation could not fetch it
+RETRY_DELAY = 300
+
+# Largest accepted webhook body (GitHub caps payloads at 25 MB)
+MAX_BODY_SIZE = 25 * 1024 * 1024
+
+
+def verify_signature(secret: str, body: bytes, signature: str) -> bool:
+    """Check an X-Hub-Signature-256 header against the webhook secret."""
+    expected = "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature or "")
+
+
+def parse_webhook(event: str, payload: Dict, repo: str = "") -> List[Tuple[str, str]]:
+    """Translate a webhook payload into ("evaluate" | "cancel", branch) work items."""
+    full_name = (payload.get("repository") or {}).get("full_name", "")
+    if repo and full_name and full_name.lower() != repo.lower():
+        return []
+
+    if event == "pull_request":
+        if payload.get("action") != "closed":
+            return []
+        head = (payload.get("pull_request") or {}).get("head") or {}
+        head_repo = (head.get("repo") or {}).get("full_name", "")
+        # Branches of forks are not ours to delete
+        if not head.get("ref") or (repo and head_repo.lower() != repo.lower()):
+            return []
+        return [("evaluate", head["ref"])]
+
+    if event == "push":
+        ref = payload.get("ref", "")
+        if not ref.startswith("refs/heads/"):
+            return []
+        branch = ref[len("refs/heads/"):]
+        return [("cancel" if payload.get("deleted") else "evaluate", branch)]
+
+    if event == "delete":
+        if payload.get("ref_type") != "branch" or not payload.get("ref"):
+            return []
+        return [("cancel", payload["ref"])]
+
+    return []
+
+
+class TimerQueue:
+    """Deletion deadlines per branch, persisted to a JSON file."""
+
+    def __init__(self, path: str):
+        """Load the timers stored at path, if any."""
+        self.path = path
+        self.timers: Dict[str, int] = {}
+        self._heap: List[Tuple[int, str]] = []
+        self._lock = threading.Lock()
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.timers)
+
+    def load(self) -> None:
+        """Read the timers file; a missing or unreadable file starts an empty queue."""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            timers = {str(branch): int(due) for branch, due in data.get("timers", {}).items()}
+        except FileNotFoundError:
+            timers = {}
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"::warning::Ignoring unreadable timer file {self.path}: {e}")
+            timers = {}
+        with self._lock:
+            self.timers = timers
+            self._heap = [(due, branch) for branch, due in timers.items()]
+            heapq.heapify(self._heap)
+
+    def save(self) -> None:
+        """Write the timers atomically."""
+        with self._lock:
+            data = {"version": 1, "timers": dict(sorted(self.timers.items()))}
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+    def schedule(self, branch: str, due: int) -> None:
+        """Set or move the deadline of a branch."""
+        with self._lock:
+            self.timers[branch] = due
+            heapq.heappush(self._heap, (due, branch))
+        self.save()
+
+    def cancel(self, branch: str) -> bool:
+        """Drop the timer of a branch; return whether it had one."""
+        with self._lock:
+            existed = self.timers.pop(branch, None) is not None
+        if existed:
+            self.save()
+        return existed
+
+    def replace(self, timers: Dict[str, int]) -> None:
+        """Replace every timer, e.g. with the deadlines found by a full sweep."""
+        with self._lock:
+            self.timers = dict(timers)
+            self._heap = [(due, branch) for branch, due in self.timers.items()]
+            heapq.heapify(self._heap)
+        self.save()
+
+    def next_due(self) -> Optional[int]:
+        """Return the earliest deadline, or None when the queue is empty."""
+        with self._lock:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> List[str]:
+        """Remove and return the branches whose deadline has passed."""
+        due_branches = []
+        with self._lock:
+            self._drop_stale()
+            while self._heap and self._heap[0][0] <= now:
+                _, branch = heapq.heappop(self._heap)
+                del self.timers[branch]
+                due_branches.append(branch)
+                self._drop_stale()
+        if due_branches:
+            self.save()
+        return due_branches
+
+    def _drop_stale(self) -> None:
+        """Discard heap entries of cancelled or rescheduled timers (lock held)."""
+        while self._heap and self.timers.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """Accept GitHub webhooks and queue the affected branches."""
+
+    def do_POST(self):
+        daemon = self.server.daemon
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0 or length > MAX_BODY_SIZE:
+            self._reply(413, {"message": "Payload too large"})
+            return
+        body = self.rfile.read(length)
+
+        if daemon.secret and not verify_signature(daemon.secret, body, self.headers.get("X-Hub-Signature-256", "")):
+            self._reply(401, {"message": "Invalid signature"})
+            return
+
+        event = self.headers.get("X-GitHub-Event", "")
+        try:
+            payload = json.loads(body.decode("utf-8")) if body else {}
+        except ValueError:
+            self._reply(400, {"message": "Invalid JSON"})
+            return
+
+        items = parse_webhook(event, payload if isinstance(payload, dict) else {}, daemon.repo)
+        for action, branch in items:
+            daemon.submit(action, branch)
+        self._reply(202, {"queued": [branch for _, branch in items]})
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("", "/healthz"):
+            self._reply(200, self.server.daemon.status())
+        else:
+            self._reply(404, {"message": "Not Found"})
+
+    def _reply(self, status: int, body: Dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.daemon.verbose:
+            print(f"DEBUG: webhook {self.address_string()} {format % args}")
+
+
+class SweeperDaemon:
+    """Long-running sweeper that reacts to webhooks and fires persisted deletion timers."""
+
+    def __init__(
+        self,
+        sweeper_factory: Callable[[], BranchSweeper],
+        queue_path: str = "sweeper-timers.json",
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        secret: str = "",
+        repo: str = "",
+        reconcile_interval: float = 24 * 3600,
+        reconcile_on_start: bool = True,
+        verbose: bool = False,
+        allow_unsigned: bool = False,
+    ):
+        """Configure the daemon; sweeper_factory returns a fresh BranchSweeper for each full sweep."""
+        if not secret and not allow_unsigned:
+            raise ValueError("A webhook secret is required to verify payload signatures "
+                             "(allow unsigned payloads explicitly to run without one)")
+        self.sweeper_factory = sweeper_factory
+        self.timers = TimerQueue(queue_path)
+        self.secret = secret
+        self.allow_unsigned = allow_unsigned
+        self.repo = repo
+        self.reconcile_interval = reconcile_interval
+        self.verbose = verbose
+        self.next_reconcile = time.time() if reconcile_on_start else time.time() + reconcile_interval
+        self.last_reconcile: Optional[float] = None
+        self.evaluations = 0
+
+        self.events: "queue.Queue[Tuple[str, str]]" = queue.Queue()
+        self.server = ThreadingHTTPServer((host, port), WebhookHandler)
+        self.server.daemon = self
+        self.sweeper: Optional[BranchSweeper] = None
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def url(self) -> str:
+        """Base URL of the webhook listener."""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def status(self) -> Dict:
+        """Return the state reported by GET /healthz."""
+        return {
+            "timers": len(self.timers),
+            "next_due": self.timers.next_due(),
+            "pending_events": self.events.qsize(),
+            "evaluations": self.evaluations,
+            "last_reconcile": self.last_reconcile,
+            "next_reconcile": self.next_reconcile,
+        }
+
+    def submit(self, action: str, branch: str) -> None:
+        """Queue a work item for the worker thread."""
+        self.events.put((action, branch))
+
+    def start(self) -> None:
+        """Start the HTTP listener and the worker thread."""
+        if not self.secret:
+            print("::warning::Unsigned webhooks allowed, payload signatures are not verified")
+        for target in (self.server.serve_forever, self._worker):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"Listening for webhooks on {self.url} ({len(self.timers)} timers loaded)")
+
+    def stop(self) -> None:
+        """Stop accepting webhooks, let the worker finish its current item and wait for it."""
+        self.server.shutdown()
+        self.server.server_close()
+        self.submit("stop", "")
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def serve_forever(self) -> int:
+        """Run until SIGINT or SIGTERM."""
+        stopped = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+        signal.signal(signal.SIGINT, lambda *_: stopped.set())
+        self.start()
+        while not stopped.wait(1.0):
+            pass
+        print("Shutting down...")
+        self.stop()
+        return 0
+
+    def _worker(self) -> None:
+        """Process queued webhooks, due timers and periodic full sweeps."""
+        while True:
+            wake_at = self.next_reconcile
+            next_due = self.timers.next_due()
+            if next_due is not None:
+                wake_at = min(wake_at, next_due)
+
+            try:
+                action, branch = self.events.get(timeout=min(max(wake_at - time.time(), 0.0), 60.0))
+            except queue.Empty:
+                action, branch = "", ""
+
+            if action == "stop":
+                return
+            try:
+                if action == "cancel":
+                    if self.timers.cancel(branch):
+                        print(f"Branch {branch} was deleted, timer cancelled")
+                elif action == "evaluate":
+                    self.evaluate(branch)
+
+                for due_branch in self.timers.pop_due(time.time()):
+                    print(f"Timer fired for branch {due_branch}")
+                    self.evaluate(due_branch)
+
+                if time.time() >= self.next_reconcile:
+                    self.reconcile()
+            except Exception as e:
+                print(f"::error::Sweeper daemon failed to process {action or 'timers'} {branch}: {e}")
+
+    def evaluate(self, branch: str) -> None:
+        """Fetch one branch and the protected branches, then apply the deletion policy to it."""
+        if self.sweeper is None:
+            self.sweeper = self.sweeper_factory()
+            self.sweeper._resolve_default_branch()
+            self.sweeper._discover_protected_branches()
+        sweeper = self.sweeper
+        sweeper._refresh_cutoffs()
+        self.evaluations += 1
+
+        if branch in sweeper.protected_branches:
+            self.timers.cancel(branch)
+            return
+
+        if not sweeper._branch_exists(branch):
+            sweeper._run_command(["git", "update-ref", "-d", f"refs/remotes/origin/{branch}"])
+            if self.timers.cancel(branch):
+                print(f"Branch {branch} no longer exists, timer cancelled")
+            return
+
+        refspecs = [
+            f"+refs/heads/{name}:refs/remotes/origin/{name}" for name in [branch] + sorted(sweeper.branches_to_check)
+        ]
+        result = sweeper._run_command(["git", "fetch", "origin"] + refspecs)
+        if result.returncode != 0:
+            print(f"::warning::Unable to fetch {branch}, retrying in {RETRY_DELAY}s: {result.stderr.strip()}")
+            self.timers.schedule(branch, int(time.time()) + RETRY_DELAY)
+            return
+
+        info = sweeper._get_branch_info([branch]).get(branch)
+        if not info:
+            self.timers.cancel(branch)
+            return
+
+        due_date = sweeper._evaluate_branch(branch, info)
+        if due_date is None:
+            self.timers.cancel(branch)
+        else:
+            due_date = max(due_date, int(time.time()) + 1)
+            self.timers.schedule(branch, due_date)
+            print(f"Branch {branch} scheduled for {time.strftime('%Y-%m-%d %H:%M', time.localtime(due_date))}")
+
+    def reconcile(self) -> None:
+        """Run a full sweep and rebuild the timers from its results."""
+        print("Running full reconcile sweep")
+        # The next evaluation starts over with fresh protection and empty results
+        self.sweeper = None
+        sweeper = self.sweeper_factory()
+        sweeper.run()
+        self.timers.replace(sweeper.due_dates)
+        self.last_reconcile = time.time()
+        self.next_reconcile = self.last_reconcile + self.reconcile_interval
+        print(f"Reconcile finished, {len(self.timers)} timers scheduled")
+
+
+def main(argv: Optional[List[str]] = None):
+    """Parse command-line arguments (sys.argv without argv) and run the sweeper daemon."""
+    parser = argparse.ArgumentParser(description="Sweep branches incrementally from GitHub webhooks")
+    parser.add_argument("dry_run", help="Run in dry-run mode (no actual deletions)")
+    parser.add_argument("weeks_threshold", help="Age threshold in weeks")
+    parser.add_argument("default_branch", help="Default branch name")
+    parser.add_argument("protected_branches", help="Space-separated list of protected branches")
+    parser.add_argument("repo", help="Repository name (owner/repo)")
+    parser.add_argument("--host", default="127.0.0.1", help="Address the webhook listener binds to")
+    parser.add_argument("--port", type=int, default=8080, help="Port of the webhook listener")
+    parser.add_argument("--secret", default=os.environ.get("SWEEPER_WEBHOOK_SECRET", ""),
+                        help="Webhook secret used to verify X-Hub-Signature-256")
+    parser.add_argument("--allow-unsigned", action="store_true",
+                        help="Accept webhooks without a signature when no secret is configured")
+    parser.add_argument("--discover-protected", action="store_true",
+                        help="Also protect the branches the GitHub API lists as protected or covered by rulesets "
+                             "(looked up again after every reconcile sweep)")
+    parser.add_argument("--protection-cache", default="", metavar="PATH",
+                        help="Cache the --discover-protected responses and revalidate them with ETags")
+    parser.add_argument("--timer-file", default="sweeper-timers.json", help="File persisting the deletion timers")
+    parser.add_argument("--reconcile-hours", type=float, default=24.0, help="Hours between full reconcile sweeps")
+    parser.add_argument("--merge-engine", choices=MERGE_ENGINES, default="reference",
+                        help="Merge detection engine of the full reconcile sweeps")
+    parser.add_argument("--unmerged-days", type=int, default=30, metavar="DAYS",
+                        help="Age in days after which unmerged branches are deleted")
+    parser.add_argument("--policy", default="", metavar="PATH",
+                        help="JSON file of ordered branch rules with their own thresholds (see branch_policy.py)")
+
+    args = parser.parse_args(argv)
+
+    dry_run = args.dry_run.lower() == "true"
+    try:
+        weeks_threshold = int(args.weeks_threshold)
+        if weeks_threshold <= 0:
+            print("::error::weeks_threshold must be a positive number")
+            return 1
+    except ValueError:
+        print("::error::weeks_threshold must be a positive number")
+        return 1
+    if args.unmerged_days <= 0:
+        print("::error::--unmerged-days must be a positive number")
+        return 1
+    if args.policy:
+        try:
+            load_policy(args.policy, weeks_threshold, args.unmerged_days)
+        except ValueError as e:
+            print(f"::error::{e}")
+            return 1
+
+    def sweeper_factory() -> BranchSweeper:
+        return BranchSweeper(
+            dry_run=dry_run,
+            weeks_threshold=weeks_threshold,
+            default_branch=args.default_branch,
+            protected_branches=args.protected_branches,
+            repo=args.repo,
+            verbose=os.environ.get("DEBUG") == "true",
+            summary_details="",
+            merge_engine=args.merge_engine,
+            unmerged_days=args.unmerged_days,
+            policy=args.policy,
+            protected_lookup=args.discover_protected,
+            protection_cache=args.protection_cache,
+        )
+
+    try:
+        daemon = SweeperDaemon(
+            sweeper_factory,
+            queue_path=args.timer_file,
+            host=args.host,
+            port=args.port,
+            secret=args.secret,
+            repo=args.repo,
+            reconcile_interval=args.reconcile_hours * 3600,
+            verbose=os.environ.get("DEBUG") == "true",
+            allow_unsigned=args.allow_unsigned,
+        )
+    except ValueError as e:
+        print(f"::error::{e}")
+        return 1
+    return daemon.serve_forever()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/timing.py
+
+"""
+Phase-level timing spans and an opt-in profiler for the branch sweeper.
+
+PhaseTimer records wall time, CPU time and call/item counts per named phase.
+RunProfiler wraps a run with cProfile and a wall-clock stack sampler, writing
+a .pstats file and a collapsed-stack file that flame graph tools can read.
+"""
+
+import cProfile
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+def render_table(header: List[str], rows: List[List[str]]) -> str:
+    """Render rows as a fixed-width console table; the first column is left-aligned, the rest right-aligned."""
+    widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+    lines = ["  ".join(cell.ljust(widths[i]) if i == 0 else cell.rjust(widths[i])
+                       for i, cell in enumerate(row))
+             for row in [header] + rows]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+
+def render_markdown_table(title: str, summary: str, header: List[str], rows: List[List[str]]) -> str:
+    """Render rows as a collapsible Markdown table under a heading, numeric columns right-aligned."""
+    lines = [
+        f"### {title}",
+        "<details>",
+        f"<summary>{summary}</summary>",
+        "",
+        "| " + " | ".join(header) + " |",
+        "|---|" + "---:|" * (len(header) - 1),
+    ]
+    lines.extend("| " + " | ".join(row) + " |" for row in rows)
+    lines.extend(["", "</details>", ""])
+    return "\n".join(lines)
+
+
+PHASE_HEADER = ["Phase", "Wall (s)", "CPU (s)", "Calls", "Items"]
+
+
+class PhaseTimer:
+    """Accumulate wall time, CPU time and counts for named phases."""
+
+    def __init__(self, observer: Optional[Callable[[str, float], None]] = None):
+        """Initialize an empty set of phases; observer receives (phase, wall seconds) per call."""
+        self.observer = observer
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self._order: List[str] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _entry(self, name: str) -> Dict[str, float]:
+        """Return the accumulator for a phase, creating it if needed."""
+        entry = self.phases.get(name)
+        if entry is None:
+            entry = {"wall": 0.0, "cpu": 0.0, "calls": 0, "items": 0}
+            self.phases[name] = entry
+            self._order.append(name)
+        return entry
+
+    @property
+    def current_phase(self) -> str:
+        """Name of the innermost phase active on the calling thread."""
+        stack = getattr(self._local, "stack", None)
+        return stack[-1] if stack else ""
+
+    @contextmanager
+    def phase(self, name: str, items: int = 0) -> Iterator[None]:
+        """Time a block of code as one call of the named phase."""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(name)
+
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            stack.pop()
+            with self._lock:
+                entry = self._entry(name)
+                entry["wall"] += wall
+                entry["cpu"] += cpu
+                entry["calls"] += 1
+                entry["items"] += items
+            if self.observer:
+                self.observer(name, wall)
+
+    def count(self, name: str, items: int = 1) -> None:
+        """Add to the item count of a phase without timing anything."""
+        with self._lock:
+            self._entry(name)["items"] += items
+
+    def _rows(self) -> List[List[str]]:
+        """Return formatted table rows in the order phases were first seen."""
+        rows = []
+        for name in self._order:
+            entry = self.phases[name]
+            rows.append([
+                name,
+                f"{entry['wall']:.3f}",
+                f"{entry['cpu']:.3f}",
+                str(entry["calls"]),
+                str(entry["items"]),
+            ])
+        return rows
+
+    def render_table(self) -> str:
+        """Render the phase timings as a fixed-width console table."""
+        return render_table(PHASE_HEADER, self._rows())
+
+    def render_markdown(self) -> str:
+        """Render the phase timings as a collapsible Markdown table."""
+        return render_markdown_table("Timing", "Per-phase wall and CPU time", PHASE_HEADER, self._rows())
+
+
+class RunProfiler:
+    """Profile a run with cProfile plus a wall-clock sampler for flame graphs."""
+
+    def __init__(self, output_prefix: str, interval: float = 0.005):
+        """Initialize the profiler; output files are written on stop()."""
+        self.output_prefix = output_prefix
+        self.interval = interval
+        self.profile = cProfile.Profile()
+        self.stacks: Counter = Counter()
+        self._previous_handler = None
+        self._sampling = hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        """Return a compact module:function label for a stack frame."""
+        module = frame.f_globals.get("__name__", "?")
+        return f"{module}:{frame.f_code.co_name}"
+
+    def _sample(self, signum, frame) -> None:
+        """Record the current stack of every thread as one sample."""
+        for thread_id, thread_frame in sys._current_frames().items():
+            labels = []
+            while thread_frame is not None:
+                labels.append(self._frame_label(thread_frame))
+                thread_frame = thread_frame.f_back
+            if thread_id == threading.main_thread().ident:
+                labels = labels[1:]  # Drop the sampler's own frame
+            if labels:
+                thread_name = "main" if thread_id == threading.main_thread().ident else f"thread-{thread_id}"
+                self.stacks[";".join([thread_name] + labels[::-1])] += 1
+
+    def start(self) -> None:
+        """Start collecting profile data."""
+        if self._sampling:
+            self._previous_handler = signal.signal(signal.SIGALRM, self._sample)
+            signal.setitimer(signal.ITIMER_REAL, self.interval, self.interval)
+        else:
+            print("::warning::Stack sampling is unavailable on this platform; only pstats will be written")
+        self.profile.enable()
+
+    def stop(self) -> List[str]:
+        """Stop profiling, write the output files and return their paths."""
+        self.profile.disable()
+        if self._sampling:
+            signal.setitimer(signal.ITIMER_REAL, 0, 0)
+            signal.signal(signal.SIGALRM, self._previous_handler or signal.SIG_DFL)
+
+        written = []
+        pstats_path = f"{self.output_prefix}.pstats"
+        self.profile.dump_stats(pstats_path)
+        written.append(pstats_path)
+
+        if self._sampling:
+            collapsed_path = f"{self.output_prefix}.collapsed"
+            with open(collapsed_path, "w") as f:
+                for stack, samples in self.stacks.most_common():
+                    f.write(f"{stack} {samples}\n")
+            written.append(collapsed_path)
+
+        return written
+
+    def __enter__(self) -> "RunProfiler":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        for path in self.stop():
+            print(f"Profile data written to {path}")
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/scripts/workspace.py
+
+"""
+Workspace of clones for sweeping many repositories in one run.
+
+Forks and mirrors of one upstream share almost all of their objects, so
+cloning each of them in full transfers and stores the same history again and
+again. The workspace keeps one bare reference store per project family and
+attaches every clone of the family to it through objects/info/alternates
+(`git clone --reference`):
+
+- Before a repository is cloned, its branches are fetched into the store
+  under refs/members/<owner>/<repo>/heads/. Only the objects no other member
+  brought in are transferred, and these refs keep every object a clone
+  borrows reachable.
+- The clone itself then only fetches refs; its objects live in the store.
+- Clones are removed as soon as their sweep is done (release) and at the end
+  of the run (close). Stores are kept for the next run unless the workspace
+  is a temporary directory, which is removed whole.
+
+A MirrorCache replaces the full checkout of a single-repository run: a bare,
+blob-less mirror kept in a cache directory (a CI cache or a runner volume)
+and refreshed with a ref-only fetch before each sweep.
+
+Persistent stores and mirrors lose refs with every deleted branch but never
+the objects behind them: stores disable gc pruning while clones borrow from
+them, and git keeps every object of a mirror's promisor packs. Both are
+cleaned up on a schedule instead (every PRUNE_INTERVAL seconds by default):
+a store is pruned when the run closes the workspace and no clone is attached,
+and a mirror is rebuilt from scratch by its next refresh.
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+try:
+    from .github_api import APIError, GitHubAPI
+except ImportError:
+    from github_api import APIError, GitHubAPI
+
+DEFAULT_URL_TEMPLATE = "https://github.com/{repo}.git"
+
+# Namespace of the member branches kept in a reference store
+MEMBER_REFS = "refs/members"
+
+# Mirror caches only hold commits and trees; no sweeper command reads a blob
+MIRROR_FILTER = "blob:none"
+
+# Seconds between scheduled prunes of a persistent store or mirror (0 disables them)
+PRUNE_INTERVAL = 7 * 86400
+
+# Config key recording when a store or mirror was last pruned
+LAST_PRUNE_KEY = "sweeper.lastPrune"
+
+
+def repository_key(repo: str) -> str:
+    """File-system name of a repository or family (owner/repo -> owner__repo)."""
+    return repo.replace("/", "__")
+
+
+def _default_run_command() -> Callable[[List[str]], subprocess.CompletedProcess]:
+    """The shared command runner of the scripts."""
+    try:
+        from .github_auth import run_command
+    except ImportError:
+        from github_auth import run_command
+    return run_command
+
+
+def prune_due(
+    run_command: Callable[[List[str]], subprocess.CompletedProcess],
+    git_dir: Path,
+    interval: float = PRUNE_INTERVAL,
+) -> bool:
+    """Whether a repository was last pruned more than interval seconds ago."""
+    if interval <= 0:
+        return False
+    result = run_command(["git", "--git-dir", str(git_dir), "config", "--get", LAST_PRUNE_KEY])
+    last_prune = int(result.stdout.strip()) if result.returncode == 0 and result.stdout.strip().isdigit() else 0
+    return time.time() - last_prune >= interval
+
+
+def prune_if_due(
+    run_command: Callable[[List[str]], subprocess.CompletedProcess],
+    git_dir: Path,
+    interval: float = PRUNE_INTERVAL,
+) -> bool:
+    """Drop the unreachable objects of a repository if its prune is due; return whether it ran."""
+    if not prune_due(run_command, git_dir, interval):
+        return False
+    git = ["git", "--git-dir", str(git_dir)]
+    result = run_command(git + ["gc", "--quiet", "--prune=now"])
+    if result.returncode != 0:
+        print(f"::warning::Unable to prune {git_dir}: {result.stderr.strip()}")
+        return False
+    run_command(git + ["config", LAST_PRUNE_KEY, str(int(time.time()))])
+    print(f"Pruned unreachable objects from {git_dir}")
+    return True
+
+
+class WorkspaceManager:
+    """Clones of many repositories sharing one object store per project family."""
+
+    def __init__(
+        self,
+        root: str = "",
+        url_template: str = DEFAULT_URL_TEMPLATE,
+        run_command: Optional[Callable[[List[str]], subprocess.CompletedProcess]] = None,
+        verbose: bool = False,
+        prune_interval: float = PRUNE_INTERVAL,
+    ):
+        """Use root as a persistent workspace, or a temporary directory removed by close()."""
+        self.temporary = not root
+        self.root = Path(root or tempfile.mkdtemp(prefix="sweeper-workspace-")).resolve()
+        self.stores_dir = self.root / "stores"
+        self.clones_dir = self.root / "clones"
+        self.url_template = url_template
+        self.verbose = verbose
+        self.prune_interval = prune_interval
+        self.clones: Dict[str, Path] = {}
+        self.run_command = run_command or _default_run_command()
+
+    def repository_url(self, repo: str) -> str:
+        """Clone URL of a repository."""
+        return self.url_template.format(repo=repo)
+
+    def family_of(self, repo: str) -> str:
+        """The upstream a fork was created from, or the repository itself."""
+        try:
+            return GitHubAPI(repo, run_command=self.run_command).source_repository()
+        except APIError as e:
+            if self.verbose:
+                print(f"DEBUG: Unable to look up the upstream of {repo}: {e}")
+            return repo
+
+    def store_path(self, family: str) -> Path:
+        """Path of the bare reference store of a family."""
+        return self.stores_dir / f"{repository_key(family)}.git"
+
+    def _ensure_store(self, family: str) -> Path:
+        """Create the reference store of a family if it does not exist yet."""
+        store = self.store_path(family)
+        if not store.exists():
+            self.stores_dir.mkdir(parents=True, exist_ok=True)
+            self.run_command(["git", "init", "-q", "--bare", str(store)])
+            # Clones borrow objects the store alone cannot see; never let gc prune any
+            self.run_command(["git", "--git-dir", str(store), "config", "gc.pruneExpire", "never"])
+            # A new store has nothing to prune until the next scheduled prune
+            self.run_command(["git", "--git-dir", str(store), "config", LAST_PRUNE_KEY, str(int(time.time()))])
+        return store
+
+    def _update_store(self, store: Path, repo: str) -> bool:
+        """Fetch a member's branches, and only the objects the store lacks, into the store."""
+        refspec = f"+refs/heads/*:{MEMBER_REFS}/{repo}/heads/*"
+        result = self.run_command(
+            ["git", "--git-dir", str(store), "fetch", "--quiet", "--no-tags", "--prune",
+             self.repository_url(repo), refspec]
+        )
+        if result.returncode != 0:
+            print(f"::warning::Unable to update the reference store for {repo}: {result.stderr.strip()}")
+        return result.returncode == 0
+
+    def checkout(self, repo: str, family: str = "") -> Optional[Path]:
+        """Clone a repository against its family's reference store; return the clone or None."""
+        family = family or self.family_of(repo)
+        store = self._ensure_store(family)
+        self._update_store(store, repo)
+
+        clone = self.clones_dir / repository_key(repo)
+        if clone.exists():
+            # Left over from an interrupted run
+            shutil.rmtree(clone)
+        self.clones_dir.mkdir(parents=True, exist_ok=True)
+
+        result = self.run_command(
+            ["git", "clone", "--quiet", "--no-checkout", "--reference-if-able", str(store),
+             self.repository_url(repo), str(clone)]
+        )
+        if result.returncode != 0:
+            print(f"::error::Unable to clone {repo}: {result.stderr.strip()}")
+            shutil.rmtree(clone, ignore_errors=True)
+            return None
+
+        self.clones[repo] = clone
+        if self.verbose:
+            print(f"DEBUG: Cloned {repo} into {clone} (objects from {store})")
+        return clone
+
+    def release(self, repo: str) -> None:
+        """Remove the clone of a repository."""
+        clone = self.clones.pop(repo, None)
+        if clone is not None:
+            shutil.rmtree(clone, ignore_errors=True)
+
+    def close(self) -> None:
+        """Remove every clone, then the whole workspace if it is temporary or prune the stores that are due."""
+        for repo in list(self.clones):
+            self.release(repo)
+        if self.temporary:
+            shutil.rmtree(self.root, ignore_errors=True)
+        elif self.stores_dir.is_dir():
+            # No clone borrows from the stores any more, so unreachable objects can go
+            for store in sorted(self.stores_dir.glob("*.git")):
+                prune_if_due(self.run_command, store, self.prune_interval)
+
+    def __enter__(self) -> "WorkspaceManager":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class MirrorCache:
+    """
+    Bare, blob-less mirror of one repository kept in a cache directory between runs.
+
+    Remote branches live under refs/remotes/origin/ exactly as in a checkout,
+    so the sweeper runs against the mirror unchanged (with GIT_DIR pointing at
+    it), and its own fetches and deletions keep the mirror current.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        repo: str,
+        url_template: str = DEFAULT_URL_TEMPLATE,
+        run_command: Optional[Callable[[List[str]], subprocess.CompletedProcess]] = None,
+        prune_interval: float = PRUNE_INTERVAL,
+    ):
+        """Configure the mirror of repo inside cache_dir."""
+        self.path = Path(cache_dir).resolve() / f"{repository_key(repo)}.git"
+        self.url = url_template.format(repo=repo)
+        self.run_command = run_command or _default_run_command()
+        self.prune_interval = prune_interval
+        self.bytes_fetched = 0
+        self.built = False
+        self.rebuilt = False
+        self.expired = False
+
+    @property
+    def outcome(self) -> str:
+        """How the refresh found the cache: hit, miss (nothing cached), rebuild (corrupt) or expired (scheduled)."""
+        if self.rebuilt:
+            return "rebuild"
+        if self.expired:
+            return "expired"
+        return "miss" if self.built else "hit"
+
+    def _git(self, args: List[str]) -> subprocess.CompletedProcess:
+        """Run a git command against the mirror."""
+        return self.run_command(["git", "--git-dir", str(self.path)] + args)
+
+    def object_bytes(self) -> int:
+        """Bytes of packed and loose objects stored in the mirror."""
+        total = 0
+        for directory, _, files in os.walk(self.path / "objects"):
+            if os.path.basename(directory) != "info":
+                total += sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+        return total
+
+    def intact(self) -> bool:
+        """Whether the mirror is a readable repository of the right remote with all commits and trees."""
+        result = self._git(["config", "--get", "remote.origin.url"])
+        if result.returncode != 0 or result.stdout.strip() != self.url:
+            return False
+        # Blobs are promised by the remote; every commit and tree must be present
+        return self._git(["fsck", "--connectivity-only", "--no-progress", "--no-dangling"]).returncode == 0
+
+    def _create(self) -> bool:
+        """Initialize an empty mirror whose fetches leave out blobs."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        for args in (
+            ["init", "-q", "--bare"],
+            ["remote", "add", "origin", self.url],
+            ["config", "remote.origin.promisor", "true"],
+            ["config", "remote.origin.partialclonefilter", MIRROR_FILTER],
+            ["config", LAST_PRUNE_KEY, str(int(time.time()))],
+        ):
+            result = self._git(args)
+            if result.returncode != 0:
+                print(f"::error::Unable to create the mirror cache at {self.path}: {result.stderr.strip()}")
+                return False
+        return True
+
+    def _discard(self, reason: str) -> None:
+        """Remove a mirror that cannot be used, so the next refresh rebuilds it."""
+        print(f"::warning::Rebuilding the mirror cache at {self.path}: {reason}")
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.rebuilt = True
+
+    def refresh(self) -> Optional[Path]:
+        """Bring the mirror up to date, rebuilding it if it is corrupt; return its path or None."""
+        if self.path.exists() and not self.intact():
+            self._discard("the cached repository is corrupt or belongs to another remote")
+        elif self.path.exists() and prune_due(self.run_command, self.path, self.prune_interval):
+            # gc never drops promisor objects, so only a rebuild sheds those of deleted branches
+            print(f"Rebuilding the mirror cache at {self.path} to drop the objects of deleted branches")
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.expired = True
+
+        created = not self.path.exists()
+        if created and not self._create():
+            shutil.rmtree(self.path, ignore_errors=True)
+            return None
+
+        before = self.object_bytes()
+        result = self._git(["fetch", "--quiet", "--prune", "--no-tags", "origin"])
+        if result.returncode != 0 and not created and not self.intact():
+            # The fetch tripped over damage the integrity check did not see first
+            self._discard(result.stderr.strip())
+            return self.refresh()
+        if result.returncode != 0:
+            print(f"::error::Unable to refresh the mirror cache from {self.url}: {result.stderr.strip()}")
+            if created:
+                shutil.rmtree(self.path, ignore_errors=True)
+            return None
+
+        self.bytes_fetched = max(0, self.object_bytes() - before)
+        self.built = self.built or created
+        print(f"Mirror cache {'built' if created else 'refreshed'} at {self.path}: "
+              f"{self.bytes_fetched} bytes fetched")
+        return self.path
+
+
+def use_mirror_cache(cache_dir: str, repo: str, url_template: str = DEFAULT_URL_TEMPLATE) -> Optional[MirrorCache]:
+    """Refresh the mirror of repo and point every following git command at it (GIT_DIR)."""
+    mirror = MirrorCache(cache_dir, repo, url_template)
+    path = mirror.refresh()
+    if path is None:
+        return None
+    os.environ["GIT_DIR"] = str(path)
+
+    github_output = os.environ.get("GITHUB_OUTPUT")
+    if github_output:
+        with open(github_output, "a") as f:
+            f.write(f"bytes_fetched={mirror.bytes_fetched}\n")
+    return mirror
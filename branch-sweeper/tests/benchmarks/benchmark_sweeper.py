@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/benchmarks/benchmark_sweeper.py
+
+"""
+Scaling benchmark for the branch sweeper.
+
+For every requested size a synthetic repository with a local bare file://
+origin is built, and the real non-test-mode path (_process_branches and
+_delete_branch) is run end to end in a separate process so that peak RSS is
+measured per point. With --api, pull requests are looked up against the local
+GitHub API stand-in with injectable latency and rate limits. Wall time, subprocess count and peak RSS are reported as
+scaling curves and saved to JSON, tagged with the commit under test, so runs
+can be compared across commits with --compare.
+"""
+
+import argparse
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Add the tests and scripts directories to the Python path
+tests_dir = Path(__file__).parent.parent
+sys.path.append(str(tests_dir))
+sys.path.append(str(tests_dir.parent / "scripts"))
+
+from github_api_standin import start_standin  # noqa: E402
+from synthetic_repository import build_repository, random_spec  # noqa: E402
+
+REPO = "benchmark/synthetic"
+
+
+class TerminalColors:
+    """Terminal colors for better output readability."""
+    GREEN = '\033[0;32m'
+    YELLOW = '\033[1;33m'
+    RED = '\033[0;31m'
+    BLUE = '\033[0;34m'
+    NC = '\033[0m'  # No Color
+
+
+def current_commit() -> str:
+    """Return the commit of the code under test, or "unknown" outside a git checkout."""
+    result = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"], cwd=tests_dir, capture_output=True, text=True, check=False
+    )
+    return result.stdout.strip() if result.returncode == 0 else "unknown"
+
+
+def run_point(work: Path, protected: List[str], dry_run: bool, report_path: Path, merge_engine: str) -> None:
+    """Run the sweeper once inside a prepared clone and write the measurements (child process)."""
+    from branch_sweeper import BranchSweeper
+
+    os.chdir(work)
+    sweeper = BranchSweeper(
+        dry_run=dry_run,
+        weeks_threshold=2,
+        default_branch="main",
+        protected_branches=" ".join(protected),
+        repo=REPO,
+        summary_details="",
+        trace_output=str(report_path.with_suffix(".trace.json")),
+        # Pull requests are only looked up when a local API stand-in is running
+        pull_request_lookup=bool(os.environ.get("SWEEPER_API_URL")),
+        merge_engine=merge_engine,
+    )
+
+    started = time.perf_counter()
+    exit_code = sweeper.run()
+    wall = time.perf_counter() - started
+
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    report = {
+        "exit_code": exit_code,
+        "wall_seconds": wall,
+        "subprocess_calls": sweeper.tracer.call_count,
+        "calls_by_command": {key: len(values) for key, values in sweeper.tracer.durations.items()},
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        "phases": sweeper.timer.phases,
+        "decisions": sweeper.summary.counts,
+    }
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def measure(size: int, args: argparse.Namespace, root: Path) -> Optional[Dict]:
+    """Build the fixture for one size and benchmark it in a child process."""
+    spec = random_spec(size, args.protected, args.merged, args.squashed, args.max_age_days, args.depth, args.seed)
+    point_dir = root / f"n{size}"
+
+    print(f"{TerminalColors.BLUE}Building {size} branches...{TerminalColors.NC}")
+    started = time.perf_counter()
+    paths = build_repository(spec, point_dir)
+    build_seconds = time.perf_counter() - started
+
+    # The sweeper writes a global git identity, so give the child its own HOME
+    env = os.environ.copy()
+    env["HOME"] = str(point_dir)
+    env.pop("GITHUB_OUTPUT", None)
+    env.pop("GITHUB_TEST_MODE", None)
+    env.pop("DEBUG", None)
+    env.pop("SWEEPER_API_URL", None)
+
+    server = None
+    if args.api:
+        server = start_standin(spec, REPO, origin=paths["origin"], latency=args.api_latency_ms / 1000.0,
+                               rate_limit=args.api_rate_limit)
+        env["SWEEPER_API_URL"] = server.url
+
+    report_path = point_dir / "report.json"
+    cmd = [
+        sys.executable, str(Path(__file__).resolve()), "--child", str(paths["work"]),
+        "--child-report", str(report_path), "--child-protected", " ".join(spec.protected_with_default),
+        "--merge-engine", args.merge_engine,
+    ]
+    if args.dry_run:
+        cmd.append("--dry-run")
+
+    print(f"{TerminalColors.BLUE}Sweeping {size} branches...{TerminalColors.NC}")
+    try:
+        with open(point_dir / "sweeper.log", "w") as log:
+            result = subprocess.run(cmd, env=env, stdout=log, stderr=subprocess.STDOUT, check=False)
+    finally:
+        if server:
+            server.shutdown()
+    if result.returncode != 0 or not report_path.exists():
+        print(f"{TerminalColors.RED}Benchmark run failed for {size} branches, see {point_dir / 'sweeper.log'}"
+              f"{TerminalColors.NC}")
+        return None
+
+    with open(report_path) as f:
+        report = json.load(f)
+    report["branches"] = size
+    report["build_seconds"] = build_seconds
+    report["api_requests"] = server.state.request_count if server else 0
+    return report
+
+
+def scaling_exponent(points: List[Dict], index: int, key: str) -> str:
+    """Return the log-log slope of a metric between a point and its predecessor."""
+    if index == 0:
+        return "-"
+    previous, current = points[index - 1], points[index]
+    if previous[key] <= 0 or current[key] <= 0 or previous["branches"] == current["branches"]:
+        return "-"
+    slope = math.log(current[key] / previous[key]) / math.log(current["branches"] / previous["branches"])
+    return f"{slope:.2f}"
+
+
+def render_table(header: List[str], rows: List[List[str]]) -> str:
+    """Render a fixed-width console table."""
+    widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+    lines = ["  ".join(cell.rjust(widths[i]) for i, cell in enumerate(row)) for row in [header] + rows]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+
+def print_curves(points: List[Dict]) -> None:
+    """Print time, subprocess count and peak RSS against the number of branches."""
+    header = ["Branches", "Build (s)", "Run (s)", "Time exp", "Calls", "Calls/branch", "Calls exp",
+              "API requests", "Peak RSS (MB)"]
+    rows = []
+    for index, point in enumerate(points):
+        rows.append([
+            str(point["branches"]),
+            f"{point['build_seconds']:.2f}",
+            f"{point['wall_seconds']:.2f}",
+            scaling_exponent(points, index, "wall_seconds"),
+            str(point["subprocess_calls"]),
+            f"{point['subprocess_calls'] / point['branches']:.1f}",
+            scaling_exponent(points, index, "subprocess_calls"),
+            str(point.get("api_requests", 0)),
+            f"{point['peak_rss_bytes'] / 2 ** 20:.1f}",
+        ])
+    print(render_table(header, rows))
+
+
+def print_comparison(baseline: Dict, current: Dict) -> None:
+    """Print a point-by-point comparison against an earlier results file."""
+    previous = {point["branches"]: point for point in baseline.get("points", [])}
+    header = ["Branches", "Run (s) old", "Run (s) new", "Ratio", "Calls old", "Calls new", "RSS old", "RSS new"]
+    rows = []
+    for point in current["points"]:
+        old = previous.get(point["branches"])
+        if not old:
+            continue
+        ratio = point["wall_seconds"] / old["wall_seconds"] if old["wall_seconds"] else 0.0
+        rows.append([
+            str(point["branches"]),
+            f"{old['wall_seconds']:.2f}",
+            f"{point['wall_seconds']:.2f}",
+            f"{ratio:.2f}x",
+            str(old["subprocess_calls"]),
+            str(point["subprocess_calls"]),
+            f"{old['peak_rss_bytes'] / 2 ** 20:.1f}",
+            f"{point['peak_rss_bytes'] / 2 ** 20:.1f}",
+        ])
+
+    print(f"\nComparison: {baseline.get('commit', 'unknown')} -> {current['commit']}")
+    if rows:
+        print(render_table(header, rows))
+    else:
+        print(f"{TerminalColors.YELLOW}No common sizes to compare{TerminalColors.NC}")
+
+
+def main():
+    """Run the scaling benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark the branch sweeper on synthetic repositories")
+    parser.add_argument("--sizes", default="100,1000",
+                        help="Comma-separated branch counts to benchmark (e.g. 100,1000,10000,50000)")
+    parser.add_argument("--protected", type=int, default=2, help="Number of protected branches (including main)")
+    parser.add_argument("--merged", type=float, default=0.4, help="Fraction of merged branches")
+    parser.add_argument("--squashed", type=float, default=0.1, help="Fraction of squash-merged branches")
+    parser.add_argument("--max-age-days", type=int, default=365, help="Maximum branch age in days")
+    parser.add_argument("--depth", type=int, default=1, help="Commits per branch")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the fixtures")
+    parser.add_argument("--dry-run", action="store_true", help="Benchmark a dry run instead of real deletions")
+    parser.add_argument("--api", action="store_true",
+                        help="Look up pull requests against a local GitHub API stand-in")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="Latency of the API stand-in")
+    parser.add_argument("--api-rate-limit", type=int, default=0,
+                        help="Requests per minute allowed by the API stand-in (0 for unlimited)")
+    parser.add_argument("--merge-engine", choices=["reference", "batched"], default="reference",
+                        help="Merge detection engine to benchmark")
+    parser.add_argument("--workdir", default="", help="Directory for the fixtures (default: a temporary directory)")
+    parser.add_argument("--output", default="benchmark-results.json", help="File receiving the results")
+    parser.add_argument("--compare", default="", metavar="RESULTS", help="Earlier results file to compare against")
+    # Internal: run a single measurement inside a fixture clone
+    parser.add_argument("--child", default="", help=argparse.SUPPRESS)
+    parser.add_argument("--child-report", default="", help=argparse.SUPPRESS)
+    parser.add_argument("--child-protected", default="", help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.child:
+        run_point(Path(args.child), args.child_protected.split(), args.dry_run, Path(args.child_report), args.merge_engine)
+        return 0
+
+    try:
+        sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    except ValueError:
+        print(f"{TerminalColors.RED}--sizes must be a comma-separated list of integers{TerminalColors.NC}")
+        return 1
+
+    root = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="sweeper-bench-"))
+    results = {
+        "commit": current_commit(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "parameters": {
+            "protected": args.protected,
+            "merged": args.merged,
+            "squashed": args.squashed,
+            "max_age_days": args.max_age_days,
+            "depth": args.depth,
+            "seed": args.seed,
+            "dry_run": args.dry_run,
+            "merge_engine": args.merge_engine,
+            "api": args.api,
+            "api_latency_ms": args.api_latency_ms,
+            "api_rate_limit": args.api_rate_limit,
+        },
+        "points": [],
+    }
+
+    for size in sorted(sizes):
+        point = measure(size, args, root)
+        if point is None:
+            return 1
+        results["points"].append(point)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\n{TerminalColors.GREEN}Scaling curves for commit {results['commit']}{TerminalColors.NC}")
+    print_curves(results["points"])
+    print(f"\nResults written to {args.output} (fixtures in {root})")
+
+    if args.compare:
+        try:
+            with open(args.compare) as f:
+                baseline = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"{TerminalColors.RED}Unable to read {args.compare}: {e}{TerminalColors.NC}")
+            return 1
+        print_comparison(baseline, results)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,19 +3,20 @@
 
 import argparse
 import os
+import shutil
 import subprocess
 import sys
-import time
-from datetime import datetime, timedelta
 from pathlib import Path
 
 # Add parent directories to sys.path
 script_dir = Path(__file__).parent
 project_root = script_dir.parent.parent.parent
 sys.path.append(str(project_root / "branch-sweeper" / "scripts"))
+sys.path.append(str(project_root / "branch-sweeper" / "tests"))
 
-# Import GitHub authentication helper
+# Import GitHub authentication helper and the repository fixtures
 import github_auth
+from synthetic_repository import build_local_repository, scenario_spec
 
 
 def log(message):
@@ -23,11 +24,12 @@ def log(message):
     print(f"[INFO] {message}")
 
 
-def run_command(cmd, capture_output=True):
+def run_command(cmd, capture_output=True, cwd=None):
     """Run a command and return the result."""
     try:
         result = subprocess.run(
             cmd,
+            cwd=cwd,
             capture_output=capture_output,
             text=True,
             check=False
@@ -51,28 +53,19 @@ def delete_github_test_repo(repo_name, repo_owner):
     return result.returncode == 0
 
 
-def calculate_dates():
-    """Calculate dates for test branches."""
-    current_date = int(time.time())
-    print(f"Current timestamp: {current_date} ({datetime.fromtimestamp(current_date).strftime('%Y-%m-%d')})")
-    
-    seconds_per_day = 86400
-    seconds_per_week = seconds_per_day * 7
-    
-    # Calculate dates in the past
-    dates = {
-        "WEEKS_10_AGO": datetime.fromtimestamp(current_date - seconds_per_week * 10).strftime("%Y-%m-%d"),
-        "WEEKS_8_AGO": datetime.fromtimestamp(current_date - seconds_per_week * 8).strftime("%Y-%m-%d"),
-        "WEEKS_6_AGO": datetime.fromtimestamp(current_date - seconds_per_week * 6).strftime("%Y-%m-%d"),
-        "WEEKS_5_AGO": datetime.fromtimestamp(current_date - seconds_per_week * 5).strftime("%Y-%m-%d"),
-        "DAYS_2_AGO": datetime.fromtimestamp(current_date - seconds_per_day * 2).strftime("%Y-%m-%d"),
-    }
-    
-    print("Date calculations:")
-    for name, date in dates.items():
-        print(f"  {name}: {date}")
-        
-    return dates
+def github_scenario_spec(repo_owner):
+    """The TestRepositorySetup scenarios as pushed to GitHub: PR merges come from the owner's fork."""
+    spec = scenario_spec()
+    for branch in spec.branches:
+        if branch.name == "bugfix-recent":
+            branch.age_days = 2
+        if branch.kind == "pr_merged":
+            branch.merge_message = f"Merge pull request #{branch.pr_number} from {repo_owner}/{branch.name}"
+
+    print("Test branches:")
+    for branch in spec.branches:
+        print(f"  {branch.name}: {branch.kind}, {branch.age_days} days old")
+    return spec
 
 
 def verify_github_permissions(repo_owner):
@@ -153,14 +146,13 @@ def create_github_repository(repo_name, repo_owner):
     return True
 
 
-def clone_and_setup_repository(repo_name, repo_owner, dates):
-    """Clone and set up the repository with test branches."""
+def clone_and_setup_repository(repo_name, repo_owner, spec):
+    """Clone the repository, build the test branches with one fast-import stream and push them."""
     full_repo_name = f"{repo_owner}/{repo_name}"
     
     # Create a temporary directory for cloning
     temp_dir = Path("/tmp/repo-janitor-test")
     if temp_dir.exists():
-        import shutil
         shutil.rmtree(temp_dir)
     temp_dir.mkdir(parents=True)
     
@@ -172,74 +164,19 @@ def clone_and_setup_repository(repo_name, repo_owner, dates):
         print("Error cloning repository")
         return False
     
-    # Set up Git identity
-    run_command(["git", "config", "--global", "user.name", "GitHub Test Bot"], capture_output=False)
-    run_command(["git", "config", "--global", "user.email", "test-bot@github.com"], capture_output=False)
-    
-    # Create initial commit
-    with open(temp_dir / "README.md", "w") as f:
-        f.write("# Test Repository\n\nThis is a test repository for branch-sweeper.\n")
-    
-    run_command(["git", "add", "README.md"], cwd=temp_dir, capture_output=False)
-    run_command(["git", "commit", "-m", "Initial commit"], cwd=temp_dir, capture_output=False)
-    
-    # Create main branch
-    run_command(["git", "branch", "-M", "main"], cwd=temp_dir, capture_output=False)
-    
-    # Push to remote
-    run_command(["git", "push", "-u", "origin", "main"], cwd=temp_dir, capture_output=False)
-    
-    # Create protected branches
-    for branch in ["develop", "production"]:
-        run_command(["git", "checkout", "-b", branch], cwd=temp_dir, capture_output=False)
-        with open(temp_dir / f"{branch.upper()}.md", "w") as f:
-            f.write(f"# {branch.capitalize()} Branch\n\nThis is the {branch} branch.\n")
-        run_command(["git", "add", f"{branch.upper()}.md"], cwd=temp_dir, capture_output=False)
-        run_command(["git", "commit", "-m", f"Add {branch} documentation"], cwd=temp_dir, capture_output=False)
-        run_command(["git", "push", "-u", "origin", branch], cwd=temp_dir, capture_output=False)
-        run_command(["git", "checkout", "main"], cwd=temp_dir, capture_output=False)
-    
-    # Create test branches with specific dates
-    
-    # Helper function to create a branch with a specific date
-    def create_branch(name, date, merge=False, pr_merge=False):
-        run_command(["git", "checkout", "-b", name], cwd=temp_dir, capture_output=False)
-        with open(temp_dir / f"{name}.md", "w") as f:
-            f.write(f"# {name}\n\nThis is the {name} branch.\n")
-        run_command(["git", "add", f"{name}.md"], cwd=temp_dir, capture_output=False)
-        
-        # Use environment variables to set the commit date
-        env = os.environ.copy()
-        env["GIT_COMMITTER_DATE"] = date
-        env["GIT_AUTHOR_DATE"] = date
-        
-        subprocess.run(
-            ["git", "commit", "-m", f"Add {name}", "--date", date],
-            cwd=temp_dir,
-            env=env,
-            check=True
-        )
-        
-        run_command(["git", "push", "-u", "origin", name], cwd=temp_dir, capture_output=False)
-        
-        if merge or pr_merge:
-            run_command(["git", "checkout", "main"], cwd=temp_dir, capture_output=False)
-            if pr_merge:
-                run_command(["git", "merge", "--no-ff", name, "-m", f"Merge pull request #123 from {repo_owner}/{name}"], 
-                           cwd=temp_dir, capture_output=False)
-            else:
-                run_command(["git", "merge", "--no-ff", name, "-m", f"Merge branch '{name}'"], 
-                           cwd=temp_dir, capture_output=False)
-            run_command(["git", "push", "origin", "main"], cwd=temp_dir, capture_output=False)
+    # Create every commit and branch of the scenario in the (empty) clone
+    try:
+        build_local_repository(spec, temp_dir)
+    except (RuntimeError, subprocess.CalledProcessError) as e:
+        print(f"Error building test branches: {e}")
+        return False
     
-    # Create various branches with different dates
-    create_branch("feature-old-merged", dates["WEEKS_6_AGO"], merge=True)
-    create_branch("feature-ancient-unmerged", dates["WEEKS_10_AGO"])
-    create_branch("feature-pr-merged", dates["WEEKS_5_AGO"], pr_merge=True)
-    create_branch("feature-recent", dates["DAYS_2_AGO"])
-    create_branch("feature-unmerged-stale", dates["WEEKS_8_AGO"])
-    create_branch("bugfix-old-merged", dates["WEEKS_6_AGO"], merge=True)
-    create_branch("bugfix-recent", dates["DAYS_2_AGO"])
+    # Push main first so it becomes the default branch, then every other branch
+    for push in (["git", "push", "-u", "origin", "main"], ["git", "push", "-u", "origin", "--all"]):
+        push_result = run_command(push, cwd=temp_dir, capture_output=False)
+        if push_result.returncode != 0:
+            print(f"Error pushing test branches: {' '.join(push)}")
+            return False
     
     # Set protected branches
     for branch in ["main", "develop", "production"]:
@@ -284,11 +221,11 @@ def main():
         print("Error: GitHub authentication failed")
         return 1
     
-    # Calculate dates for branches
+    # Describe the test branches
     print("-------------------------------------------------------")
-    print("STEP: Calculating dates for test branches")
+    print("STEP: Describing test branches")
     print("-------------------------------------------------------")
-    dates = calculate_dates()
+    spec = github_scenario_spec(repo_owner)
     
     # Create GitHub repository
     print("-------------------------------------------------------")
@@ -301,7 +238,7 @@ def main():
     print("-------------------------------------------------------")
     print("STEP: Setting up repository with test branches")
     print("-------------------------------------------------------")
-    if not clone_and_setup_repository(repo_name, repo_owner, dates):
+    if not clone_and_setup_repository(repo_name, repo_owner, spec):
         return 1
     
     print("-------------------------------------------------------")
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/github_api_standin.py
+
+"""
+Local HTTP stand-in for the GitHub API endpoints used by the branch sweeper.
+
+Serves branches, pulls, rulesets, app installations and git refs for one
+repository seeded from a synthetic RepositorySpec. Latency and rate limits can be injected so the real API code
+paths can be tested and benchmarked with realistic round-trip costs and no
+network. Point the sweeper at it with SWEEPER_API_URL.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from synthetic_repository import SECONDS_PER_DAY, RepositorySpec, random_spec, scenario_spec
+
+# Merge kinds that correspond to a merged pull request on GitHub
+PULL_REQUEST_KINDS = ("pr_merged", "squashed")
+
+
+def _iso(timestamp: int) -> str:
+    """Format a Unix timestamp the way the GitHub API does."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class StandinState:
+    """Repository data served by the stand-in, plus request accounting."""
+
+    def __init__(self, spec: RepositorySpec, repo: str = "owner/repo", origin: Optional[Path] = None,
+                 latency: float = 0.0, rate_limit: int = 0, rate_window: float = 60.0):
+        """Seed branches and pull requests from a spec."""
+        self.repo = repo
+        self.owner = repo.split("/")[0]
+        self.origin = origin
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.lock = threading.Lock()
+        self.requests: Dict[str, int] = {}
+        self.rate_limited = 0
+        self.window_start = time.time()
+        self.window_count = 0
+        self.tokens_issued = 0
+
+        shas = self._origin_shas()
+        protected = set(spec.protected_with_default)
+        names = spec.protected_with_default + [branch.name for branch in spec.branches]
+        self.branches: Dict[str, Dict] = {
+            name: {
+                "name": name,
+                "protected": name in protected,
+                "commit": {"sha": shas.get(name) or hashlib.sha1(name.encode("utf-8")).hexdigest()},
+            }
+            for name in names
+        }
+
+        self.rulesets: List[Dict] = []
+        self.pulls: List[Dict] = []
+        for branch in spec.branches:
+            if branch.kind not in PULL_REQUEST_KINDS:
+                continue
+            self.add_pull(branch.pr_number, branch.name, spec.now - branch.age_days * SECONDS_PER_DAY + 60,
+                          target=branch.target)
+
+    def add_pull(self, number: int, head: str, merged_at: int, target: str = "main",
+                 updated_at: Optional[int] = None) -> Dict:
+        """Add a merged pull request of a head branch (updated when it was merged unless given)."""
+        branch = self.branches.get(head)
+        pull = {
+            "number": number,
+            "title": f"Add {head} feature",
+            "state": "closed",
+            "merged_at": _iso(merged_at),
+            "closed_at": _iso(merged_at),
+            "updated_at": _iso(updated_at or merged_at),
+            "merge_commit_sha": hashlib.sha1(f"merge-{number}".encode("utf-8")).hexdigest(),
+            "head": {"ref": head, "label": f"{self.owner}:{head}",
+                     "sha": branch["commit"]["sha"] if branch else hashlib.sha1(head.encode("utf-8")).hexdigest()},
+            "base": {"ref": target},
+        }
+        with self.lock:
+            self.pulls.append(pull)
+        return pull
+
+    def add_ruleset(self, name: str, include: List[str], exclude: Optional[List[str]] = None,
+                    rules: Tuple[str, ...] = ("deletion",), enforcement: str = "active", target: str = "branch",
+                    source_type: str = "Repository") -> Dict:
+        """Add a ruleset whose ref_name condition includes and excludes the given patterns."""
+        ruleset = {
+            "id": len(self.rulesets) + 1,
+            "name": name,
+            "target": target,
+            "source_type": source_type,
+            "source": self.owner if source_type == "Organization" else self.repo,
+            "enforcement": enforcement,
+            "conditions": {"ref_name": {"include": list(include), "exclude": list(exclude or [])}},
+            "rules": [{"type": rule} for rule in rules],
+        }
+        with self.lock:
+            self.rulesets.append(ruleset)
+        return ruleset
+
+    def _origin_shas(self) -> Dict[str, str]:
+        """Read the branch tips of the seeded origin repository, if there is one."""
+        if not self.origin:
+            return {}
+        result = subprocess.run(
+            ["git", "for-each-ref", "--format=%(refname:short) %(objectname)", "refs/heads/"],
+            cwd=self.origin, capture_output=True, text=True, check=False,
+        )
+        return dict(line.split(" ", 1) for line in result.stdout.splitlines() if " " in line)
+
+    def admit(self) -> Tuple[bool, Dict[str, str]]:
+        """Account for one request against the rate limit and return (allowed, rate limit headers)."""
+        with self.lock:
+            now = time.time()
+            if now - self.window_start >= self.rate_window:
+                self.window_start = now
+                self.window_count = 0
+            reset = self.window_start + self.rate_window
+            headers = {"X-RateLimit-Reset": str(int(math.ceil(reset)))}
+            if not self.rate_limit:
+                return True, headers
+
+            headers["X-RateLimit-Limit"] = str(self.rate_limit)
+            if self.window_count >= self.rate_limit:
+                self.rate_limited += 1
+                headers["X-RateLimit-Remaining"] = "0"
+                headers["Retry-After"] = str(max(1, int(math.ceil(reset - now))))
+                return False, headers
+            self.window_count += 1
+            headers["X-RateLimit-Remaining"] = str(self.rate_limit - self.window_count)
+            return True, headers
+
+    def count(self, route: str) -> None:
+        """Count a request by route."""
+        with self.lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+
+    @property
+    def request_count(self) -> int:
+        """Total number of requests served."""
+        return sum(self.requests.values())
+
+    def delete_branch(self, name: str) -> bool:
+        """Delete a branch (and its ref in the seeded origin)."""
+        with self.lock:
+            if name not in self.branches:
+                return False
+            del self.branches[name]
+        if self.origin:
+            subprocess.run(["git", "update-ref", "-d", f"refs/heads/{name}"], cwd=self.origin, check=False)
+        return True
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """Route GitHub API requests to the stand-in state."""
+
+    server_version = "GitHubAPIStandin/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self) -> StandinState:
+        return self.server.state
+
+    def log_message(self, format, *args) -> None:
+        """Keep the console quiet; requests are counted in the state instead."""
+
+    def _send(self, status: int, body: object = None, headers: Optional[Dict[str, str]] = None) -> None:
+        """Send a JSON response (with an ETag) honouring If-None-Match."""
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        headers = dict(headers or {})
+        if status == 200 and payload:
+            etag = '"' + hashlib.sha1(payload).hexdigest() + '"'
+            headers["ETag"] = etag
+            if self.headers.get("If-None-Match") == etag:
+                status, payload = 304, b""
+
+        self.send_response(status)
+        if payload:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _paginate(self, items: List, query: Dict[str, str], headers: Dict[str, str]) -> List:
+        """Slice a list by page/per_page and add a Link header for the other pages."""
+        per_page = max(1, min(100, int(query.get("per_page", "30"))))
+        page = max(1, int(query.get("page", "1")))
+        last = max(1, math.ceil(len(items) / per_page))
+
+        base = f"http://{self.headers.get('Host')}{urllib.parse.urlsplit(self.path).path}"
+        links = []
+        for rel, number in (("next", page + 1), ("last", last)):
+            if rel == "next" and page >= last:
+                continue
+            params = dict(query, page=str(number), per_page=str(per_page))
+            links.append(f'<{base}?{urllib.parse.urlencode(params)}>; rel="{rel}"')
+        if links:
+            headers["Link"] = ", ".join(links)
+        return items[(page - 1) * per_page:page * per_page]
+
+    def _handle(self, method: str) -> None:
+        """Apply latency and rate limits, then dispatch the request."""
+        if self.state.latency:
+            time.sleep(self.state.latency)
+
+        split = urllib.parse.urlsplit(self.path)
+        path = urllib.parse.unquote(split.path).strip("/")
+        query = dict(urllib.parse.parse_qsl(split.query))
+        # No endpoint reads the request body, but it must be consumed
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        allowed, headers = self.state.admit()
+        if not allowed:
+            self._send(403, {"message": "API rate limit exceeded"}, headers)
+            return
+
+        repo_prefix = f"repos/{self.state.repo}/"
+        if path.startswith(repo_prefix):
+            route, status, response = self._repository(method, path[len(repo_prefix):], query, headers)
+        elif path == "app/installations" and method == "GET":
+            route, status, response = "app/installations", 200, [{"id": 1, "account": {"login": self.state.owner}}]
+        elif path.startswith("app/installations/") and path.endswith("/access_tokens") and method == "POST":
+            route, status, response = "app/installations/access_tokens", 201, self._access_token()
+        else:
+            route, status, response = "unknown", 404, {"message": "Not Found"}
+
+        self.state.count(f"{method} {route}")
+        self._send(status, response, headers)
+
+    def _repository(self, method: str, path: str, query: Dict[str, str],
+                    headers: Dict[str, str]) -> Tuple[str, int, object]:
+        """Handle the repository-scoped endpoints."""
+        if path == "branches" and method == "GET":
+            branches = list(self.state.branches.values())
+            if query.get("protected") == "true":
+                branches = [branch for branch in branches if branch["protected"]]
+            return "branches", 200, self._paginate(branches, query, headers)
+
+        if path.startswith("branches/") and method == "GET":
+            branch = self.state.branches.get(path[len("branches/"):])
+            return ("branches/:branch", 200, branch) if branch else ("branches/:branch", 404, {"message": "Branch not found"})
+
+        if path == "rulesets" and method == "GET":
+            rulesets = self.state.rulesets
+            if query.get("includes_parents") == "false":
+                rulesets = [ruleset for ruleset in rulesets if ruleset["source_type"] == "Repository"]
+            summaries = [{key: value for key, value in ruleset.items() if key not in ("conditions", "rules")}
+                         for ruleset in rulesets]
+            return "rulesets", 200, self._paginate(summaries, query, headers)
+
+        if path.startswith("rulesets/") and method == "GET":
+            ruleset = next((ruleset for ruleset in self.state.rulesets
+                            if str(ruleset["id"]) == path[len("rulesets/"):]), None)
+            return ("rulesets/:id", 200, ruleset) if ruleset else ("rulesets/:id", 404, {"message": "Not Found"})
+
+        if path == "pulls" and method == "GET":
+            pulls = self.state.pulls
+            if query.get("state", "open") != "all":
+                pulls = [pull for pull in pulls if pull["state"] == query.get("state", "open")]
+            if "head" in query:
+                pulls = [pull for pull in pulls if pull["head"]["label"] == query["head"]]
+            if "base" in query:
+                pulls = [pull for pull in pulls if pull["base"]["ref"] == query["base"]]
+            if query.get("sort") == "updated":
+                pulls = sorted(pulls, key=lambda pull: pull["updated_at"], reverse=query.get("direction") != "asc")
+            return "pulls", 200, self._paginate(pulls, query, headers)
+
+        if path.startswith("git/ref/heads/") and method == "GET":
+            status, ref = self._ref(path[len("git/ref/heads/"):])
+            return "git/ref", status, ref
+
+        if path.startswith("git/matching-refs/heads/") and method == "GET":
+            prefix = path[len("git/matching-refs/heads/"):]
+            refs = [self._ref(name)[1] for name in self.state.branches if name.startswith(prefix)]
+            return "git/matching-refs", 200, refs
+
+        if path.startswith("git/refs/heads/") and method == "DELETE":
+            if self.state.delete_branch(path[len("git/refs/heads/"):]):
+                return "git/refs", 204, None
+            return "git/refs", 422, {"message": "Reference does not exist"}
+
+        return "unknown", 404, {"message": "Not Found"}
+
+    def _ref(self, name: str) -> Tuple[int, Dict]:
+        """Return the git ref object of a branch."""
+        branch = self.state.branches.get(name)
+        if not branch:
+            return 404, {"message": "Not Found"}
+        return 200, {"ref": f"refs/heads/{name}", "object": {"type": "commit", "sha": branch["commit"]["sha"]}}
+
+    def _access_token(self) -> Dict:
+        """Issue a fake installation access token."""
+        with self.state.lock:
+            self.state.tokens_issued += 1
+            number = self.state.tokens_issued
+        return {"token": f"ghs_standin{number:08d}", "expires_at": _iso(int(time.time()) + 3600)}
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+class StandinServer(ThreadingHTTPServer):
+    """Threaded HTTP server carrying the stand-in state."""
+
+    daemon_threads = True
+
+    def __init__(self, address, state: StandinState):
+        super().__init__(address, StandinHandler)
+        self.state = state
+
+    @property
+    def url(self) -> str:
+        """Base URL to use as SWEEPER_API_URL."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_standin(spec: RepositorySpec, repo: str = "owner/repo", origin: Optional[Path] = None,
+                  latency: float = 0.0, rate_limit: int = 0, rate_window: float = 60.0,
+                  host: str = "127.0.0.1", port: int = 0) -> StandinServer:
+    """Start a stand-in on a background thread; call shutdown() on the result to stop it."""
+    server = StandinServer((host, port), StandinState(spec, repo, origin, latency, rate_limit, rate_window))
+    thread = threading.Thread(target=server.serve_forever, name="github-api-standin", daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    """Serve a stand-in seeded from a synthetic spec until interrupted."""
+    parser = argparse.ArgumentParser(description="Local stand-in for the GitHub API endpoints used by the sweeper")
+    parser.add_argument("--repo", default="owner/repo", help="Repository name served (owner/repo)")
+    parser.add_argument("--scenario", action="store_true", help="Seed from the TestRepositorySetup scenarios")
+    parser.add_argument("--branches", type=int, default=100, help="Number of synthetic feature branches")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic branches")
+    parser.add_argument("--origin", default="", help="Bare repository whose branch tips and refs are served")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latency added to every response")
+    parser.add_argument("--rate-limit", type=int, default=0, help="Requests allowed per window (0 for unlimited)")
+    parser.add_argument("--rate-window", type=float, default=60.0, help="Rate limit window in seconds")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+
+    args = parser.parse_args()
+
+    spec = scenario_spec() if args.scenario else random_spec(args.branches, seed=args.seed)
+    server = StandinServer(
+        ("127.0.0.1", args.port),
+        StandinState(spec, args.repo, Path(args.origin) if args.origin else None,
+                     args.latency_ms / 1000.0, args.rate_limit, args.rate_window),
+    )
+    print(f"GitHub API stand-in for {args.repo} listening on {server.url} (export SWEEPER_API_URL={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Served {server.state.request_count} requests ({server.state.rate_limited} rate limited)")
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
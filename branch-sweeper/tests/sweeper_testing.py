@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/sweeper_testing.py
+
+"""
+Shared harness of the script-style test suites.
+
+Importing this module puts the tests and scripts directories on the Python
+path, so a suite imports it before any sweeper module. SweeperTester gives a
+suite a scratch directory, an environment isolated from the caller's git
+configuration and GitHub Actions variables, the check() assertion and the
+runner; run_suite() is the main() of a suite.
+"""
+
+import abc
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Callable, List, Tuple, Type
+
+TESTS_DIR = Path(__file__).parent
+SCRIPTS_DIR = TESTS_DIR.parent / "scripts"
+for path in (TESTS_DIR, SCRIPTS_DIR):
+    if str(path) not in sys.path:
+        sys.path.append(str(path))
+
+# Variables of the caller that would change what the sweeper does
+ISOLATED_VARIABLES = ("GITHUB_TEST_MODE", "GITHUB_OUTPUT", "SWEEPER_API_URL", "GIT_DIR")
+
+
+class TerminalColors:
+    """ANSI color codes for terminal output."""
+    GREEN = '\033[0;32m'
+    YELLOW = '\033[1;33m'
+    RED = '\033[0;31m'
+    NC = '\033[0m'  # No Color
+
+
+def isolate_environment(home: Path) -> None:
+    """Keep the git configuration written by the sweeper in home and drop the caller's sweeper variables."""
+    os.environ["HOME"] = str(home)
+    for name in ISOLATED_VARIABLES:
+        os.environ.pop(name, None)
+
+
+class SweeperTester(abc.ABC):
+    """Base class of a test suite: scratch directory, assertions and the runner."""
+
+    # Prefix of the scratch directory of the suite
+    prefix = "sweeper-test-"
+
+    def __init__(self):
+        """Create a scratch directory and isolate the environment."""
+        self.work_dir = Path(tempfile.mkdtemp(prefix=self.prefix))
+        isolate_environment(self.work_dir)
+
+    def check(self, condition, message):
+        """Print and return the outcome of a single assertion."""
+        color = TerminalColors.GREEN if condition else TerminalColors.RED
+        print(f"{color}{'ok' if condition else 'FAILED'}: {message}{TerminalColors.NC}")
+        return bool(condition)
+
+    @abc.abstractmethod
+    def tests(self) -> List[Tuple[str, Callable[[], bool]]]:
+        """Return the (name, test) pairs of the suite, in the order they run."""
+
+    def run_all_tests(self) -> bool:
+        """Run every test of the suite; return whether all of them passed."""
+        results = []
+        for name, test in self.tests():
+            print(f"\n{TerminalColors.YELLOW}Running Test: {name}{TerminalColors.NC}")
+            try:
+                success = test()
+            except Exception as e:
+                print(f"{TerminalColors.RED}Error running {name}: {e}{TerminalColors.NC}")
+                success = False
+            results.append((name, success))
+
+        passed = sum(1 for _, success in results if success)
+        color = TerminalColors.GREEN if passed == len(results) else TerminalColors.RED
+        print(f"\n{color}Tests completed: {passed}/{len(results)} passed{TerminalColors.NC}")
+        return passed == len(results)
+
+
+def run_suite(tester_class: Type[SweeperTester], description: str) -> int:
+    """Parse the (empty) command line and run a suite; return the exit code."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.parse_args()
+
+    tester = tester_class()
+    return 0 if tester.run_all_tests() else 1
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/synthetic_repository.py
+
+"""
+Parameterized synthetic repositories for benchmarks and verification harnesses.
+
+A RepositorySpec describes the protected branches and every feature branch
+(merge style, age, history depth) declaratively. The spec is rendered as a
+single git fast-import stream, so repositories with tens of thousands of refs
+are built in seconds instead of one checkout/add/commit/merge at a time.
+
+build_repository() creates a bare origin plus a working clone that fetches
+from it over file://, so the sweeper's non-test-mode code path runs against a
+realistic remote; build_local_repository() creates a plain repository with
+local branches for test mode.
+"""
+
+import argparse
+import itertools
+import random
+import shutil
+import subprocess
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+SECONDS_PER_DAY = 86400
+
+AUTHOR = "Synthetic Author <author@example.com>"
+
+# Merge styles a synthetic branch can have
+MERGE_KINDS = ("merged", "pr_merged", "squashed", "unmerged")
+
+
+class BranchSpec:
+    """A single synthetic feature branch."""
+
+    def __init__(self, name, kind="unmerged", age_days=0, depth=1, target="main", pr_number=0, merge_message=""):
+        """
+        Initialize the branch description.
+
+        The target may be a protected branch or an earlier feature branch (stacked
+        branches); merge_message overrides the generated merge or squash message.
+        """
+        self.name = name
+        self.kind = kind
+        self.age_days = age_days
+        self.depth = depth
+        self.target = target
+        self.pr_number = pr_number
+        self.merge_message = merge_message
+
+    def to_dict(self) -> Dict:
+        """Return the branch description as a plain dictionary."""
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "age_days": self.age_days,
+            "depth": self.depth,
+            "target": self.target,
+            "pr_number": self.pr_number,
+            "merge_message": self.merge_message,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "BranchSpec":
+        """Create a branch description from to_dict() output."""
+        return cls(**data)
+
+
+class RepositorySpec:
+    """A synthetic repository: default branch, protected branches and feature branches."""
+
+    def __init__(self, default_branch="main", protected=None, branches=None, now=None, fanout=False):
+        """
+        Initialize the repository description.
+
+        With fanout, branch files are spread over 256 hashed directories so that
+        merge commits on the protected branches do not rewrite one huge tree.
+        """
+        self.default_branch = default_branch
+        self.protected = list(protected or [])
+        self.branches: List[BranchSpec] = list(branches or [])
+        self.now = now or int(time.time())
+        self.fanout = fanout
+
+    def to_dict(self) -> Dict:
+        """Return the repository description as a plain dictionary (ages stay relative)."""
+        return {
+            "default_branch": self.default_branch,
+            "protected": self.protected,
+            "fanout": self.fanout,
+            "branches": [branch.to_dict() for branch in self.branches],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RepositorySpec":
+        """Create a repository description from to_dict() output, relative to the current time."""
+        return cls(
+            default_branch=data["default_branch"],
+            protected=data["protected"],
+            branches=[BranchSpec.from_dict(branch) for branch in data["branches"]],
+            fanout=data.get("fanout", False),
+        )
+
+    def file_path(self, branch: BranchSpec) -> str:
+        """Path of the file a branch adds."""
+        if self.fanout:
+            return f"{zlib.crc32(branch.name.encode('utf-8')) & 0xff:02x}/{branch.name}.md"
+        return f"{branch.name}.md"
+
+    @property
+    def protected_with_default(self) -> List[str]:
+        """The default branch followed by the other protected branches."""
+        return [self.default_branch] + [b for b in self.protected if b != self.default_branch]
+
+
+def random_spec(
+    branch_count: int,
+    protected_count: int = 2,
+    merged_fraction: float = 0.4,
+    squashed_fraction: float = 0.1,
+    max_age_days: int = 365,
+    depth: int = 1,
+    seed: int = 0,
+) -> RepositorySpec:
+    """Build a reproducible random repository specification."""
+    rng = random.Random(seed)
+    protected = [f"release/{index}" for index in range(1, protected_count)]
+    targets = ["main"] + protected
+
+    branches = []
+    for index in range(branch_count):
+        roll = rng.random()
+        if roll < merged_fraction:
+            kind = rng.choice(("merged", "pr_merged"))
+        elif roll < merged_fraction + squashed_fraction:
+            kind = "squashed"
+        else:
+            kind = "unmerged"
+        prefix = rng.choice(("feature", "bugfix", "chore", "user/dev"))
+        branches.append(BranchSpec(
+            name=f"{prefix}/{index:06d}",
+            kind=kind,
+            age_days=rng.randint(0, max_age_days),
+            depth=depth,
+            target=rng.choice(targets),
+            pr_number=index + 1,
+        ))
+
+    # Create branches oldest first so the history of each target is chronological
+    branches.sort(key=lambda branch: -branch.age_days)
+    return RepositorySpec(default_branch="main", protected=protected, branches=branches, fanout=True)
+
+
+def scenario_spec() -> RepositorySpec:
+    """The branch scenarios of TestRepositorySetup, expressed as a spec."""
+    return RepositorySpec(
+        default_branch="main",
+        protected=["develop", "production"],
+        branches=[
+            BranchSpec("feature-old-merged", "merged", age_days=42),
+            BranchSpec("feature-ancient-unmerged", "unmerged", age_days=70),
+            BranchSpec("feature-pr-merged", "pr_merged", age_days=35, pr_number=123),
+            BranchSpec("feature-recent", "unmerged", age_days=2),
+            BranchSpec("feature-unmerged-stale", "unmerged", age_days=56),
+            BranchSpec("bugfix-old-merged", "merged", age_days=42),
+            BranchSpec("bugfix-recent", "unmerged", age_days=15),
+        ],
+    )
+
+
+def _git(args: List[str], cwd: Path, env: Optional[Dict[str, str]] = None, input_text: Optional[str] = None) -> str:
+    """Run a git command and return its stripped output, raising on failure."""
+    result = subprocess.run(
+        ["git"] + args,
+        cwd=cwd,
+        env=env,
+        input=input_text,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.strip()
+
+
+def _data(text: str) -> bytes:
+    """Encode a fast-import data block."""
+    payload = text.encode("utf-8")
+    return b"data %d\n" % len(payload) + payload + b"\n"
+
+
+def fast_import_stream(spec: RepositorySpec) -> Iterator[bytes]:
+    """
+    Yield a git fast-import stream that creates every commit and ref of a spec.
+
+    Each branch adds or updates a "<branch>.md" file, starting from the current
+    tip of its target branch. Merged branches get a --no-ff style merge commit
+    on the target, squashed branches a single commit with the same content and
+    no second parent, and unmerged branches are left as they are.
+    """
+    marks = itertools.count(1)
+    base_date = spec.now - 400 * SECONDS_PER_DAY
+
+    def commit(ref: str, message: str, timestamp: int, parent: Optional[int] = None,
+               merge: Optional[int] = None, files: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        mark = next(marks)
+        lines = [
+            f"commit refs/heads/{ref}\n".encode("utf-8"),
+            b"mark :%d\n" % mark,
+            f"author {AUTHOR} {timestamp} +0000\n".encode("utf-8"),
+            f"committer {AUTHOR} {timestamp} +0000\n".encode("utf-8"),
+            _data(message),
+        ]
+        if parent is not None:
+            lines.append(b"from :%d\n" % parent)
+        if merge is not None:
+            lines.append(b"merge :%d\n" % merge)
+        for path, content in (files or {}).items():
+            lines.append(f"M 100644 inline {path}\n".encode("utf-8"))
+            lines.append(_data(content))
+        return mark, b"".join(lines) + b"\n"
+
+    root, chunk = commit(spec.default_branch, "Initial commit", base_date,
+                         files={"README.md": "# Test Repository\n"})
+    yield chunk
+    tips = {spec.default_branch: root}
+    for name in spec.protected:
+        tips[name], chunk = commit(name, f"Add {name} documentation", base_date + 60, parent=root,
+                                   files={f"{name.upper()}.md": f"# {name} branch\n"})
+        yield chunk
+
+    for branch in spec.branches:
+        if branch.kind not in MERGE_KINDS:
+            raise ValueError(f"Unknown merge kind '{branch.kind}' for branch {branch.name}")
+        target = branch.target if branch.target in tips else spec.default_branch
+        timestamp = spec.now - branch.age_days * SECONDS_PER_DAY
+        path = spec.file_path(branch)
+        content = f"# {branch.name} feature\n"
+
+        tip = tips[target]
+        for step in range(branch.depth):
+            message = f"Add {branch.name} feature" if step == 0 else f"Update {branch.name} feature ({step + 1})"
+            content += "" if step == 0 else f"Change {step + 1}\n"
+            tip, chunk = commit(branch.name, message, timestamp - (branch.depth - step - 1) * 60,
+                                parent=tip, files={path: content})
+            yield chunk
+
+        tips[branch.name] = tip
+
+        if branch.kind == "merged":
+            message = branch.merge_message or f"Merge branch '{branch.name}'"
+            tips[target], chunk = commit(target, message, timestamp + 60,
+                                         parent=tips[target], merge=tip, files={path: content})
+            yield chunk
+        elif branch.kind == "pr_merged":
+            message = branch.merge_message or f"Merge pull request #{branch.pr_number} from user/{branch.name}"
+            tips[target], chunk = commit(target, message, timestamp + 60,
+                                         parent=tips[target], merge=tip, files={path: content})
+            yield chunk
+        elif branch.kind == "squashed":
+            message = branch.merge_message or f"{branch.name} (#{branch.pr_number})"
+            tips[target], chunk = commit(target, message, timestamp + 60,
+                                         parent=tips[target], files={path: content})
+            yield chunk
+
+    yield b"done\n"
+
+
+def _fast_import(spec: RepositorySpec, git_dir: Path) -> None:
+    """Feed the fast-import stream of a spec into a repository."""
+    process = subprocess.Popen(
+        ["git", "fast-import", "--quiet", "--done"],
+        cwd=git_dir,
+        stdin=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    try:
+        for chunk in fast_import_stream(spec):
+            process.stdin.write(chunk)
+        process.stdin.close()
+    except BrokenPipeError:
+        pass
+    stderr = process.stderr.read().decode("utf-8", "replace")
+    if process.wait() != 0:
+        raise RuntimeError(f"git fast-import failed: {stderr.strip()}")
+    _git(["symbolic-ref", "HEAD", f"refs/heads/{spec.default_branch}"], git_dir)
+
+
+def build_repository(spec: RepositorySpec, root: Path) -> Dict[str, Path]:
+    """
+    Materialize a spec as root/origin.git (bare) and root/work (a clone of it).
+
+    Returns a dictionary with the "origin" and "work" paths.
+    """
+    root = Path(root)
+    if root.exists():
+        shutil.rmtree(root)
+    root.mkdir(parents=True)
+
+    origin = root / "origin.git"
+    work = root / "work"
+    _git(["init", "--quiet", "--bare", str(origin)], root)
+    _fast_import(spec, origin)
+    _git(["clone", "--quiet", "--no-checkout", f"file://{origin}", str(work)], root)
+
+    return {"origin": origin, "work": work}
+
+
+def build_local_repository(spec: RepositorySpec, path: Path) -> Path:
+    """Materialize a spec as a non-bare repository with local branches and the default branch checked out."""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    _git(["init", "--quiet"], path)
+    _fast_import(spec, path)
+    _git(["reset", "--quiet", "--hard"], path)
+    return path
+
+
+def main():
+    """Build a synthetic repository from the command line."""
+    parser = argparse.ArgumentParser(description="Build a synthetic repository for sweeper benchmarks")
+    parser.add_argument("root", help="Directory that receives origin.git and work/ (or the local repository)")
+    parser.add_argument("--scenario", action="store_true", help="Build the TestRepositorySetup scenarios")
+    parser.add_argument("--local", action="store_true", help="Build a local repository instead of origin + clone")
+    parser.add_argument("--branches", type=int, default=100, help="Number of feature branches")
+    parser.add_argument("--protected", type=int, default=2, help="Number of protected branches (including main)")
+    parser.add_argument("--merged", type=float, default=0.4, help="Fraction of merged branches")
+    parser.add_argument("--squashed", type=float, default=0.1, help="Fraction of squash-merged branches")
+    parser.add_argument("--max-age-days", type=int, default=365, help="Maximum branch age in days")
+    parser.add_argument("--depth", type=int, default=1, help="Commits per branch")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+
+    args = parser.parse_args()
+
+    if args.scenario:
+        spec = scenario_spec()
+    else:
+        spec = random_spec(args.branches, args.protected, args.merged, args.squashed,
+                           args.max_age_days, args.depth, args.seed)
+
+    started = time.perf_counter()
+    if args.local:
+        path = build_local_repository(spec, Path(args.root))
+    else:
+        path = build_repository(spec, Path(args.root))["work"]
+    print(f"Built {len(spec.branches)} branches in {time.perf_counter() - started:.2f}s: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
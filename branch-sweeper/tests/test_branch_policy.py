@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_branch_policy.py
+
+"""
+Tests of per-pattern policies.
+
+The compiled matcher must pick the same rule as trying the rules one by one,
+policy files must be validated before a sweep starts, and a sweep must apply
+each rule's thresholds (and simulate_policy.py must reproduce them offline).
+"""
+
+import json
+import os
+import random
+import re
+import sys
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from branch_policy import compile_rule, load_policy, parse_policy
+from branch_sweeper import BranchSweeper
+from policy_snapshot import load_snapshot
+from simulate_policy import simulate
+from synthetic_repository import BranchSpec, RepositorySpec, build_repository
+
+POLICY = {"rules": [
+    {"name": "releases", "match": ["release/*", "release/*/*"], "keep": True},
+    {"name": "dependabot", "match": "dependabot/**", "weeks_threshold": 1, "unmerged_days": 14},
+    {"name": "hotfixes", "regex": "hotfix/[0-9]+(-[a-z]+)?", "require_merged": True},
+    {"name": "personal", "match": "users/**", "exclude": "users/*/keep-*", "weeks_threshold": 12,
+     "unmerged_days": 180},
+]}
+
+
+class BranchPolicyTester(SweeperTester):
+    """Exercise policy files and the compiled matcher."""
+
+    prefix = "sweeper-policy-test-"
+
+    def test_matching(self):
+        """The combined matcher picks the first matching rule, like trying each rule in order."""
+        policy = parse_policy(POLICY, 2, 30)
+        rules = [compile_rule(rule, index, 2, 30) for index, rule in enumerate(POLICY["rules"])]
+
+        def one_by_one(name):
+            for rule, pattern in rules:
+                if re.fullmatch(pattern, name):
+                    return rule.name
+            return "default"
+
+        rng = random.Random(11)
+        segments = ["release", "dependabot", "hotfix", "users", "alice", "keep-x", "npm", "12", "12-fix", "1.0"]
+        names = ["/".join(rng.choice(segments) for _ in range(rng.randint(1, 4))) for _ in range(5000)]
+        combined = {name: rule.name for name, rule in policy.classify(names).items()}
+        expected = {
+            "release/1.0": "releases", "release/1.0/rc": "releases", "release/1.0/rc/1": "default",
+            "dependabot/npm/lodash-4": "dependabot", "hotfix/12": "hotfixes", "hotfix/12-fix": "hotfixes",
+            "hotfix/x12": "default", "users/alice/spike": "personal", "users/alice/keep-this": "default",
+            "feature/users/alice": "default",
+        }
+
+        return all([
+            self.check(all(combined[name] == one_by_one(name) for name in names),
+                       f"same rules as one by one for {len(names)} names"),
+            self.check(len(set(combined.values())) == 5, "every rule is exercised"),
+            self.check({name: policy.rule_for(name).name for name in expected} == expected,
+                       "globs stay within segments, regexes match whole names, exclusions fall through"),
+            self.check(policy.rule_for("dependabot/x").weeks_threshold == 1 and
+                       policy.rule_for("hotfix/1").unmerged_days == 30, "thresholds default to the command line's"),
+            self.check(parse_policy(POLICY, 2, 30).fingerprint == policy.fingerprint !=
+                       parse_policy({"rules": POLICY["rules"][:2]}, 2, 30).fingerprint,
+                       "the fingerprint follows the rules"),
+        ])
+
+    def test_validation(self):
+        """Broken policy files are rejected with the rule at fault."""
+        def error(document):
+            try:
+                parse_policy(document, 2, 30)
+            except ValueError as e:
+                return str(e)
+            return ""
+
+        broken_path = self.work_dir / "broken.json"
+        broken_path.write_text("{\"rules\": [")
+        try:
+            load_policy(str(broken_path), 2, 30)
+            unreadable = ""
+        except ValueError as e:
+            unreadable = str(e)
+
+        return all([
+            self.check("unknown field treshold" in error({"rules": [{"match": "a", "treshold": 1}]}),
+                       "misspelled fields"),
+            self.check("needs a 'match' glob" in error({"rules": [{"name": "empty"}]}), "rules without matchers"),
+            self.check("defined twice" in error({"rules": [{"name": "a", "match": "a"}, {"name": "a", "match": "b"}]}),
+                       "duplicate names"),
+            self.check("invalid regex" in error({"rules": [{"regex": "feature/("}]}), "invalid regexes"),
+            self.check("backreferences" in error({"rules": [{"regex": "(a)\\1"}]}), "backreferences"),
+            self.check("positive number" in error({"rules": [{"match": "a", "weeks_threshold": 0}]}),
+                       "non-positive thresholds"),
+            self.check("list of 'rules'" in error({"rule": []}), "documents without rules"),
+            self.check(unreadable.startswith("Unable to read the policy file"), "unreadable files"),
+        ])
+
+    def test_sweep(self):
+        """A sweep applies each rule's thresholds, and the simulator reproduces it."""
+        branches = [
+            BranchSpec("release/1.0", "unmerged", age_days=200),
+            BranchSpec("dependabot/npm/lodash", "merged", age_days=10),
+            BranchSpec("dependabot/pip/requests", "unmerged", age_days=20),
+            BranchSpec("hotfix/17", "unmerged", age_days=60),
+            BranchSpec("hotfix/18", "merged", age_days=20),
+            BranchSpec("users/alice/spike", "merged", age_days=40),
+            BranchSpec("users/alice/old", "unmerged", age_days=200),
+            BranchSpec("users/alice/keep-notes", "unmerged", age_days=60),
+            BranchSpec("feature-old", "unmerged", age_days=45),
+            BranchSpec("feature-merged", "merged", age_days=10),
+        ]
+        spec = RepositorySpec(default_branch="main", branches=branches)
+        paths = build_repository(spec, self.work_dir / "repo")
+        policy_path = self.work_dir / "policy.json"
+        policy_path.write_text(json.dumps(POLICY))
+        results_path = self.work_dir / "sweep.ndjson"
+        snapshot_path = self.work_dir / "sweep.snapshot.ndjson"
+
+        cwd = os.getcwd()
+        os.chdir(paths["work"])
+        try:
+            sweeper = BranchSweeper(
+                dry_run=True,
+                weeks_threshold=2,
+                default_branch="main",
+                repo="owner/repo",
+                results=[f"ndjson:{results_path}"],
+                summary_details="",
+                pull_request_lookup=False,
+                policy=str(policy_path),
+                snapshot_output=str(snapshot_path),
+            )
+            exit_code = sweeper.run()
+            with open("summary.md") as f:
+                summary = f.read()
+        finally:
+            os.chdir(cwd)
+        with open(results_path) as f:
+            records = {record["branch"]: record for record in map(json.loads, f) if "branch" in record}
+        deleted = {name for name, record in records.items() if record["action"] == "would_delete"}
+
+        header, snapshot = load_snapshot(str(snapshot_path))
+        outcome = simulate(snapshot, 2, 30, header["created"], policy=load_policy(str(policy_path), 2, 30))
+        simulated = {name for names in outcome["delete"].values() for name in names}
+
+        return all([
+            self.check(exit_code == 0, "sweep succeeds"),
+            self.check(deleted == {"dependabot/npm/lodash", "dependabot/pip/requests", "hotfix/18",
+                                   "users/alice/old", "users/alice/keep-notes", "feature-old"},
+                       f"deleted by their rules' thresholds: {sorted(deleted)}"),
+            self.check(records["release/1.0"]["reason"] == "kept by policy rule 'releases'", "kept by a rule"),
+            self.check(records["hotfix/17"]["reason"] == "stale but unmerged" and "hotfix/17" not in sweeper.due_dates,
+                       "rules requiring merged branches never delete unmerged ones"),
+            self.check(records["users/alice/spike"]["action"] == "skipped", "longer thresholds per rule"),
+            self.check(records["users/alice/keep-notes"]["rule"] == "default" and
+                       records["dependabot/npm/lodash"]["rule"] == "dependabot", "records name their rule"),
+            self.check("- Policy: " in summary and "releases 1, dependabot 2" in summary, "summary counts per rule"),
+            self.check(simulated == deleted and len(snapshot) == len(branches) + 1,
+                       "the simulator applies the policy to the snapshot"),
+        ])
+
+    def tests(self):
+        """The policy tests, in order."""
+        return [
+            ("Matching", self.test_matching),
+            ("Validation", self.test_validation),
+            ("Sweep", self.test_sweep),
+        ]
+
+
+def main():
+    """Run the policy tests."""
+    return run_suite(BranchPolicyTester, "Test per-pattern branch policies")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
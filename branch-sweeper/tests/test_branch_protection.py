@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_branch_protection.py
+
+"""
+Tests of ruleset-aware branch protection.
+
+Protection is resolved against the local GitHub API stand-in, which serves
+classic protection and rulesets with ETags, so the tests can check that
+rulesets protect the branches their patterns cover, that a second run is
+answered by 304 responses, and that a changed ruleset is picked up.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from branch_protection import ProtectionMatcher, ProtectionResolver
+from branch_sweeper import BranchSweeper
+from github_api import GitHubAPI
+from github_api_standin import start_standin
+from synthetic_repository import BranchSpec, RepositorySpec, build_repository
+
+REPO = "owner/repo"
+
+
+class BranchProtectionTester(SweeperTester):
+    """Exercise protection resolution and the compiled matcher."""
+
+    prefix = "sweeper-protection-test-"
+
+    def add_rulesets(self, state):
+        """Seed the rulesets every test uses, protecting and not."""
+        state.add_ruleset("releases", ["refs/heads/release/*", "~DEFAULT_BRANCH"])
+        state.add_ruleset("personal", ["refs/heads/users/**"], ["refs/heads/users/*/scratch"],
+                          rules=("non_fast_forward",), source_type="Organization")
+        state.add_ruleset("trial", ["~ALL"], enforcement="evaluate")
+        state.add_ruleset("naming", ["~ALL"], rules=("creation",))
+        state.add_ruleset("tags", ["refs/tags/*"], target="tag")
+
+    def test_matcher(self):
+        """Names and ruleset patterns are matched together; only names are iterated."""
+        matcher = ProtectionMatcher(["main", "develop"])
+        covers = matcher.add_ruleset("releases", ["refs/heads/release/*", "~DEFAULT_BRANCH"])
+        matcher.add_ruleset("personal", ["refs/heads/users/**"], ["refs/heads/users/*/scratch"])
+        ignored = not matcher.add_ruleset("tags", ["refs/tags/v*"])
+
+        def gh(_cmd):
+            return subprocess.CompletedProcess([], 1, 'HTTP/2.0 304 Not Modified\r\nEtag: W/"abc"\r\n\r\n', "")
+
+        status, body, etag = GitHubAPI(REPO, base_url="", run_command=gh).conditional_get("repos/x", etag='W/"abc"')
+
+        return all([
+            self.check(covers and ignored, "rulesets without branch patterns protect nothing"),
+            self.check(all(name in matcher for name in ("main", "release/1.0", "users/alice/spike", "users/a/b/c")),
+                       "names and patterns protect"),
+            self.check(not any(name in matcher for name in ("release/1.0/rc", "users/alice/scratch", "feature")),
+                       "`*` stays within a segment and exclusions are honoured"),
+            self.check(sorted(matcher) == ["develop", "main"] and matcher.copy() == {"main", "develop"},
+                       "only the names are merge targets"),
+            self.check(matcher.ruleset_for("users/bob/x") == "personal" and matcher.ruleset_for("main") == "",
+                       "the protecting ruleset is named"),
+            self.check((status, body, etag) == (304, None, 'W/"abc"'), "gh transport recognises 304 responses"),
+        ])
+
+    def test_cached_resolution(self):
+        """Classic protection and rulesets are resolved once; a repeated run only revalidates."""
+        names = [f"stable-{index}" for index in range(5)]
+        spec = RepositorySpec(default_branch="main", protected=names, branches=[BranchSpec("feature", "merged")])
+        server = start_standin(spec, REPO)
+        self.add_rulesets(server.state)
+        cache = str(self.work_dir / "protection.json")
+        api = GitHubAPI(REPO, base_url=server.url)
+        try:
+            first = ProtectionResolver(api, cache, per_page=2)
+            first_names, first_rulesets = first.resolve()
+            first.save()
+
+            second = ProtectionResolver(api, cache, per_page=2)
+            second_names, second_rulesets = second.resolve()
+            second.save()
+
+            server.state.rulesets[0]["conditions"]["ref_name"]["include"].append("refs/heads/hotfix/*")
+            third = ProtectionResolver(api, cache, per_page=2)
+            _, third_rulesets = third.resolve()
+            third.save()
+            foreign = ProtectionResolver(GitHubAPI("owner/other", base_url=server.url), cache)
+        finally:
+            server.shutdown()
+
+        return all([
+            self.check(sorted(first_names) == sorted(names + ["main"]), "every page of classic protection"),
+            self.check([name for name, _, _ in first_rulesets] == ["releases", "personal"],
+                       "only active branch rulesets that protect branches"),
+            # 4 pages of classic protection, 3 of rulesets and the details of the 3 active branch rulesets
+            self.check(first.requests == first.misses == 10 and first.hits == 0,
+                       f"{first.requests} requests on the first run"),
+            self.check(second.hits == second.requests == first.requests and second.misses == 0 and
+                       (second_names, second_rulesets) == (first_names, first_rulesets),
+                       "a repeated run is answered from the cache with 304s"),
+            self.check(third.hits == third.requests - 1 and third.misses == 1 and
+                       "refs/heads/hotfix/*" in third_rulesets[0][1],
+                       "a changed ruleset only invalidates its own response"),
+            self.check(not foreign.cached, "a cache of another repository is not used"),
+        ])
+
+    def test_sweep(self):
+        """Branches covered by rulesets are skipped as protected."""
+        branches = [BranchSpec(name, "merged", age_days=40)
+                    for name in ("release/1.0", "users/alice/spike", "users/alice/scratch", "feature-done")]
+        spec = RepositorySpec(default_branch="main", branches=branches)
+        paths = build_repository(spec, self.work_dir / "repo")
+        server = start_standin(spec, REPO, origin=paths["origin"])
+        self.add_rulesets(server.state)
+        results_path = self.work_dir / "sweep.ndjson"
+
+        cwd = os.getcwd()
+        os.environ["SWEEPER_API_URL"] = server.url
+        os.chdir(paths["work"])
+        exported = []
+        try:
+            # The second run revalidates the cache the first one wrote
+            for run in ("first", "second"):
+                metrics_path = self.work_dir / f"{run}.prom"
+                sweeper = BranchSweeper(
+                    dry_run=True,
+                    weeks_threshold=2,
+                    default_branch="main",
+                    repo=REPO,
+                    results=[f"ndjson:{results_path}"],
+                    summary_details="",
+                    pull_request_lookup=False,
+                    protected_lookup=True,
+                    protection_cache=str(self.work_dir / "sweep.protection.json"),
+                    metrics_output=str(metrics_path),
+                )
+                exit_code = sweeper.run()
+                exported.append(metrics_path.read_text())
+            with open("summary.md") as f:
+                summary = f.read()
+        finally:
+            os.chdir(cwd)
+            os.environ.pop("SWEEPER_API_URL", None)
+            server.shutdown()
+        with open(results_path) as f:
+            records = {record["branch"]: (record["action"], record["reason"])
+                       for record in map(json.loads, f) if "branch" in record}
+        metric = f'branch_sweeper_protection_cache_lookups_total{{{{repo="{REPO}",result="{{}}"}}}} {{}}'
+
+        return all([
+            self.check(exit_code == 0, "sweep succeeds"),
+            self.check(records["release/1.0"] == ("skipped", "protected") and
+                       records["users/alice/spike"] == ("skipped", "protected"), "ruleset branches skipped"),
+            self.check(records["users/alice/scratch"][0] == "would_delete" and
+                       records["feature-done"][0] == "would_delete", "other branches still swept"),
+            self.check(sweeper.branches_to_check == {"main"}, "merges are checked against named branches"),
+            self.check("- Protected by rulesets: releases (refs/heads/release/* ~DEFAULT_BRANCH), personal" in summary,
+                       "summary lists the rulesets"),
+            self.check(metric.format("hit", 0) in exported[0] and metric.format("miss", 0) in exported[1],
+                       "the first run misses the protection cache and the second one only hits it"),
+            # One page of classic protection, one of rulesets and the details of the 3 active branch rulesets
+            self.check(metric.format("miss", 5) in exported[0] and metric.format("hit", 5) in exported[1],
+                       "every protection request is counted"),
+        ])
+
+    def tests(self):
+        """The protection tests, in order."""
+        return [
+            ("Matcher", self.test_matcher),
+            ("Cached Resolution", self.test_cached_resolution),
+            ("Sweep", self.test_sweep),
+        ]
+
+
+def main():
+    """Run the protection tests."""
+    return run_suite(BranchProtectionTester, "Test ruleset-aware branch protection")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_command_trace.py
+
+"""
+Tests of the subprocess tracer.
+
+Commands must be keyed by their subcommand whatever options precede it, the
+trace file must be valid Chrome trace-event JSON, and the per-command table
+of a traced sweep must account for every call it made.
+"""
+
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from branch_sweeper import BranchSweeper
+from command_trace import CommandTracer, command_key, percentile, redact
+from synthetic_repository import build_local_repository, scenario_spec
+
+
+class CommandTraceTester(SweeperTester):
+    """Exercise command keys, the trace file and the per-command table."""
+
+    prefix = "sweeper-trace-test-"
+
+    def test_command_keys(self):
+        """Leading options and their values are not part of the key."""
+        keys = {
+            "git merge-base": ["git", "merge-base", "--is-ancestor", "a", "b"],
+            "git log": ["git", "-C", "/tmp/work", "log", "-1"],
+            "git push": ["/usr/bin/git", "-c", "http.extraHeader=x", "--no-pager", "push", "origin", "--delete", "a"],
+            "git for-each-ref": ["git", "--git-dir", "/tmp/mirror.git", "for-each-ref"],
+            "gh pr list": ["gh", "pr", "list", "--head", "feature"],
+            "gh api": ["gh", "api", "--paginate", "repos/owner/repo/branches"],
+            "git": ["git"],
+        }
+        mismatched = {expected: command_key(cmd) for expected, cmd in keys.items() if command_key(cmd) != expected}
+        return all([
+            self.check(not mismatched, f"commands keyed by their subcommand, got {mismatched}" if mismatched else
+                       "commands keyed by their subcommand"),
+            self.check(command_key([]) == "", "empty commands have no key"),
+            self.check(percentile([5, 1, 4, 2, 3], 0.95) == 5 and percentile([5, 1, 4, 2, 3], 0.5) == 3 and
+                       percentile([], 0.95) == 0.0, "nearest-rank percentiles"),
+        ])
+
+    def test_trace_file(self):
+        """Events are streamed as trace-event JSON and aggregated per command."""
+        path = self.work_dir / "trace.json"
+        tracer = CommandTracer(str(path), phase_source=lambda: "merge_check")
+        ok = SimpleNamespace(returncode=0, stdout="abc\n", stderr="")
+        failed = SimpleNamespace(returncode=1, stdout="", stderr="fatal: é\n")
+        tracer.record(["git", "-C", "/tmp/work", "merge-base", "a", "b"], 100.0, 100.5, ok)
+        tracer.record(["git", "merge-base", "a", "c"], 101.0, 101.1, failed)
+        tracer.record(["gh", "pr", "list"], 102.0, 104.0, ok)
+        tracer.record(["gh", "api", "--method", "POST", "app/installations/1/access_tokens",
+                       "--header", "Authorization: Bearer app.jwt.secret"], 105.0, 105.1, ok)
+        tracer.close()
+
+        with open(path) as f:
+            events = json.load(f)["traceEvents"]
+        rows = tracer._rows()
+        return all([
+            self.check([event["name"] for event in events]
+                       == ["git merge-base", "git merge-base", "gh pr list", "gh api"],
+                       "one event per call, keyed by subcommand"),
+            self.check(events[0]["dur"] == 500000 and events[0]["cat"] == "merge_check" and
+                       events[0]["args"]["cmd"].startswith("git -C"), "durations, phases and full commands"),
+            self.check(events[0]["args"]["stdout_bytes"] == 4 and events[1]["args"]["stderr_bytes"] == 10 and
+                       events[1]["args"]["exit_code"] == 1, "output sizes and exit codes"),
+            self.check("app.jwt.secret" not in path.read_text() and
+                       events[3]["args"]["cmd"].endswith("Authorization: ***"),
+                       "authorization headers redacted"),
+            self.check(redact(["git", "-c", "http.extraHeader=AUTHORIZATION: basic abc", "fetch"])[2]
+                       == "http.extraHeader=AUTHORIZATION: ***", "git extra headers redacted"),
+            self.check([row[:2] for row in rows] == [["gh pr list", "1"], ["git merge-base", "2"], ["gh api", "1"]],
+                       "aggregated per command, slowest first"),
+            self.check(rows[1][2:] == ["0.600", "300.0", "500.0"], "total, mean and p95"),
+            self.check("4 git/gh calls" in tracer.render_markdown() and
+                       tracer.render_table().splitlines()[0].startswith("Command"), "tables rendered"),
+        ])
+
+    def test_traced_sweep(self):
+        """A traced sweep accounts for every subprocess call in its summary."""
+        repo = build_local_repository(scenario_spec(), self.work_dir / "local")
+        path = self.work_dir / "sweep-trace.json"
+
+        cwd = os.getcwd()
+        os.chdir(repo)
+        try:
+            sweeper = BranchSweeper(dry_run=True, weeks_threshold=4, default_branch="main",
+                                    protected_branches="develop production", repo="owner/repo", test_mode=True,
+                                    summary_details="", trace_output=str(path))
+            exit_code = sweeper.run()
+            summary = open("summary.md").read()
+        finally:
+            os.chdir(cwd)
+
+        with open(path) as f:
+            events = json.load(f)["traceEvents"]
+        return all([
+            self.check(exit_code == 0, "sweep succeeds"),
+            self.check(len(events) == sweeper.tracer.call_count > 0, "every call is in the trace file"),
+            self.check(all(event["name"].startswith("git ") for event in events), "test mode only runs git"),
+            self.check({event["cat"] for event in events} >= {"test_mode"}, "calls tagged with their phase"),
+            self.check(f"{len(events)} git/gh calls" in summary, "the summary counts the calls"),
+        ])
+
+    def tests(self):
+        """The command trace tests, in order."""
+        return [
+            ("Command Keys", self.test_command_keys),
+            ("Trace File", self.test_trace_file),
+            ("Traced Sweep", self.test_traced_sweep),
+        ]
+
+
+def main():
+    """Run the command trace tests."""
+    return run_suite(CommandTraceTester, "Test the subprocess tracer")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_deletion_pipeline.py
+
+"""
+Tests of the evaluate/delete pipeline.
+
+The queue mechanics (backpressure, draining on shutdown, abandoned batches)
+are checked directly; batched deletion is checked end to end against a
+synthetic repository with a file:// origin, and compared with the inline
+one-branch-at-a-time path.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from branch_sweeper import BranchSweeper
+from deletion_pipeline import DeletionPipeline
+from synthetic_repository import BranchSpec, RepositorySpec, build_repository
+
+
+class DeletionPipelineTester(SweeperTester):
+    """Exercise the deletion pipeline."""
+
+    prefix = "sweeper-pipeline-test-"
+
+    def requests(self, count):
+        """Deletion requests for count fake branches."""
+        return [(f"branch-{index}", "2020-01-01", "merged & stale", 0) for index in range(count)]
+
+    def test_backpressure_and_drain(self):
+        """A full queue blocks the producer and close() processes everything queued."""
+        deleted = []
+
+        def slow_delete(batch):
+            time.sleep(0.2)
+            deleted.extend(request[0] for request in batch)
+
+        pipeline = DeletionPipeline(slow_delete, lambda batch, reason: None, queue_size=2, batch_size=2,
+                                    batch_wait=0.05)
+        pipeline.start()
+        for request in self.requests(10):
+            pipeline.submit(request)
+        queued_at_close = len(deleted)
+        pipeline.close()
+
+        return all([
+            self.check(pipeline.blocked_seconds > 0.2, f"producer blocked {pipeline.blocked_seconds:.2f}s on the queue"),
+            self.check(queued_at_close < 10, "work was still pending when close() was called"),
+            self.check(deleted == [f"branch-{index}" for index in range(10)], "close() drained every request in order"),
+            self.check(pipeline.batches <= 6, f"requests were batched ({pipeline.batches} batches)"),
+        ])
+
+    def test_abandoned_batches(self):
+        """Batches are abandoned, not lost, when the guard fails or a deletion raises."""
+        outcomes = {}
+        allowed = threading.Event()
+        allowed.set()
+
+        def delete(batch):
+            # Every batch revokes the guard until the test grants it again
+            allowed.clear()
+            if batch[0][0] == "branch-4":
+                raise RuntimeError("push exploded")
+            for request in batch:
+                outcomes[request[0]] = "deleted"
+
+        def abandon(batch, reason):
+            for request in batch:
+                outcomes[request[0]] = reason
+
+        pipeline = DeletionPipeline(delete, abandon, queue_size=10, batch_size=4, batch_wait=1.0,
+                                    guard=lambda: "" if allowed.is_set() else "sweep lease lost")
+        pipeline.start()
+        for request in self.requests(4):
+            pipeline.submit(request)
+        time.sleep(0.3)
+        allowed.set()
+        for request in self.requests(8)[4:]:
+            pipeline.submit(request)
+        time.sleep(0.3)
+        for request in self.requests(12)[8:]:
+            pipeline.submit(request)
+        pipeline.close()
+
+        return all([
+            self.check(len(outcomes) == 12, "every request has an outcome"),
+            self.check(all(outcomes[f"branch-{index}"] == "deleted" for index in range(4)), "first batch deleted"),
+            self.check(outcomes["branch-4"].startswith("deletion error"), "failed batch abandoned with the error"),
+            self.check(outcomes["branch-8"] == "sweep lease lost", "batches after the guard failed are abandoned"),
+        ])
+
+    def build(self, name):
+        """A repository with stale merged, fresh merged, old unmerged and recent unmerged branches."""
+        branches = [BranchSpec(f"stale-{index:02d}", "merged", age_days=20 + index) for index in range(25)]
+        branches += [BranchSpec(f"fresh-{index:02d}", "merged", age_days=3) for index in range(5)]
+        branches += [BranchSpec(f"old-{index:02d}", "unmerged", age_days=60 + index) for index in range(5)]
+        branches += [BranchSpec(f"open-{index:02d}", "unmerged", age_days=5) for index in range(5)]
+        spec = RepositorySpec(default_branch="main", protected=["develop"], branches=branches)
+        return build_repository(spec, self.work_dir / name)
+
+    def sweep(self, paths, name, delete_batch_size):
+        """Run a real (non dry-run) sweep and return (exit code, {branch: action}, push count)."""
+        results_path = self.work_dir / f"{name}.ndjson"
+        trace_path = self.work_dir / f"{name}.trace.json"
+        cwd = os.getcwd()
+        os.chdir(paths["work"])
+        try:
+            sweeper = BranchSweeper(
+                dry_run=False,
+                weeks_threshold=2,
+                default_branch="main",
+                protected_branches="develop",
+                repo="owner/repo",
+                results=[f"ndjson:{results_path}"],
+                summary_details="",
+                trace_output=str(trace_path),
+                pull_request_lookup=False,
+                delete_batch_size=delete_batch_size,
+            )
+            exit_code = sweeper.run()
+            pushes = len(sweeper.tracer.durations.get("git push", []))
+        finally:
+            os.chdir(cwd)
+
+        with open(results_path) as f:
+            actions = {record["branch"]: record["action"] for record in map(json.loads, f) if "branch" in record}
+        return exit_code, actions, pushes
+
+    def remote_branches(self, origin):
+        """Names of the branches in the bare origin."""
+        result = subprocess.run(
+            ["git", "--git-dir", str(origin), "for-each-ref", "--format=%(refname:short)", "refs/heads/"],
+            capture_output=True, text=True, check=False
+        )
+        return set(result.stdout.split())
+
+    def test_batched_sweep(self):
+        """The pipelined sweep deletes the same branches as the inline path with far fewer pushes."""
+        pipelined_paths = self.build("pipelined")
+        inline_paths = self.build("inline")
+        exit_code, pipelined, pipelined_pushes = self.sweep(pipelined_paths, "pipelined", 8)
+        _, inline, inline_pushes = self.sweep(inline_paths, "inline", 0)
+
+        deleted = {branch for branch, action in pipelined.items() if action == "deleted"}
+        expected = {f"stale-{index:02d}" for index in range(25)} | {f"old-{index:02d}" for index in range(5)}
+        return all([
+            self.check(exit_code == 0, "pipelined sweep succeeds"),
+            self.check(deleted == expected, f"{len(deleted)} stale branches deleted"),
+            self.check(not expected & self.remote_branches(pipelined_paths["origin"]), "origin no longer has them"),
+            self.check(pipelined == inline, "same result for every branch as the inline path"),
+            self.check(pipelined_pushes < inline_pushes,
+                       f"{pipelined_pushes} pushes instead of {inline_pushes}"),
+        ])
+
+    def tests(self):
+        """The deletion pipeline tests, in order."""
+        return [
+            ("Backpressure And Drain", self.test_backpressure_and_drain),
+            ("Abandoned Batches", self.test_abandoned_batches),
+            ("Batched Sweep", self.test_batched_sweep),
+        ]
+
+
+def main():
+    """Run the deletion pipeline tests."""
+    return run_suite(DeletionPipelineTester, "Test the evaluate/delete pipeline")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
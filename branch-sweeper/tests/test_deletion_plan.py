@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_deletion_plan.py
+
+"""
+Tests of the plan/apply split.
+
+A dry run writes a plan; the origin then changes the way a real repository
+does between review and apply (branches move or disappear, or become
+protected), and applying the plan must only delete what is unchanged and
+still unprotected.
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from apply_plan import apply_plan
+from branch_sweeper import BranchSweeper
+from deletion_plan import PLAN_VERSION, load_plan
+from github_api_standin import start_standin
+from synthetic_repository import BranchSpec, RepositorySpec, build_repository
+
+
+class DeletionPlanTester(SweeperTester):
+    """Exercise writing and applying deletion plans."""
+
+    prefix = "sweeper-plan-test-"
+
+    def git(self, args, git_dir):
+        """Run git against a repository and return its stripped output."""
+        result = subprocess.run(["git", "--git-dir", str(git_dir)] + args, capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+
+    def heads(self, origin):
+        """{branch: tip} of the origin."""
+        listing = self.git(["for-each-ref", "--format=%(refname:lstrip=2) %(objectname)", "refs/heads/"], origin)
+        return dict(line.split() for line in listing.splitlines())
+
+    def move(self, origin, branch):
+        """Add a commit on top of a branch in the origin."""
+        commit = self.git(["-c", "user.name=Tester", "-c", "user.email=tester@example.com",
+                           "commit-tree", f"{branch}^{{tree}}", "-p", branch, "-m", "More work"], origin)
+        self.git(["update-ref", f"refs/heads/{branch}", commit], origin)
+
+    def plan_spec(self):
+        """Stale merged, old unmerged and recent unmerged branches next to a protected develop."""
+        branches = [BranchSpec(f"stale-{index:02d}", "merged", age_days=20 + index) for index in range(10)]
+        branches += [BranchSpec(f"old-{index:02d}", "unmerged", age_days=60 + index) for index in range(3)]
+        branches += [BranchSpec(f"open-{index:02d}", "unmerged", age_days=5) for index in range(3)]
+        return RepositorySpec(default_branch="main", protected=["develop"], branches=branches)
+
+    def plan(self, name):
+        """Build a repository and write a plan with a dry run; return its paths and the plan path."""
+        paths = build_repository(self.plan_spec(), self.work_dir / name)
+
+        plan_path = self.work_dir / f"{name}.plan.json"
+        cwd = os.getcwd()
+        os.chdir(paths["work"])
+        try:
+            sweeper = BranchSweeper(
+                dry_run=True,
+                weeks_threshold=2,
+                default_branch="main",
+                protected_branches="develop",
+                repo="owner/repo",
+                summary_details="",
+                pull_request_lookup=False,
+                plan_output=str(plan_path),
+            )
+            exit_code = sweeper.run()
+        finally:
+            os.chdir(cwd)
+        return paths, plan_path, exit_code
+
+    def apply(self, paths, plan_path, name, hook=None):
+        """Apply a plan from the work clone; return (exit code, {branch: (action, reason)}, sweeper)."""
+        results_path = self.work_dir / f"{name}.ndjson"
+        trace_path = self.work_dir / f"{name}.trace.json"
+        cwd = os.getcwd()
+        os.chdir(paths["work"])
+        try:
+            metadata, _ = load_plan(str(plan_path))
+            sweeper = BranchSweeper(
+                dry_run=False,
+                weeks_threshold=metadata["weeks_threshold"],
+                default_branch=metadata["default_branch"],
+                protected_branches=metadata["protected_branches"],
+                repo=metadata["repo"],
+                results=[f"ndjson:{results_path}"],
+                summary_details="",
+                trace_output=str(trace_path),
+                apply_plan=str(plan_path),
+            )
+            if hook:
+                hook(sweeper)
+            exit_code = sweeper.run()
+        finally:
+            os.chdir(cwd)
+        with open(results_path) as f:
+            results = {record["branch"]: (record["action"], record["reason"]) for record in map(json.loads, f)}
+        return exit_code, results, sweeper
+
+    def test_plan_file(self):
+        """A dry run writes every branch it would delete with its tip, reason and evidence."""
+        paths, plan_path, exit_code = self.plan("written")
+        metadata, entries = load_plan(str(plan_path))
+        heads = self.heads(paths["origin"])
+        planned = {entry["branch"]: entry for entry in entries}
+
+        unsupported = self.work_dir / "unsupported.plan.json"
+        unsupported.write_text(json.dumps({"version": PLAN_VERSION + 1, "branches": []}))
+        try:
+            load_plan(str(unsupported))
+            rejected = False
+        except ValueError:
+            rejected = True
+
+        expected = sorted([f"stale-{index:02d}" for index in range(10)] + [f"old-{index:02d}" for index in range(3)])
+        return all([
+            self.check(exit_code == 0, "dry run succeeds"),
+            self.check(sorted(planned) == expected, f"{len(planned)} branches planned"),
+            self.check(all(entry["sha"] == heads[name] for name, entry in planned.items()), "tips recorded"),
+            self.check(planned["stale-00"]["reason"] == "merged & stale" and "merged" in planned["stale-00"]["evidence"],
+                       f"merge evidence recorded ({planned['stale-00']['evidence']})"),
+            self.check(planned["old-00"]["evidence"] == "no merge evidence", "unmerged branches say so"),
+            self.check(metadata["default_branch"] == "main" and metadata["repo"] == "owner/repo", "run configuration kept"),
+            self.check(rejected, "unknown plan versions are rejected"),
+        ])
+
+    def test_apply(self):
+        """Only planned branches whose tip is unchanged are deleted, with one listing and no evaluation."""
+        paths, plan_path, _ = self.plan("applied")
+        origin = paths["origin"]
+        self.move(origin, "stale-01")
+        self.git(["update-ref", "-d", "refs/heads/stale-02"], origin)
+
+        exit_code, results, sweeper = self.apply(paths, plan_path, "applied")
+        heads = self.heads(origin)
+        commands = set(sweeper.tracer.durations)
+        deleted = sorted(branch for branch, (action, _) in results.items() if action == "deleted")
+
+        evaluation = {"git merge-base", "git log", "git for-each-ref", "git fetch"} & commands
+        listings = len(sweeper.tracer.durations.get("git ls-remote", []))
+        return all([
+            self.check(exit_code == 0, "apply succeeds"),
+            self.check(len(deleted) == 11, f"{len(deleted)} unchanged branches deleted"),
+            self.check(not set(deleted) & set(heads), "deleted branches are gone from the origin"),
+            self.check(results["stale-01"] == ("skipped", "changed since the plan") and "stale-01" in heads,
+                       "a branch that moved is kept"),
+            self.check(results["stale-02"][0] == "already_deleted", "a branch deleted meanwhile is reported"),
+            self.check("open-00" in heads and "open-00" not in results, "unplanned branches are untouched"),
+            self.check(not evaluation, f"nothing was evaluated again ({', '.join(sorted(commands))})"),
+            self.check(listings == 1, f"the remote was listed once ({listings} listings)"),
+        ])
+
+    def test_moved_during_apply(self):
+        """A branch that moves after the listing is kept by its lease; one deleted after it is reported."""
+        paths, plan_path, _ = self.plan("raced")
+        origin = paths["origin"]
+
+        def move_after_listing(sweeper):
+            run_command = sweeper._run_command
+
+            def racing_run_command(cmd, capture_output=True):
+                result = run_command(cmd, capture_output)
+                if cmd == ["git", "ls-remote", "--heads", "origin"]:
+                    self.move(origin, "stale-03")
+                    self.git(["update-ref", "-d", "refs/heads/stale-05"], origin)
+                return result
+            sweeper._run_command = racing_run_command
+
+        exit_code, results, _ = self.apply(paths, plan_path, "raced", hook=move_after_listing)
+        heads = self.heads(origin)
+
+        return all([
+            self.check(exit_code == 0, "apply succeeds"),
+            self.check(results["stale-03"] == ("skipped", "changed since the plan") and "stale-03" in heads,
+                       "the moved branch was not deleted"),
+            self.check(results["stale-05"][0] == "already_deleted", "the branch deleted meanwhile is reported"),
+            self.check(results["stale-04"][0] == "deleted" and "stale-04" not in heads,
+                       "the rest of its batch was deleted"),
+        ])
+
+    def apply_script(self, paths, name, api_url, **options):
+        """Run apply_plan() from the work clone against an API; return its exit code and the origin's heads."""
+        cwd = os.getcwd()
+        os.environ["SWEEPER_API_URL"] = api_url
+        os.chdir(paths["work"])
+        try:
+            exit_code = apply_plan(str(self.work_dir / f"{name}.plan.json"), summary_details="",
+                                   pull_request_lookup=False, **options)
+        finally:
+            os.chdir(cwd)
+            os.environ.pop("SWEEPER_API_URL", None)
+        return exit_code, self.heads(paths["origin"])
+
+    def test_apply_script(self):
+        """apply_plan() takes the run configuration from the plan and protection from the API."""
+        paths, _, _ = self.plan("scripted")
+        before = self.heads(paths["origin"])
+        server = start_standin(self.plan_spec(), "owner/repo", origin=paths["origin"])
+        # Protected after the plan was reviewed
+        server.state.add_ruleset("keep", ["refs/heads/stale-05"])
+        try:
+            checked_code, checked_heads = self.apply_script(paths, "scripted", server.url, dry_run=True)
+            exit_code, heads = self.apply_script(paths, "scripted", server.url)
+        finally:
+            server.shutdown()
+
+        return all([
+            self.check(checked_code == 0 and checked_heads == before, "a checking run deletes nothing"),
+            self.check(exit_code == 0, "apply succeeds"),
+            self.check(not any(name.startswith(("stale-", "old-")) for name in heads if name != "stale-05"),
+                       "planned branches deleted"),
+            self.check("stale-05" in heads, "a branch protected since the plan is kept"),
+            self.check({"main", "develop", "open-00"} <= set(heads), "other branches kept"),
+        ])
+
+    def test_protection_unavailable(self):
+        """A plan is rejected when protection cannot be looked up."""
+        paths, _, _ = self.plan("unprotected")
+        before = self.heads(paths["origin"])
+        exit_code, heads = self.apply_script(paths, "unprotected", "http://127.0.0.1:9")
+
+        return all([
+            self.check(exit_code == 1, "the plan is rejected"),
+            self.check(heads == before, "nothing was deleted"),
+        ])
+
+    def test_action_dry_run(self):
+        """The action passes its dry_run input on when it applies a plan."""
+        action = (Path(__file__).resolve().parent.parent / "action.yml").read_text()
+        call = re.search(r"sys\.exit\(apply_plan\((.*?)\n\s*\)\)", action, re.DOTALL)
+        assignment = action.find("dry_run = ")
+
+        return all([
+            self.check(call is not None and "dry_run=dry_run," in call.group(1), "apply_plan() gets dry_run"),
+            self.check(0 <= assignment < (call.start() if call else -1), "dry_run is set before the plan is applied"),
+        ])
+
+    def tests(self):
+        """The deletion plan tests, in order."""
+        return [
+            ("Plan File", self.test_plan_file),
+            ("Apply", self.test_apply),
+            ("Moved During Apply", self.test_moved_during_apply),
+            ("Apply Script", self.test_apply_script),
+            ("Protection Unavailable", self.test_protection_unavailable),
+            ("Action Dry Run", self.test_action_dry_run),
+        ]
+
+
+def main():
+    """Run the deletion plan tests."""
+    return run_suite(DeletionPlanTester, "Test the plan/apply split")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
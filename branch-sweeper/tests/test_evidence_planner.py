@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_evidence_planner.py
+
+"""
+Tests of the lazy evidence planner.
+
+A lazy sweep must delete exactly what a full sweep deletes while running
+merge checks only for the branches whose age leaves the decision open, and
+it must try the checks cheapest first.
+"""
+
+import json
+import os
+import sys
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from branch_sweeper import BranchSweeper
+from evidence_planner import EvidencePlanner, evidence_needed, unchecked_decision
+from synthetic_repository import BranchSpec, RepositorySpec, build_repository
+
+DAY = 86400
+
+
+class EvidencePlannerTester(SweeperTester):
+    """Exercise lazy, cost-ordered merge evidence."""
+
+    prefix = "sweeper-evidence-test-"
+
+    def test_evidence_needed(self):
+        """Evidence is only needed where the policy's answer depends on it."""
+        now = 1000 * DAY
+        cutoff, unmerged_cutoff = now - 14 * DAY, now - 30 * DAY
+        short_unmerged_cutoff = now - 7 * DAY
+
+        return all([
+            self.check(not evidence_needed(now - 3 * DAY, cutoff, unmerged_cutoff), "recent branches: kept either way"),
+            self.check(evidence_needed(now - 20 * DAY, cutoff, unmerged_cutoff), "stale branches: merged decides"),
+            self.check(not evidence_needed(now - 40 * DAY, cutoff, unmerged_cutoff), "old branches: deleted either way"),
+            self.check(evidence_needed(now - 10 * DAY, cutoff, short_unmerged_cutoff),
+                       "an unmerged cutoff shorter than the threshold makes recent branches depend on it"),
+            self.check(unchecked_decision(now - 40 * DAY, cutoff, unmerged_cutoff, 30)
+                       == ("delete", "unmerged for over 30 days"), "old branches deleted by age"),
+            self.check(unchecked_decision(now - 3 * DAY, cutoff, unmerged_cutoff, 30) == ("kept", "not stale"),
+                       "recent branches kept as not stale"),
+        ])
+
+    def test_cheapest_first(self):
+        """Checks run in order and stop at the first evidence; skipped ones are counted."""
+        calls = []
+
+        def check(name, merged):
+            def run(branch):
+                calls.append((name, branch))
+                return f"{branch} merged ({name})" if branch in merged else None
+            return run
+
+        planner = EvidencePlanner([
+            ("containment", check("containment", {"contained"})),
+            ("pull_request", check("pull_request", {"via-pr"})),
+            ("message", check("message", {"via-message"})),
+        ])
+        found = [planner.evidence(branch) for branch in ("contained", "via-pr", "via-message", "unmerged")]
+        planner.skip()
+
+        return all([
+            self.check(found[0] == "contained merged (containment)" and found[3] is None, "first evidence returned"),
+            self.check(calls[:2] == [("containment", "contained"), ("containment", "via-pr")],
+                       "containment answers first"),
+            self.check(planner.run == {"containment": 4, "pull_request": 3, "message": 2}, f"checks run {planner.run}"),
+            self.check(planner.avoided == {"containment": 1, "pull_request": 2, "message": 3},
+                       f"checks avoided {planner.avoided}"),
+            self.check("1 branches decided by age alone" in planner.describe(), "summary line"),
+        ])
+
+    def sweep(self, name, paths, **options):
+        """Dry-run the work clone; return (sweeper, {branch: record})."""
+        results_path = self.work_dir / f"{name}.ndjson"
+        cwd = os.getcwd()
+        os.chdir(paths["work"])
+        try:
+            sweeper = BranchSweeper(
+                dry_run=True,
+                weeks_threshold=2,
+                default_branch="main",
+                protected_branches="develop",
+                repo="owner/repo",
+                results=[f"ndjson:{results_path}"],
+                summary_details="",
+                pull_request_lookup=False,
+                **options,
+            )
+            sweeper.run()
+            with open("summary.md") as f:
+                summary = f.read()
+        finally:
+            os.chdir(cwd)
+        with open(results_path) as f:
+            records = {record["branch"]: record for record in map(json.loads, f) if "branch" in record}
+        return sweeper, records, summary
+
+    def test_lazy_matches_full(self):
+        """Lazy sweeps delete what full sweeps delete, with merge checks only for stale branches."""
+        branches = []
+        for kind in ("merged", "squashed", "unmerged"):
+            branches += [BranchSpec(f"{kind}-{age:03d}", kind, age_days=age) for age in (2, 8, 18, 25, 45, 90)]
+        spec = RepositorySpec(default_branch="main", protected=["develop"], branches=branches)
+        paths = build_repository(spec, self.work_dir / "repo")
+
+        full, full_records, _ = self.sweep("full", paths)
+        lazy, lazy_records, summary = self.sweep("lazy", paths, lazy_evidence=True)
+        _, batched_records, _ = self.sweep("batched", paths, lazy_evidence=True, merge_engine="batched")
+
+        def deleted(records):
+            return {name for name, record in records.items() if record["action"] == "would_delete"}
+
+        stale = [name for name in full_records if name.endswith(("-018", "-025"))]
+        full_checks = full.timer.phases["merge_check"]["calls"]
+        lazy_checks = lazy.timer.phases["merge_check"]["calls"]
+        planner = lazy.evidence_planner
+        return all([
+            self.check(deleted(lazy_records) == deleted(full_records), f"{len(deleted(lazy_records))} same deletions"),
+            self.check(deleted(batched_records) == deleted(full_records), "the batched engine agrees"),
+            self.check(all(lazy_records[name]["reason"] == full_records[name]["reason"] for name in stale),
+                       "stale branches get their full decision"),
+            self.check(lazy_records["unmerged-002"]["reason"] == "not stale" and
+                       lazy_records["merged-090"]["evidence"].startswith("not checked"),
+                       "branches decided by age say so"),
+            self.check(lazy_checks == len(stale) and full_checks == len(branches),
+                       f"{lazy_checks} merge checks instead of {full_checks}"),
+            self.check(planner.decided_by_age == len(branches) - len(stale), "the rest were decided by age alone"),
+            self.check(sum(planner.avoided.values()) > 3 * planner.decided_by_age,
+                       f"{sum(planner.avoided.values())} checks avoided"),
+            self.check("- Evidence planner: " in summary, "summary reports the planner"),
+        ])
+
+    def tests(self):
+        """The evidence planner tests, in order."""
+        return [
+            ("Evidence Needed", self.test_evidence_needed),
+            ("Cheapest First", self.test_cheapest_first),
+            ("Lazy Matches Full", self.test_lazy_matches_full),
+        ]
+
+
+def main():
+    """Run the evidence planner tests."""
+    return run_suite(EvidencePlannerTester, "Test the lazy evidence planner")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_github_api.py
+
+"""
+Tests of the production GitHub API code paths against the local API stand-in.
+
+The sweeper runs in non-test mode against a synthetic repository with a
+file:// origin, while pull request lookups, the protected branch listing and
+the installation token exchange go to the stand-in through SWEEPER_API_URL.
+"""
+
+import http.server
+import json
+import os
+import sys
+import threading
+import time
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from branch_sweeper import BranchSweeper
+from fetch_protected_branches import fetch_protected_branches
+from github_api import APIError, GitHubAPI
+from github_api_standin import start_standin
+from github_auth import get_installation_token
+from synthetic_repository import BranchSpec, RepositorySpec, build_repository, random_spec
+
+REPO = "owner/repo"
+
+
+class GitHubAPITester(SweeperTester):
+    """Exercise the GitHub API code paths against the local stand-in."""
+
+    prefix = "sweeper-api-test-"
+
+    def test_pull_request_lookup(self):
+        """A squash-merged branch is only recognised through its merged pull request."""
+        spec = RepositorySpec(
+            default_branch="main",
+            protected=["develop"],
+            branches=[
+                BranchSpec("feature-squashed", "squashed", age_days=42, pr_number=7),
+                BranchSpec("feature-merged", "merged", age_days=42),
+                BranchSpec("feature-stale", "unmerged", age_days=21),
+            ],
+        )
+        paths = build_repository(spec, self.work_dir / "lookup")
+        server = start_standin(spec, REPO, origin=paths["origin"])
+        os.environ["SWEEPER_API_URL"] = server.url
+        results_path = self.work_dir / "lookup-results.ndjson"
+
+        cwd = os.getcwd()
+        os.chdir(paths["work"])
+        try:
+            sweeper = BranchSweeper(
+                dry_run=True,
+                weeks_threshold=2,
+                default_branch="main",
+                protected_branches="develop",
+                repo=REPO,
+                results=[f"ndjson:{results_path}"],
+                summary_details="",
+            )
+            exit_code = sweeper.run()
+        finally:
+            os.chdir(cwd)
+            os.environ.pop("SWEEPER_API_URL", None)
+            server.shutdown()
+
+        with open(results_path) as f:
+            actions = {record["branch"]: record["action"] for record in map(json.loads, f) if "branch" in record}
+
+        return all([
+            self.check(exit_code == 0, "sweeper run succeeds"),
+            self.check(actions.get("feature-squashed") == "would_delete", "squash-merged branch found via its PR"),
+            self.check(actions.get("feature-merged") == "would_delete", "merged branch found via git"),
+            self.check(actions.get("feature-stale") == "kept", "unmerged branch without a PR is kept"),
+            self.check(server.state.requests.get("GET pulls", 0) == 3, "one pulls request per feature branch"),
+        ])
+
+    def test_pull_request_listing_cutoff(self):
+        """The bulk listing stops at pull requests older than the oldest branch."""
+        spec = RepositorySpec(
+            default_branch="main",
+            branches=[
+                BranchSpec("feature-squashed", "squashed", age_days=42, pr_number=7),
+                BranchSpec("feature-stale", "unmerged", age_days=60),
+            ],
+        )
+        paths = build_repository(spec, self.work_dir / "cutoff")
+        server = start_standin(spec, REPO, origin=paths["origin"])
+        # Years of pull requests of branches deleted long ago
+        for number in range(1000, 1450):
+            server.state.add_pull(number, f"old/{number}", spec.now - (400 + number % 300) * 86400)
+        os.environ["SWEEPER_API_URL"] = server.url
+        results_path = self.work_dir / "cutoff-results.ndjson"
+
+        cwd = os.getcwd()
+        os.chdir(paths["work"])
+        try:
+            api = GitHubAPI(REPO)
+            everything = api.merged_pull_requests()
+            pages_everything = server.state.requests.get("GET pulls", 0)
+            recent = api.merged_pull_requests("2000-01-01T00:00:00Z")
+            pages_before = server.state.requests.get("GET pulls", 0)
+            exit_code = BranchSweeper(dry_run=True, weeks_threshold=2, default_branch="main", protected_branches="",
+                                      repo=REPO, merge_engine="batched", results=[f"ndjson:{results_path}"],
+                                      summary_details="").run()
+            pages_sweep = server.state.requests.get("GET pulls", 0) - pages_before
+        finally:
+            os.chdir(cwd)
+            os.environ.pop("SWEEPER_API_URL", None)
+            server.shutdown()
+
+        with open(results_path) as f:
+            actions = {record["branch"]: record["action"] for record in map(json.loads, f) if "branch" in record}
+
+        return all([
+            self.check(len(everything) == 451 and recent == everything and pages_everything == 5,
+                       "without a cutoff every page is listed"),
+            self.check(exit_code == 0 and actions.get("feature-squashed") == "would_delete",
+                       "the squash-merged branch is still found"),
+            self.check(pages_sweep == 1, f"the sweep listed {pages_sweep} page(s) of pull requests"),
+        ])
+
+    def test_protected_branches_pagination(self):
+        """fetch_protected_branches follows Link pagination."""
+        spec = random_spec(5, protected_count=150)
+        server = start_standin(spec, REPO)
+        os.environ["SWEEPER_API_URL"] = server.url
+        try:
+            branches = fetch_protected_branches(REPO).split()
+        finally:
+            os.environ.pop("SWEEPER_API_URL", None)
+            server.shutdown()
+
+        return all([
+            self.check(len(branches) == 150, "all 150 protected branches returned"),
+            self.check(server.state.requests.get("GET branches") == 2, "two pages requested"),
+        ])
+
+    def test_rate_limit_retry(self):
+        """Rate limited requests are retried after Retry-After."""
+        spec = random_spec(3)
+        server = start_standin(spec, REPO, rate_limit=2, rate_window=1.0)
+        api = GitHubAPI(REPO, base_url=server.url, max_retry_wait=2.0)
+        started = time.perf_counter()
+        try:
+            found = [api.merged_pull_request(branch.name) for branch in spec.branches for _ in range(2)]
+        finally:
+            server.shutdown()
+
+        return all([
+            self.check(len(found) == 6, "all requests eventually succeed"),
+            self.check(server.state.rate_limited >= 1, "the stand-in rate limited at least once"),
+            self.check(time.perf_counter() - started >= 1.0, "the client waited for the window to reset"),
+        ])
+
+    def test_installation_token(self):
+        """The installation token exchange goes through the API client."""
+        server = start_standin(random_spec(1), REPO)
+        os.environ["SWEEPER_API_URL"] = server.url
+        try:
+            token = get_installation_token("jwt-token", "1")
+        finally:
+            os.environ.pop("SWEEPER_API_URL", None)
+            server.shutdown()
+
+        return self.check(token.startswith("ghs_standin"), "installation token issued by the stand-in")
+
+    def test_unparsable_response(self):
+        """A successful response that is not JSON raises an APIError like a failed one."""
+
+        class HtmlHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = b"<html>Service unavailable</html>"
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), HtmlHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            api = GitHubAPI(REPO, base_url=f"http://127.0.0.1:{server.server_port}", token="", max_retries=0)
+            try:
+                api.merged_pull_request("feature")
+                error = None
+            except APIError as e:
+                error = e
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        return all([
+            self.check(error is not None, "an APIError is raised"),
+            self.check(error is not None and error.status == 200 and "unparsable" in str(error),
+                       "the error names the status and the unparsable body"),
+        ])
+
+    def tests(self):
+        """The GitHub API tests, in order."""
+        return [
+            ("Pull Request Lookup", self.test_pull_request_lookup),
+            ("Pull Request Listing Cutoff", self.test_pull_request_listing_cutoff),
+            ("Protected Branches Pagination", self.test_protected_branches_pagination),
+            ("Rate Limit Retry", self.test_rate_limit_retry),
+            ("Installation Token", self.test_installation_token),
+            ("Unparsable Response", self.test_unparsable_response),
+        ]
+
+
+def main():
+    """Run the GitHub API tests."""
+    return run_suite(GitHubAPITester, "Test the GitHub API code paths against a local stand-in")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
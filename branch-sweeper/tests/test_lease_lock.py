@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_lease_lock.py
+
+"""
+Tests of the refs/janitor/lock sweep lease.
+
+Two clones of a synthetic repository with a file:// origin stand in for two
+overlapping sweeper runs.
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from branch_sweeper import BranchSweeper
+from lease_lock import LOCK_REF, LeaseLock
+from synthetic_repository import BranchSpec, RepositorySpec, build_repository
+
+
+class LeaseLockTester(SweeperTester):
+    """Exercise the sweep lease with two competing clones."""
+
+    prefix = "sweeper-lease-test-"
+
+    def setup(self, name):
+        """Build a repository with one stale merged branch and a second clone of its origin."""
+        spec = RepositorySpec(default_branch="main", branches=[BranchSpec("feature-old", "merged", age_days=40)])
+        paths = build_repository(spec, self.work_dir / name)
+        other = self.work_dir / name / "other"
+        subprocess.run(["git", "clone", "-q", str(paths["origin"]), str(other)], check=True)
+        return paths, other
+
+    def runner(self, cwd):
+        """A run_command bound to one clone."""
+        def run_command(cmd):
+            return subprocess.run(cmd, cwd=cwd, capture_output=True, text=True, check=False)
+        return run_command
+
+    def lock_exists(self, origin):
+        """Whether the lease ref exists on the origin."""
+        result = subprocess.run(["git", "--git-dir", str(origin), "rev-parse", "--verify", "-q", LOCK_REF],
+                                capture_output=True, text=True, check=False)
+        return result.returncode == 0
+
+    def test_exclusive(self):
+        """Only one sweeper can hold the lease."""
+        paths, other = self.setup("exclusive")
+        first = LeaseLock(self.runner(paths["work"]), ttl=60, owner="first")
+        second = LeaseLock(self.runner(other), ttl=60, owner="second")
+
+        first_acquired = first.acquire()
+        first_held = first.held
+        started = time.perf_counter()
+        second_acquired = second.acquire()
+        elapsed = time.perf_counter() - started
+        first.release()
+
+        return all([
+            self.check(first_acquired and first_held, "first sweeper holds the lease"),
+            self.check(not second_acquired, "second sweeper is refused"),
+            self.check(second.holder.get("owner") == "first", "second sweeper sees the holder"),
+            self.check(elapsed < 5.0, f"refusal is fast ({elapsed:.2f}s)"),
+            self.check(not self.lock_exists(paths["origin"]), "release deletes the lease ref"),
+        ])
+
+    def test_expiry_takeover(self):
+        """An expired lease is taken over and its old holder notices on renewal."""
+        paths, other = self.setup("expiry")
+        first = LeaseLock(self.runner(paths["work"]), ttl=1, owner="first")
+        second = LeaseLock(self.runner(other), ttl=60, owner="second")
+
+        first.acquire()
+        time.sleep(1.5)
+        taken_over = second.acquire()
+        renewed = first.renew()
+        first.release()
+        still_locked = self.lock_exists(paths["origin"])
+        second.release()
+
+        return all([
+            self.check(taken_over, "second sweeper takes over the expired lease"),
+            self.check(not renewed and first.lost.is_set(), "first sweeper loses the lease on renewal"),
+            self.check(still_locked, "the old holder does not release the new holder's lease"),
+            self.check(not self.lock_exists(paths["origin"]), "the new holder releases it"),
+        ])
+
+    def test_wait(self):
+        """A waiting sweeper gets the lease as soon as it is released."""
+        paths, other = self.setup("wait")
+        first = LeaseLock(self.runner(paths["work"]), ttl=60, owner="first")
+        second = LeaseLock(self.runner(other), ttl=60, owner="second")
+
+        first.acquire()
+        first.start_renewal()
+        releaser = threading.Timer(1.0, first.release)
+        releaser.start()
+        started = time.perf_counter()
+        acquired = second.acquire(wait=20.0, poll_interval=0.3)
+        elapsed = time.perf_counter() - started
+        releaser.join()
+        second.release()
+
+        return all([
+            self.check(acquired, "waiting sweeper acquires the lease"),
+            self.check(1.0 <= elapsed < 10.0, f"acquired shortly after the release ({elapsed:.2f}s)"),
+        ])
+
+    def test_sweeper_exits(self):
+        """A sweeper run exits without touching branches while another run holds the lease."""
+        paths, other = self.setup("sweeper")
+        holder = LeaseLock(self.runner(other), ttl=60, owner="scheduled-run")
+        holder.acquire()
+
+        def sweep():
+            sweeper = BranchSweeper(
+                dry_run=False,
+                weeks_threshold=2,
+                default_branch="main",
+                repo="owner/repo",
+                summary_details="",
+                pull_request_lookup=False,
+                lease="exit",
+            )
+            return sweeper.run(), sweeper.summary.deleted_count
+
+        cwd = os.getcwd()
+        os.chdir(paths["work"])
+        try:
+            blocked_exit, blocked_deleted = sweep()
+            holder.release()
+            exit_code, deleted = sweep()
+        finally:
+            os.chdir(cwd)
+
+        return all([
+            self.check(blocked_exit == 0 and blocked_deleted == 0, "blocked run exits without deleting"),
+            self.check(exit_code == 0 and deleted == 1, "run after the release deletes the stale branch"),
+            self.check(not self.lock_exists(paths["origin"]), "the sweeper releases its lease"),
+        ])
+
+    def tests(self):
+        """The lease tests, in order."""
+        return [
+            ("Exclusive Lease", self.test_exclusive),
+            ("Expiry Takeover", self.test_expiry_takeover),
+            ("Wait For Lease", self.test_wait),
+            ("Sweeper Exits While Locked", self.test_sweeper_exits),
+        ]
+
+
+def main():
+    """Run the sweep lease tests."""
+    return run_suite(LeaseLockTester, "Test the refs/janitor/lock sweep lease")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_merge_equivalence.py
+
+"""
+Differential harness for the merge detection engines.
+
+Every round builds a randomized repository (prefix-colliding and dotted branch
+names, stacked branches, squash merges, "|" in merge messages, ages around the
+thresholds) with a file:// origin and a local GitHub API stand-in, then runs the
+sweeper with the reference per-branch evaluator and with the batched engine.
+Per-branch verdicts and deletion plans must be identical. A mismatching case is
+shrunk with delta debugging to a minimal repository and saved as JSON, which can
+be replayed with --replay.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import TerminalColors, isolate_environment  # isort: skip
+from branch_sweeper import BranchSweeper
+from github_api_standin import start_standin
+from synthetic_repository import MERGE_KINDS, BranchSpec, RepositorySpec, build_repository
+
+REPO = "owner/repo"
+
+# Names chosen so that some are prefixes or regex-lookalikes of others
+NAME_POOL = [
+    "a", "ab", "a-b", "a.b", "axb", "fix", "fix-1", "fix.1", "fix-10", "main-hotfix", "develop2",
+    "feature/x", "feature/x-y", "feature/xy", "release/1-fix", "release/1.x", "a|b", "a+b", "a(b)",
+]
+EXTRA_PROTECTED = ["develop", "release/1", "main-old"]
+AGE_POOL = [0, 1, 13, 14, 15, 29, 30, 31, 45, 120, 400]
+
+Verdicts = Dict[str, Tuple[str, str, object]]
+
+
+class VerdictSink:
+    """Results sink that keeps the decision for every branch in memory."""
+
+    def __init__(self):
+        self.verdicts: Verdicts = {}
+
+    def write(self, record: Dict) -> None:
+        self.verdicts[record["branch"]] = (record["action"], record["reason"], record.get("merged"))
+
+    def flush(self) -> None:
+        pass
+
+    def close(self, counts: Dict[str, int]) -> None:
+        pass
+
+
+def random_case(rng: random.Random, branch_count: int) -> Tuple[RepositorySpec, bool]:
+    """Return a randomized repository spec and whether pull requests are looked up."""
+    protected = rng.sample(EXTRA_PROTECTED, rng.randint(0, len(EXTRA_PROTECTED)))
+    names = rng.sample(NAME_POOL, min(branch_count, len(NAME_POOL)))
+
+    branches: List[BranchSpec] = []
+    for index, name in enumerate(names):
+        kind = rng.choice(MERGE_KINDS)
+        targets = ["main"] + protected + [branch.name for branch in branches]
+        message = ""
+        if kind != "unmerged" and rng.random() < 0.3:
+            # Messages containing the reference pattern literally, "|" included
+            message = rng.choice([
+                f"Merge {name}|Merge branch {name}|Merge pull request {name}|{name} into main",
+                f"Merge.*{name}|x",
+                f"{name} into main",
+                f"Merge branch '{name}' into main",
+            ])
+        branches.append(BranchSpec(
+            name=name,
+            kind=kind,
+            age_days=rng.choice(AGE_POOL),
+            depth=rng.randint(1, 2),
+            target=rng.choice(targets),
+            pr_number=index + 1,
+            merge_message=message,
+        ))
+
+    return RepositorySpec(default_branch="main", protected=protected, branches=branches), rng.random() < 0.7
+
+
+def run_engine(spec: RepositorySpec, root: Path, engine: str, pull_request_lookup: bool) -> Verdicts:
+    """Build the repository for a spec and return the verdicts of one engine."""
+    # Date the fixture an hour back so ages that sit exactly on a threshold
+    # cannot land on different sides of it in the two runs
+    spec.now = int(time.time()) - 3600
+    paths = build_repository(spec, root)
+    server = start_standin(spec, REPO, origin=paths["origin"])
+    sink = VerdictSink()
+
+    cwd = os.getcwd()
+    os.environ["SWEEPER_API_URL"] = server.url
+    os.chdir(paths["work"])
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            sweeper = BranchSweeper(
+                dry_run=True,
+                weeks_threshold=2,
+                default_branch=spec.default_branch,
+                protected_branches=" ".join(spec.protected),
+                repo=REPO,
+                summary_details="",
+                pull_request_lookup=pull_request_lookup,
+                merge_engine=engine,
+            )
+            sweeper.results.add_sink(sink)
+            sweeper.run()
+    finally:
+        os.chdir(cwd)
+        os.environ.pop("SWEEPER_API_URL", None)
+        server.shutdown()
+    return sink.verdicts
+
+
+def differences(reference: Verdicts, batched: Verdicts) -> Dict[str, Tuple]:
+    """Return {branch: (reference verdict, batched verdict)} for every differing branch."""
+    return {
+        branch: (reference.get(branch), batched.get(branch))
+        for branch in sorted(set(reference) | set(batched))
+        if reference.get(branch) != batched.get(branch)
+    }
+
+
+def compare(spec: RepositorySpec, root: Path, pull_request_lookup: bool) -> Dict[str, Tuple]:
+    """Run both engines on a spec and return their differing verdicts."""
+    reference = run_engine(spec, root / "reference", "reference", pull_request_lookup)
+    batched = run_engine(spec, root / "batched", "batched", pull_request_lookup)
+    return differences(reference, batched)
+
+
+def deletion_plan(verdicts: Verdicts) -> List[str]:
+    """Branches a verdict set would delete."""
+    return sorted(branch for branch, (action, _, _) in verdicts.items() if action == "would_delete")
+
+
+def ddmin(items: List, failing: Callable[[List], bool]) -> List:
+    """Delta debugging: return a 1-minimal sublist of items for which failing() still holds."""
+    granularity = 2
+    while len(items) >= 2:
+        chunk = -(-len(items) // granularity)
+        subsets = [items[start:start + chunk] for start in range(0, len(items), chunk)]
+        reduced = False
+
+        for subset in subsets:
+            if failing(subset):
+                items, granularity, reduced = subset, 2, True
+                break
+
+        if not reduced:
+            for index in range(len(subsets)):
+                complement = [item for other, subset in enumerate(subsets) if other != index for item in subset]
+                if failing(complement):
+                    items, granularity, reduced = complement, max(granularity - 1, 2), True
+                    break
+
+        if not reduced:
+            if granularity >= len(items):
+                break
+            granularity = min(len(items), granularity * 2)
+    return items
+
+
+def shrink(spec: RepositorySpec, root: Path, pull_request_lookup: bool) -> RepositorySpec:
+    """Reduce a mismatching spec to a minimal set of branches and protected branches."""
+    attempt = [0]
+
+    def with_parts(branches: List[BranchSpec], protected: List[str]) -> RepositorySpec:
+        return RepositorySpec(default_branch=spec.default_branch, protected=protected, branches=branches)
+
+    def failing(candidate: RepositorySpec) -> bool:
+        attempt[0] += 1
+        return bool(compare(candidate, root / f"shrink-{attempt[0]}", pull_request_lookup))
+
+    branches = ddmin(list(spec.branches), lambda subset: failing(with_parts(subset, spec.protected)))
+    protected = list(spec.protected)
+    for name in list(protected):
+        candidate = [other for other in protected if other != name]
+        if failing(with_parts(branches, candidate)):
+            protected = candidate
+
+    print(f"Shrunk to {len(branches)} branches and {len(protected)} extra protected branches "
+          f"in {attempt[0]} attempts")
+    return with_parts(branches, protected)
+
+
+def report(mismatches: Dict[str, Tuple]) -> None:
+    """Print the differing verdicts."""
+    for branch, (reference, batched) in mismatches.items():
+        print(f"  {branch}:")
+        print(f"    reference: {reference}")
+        print(f"    batched:   {batched}")
+
+
+def main():
+    """Run the differential merge detection harness."""
+    parser = argparse.ArgumentParser(description="Check that the batched merge engine matches the reference")
+    parser.add_argument("--rounds", type=int, default=10, help="Number of randomized repositories")
+    parser.add_argument("--branches", type=int, default=12, help="Feature branches per repository")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first round")
+    parser.add_argument("--replay", default="", metavar="CASE", help="Replay a saved mismatch case")
+    parser.add_argument("--output-dir", default=".", help="Directory receiving shrunk mismatch cases")
+
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="sweeper-merge-equivalence-"))
+    isolate_environment(work_dir)
+
+    if args.replay:
+        with open(args.replay) as f:
+            case = json.load(f)
+        spec = RepositorySpec.from_dict(case["spec"])
+        mismatches = compare(spec, work_dir / "replay", case["pull_request_lookup"])
+        if mismatches:
+            print(f"{TerminalColors.RED}Case still mismatches:{TerminalColors.NC}")
+            report(mismatches)
+            return 1
+        print(f"{TerminalColors.GREEN}Engines agree on {args.replay}{TerminalColors.NC}")
+        return 0
+
+    failures = 0
+    for round_number in range(args.rounds):
+        seed = args.seed + round_number
+        spec, pull_request_lookup = random_case(random.Random(seed), args.branches)
+        root = work_dir / f"round-{seed}"
+
+        reference = run_engine(spec, root / "reference", "reference", pull_request_lookup)
+        batched = run_engine(spec, root / "batched", "batched", pull_request_lookup)
+        mismatches = differences(reference, batched)
+        plan = deletion_plan(reference)
+
+        if not mismatches and plan == deletion_plan(batched):
+            print(f"{TerminalColors.GREEN}Round {round_number + 1} (seed {seed}): {len(reference)} verdicts agree, "
+                  f"{len(plan)} deletions planned{TerminalColors.NC}")
+            continue
+
+        failures += 1
+        print(f"{TerminalColors.RED}Round {round_number + 1} (seed {seed}): "
+              f"{len(mismatches)} verdicts differ{TerminalColors.NC}")
+        report(mismatches)
+
+        minimal = shrink(spec, root, pull_request_lookup)
+        case_path = Path(args.output_dir) / f"merge-mismatch-seed{seed}.json"
+        with open(case_path, "w") as f:
+            json.dump({"seed": seed, "pull_request_lookup": pull_request_lookup, "spec": minimal.to_dict()}, f,
+                      indent=2)
+        print(f"{TerminalColors.YELLOW}Minimal repro written to {case_path} "
+              f"(replay with --replay {case_path}){TerminalColors.NC}")
+        report(compare(minimal, root / "minimal", pull_request_lookup))
+
+    print(f"\n{TerminalColors.GREEN if not failures else TerminalColors.RED}"
+          f"Tests completed: {args.rounds - failures}/{args.rounds} passed{TerminalColors.NC}")
+    return 0 if not failures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_metrics.py
+
+"""
+Tests of the OpenMetrics export.
+
+The registry must render counters and histograms in both text formats and
+push them to a Pushgateway under the repository's grouping key, and a sweep
+must export its metrics however it ends, including when it gives up before
+evaluating any branch.
+"""
+
+import base64
+import http.server
+import os
+import sys
+import threading
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from branch_sweeper import BranchSweeper
+from metrics import MetricsRegistry
+from synthetic_repository import build_local_repository, scenario_spec
+
+
+class PushgatewayHandler(http.server.BaseHTTPRequestHandler):
+    """Record PUT requests the way a Pushgateway would accept them."""
+
+    def do_PUT(self):
+        """Store the path and body of the push."""
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8")
+        self.server.pushes.append((self.path, self.headers["Content-Type"], body))
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        """Keep the test output quiet."""
+
+
+class MetricsTester(SweeperTester):
+    """Exercise the metrics registry and the sweeper's metrics export."""
+
+    prefix = "sweeper-metrics-test-"
+
+    def test_rendering(self):
+        """Counters and histograms render in the OpenMetrics and classic formats."""
+        registry = MetricsRegistry({"repo": 'owner/"repo"'})
+        registry.inc("branch_decisions", 2, "Branch decisions by action", action="kept")
+        registry.inc("branch_decisions", 1, "Branch decisions by action", action="kept")
+        registry.observe("run_duration_seconds", 0.3, "Wall time of a sweeper run")
+        registry.observe("run_duration_seconds", 7.0, "Wall time of a sweeper run")
+        openmetrics = registry.render().splitlines()
+        classic = registry.render(openmetrics=False).splitlines()
+
+        prom_path = self.work_dir / "sweeper.prom"
+        registry.write_textfile(str(prom_path))
+
+        labels = 'repo="owner/\\"repo\\"",action="kept"'
+        return all([
+            self.check(f"branch_sweeper_branch_decisions_total{{{labels}}} 3" in openmetrics,
+                       "counters add up and escape label values"),
+            self.check("# TYPE branch_sweeper_branch_decisions counter" in openmetrics and openmetrics[-1] == "# EOF",
+                       "OpenMetrics names counter families without _total and ends with # EOF"),
+            self.check("# TYPE branch_sweeper_branch_decisions_total counter" in classic and "# EOF" not in classic,
+                       "the classic format names them with _total"),
+            self.check('branch_sweeper_run_duration_seconds_bucket{repo="owner/\\"repo\\"",le="0.5"} 1' in openmetrics
+                       and 'branch_sweeper_run_duration_seconds_bucket{repo="owner/\\"repo\\"",le="+Inf"} 2' in
+                       openmetrics and 'branch_sweeper_run_duration_seconds_sum{repo="owner/\\"repo\\""} 7.3' in
+                       openmetrics, "histogram buckets are cumulative"),
+            self.check(prom_path.read_text().splitlines() == classic, ".prom files use the classic format"),
+            self.check(not [name for name in os.listdir(self.work_dir) if name.endswith(".tmp")],
+                       "no temporary files left behind"),
+        ])
+
+    def test_push(self):
+        """Metrics are PUT to the Pushgateway under a base64 grouping key."""
+        server = http.server.HTTPServer(("127.0.0.1", 0), PushgatewayHandler)
+        server.pushes = []
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            registry = MetricsRegistry({"repo": "owner/repo"})
+            registry.inc("runs", 1, "Sweeper runs by mode and outcome", mode="delete", outcome="success")
+            pushed = registry.push(f"http://127.0.0.1:{server.server_port}/")
+            unreachable = registry.push("http://127.0.0.1:9/", timeout=1.0)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        path, content_type, body = server.pushes[0]
+        encoded = base64.urlsafe_b64encode(b"owner/repo").decode("ascii")
+        return all([
+            self.check(pushed and not unreachable, "push reports success and failure"),
+            self.check(path == f"/metrics/job/branch_sweeper/repo@base64/{encoded}", "grouping key in the URL"),
+            self.check(content_type.startswith("text/plain; version=0.0.4") and
+                       'branch_sweeper_runs_total{repo="owner/repo",mode="delete",outcome="success"} 1' in body,
+                       "classic text body"),
+        ])
+
+    def sweep(self, name, **options):
+        """Run a test-mode sweep with a metrics file; return its exit code and the exported metrics."""
+        repo = build_local_repository(scenario_spec(), self.work_dir / name)
+        metrics_path = self.work_dir / f"{name}.prom"
+        cwd = os.getcwd()
+        os.chdir(repo)
+        try:
+            exit_code = BranchSweeper(dry_run=True, weeks_threshold=4, default_branch="main",
+                                      protected_branches="develop production", repo="owner/repo", test_mode=True,
+                                      summary_details="", metrics_output=str(metrics_path), **options).run()
+        finally:
+            os.chdir(cwd)
+        return exit_code, metrics_path.read_text() if metrics_path.exists() else ""
+
+    def test_sweep_export(self):
+        """Successful and failed runs both export their metrics."""
+        exit_code, metrics = self.sweep("success")
+        failed_code, failed_metrics = self.sweep("failure", results=[f"ndjson:{self.work_dir}/missing/r.ndjson"])
+
+        return all([
+            self.check(exit_code == 0 and 'branch_sweeper_runs_total{repo="owner/repo",mode="dry_run",'
+                       'outcome="success"} 1' in metrics, "a successful run is exported"),
+            self.check('branch_sweeper_branch_decisions_total{repo="owner/repo",action="would_delete"} 5' in metrics,
+                       "branch decisions are counted"),
+            self.check('command="git branch"' in metrics and 'phase="test_mode"' in metrics,
+                       "subprocess and phase durations are observed"),
+            self.check(failed_code == 1, "a run that cannot open its results fails"),
+            self.check('branch_sweeper_runs_total{repo="owner/repo",mode="dry_run",outcome="failure"} 1' in
+                       failed_metrics and "branch_sweeper_run_duration_seconds_count" in failed_metrics,
+                       "a failed run is still exported"),
+        ])
+
+    def tests(self):
+        """The metrics tests, in order."""
+        return [
+            ("Rendering", self.test_rendering),
+            ("Push", self.test_push),
+            ("Sweep Export", self.test_sweep_export),
+        ]
+
+
+def main():
+    """Run the metrics tests."""
+    return run_suite(MetricsTester, "Test the OpenMetrics export")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
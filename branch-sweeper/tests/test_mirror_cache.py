@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_mirror_cache.py
+
+"""
+Tests of the persistent bare mirror cache.
+
+A synthetic repository with a file:// origin that allows partial clones
+stands in for GitHub; the cache directory survives between "runs" the way a
+CI cache or a runner volume would.
+"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from branch_sweeper import BranchSweeper
+from synthetic_repository import BranchSpec, RepositorySpec, build_repository
+from workspace import LAST_PRUNE_KEY, MirrorCache, use_mirror_cache
+
+REPO = "owner/repo"
+
+
+class MirrorCacheTester(SweeperTester):
+    """Exercise the mirror cache."""
+
+    prefix = "sweeper-mirror-test-"
+
+    def git(self, args, git_dir):
+        """Run git against a repository and return its stripped output."""
+        result = subprocess.run(["git", "--git-dir", str(git_dir)] + args, capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+
+    def build(self, name, size=10):
+        """A repository whose origin serves partial clones; return its paths and the mirror URL."""
+        branches = [BranchSpec(f"stale-{index}", "merged", age_days=30 + index) for index in range(size * 6 // 10)]
+        branches += [BranchSpec(f"open-{index}", "unmerged", age_days=3) for index in range(size * 4 // 10)]
+        paths = build_repository(RepositorySpec(default_branch="main", branches=branches), self.work_dir / name)
+        self.git(["config", "uploadpack.allowFilter", "true"], paths["origin"])
+        return paths, f"file://{paths['origin']}"
+
+    def test_incremental_refresh(self):
+        """The first run builds a blob-less mirror; later runs fetch only new refs and objects, and prune."""
+        paths, url = self.build("incremental", size=100)
+        cache_dir = self.work_dir / "incremental-cache"
+
+        built = MirrorCache(str(cache_dir), REPO, url)
+        mirror = built.refresh()
+        missing_blobs = [line for line in self.git(["rev-list", "--objects", "--missing=print", "--all"], mirror)
+                         .splitlines() if line.startswith("?")]
+
+        unchanged = MirrorCache(str(cache_dir), REPO, url)
+        unchanged.refresh()
+
+        origin = paths["origin"]
+        commit = self.git(["-c", "user.name=Tester", "-c", "user.email=tester@example.com",
+                           "commit-tree", "main^{tree}", "-p", "main", "-m", "New work"], origin)
+        self.git(["update-ref", "refs/heads/new-work", commit], origin)
+        self.git(["update-ref", "-d", "refs/heads/stale-0"], origin)
+        updated = MirrorCache(str(cache_dir), REPO, url)
+        updated.refresh()
+        refs = self.git(["for-each-ref", "--format=%(refname)", "refs/remotes/origin/"], mirror).split()
+
+        return all([
+            self.check(mirror is not None and built.bytes_fetched > 0, f"first run fetched {built.bytes_fetched} bytes"),
+            self.check(self.git(["rev-parse", "--is-bare-repository"], mirror) == "true", "the mirror is bare"),
+            self.check(len(missing_blobs) > 0, f"{len(missing_blobs)} blobs were left on the server"),
+            self.check(unchanged.bytes_fetched == 0, "an unchanged remote fetches nothing"),
+            self.check((built.outcome, unchanged.outcome) == ("miss", "hit"), "cache misses and hits told apart"),
+            self.check(0 < updated.bytes_fetched < built.bytes_fetched / 4,
+                       f"a new commit fetched {updated.bytes_fetched} bytes"),
+            self.check("refs/remotes/origin/new-work" in refs, "new branches appear"),
+            self.check("refs/remotes/origin/stale-0" not in refs, "deleted branches are pruned"),
+        ])
+
+    def test_scheduled_prune(self):
+        """Commits of deleted branches stay in the mirror until it is due to be rebuilt."""
+        paths, url = self.build("prune")
+        cache_dir = self.work_dir / "prune-cache"
+        mirror = MirrorCache(str(cache_dir), REPO, url).refresh()
+        open_commit = self.git(["rev-parse", "refs/heads/open-0"], paths["origin"])
+
+        def present():
+            # Only list local objects: cat-file -e would lazily fetch the commit from the promisor remote
+            return open_commit in self.git(["cat-file", "--batch-all-objects", "--batch-check=%(objectname)"], mirror)
+
+        self.git(["update-ref", "-d", "refs/heads/open-0"], paths["origin"])
+        MirrorCache(str(cache_dir), REPO, url).refresh()
+        kept_before_due = present()
+
+        self.git(["config", LAST_PRUNE_KEY, "0"], mirror)
+        expired = MirrorCache(str(cache_dir), REPO, url)
+        expired.refresh()
+
+        return all([
+            self.check(kept_before_due, "a new mirror is not pruned before its interval"),
+            self.check(not present() and expired.outcome == "expired",
+                       "the deleted branch's commit is dropped once due"),
+            self.check(MirrorCache(str(cache_dir), REPO, url).intact(), "the pruned mirror is intact"),
+        ])
+
+    def test_corruption(self):
+        """A damaged cache, or a cache of another remote, is rebuilt automatically."""
+        _, url = self.build("corrupt")
+        cache_dir = self.work_dir / "corrupt-cache"
+        mirror = MirrorCache(str(cache_dir), REPO, url).refresh()
+
+        for pack in (mirror / "objects" / "pack").glob("*.pack"):
+            pack.chmod(0o644)
+            pack.write_bytes(b"not a pack")
+        repaired = MirrorCache(str(cache_dir), REPO, url)
+        repaired_path = repaired.refresh()
+        repaired_intact = repaired.intact()
+
+        _, other_url = self.build("other")
+        moved = MirrorCache(str(cache_dir), REPO, other_url)
+        moved.refresh()
+
+        return all([
+            self.check(repaired.outcome == "rebuild" and repaired_path is not None, "corrupt cache rebuilt"),
+            self.check(repaired_intact, "rebuilt cache is intact"),
+            self.check(repaired.bytes_fetched > 0, "rebuild refetched the history"),
+            self.check(moved.rebuilt and moved.intact(), "cache of another remote rebuilt"),
+        ])
+
+    def sweep(self, cwd, name, **options):
+        """Dry-run a sweep from cwd and return {branch: (action, reason)}."""
+        results_path = self.work_dir / f"{name}.ndjson"
+        previous = os.getcwd()
+        os.chdir(cwd)
+        try:
+            sweeper = BranchSweeper(
+                dry_run=True,
+                weeks_threshold=2,
+                default_branch="main",
+                repo=REPO,
+                results=[f"ndjson:{results_path}"],
+                summary_details="",
+                pull_request_lookup=False,
+                **options,
+            )
+            exit_code = sweeper.run()
+        finally:
+            os.chdir(previous)
+
+        with open(results_path) as f:
+            results = {record["branch"]: (record["action"], record["reason"])
+                       for record in map(json.loads, f) if "branch" in record}
+        return exit_code, results
+
+    def test_sweep_against_mirror(self):
+        """The sweeper runs against the mirror with the same results as against a full checkout."""
+        paths, url = self.build("sweep")
+        cache_dir = self.work_dir / "sweep-cache"
+        run_dir = self.work_dir / "sweep-run"
+        run_dir.mkdir()
+        output_path = self.work_dir / "github-output"
+
+        os.environ["GITHUB_OUTPUT"] = str(output_path)
+        try:
+            mirror = use_mirror_cache(str(cache_dir), REPO, url)
+            metrics_path = self.work_dir / "mirrored.prom"
+            exit_code, mirrored = self.sweep(run_dir, "mirrored", mirror=mirror, metrics_output=str(metrics_path))
+        finally:
+            os.environ.pop("GIT_DIR", None)
+            os.environ.pop("GITHUB_OUTPUT", None)
+        _, checkout = self.sweep(paths["work"], "checkout")
+
+        with open(output_path) as f:
+            outputs = dict(line.strip().split("=", 1) for line in f if "=" in line)
+        checkout_free = not (run_dir / ".git").exists()
+        shutil.rmtree(run_dir)
+
+        return all([
+            self.check(mirror is not None and exit_code == 0, "sweep against the mirror succeeds"),
+            self.check(mirrored == checkout, "same result for every branch as against a full checkout"),
+            self.check(outputs.get("bytes_fetched") == str(mirror.bytes_fetched), "bytes_fetched output set"),
+            self.check('branch_sweeper_mirror_cache_refreshes_total{repo="owner/repo",outcome="miss"} 1' in
+                       metrics_path.read_text(), "the cache outcome is exported as a metric"),
+            self.check(checkout_free, "the run directory needed no checkout"),
+        ])
+
+    def test_entry_points(self):
+        """run_sweeper.py and the action hand the mirror to the sweeper, so its refresh is exported."""
+        paths, url = self.build("entry")
+        run_dir = self.work_dir / "entry-run"
+        run_dir.mkdir()
+        metrics_path = self.work_dir / "entry.prom"
+        script = Path(__file__).resolve().parent.parent / "run_sweeper.py"
+        # Pull request lookups fail fast against a closed port instead of needing gh
+        env = dict(os.environ, SWEEPER_API_URL="http://127.0.0.1:9")
+        result = subprocess.run(
+            [sys.executable, str(script), "--repo", REPO, "--default-branch", "main", "--summary-details", "",
+             "--mirror-cache", str(self.work_dir / "entry-cache"), "--url-template", url,
+             "--metrics-file", str(metrics_path)],
+            cwd=str(run_dir), env=env, capture_output=True, text=True, check=False,
+        )
+        action = (Path(__file__).resolve().parent.parent / "action.yml").read_text()
+        call = re.search(r"sweeper = BranchSweeper\((.*?)\n\s*\)", action, re.DOTALL)
+        exported = metrics_path.read_text() if metrics_path.exists() else ""
+
+        return all([
+            self.check(result.returncode == 0, f"run_sweeper.py sweeps the mirror (exit code {result.returncode})"),
+            self.check('branch_sweeper_mirror_cache_refreshes_total{repo="owner/repo",outcome="miss"} 1' in exported,
+                       "run_sweeper.py exports the mirror refresh"),
+            self.check(call is not None and "mirror=mirror," in call.group(1) and
+                       "mirror = use_mirror_cache(" in action, "the action passes its mirror to the sweeper"),
+        ])
+
+    def tests(self):
+        """The mirror cache tests, in order."""
+        return [
+            ("Incremental Refresh", self.test_incremental_refresh),
+            ("Scheduled Prune", self.test_scheduled_prune),
+            ("Corrupt Cache", self.test_corruption),
+            ("Sweep Against Mirror", self.test_sweep_against_mirror),
+            ("Entry Points", self.test_entry_points),
+        ]
+
+
+def main():
+    """Run the mirror cache tests."""
+    return run_suite(MirrorCacheTester, "Test the persistent bare mirror cache")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
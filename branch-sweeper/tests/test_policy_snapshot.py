@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_policy_snapshot.py
+
+"""
+Tests of policy snapshots and what-if simulation.
+
+A dry run writes a snapshot; simulating the same parameters against it must
+reproduce the dry run's decisions, and simulating other parameters must
+reproduce what a dry run with those parameters decides, without any git or
+API access.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SCRIPTS_DIR, SweeperTester, run_suite  # isort: skip
+from branch_sweeper import BranchSweeper
+from policy_snapshot import DAY_SECONDS, load_snapshot, policy_decision
+from simulate_policy import simulate
+from synthetic_repository import BranchSpec, RepositorySpec, build_repository
+
+
+class PolicySnapshotTester(SweeperTester):
+    """Exercise snapshots and the policy simulator."""
+
+    prefix = "sweeper-snapshot-test-"
+
+    def __init__(self):
+        """Create a scratch directory and isolate the environment."""
+        super().__init__()
+        self.paths = None
+
+    def repository(self):
+        """Build (once) a repository with merged and unmerged branches of many ages."""
+        if self.paths is None:
+            branches = [BranchSpec(f"merged-{age:03d}", "merged", age_days=age) for age in (3, 10, 20, 35, 50, 90)]
+            branches += [BranchSpec(f"unmerged-{age:03d}", "unmerged", age_days=age) for age in (5, 20, 40, 70, 100)]
+            spec = RepositorySpec(default_branch="main", protected=["develop"], branches=branches)
+            self.paths = build_repository(spec, self.work_dir / "repo")
+        return self.paths
+
+    def dry_run(self, name, **options):
+        """Dry-run the repository; return the exit code and the set of branches it would delete."""
+        paths = self.repository()
+        results_path = self.work_dir / f"{name}.ndjson"
+        cwd = os.getcwd()
+        os.chdir(paths["work"])
+        try:
+            sweeper = BranchSweeper(
+                dry_run=True,
+                default_branch="main",
+                protected_branches="develop",
+                repo="owner/repo",
+                results=[f"ndjson:{results_path}"],
+                summary_details="",
+                pull_request_lookup=False,
+                **options,
+            )
+            exit_code = sweeper.run()
+        finally:
+            os.chdir(cwd)
+        with open(results_path) as f:
+            records = [record for record in map(json.loads, f) if "branch" in record]
+        return exit_code, {record["branch"] for record in records if record["action"] == "would_delete"}
+
+    def test_policy_decision(self):
+        """The shared policy decides the way the sweeper always has."""
+        cutoff, unmerged_cutoff = 1000, 500
+        return all([
+            self.check(policy_decision(True, 900, cutoff, unmerged_cutoff, 45) == ("delete", "merged & stale"),
+                       "merged and stale"),
+            self.check(policy_decision(True, 1100, cutoff, unmerged_cutoff, 45) == ("skipped", "merged but not stale"),
+                       "merged but recent"),
+            self.check(policy_decision(False, 400, cutoff, unmerged_cutoff, 45)
+                       == ("delete", "unmerged for over 45 days"), "unmerged and past the unmerged cutoff"),
+            self.check(policy_decision(False, 900, cutoff, unmerged_cutoff, 45) == ("kept", "stale but unmerged"),
+                       "unmerged and stale"),
+            self.check(policy_decision(False, 1100, cutoff, unmerged_cutoff, 45) == ("kept", "not merged"),
+                       "unmerged and recent"),
+        ])
+
+    def test_simulation_matches_sweeps(self):
+        """Simulating a snapshot reproduces dry runs with the same and with other parameters."""
+        snapshot_path = self.work_dir / "repo.snapshot.ndjson.gz"
+        exit_code, baseline = self.dry_run("baseline", weeks_threshold=2, snapshot_output=str(snapshot_path))
+        _, tuned = self.dry_run("tuned", weeks_threshold=6, unmerged_days=80)
+
+        header, branches = load_snapshot(str(snapshot_path))
+        same = simulate(branches, 2, 30, header["created"])
+        other = simulate(branches, 6, 80, header["created"])
+        simulated = {name for names in same["delete"].values() for name in names}
+        simulated_tuned = {name for names in other["delete"].values() for name in names}
+        merged = {branch["branch"] for branch in branches if branch["merged"]}
+
+        return all([
+            self.check(exit_code == 0, "dry run succeeds"),
+            self.check(len(branches) == 13 and header["metadata"]["unmerged_days"] == 30,
+                       f"{len(branches)} branches in the snapshot"),
+            self.check(merged == {f"merged-{age:03d}" for age in (3, 10, 20, 35, 50, 90)}, "merge evidence recorded"),
+            self.check(set(same["skipped"]["protected"]) == {"develop", "main"}, "protected branches recorded"),
+            self.check(simulated == baseline, f"same parameters, same deletions ({len(simulated)})"),
+            self.check(simulated_tuned == tuned and tuned != baseline,
+                       f"other parameters match a dry run with them ({len(simulated_tuned)})"),
+        ])
+
+    def test_simulation_speed(self):
+        """A large snapshot is re-evaluated for a grid of parameters in milliseconds per set."""
+        now = 1000 * DAY_SECONDS
+        branches = [
+            {"branch": f"feature-{index}", "sha": "0" * 40, "commit_date": now - (index % 400) * DAY_SECONDS,
+             "merged": index % 3 == 0, "evidence": None, "protected": False}
+            for index in range(50000)
+        ]
+        started = time.perf_counter()
+        outcomes = [simulate(branches, weeks, days, now) for weeks in (1, 2, 4, 8) for days in (30, 60, 90)]
+        per_set = (time.perf_counter() - started) / len(outcomes)
+        deletions = [sum(len(names) for names in outcome["delete"].values()) for outcome in outcomes]
+
+        return all([
+            self.check(per_set < 0.5, f"{per_set * 1000:.0f} ms per parameter set for 50000 branches"),
+            self.check(len(set(deletions)) > 1, "parameters change the outcome"),
+        ])
+
+    def test_command_line(self):
+        """simulate_policy.py prints counts and lists for every parameter combination."""
+        snapshot_path = self.work_dir / "cli.snapshot.ndjson"
+        self.dry_run("cli", weeks_threshold=2, snapshot_output=str(snapshot_path))
+        script = SCRIPTS_DIR / "simulate_policy.py"
+        text = subprocess.run(
+            [sys.executable, str(script), str(snapshot_path), "--weeks-threshold", "2", "--weeks-threshold", "8",
+             "--unmerged-days", "30", "--list"],
+            capture_output=True, text=True, check=False,
+        )
+        as_json = subprocess.run(
+            [sys.executable, str(script), str(snapshot_path), "--unmerged-days", "45", "--unmerged-days", "200",
+             "--protected", "merged-090", "--json"],
+            capture_output=True, text=True, check=False,
+        )
+        outcomes = json.loads(as_json.stdout) if as_json.returncode == 0 else []
+
+        return all([
+            self.check(text.returncode == 0, "simulation succeeds"),
+            self.check("weeks_threshold=2 unmerged_days=30:" in text.stdout and
+                       "weeks_threshold=8 unmerged_days=30:" in text.stdout, "one line per parameter set"),
+            self.check("  merged & stale: merged-090 merged-050 merged-035 merged-020" in text.stdout,
+                       "deleted branches listed oldest first"),
+            self.check([outcome["unmerged_days"] for outcome in outcomes] == [45, 200], "JSON outcomes"),
+            self.check(outcomes and "merged-090" in outcomes[0]["skipped"]["protected"],
+                       "extra protected branches are honoured"),
+        ])
+
+    def tests(self):
+        """The snapshot tests, in order."""
+        return [
+            ("Policy Decision", self.test_policy_decision),
+            ("Simulation Matches Sweeps", self.test_simulation_matches_sweeps),
+            ("Simulation Speed", self.test_simulation_speed),
+            ("Command Line", self.test_command_line),
+        ]
+
+
+def main():
+    """Run the snapshot tests."""
+    return run_suite(PolicySnapshotTester, "Test policy snapshots and what-if simulation")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
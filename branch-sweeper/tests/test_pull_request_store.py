@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_pull_request_store.py
+
+"""
+Tests of the incrementally synced pull request store.
+
+The store syncs against the local GitHub API stand-in, which counts every
+request, so the tests can check that a second run transfers only the pull
+requests changed since the first one and that sweeps reading the store make
+the same decisions as sweeps asking the API about every branch.
+"""
+
+import json
+import os
+import sys
+import time
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from branch_sweeper import BranchSweeper
+from github_api import GitHubAPI
+from github_api_standin import start_standin
+from pull_request_store import PullRequestStore
+from synthetic_repository import BranchSpec, RepositorySpec, build_repository, random_spec
+
+REPO = "owner/repo"
+
+
+class PullRequestStoreTester(SweeperTester):
+    """Exercise the pull request store."""
+
+    prefix = "sweeper-prstore-test-"
+
+    def test_incremental_sync(self):
+        """A second sync transfers only the pull requests updated since the first, in one page."""
+        spec = random_spec(400, seed=7)
+        server = start_standin(spec, REPO)
+        api = GitHubAPI(REPO, base_url=server.url)
+        path = str(self.work_dir / "pulls.json")
+        try:
+            merged = api.merged_pull_requests()
+            first = PullRequestStore(path, REPO)
+            transferred_first = first.sync(api)
+            first.save()
+
+            now = int(time.time())
+            server.state.add_pull(9001, "late-feature", merged_at=now)
+            server.state.add_pull(9002, "another-feature", merged_at=now + 1)
+            before = dict(server.state.requests)
+            second = PullRequestStore(path, REPO)
+            transferred_second = second.sync(api)
+            second.save()
+            pages = server.state.requests.get("GET pulls", 0) - before.get("GET pulls", 0)
+        finally:
+            server.shutdown()
+
+        reread = PullRequestStore(path, REPO)
+        foreign = PullRequestStore(path, "owner/other")
+        return all([
+            self.check(transferred_first == len(server.state.pulls) - 2, f"first sync lists all {transferred_first}"),
+            self.check(first.merged_pull_requests() == merged, "the store answers like the bulk listing"),
+            self.check(transferred_second <= 3, f"second sync transferred {transferred_second} pull requests"),
+            self.check(pages == 1, f"in {pages} page"),
+            self.check(reread.merged_pull_request("late-feature")["number"] == 9001, "new pull requests stored"),
+            self.check(reread.cursor == second.cursor and reread.cursor > first.cursor, "cursor persisted"),
+            self.check(reread.pulls["9001"]["head_sha"] and reread.pulls["9001"]["merge_commit"],
+                       "head SHA and merge commit stored"),
+            self.check(not foreign.pulls and not foreign.cursor, "a store of another repository is not used"),
+        ])
+
+    def test_compaction(self):
+        """Pull requests of branches that no longer exist are dropped."""
+        store = PullRequestStore(str(self.work_dir / "compact.json"), REPO)
+        for number, head in enumerate(["alive", "gone", "alive", "also-gone"], start=1):
+            store.pulls[str(number)] = {"head": head, "head_sha": "", "merge_commit": "",
+                                        "merged_at": f"2024-01-0{number}T00:00:00Z", "title": head}
+        dropped = store.compact(["main", "alive"])
+
+        return all([
+            self.check(dropped == 2, f"{dropped} pull requests dropped"),
+            self.check(sorted(store.pulls) == ["1", "3"], "pull requests of live branches kept"),
+            self.check(store.merged_pull_request("alive")["number"] == 3, "the latest merge of a head wins"),
+            self.check(store.merged_pull_request("gone") is None, "dropped heads are not merged anymore"),
+        ])
+
+    def sweep(self, name, server, paths, **options):
+        """Dry-run the work clone against the stand-in; return {branch: (action, reason)}."""
+        results_path = self.work_dir / f"{name}.ndjson"
+        cwd = os.getcwd()
+        os.environ["SWEEPER_API_URL"] = server.url
+        os.chdir(paths["work"])
+        try:
+            sweeper = BranchSweeper(
+                dry_run=True,
+                weeks_threshold=2,
+                default_branch="main",
+                repo=REPO,
+                results=[f"ndjson:{results_path}"],
+                summary_details="",
+                **options,
+            )
+            exit_code = sweeper.run()
+        finally:
+            os.chdir(cwd)
+            os.environ.pop("SWEEPER_API_URL", None)
+        with open(results_path) as f:
+            records = [record for record in map(json.loads, f) if "branch" in record]
+        return exit_code, {record["branch"]: (record["action"], record["reason"]) for record in records}
+
+    def test_sweep_reads_store(self):
+        """Sweeps reading the store decide like per-branch API lookups, without those lookups."""
+        branches = [BranchSpec(f"pr-{index:02d}", "pr_merged", age_days=20 + index, pr_number=index + 1)
+                    for index in range(8)]
+        branches += [BranchSpec(f"wip-{index:02d}", "unmerged", age_days=20) for index in range(4)]
+        spec = RepositorySpec(default_branch="main", branches=branches)
+        paths = build_repository(spec, self.work_dir / "sweep")
+        server = start_standin(spec, REPO, origin=paths["origin"])
+        store_path = self.work_dir / "sweep.pulls.json"
+        try:
+            _, reference = self.sweep("reference", server, paths)
+            lookups = server.state.requests.get("GET pulls", 0)
+
+            # A pull request of a branch that was deleted in the meantime is compacted away
+            server.state.add_pull(500, "deleted-long-ago", merged_at=int(time.time()) - 86400)
+            before = server.state.requests.get("GET pulls", 0)
+            exit_code, stored = self.sweep("stored", server, paths, pull_request_store=str(store_path),
+                                           metrics_output=str(self.work_dir / "stored.prom"))
+            _, batched = self.sweep("batched", server, paths, pull_request_store=str(store_path),
+                                    merge_engine="batched", metrics_output=str(self.work_dir / "batched.prom"))
+            store_requests = server.state.requests.get("GET pulls", 0) - before
+        finally:
+            server.shutdown()
+
+        store = PullRequestStore(str(store_path), REPO)
+        exported = [(self.work_dir / f"{name}.prom").read_text() for name in ("stored", "batched")]
+        metric = 'branch_sweeper_pull_request_store_lookups_total{{repo="{}",result="{}"}} {}'
+        return all([
+            self.check(exit_code == 0, "sweep succeeds"),
+            self.check(stored == reference, "same decisions as per-branch API lookups"),
+            self.check(batched == reference, "the batched engine reads the store too"),
+            self.check(lookups >= len(branches) and store_requests == 2,
+                       f"{store_requests} listing requests instead of {lookups} lookups"),
+            self.check("deleted-long-ago" not in store.merged_pull_requests() and len(store.pulls) == 8,
+                       "pull requests of missing branches compacted away"),
+            self.check(all(metric.format(REPO, "hit", 8) in text and metric.format(REPO, "miss", 4) in text
+                           for text in exported), "store hits and misses exported by both engines"),
+        ])
+
+    def tests(self):
+        """The pull request store tests, in order."""
+        return [
+            ("Incremental Sync", self.test_incremental_sync),
+            ("Compaction", self.test_compaction),
+            ("Sweep Reads Store", self.test_sweep_reads_store),
+        ]
+
+
+def main():
+    """Run the pull request store tests."""
+    return run_suite(PullRequestStoreTester, "Test the incrementally synced pull request store")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
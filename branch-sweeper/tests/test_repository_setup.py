@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 # filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_repository_setup.py
 
+import argparse
 import os
 import subprocess
 import sys
@@ -196,6 +197,17 @@ class TestRepositorySetup:
 
 def main():
     """Run the test repository setup."""
+    parser = argparse.ArgumentParser(description="Set up the branch sweeper test repository")
+    parser.add_argument("--fast-import", action="store_true",
+                        help="Build the same scenarios from a single git fast-import stream")
+    args = parser.parse_args()
+    
+    if args.fast_import:
+        from synthetic_repository import build_local_repository, scenario_spec
+        repo_dir = build_local_repository(scenario_spec(), Path("./repo-test"))
+        print(f"Test repository successfully set up at {repo_dir}")
+        return 0
+    
     setup = TestRepositorySetup()
     return setup.setup()
 
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_results_writer.py
+
+"""
+Tests of the streamed per-branch results.
+
+Every sink must write the records it is given in its own format (NDJSON,
+gzip-compressed NDJSON, one JSON document, Markdown), sink specifications must
+be parsed or rejected, and the test-mode sweep must only record a deletion
+once git branch -D has succeeded.
+"""
+
+import gzip
+import json
+import os
+import subprocess
+import sys
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from branch_sweeper import BranchSweeper
+from results_writer import JsonSink, MarkdownSink, NdjsonSink, ResultSink, ResultsWriter, create_sink
+from synthetic_repository import build_local_repository, scenario_spec
+
+METADATA = {"dry_run": True, "repo": "owner/repo"}
+
+
+class ResultsWriterTester(SweeperTester):
+    """Exercise the result sinks and the writer fanning records out to them."""
+
+    prefix = "sweeper-results-test-"
+
+    def write_records(self, specs):
+        """Write the same three records to sinks created from specs; return the writer."""
+        writer = ResultsWriter([create_sink(spec, METADATA) for spec in specs])
+        writer.record("feature-a", "would_delete", "merged & stale", branch_age="2024-01-01", commit_date=1704067200)
+        writer.record("feature-b", "kept", "not merged", merged=False)
+        writer.record("develop", "skipped", "protected")
+        writer.close()
+        return writer
+
+    def test_sinks(self):
+        """Each format holds every record, and the trailers hold the counts."""
+        ndjson_path = self.work_dir / "results.ndjson"
+        gzip_path = self.work_dir / "results.ndjson.gz"
+        json_path = self.work_dir / "results.json"
+        markdown_path = self.work_dir / "results.md"
+        writer = self.write_records([f"ndjson:{ndjson_path}", str(gzip_path), f"json:{json_path}",
+                                     f"markdown:{markdown_path}"])
+
+        with open(ndjson_path) as f:
+            lines = [json.loads(line) for line in f]
+        with gzip.open(gzip_path, "rt") as f:
+            compressed = [json.loads(line) for line in f]
+        with open(json_path) as f:
+            document = json.load(f)
+        markdown = markdown_path.read_text()
+
+        return all([
+            self.check([record["branch"] for record in lines] == ["feature-a", "feature-b", "develop"],
+                       "one NDJSON line per record, in order"),
+            self.check(lines[0]["commit_date"] == 1704067200 and lines[1]["merged"] is False and
+                       "timestamp" in lines[2], "records carry their fields and a timestamp"),
+            self.check(compressed == lines, ".gz paths are compressed"),
+            self.check(document["metadata"] == METADATA and document["records"] == lines and
+                       document["counts"] == {"would_delete": 1, "kept": 1, "skipped": 1},
+                       "the JSON document holds metadata, records and counts"),
+            self.check("- Repo: owner/repo" in markdown and
+                       "- feature-a: merged & stale (would be deleted - dry run)" in markdown and
+                       "- Skipped: 1" in markdown, "Markdown lists the configuration, records and totals"),
+            self.check(writer.counts == document["counts"], "the writer counts actions"),
+        ])
+
+    def test_specifications(self):
+        """Formats come from the prefix or the extension; unknown ones are rejected."""
+        def rejected(spec):
+            try:
+                create_sink(spec)
+            except ValueError:
+                return True
+            return False
+
+        class IncompleteSink(ResultSink):
+            """A sink that does not say how to write a record."""
+
+        try:
+            IncompleteSink(str(self.work_dir / "incomplete"))
+            abstract = False
+        except TypeError:
+            abstract = True
+
+        types = [type(create_sink(str(self.work_dir / name))).__name__
+                 for name in ("a.jsonl", "b.json", "c.md", "d.json.gz")]
+        return all([
+            self.check(types == ["NdjsonSink", "JsonSink", "MarkdownSink", "JsonSink"], "formats inferred"),
+            self.check(isinstance(create_sink(f"md:{self.work_dir / 'e.txt'}"), MarkdownSink) and
+                       isinstance(create_sink(f"JSONL:{self.work_dir / 'f.txt'}"), NdjsonSink) and
+                       isinstance(create_sink(f"json:{self.work_dir / 'g'}"), JsonSink), "explicit formats"),
+            self.check(rejected("xml:out.xml") and rejected("results") and rejected("ndjson:"),
+                       "unknown formats and missing paths are rejected"),
+            self.check(abstract, "sinks must implement write()"),
+        ])
+
+    def test_test_mode_deletions(self):
+        """Test mode records a deletion only after git branch -D succeeded."""
+        repo = build_local_repository(scenario_spec(), self.work_dir / "local")
+        # A checked-out branch cannot be deleted
+        subprocess.run(["git", "checkout", "--quiet", "feature-ancient-unmerged"], cwd=repo, check=True)
+        results_path = self.work_dir / "test-mode.ndjson"
+
+        cwd = os.getcwd()
+        os.chdir(repo)
+        try:
+            sweeper = BranchSweeper(
+                dry_run=False,
+                weeks_threshold=4,
+                default_branch="main",
+                protected_branches="develop production",
+                repo="owner/repo",
+                test_mode=True,
+                results=[f"ndjson:{results_path}"],
+                summary_details="",
+            )
+            exit_code = sweeper.run()
+            remaining = subprocess.run(["git", "branch", "--format=%(refname:short)"], capture_output=True,
+                                       text=True, check=True).stdout.split()
+        finally:
+            os.chdir(cwd)
+        with open(results_path) as f:
+            actions = {record["branch"]: record["action"] for record in map(json.loads, f)}
+
+        deleted = {name for name, action in actions.items() if action == "deleted"}
+        return all([
+            self.check(exit_code == 0, "sweep succeeds"),
+            self.check(actions["feature-ancient-unmerged"] == "delete_failed" and
+                       "feature-ancient-unmerged" in remaining, "a failed git branch -D is recorded as failed"),
+            self.check(deleted == {"feature-old-merged", "feature-pr-merged", "feature-unmerged-stale",
+                                   "bugfix-old-merged"} and not deleted & set(remaining),
+                       "deleted branches are gone"),
+            self.check(sweeper.summary.counts.get("deleted") == 4, "the summary only counts real deletions"),
+        ])
+
+    def tests(self):
+        """The results writer tests, in order."""
+        return [
+            ("Sinks", self.test_sinks),
+            ("Specifications", self.test_specifications),
+            ("Test Mode Deletions", self.test_test_mode_deletions),
+        ]
+
+
+def main():
+    """Run the results writer tests."""
+    return run_suite(ResultsWriterTester, "Test the streamed per-branch results")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
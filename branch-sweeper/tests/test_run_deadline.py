@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_run_deadline.py
+
+"""
+Tests of the per-command timeouts and the run deadline.
+
+A fake `gh` that never answers is put first on PATH, so every pull request
+lookup hangs until its timeout; the sweep must still finish within its
+deadline and report the branches it did not get to. Direct HTTP API requests
+to a server that never answers must give up at the deadline too.
+"""
+
+import http.server
+import json
+import os
+import stat
+import sys
+import threading
+import time
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from branch_sweeper import BranchSweeper
+from deadline import RunDeadline, command_category, parse_timeouts
+from github_api import APIError, GitHubAPI
+from synthetic_repository import BranchSpec, RepositorySpec, build_repository
+
+
+class RunDeadlineTester(SweeperTester):
+    """Exercise command timeouts and the run deadline."""
+
+    prefix = "sweeper-deadline-test-"
+
+    def test_categories(self):
+        """Commands are classified and timeout overrides are parsed."""
+        timeouts = parse_timeouts(["network=5", "api=0"])
+        try:
+            parse_timeouts(["remote=5"])
+            rejected = False
+        except ValueError:
+            rejected = True
+
+        return all([
+            self.check(command_category(["git", "merge-base", "a", "b"]) == "local", "git merge-base is local"),
+            self.check(command_category(["git", "-c", "x=y", "push", "origin"]) == "network", "git -c ... push is network"),
+            self.check(command_category(["git", "ls-remote", "--heads", "origin"]) == "network", "git ls-remote is network"),
+            self.check(command_category(["git", "remote", "-v", "prune", "origin"]) == "network" and
+                       command_category(["git", "remote", "update"]) == "network", "git remote prune/update are network"),
+            self.check(command_category(["git", "remote", "add", "origin", "url"]) == "local" and
+                       command_category(["git", "remote"]) == "local", "other git remote commands are local"),
+            self.check(command_category(["gh", "api", "repos"]) == "api", "gh is api"),
+            self.check(timeouts["network"] == 5 and timeouts["api"] == 0 and timeouts["local"] > 0,
+                       "overrides applied on top of the defaults"),
+            self.check(rejected, "unknown categories rejected"),
+        ])
+
+    def test_deadline(self):
+        """Hung API calls time out and the sweep stops at its deadline with a complete report."""
+        bin_dir = self.work_dir / "bin"
+        bin_dir.mkdir()
+        fake_gh = bin_dir / "gh"
+        fake_gh.write_text("#!/bin/sh\nexec sleep 60\n")
+        fake_gh.chmod(fake_gh.stat().st_mode | stat.S_IEXEC)
+
+        branches = [BranchSpec(f"feature-{index}", "unmerged", age_days=20) for index in range(8)]
+        spec = RepositorySpec(default_branch="main", branches=branches)
+        paths = build_repository(spec, self.work_dir / "repo")
+        results_path = self.work_dir / "results.ndjson"
+        output_path = self.work_dir / "github-output"
+
+        cwd = os.getcwd()
+        path = os.environ["PATH"]
+        os.environ["PATH"] = f"{bin_dir}{os.pathsep}{path}"
+        os.environ["GITHUB_OUTPUT"] = str(output_path)
+        os.chdir(paths["work"])
+        try:
+            sweeper = BranchSweeper(
+                dry_run=True,
+                weeks_threshold=2,
+                default_branch="main",
+                repo="owner/repo",
+                results=[f"ndjson:{results_path}"],
+                summary_details="",
+                command_timeouts=["api=1"],
+                deadline=5.0,
+                deadline_reserve=1.0,
+            )
+            started = time.perf_counter()
+            exit_code = sweeper.run()
+            elapsed = time.perf_counter() - started
+            with open("summary.md") as f:
+                summary = f.read()
+        finally:
+            os.chdir(cwd)
+            os.environ["PATH"] = path
+            os.environ.pop("GITHUB_OUTPUT", None)
+
+        with open(results_path) as f:
+            records = [record for record in map(json.loads, f) if "branch" in record]
+        unfinished = [record for record in records if record["reason"] == "run deadline reached"]
+        with open(output_path) as f:
+            outputs = dict(line.strip().split("=", 1) for line in f if "=" in line)
+
+        return all([
+            self.check(exit_code == 0, "sweep finishes normally"),
+            self.check(elapsed < 8.0, f"sweep stopped near its deadline ({elapsed:.1f}s)"),
+            self.check(0 < len(unfinished) < len(branches), f"{len(unfinished)} branches reported as unfinished"),
+            self.check(len(records) == len(branches) + 1, "every branch has a result record"),
+            self.check(f"Unfinished: {len(unfinished)} branches" in summary, "summary reports the unfinished work"),
+            self.check(outputs.get("unfinished_count") == str(len(unfinished)), "unfinished_count output set"),
+        ])
+
+    def test_http_deadline(self):
+        """HTTP API requests time out with the run deadline, not the longer api timeout."""
+
+        class SilentHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(10)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), SilentHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            api = GitHubAPI("owner/repo", base_url=f"http://127.0.0.1:{server.server_port}", token="",
+                            max_retries=0, timeout=60.0, deadline=RunDeadline(2.0, 0.0))
+            started = time.perf_counter()
+            try:
+                api.request("GET", "repos/owner/repo")
+                failed = False
+            except APIError:
+                failed = True
+            elapsed = time.perf_counter() - started
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        return all([
+            self.check(failed, "the hung request fails"),
+            self.check(elapsed < 5.0, f"it gave up at the deadline ({elapsed:.1f}s)"),
+        ])
+
+    def tests(self):
+        """The deadline tests, in order."""
+        return [
+            ("Command Categories", self.test_categories),
+            ("Run Deadline", self.test_deadline),
+            ("HTTP Deadline", self.test_http_deadline),
+        ]
+
+
+def main():
+    """Run the command timeout and deadline tests."""
+    return run_suite(RunDeadlineTester, "Test command timeouts and the run deadline")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
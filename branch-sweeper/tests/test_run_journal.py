@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_run_journal.py
+
+"""
+Tests of the crash-safe journal and --resume.
+
+The interrupted sweep runs in a child process that dies with os._exit in the
+middle of the evaluation loop, so nothing after the last synced journal
+batch survives, exactly as when a runner is killed.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SCRIPTS_DIR, SweeperTester, run_suite  # isort: skip
+from branch_sweeper import BranchSweeper
+from run_journal import JournalSink
+from synthetic_repository import BranchSpec, RepositorySpec, build_repository
+
+# Child process: sweep with a journal and die after a number of evaluations
+CRASHING_SWEEP = textwrap.dedent("""
+    import os, sys
+    sys.path.append(sys.argv[1])
+    from branch_sweeper import BranchSweeper
+
+    sweeper = BranchSweeper(dry_run=False, weeks_threshold=2, default_branch="main", protected_branches="develop",
+                            repo="owner/repo", summary_details="", pull_request_lookup=False,
+                            delete_batch_size=4, journal=sys.argv[2])
+    evaluate = sweeper._evaluate_branch
+    evaluated = []
+
+    def evaluate_then_die(branch_name, info):
+        if len(evaluated) == int(sys.argv[3]):
+            sweeper.journal.sync()
+            os._exit(3)
+        evaluated.append(branch_name)
+        return evaluate(branch_name, info)
+
+    sweeper._evaluate_branch = evaluate_then_die
+    sys.exit(sweeper.run())
+""")
+
+
+class RunJournalTester(SweeperTester):
+    """Exercise the journal and resumed sweeps."""
+
+    prefix = "sweeper-journal-test-"
+
+    def heads(self, origin):
+        """Branch names of the origin."""
+        result = subprocess.run(["git", "--git-dir", str(origin), "for-each-ref", "--format=%(refname:lstrip=2)",
+                                 "refs/heads/"], capture_output=True, text=True, check=True)
+        return set(result.stdout.split())
+
+    def test_batched_sync(self):
+        """Journal lines reach the disk in batches, and a torn last line is skipped on resume."""
+        path = self.work_dir / "batched.journal.ndjson"
+        metadata = {"repo": "owner/repo", "dry_run": False}
+        journal = JournalSink(str(path), metadata, sync_every=50)
+        for index in range(120):
+            journal.write({"branch": f"branch-{index}", "action": "kept", "reason": "not merged", "sha": "abc"})
+        on_disk = len(path.read_text().splitlines())
+        journal.write_pending("branch-5", "def", "2020-01-01", "merged & stale", 0)
+        journal.close({})
+
+        with open(path, "a") as f:
+            f.write('{"branch":"torn","act')
+        resumed = JournalSink(str(path), metadata, resume=True)
+        resumed.write({"branch": "after-crash", "action": "kept", "reason": "not merged", "sha": "abc"})
+        resumed.close({})
+        reread = JournalSink(str(path), metadata, resume=True)
+        reread.close({})
+
+        other = JournalSink(str(path), dict(metadata, repo="owner/other"), resume=True)
+        other.close({})
+
+        return all([
+            self.check(on_disk == 101, f"two full batches synced, the rest buffered ({on_disk} lines on disk)"),
+            self.check(resumed.resumed and len(resumed.decisions) == 119, "decisions read back"),
+            self.check(list(resumed.pending) == ["branch-5"], "pending deletion read back"),
+            self.check("torn" not in reread.decisions and "after-crash" in reread.decisions,
+                       "a torn line does not swallow the next entry"),
+            self.check(not other.resumed, "a journal of another repository is not resumed"),
+        ])
+
+    def build(self):
+        """A repository with stale merged, fresh merged, old unmerged and recent unmerged branches."""
+        branches = [BranchSpec(f"stale-{index:02d}", "merged", age_days=20 + index) for index in range(15)]
+        branches += [BranchSpec(f"fresh-{index:02d}", "merged", age_days=3) for index in range(4)]
+        branches += [BranchSpec(f"old-{index:02d}", "unmerged", age_days=60 + index) for index in range(3)]
+        branches += [BranchSpec(f"open-{index:02d}", "unmerged", age_days=5) for index in range(4)]
+        spec = RepositorySpec(default_branch="main", protected=["develop"], branches=branches)
+        return build_repository(spec, self.work_dir / "resume")
+
+    def test_crash_and_resume(self):
+        """A resumed run skips settled branches, finishes pending deletions and writes the whole summary."""
+        paths = self.build()
+        origin = paths["origin"]
+        branches = self.heads(origin)
+        journal_path = self.work_dir / "resume.journal.ndjson"
+
+        crashed = subprocess.run(
+            [sys.executable, "-c", CRASHING_SWEEP, str(SCRIPTS_DIR), str(journal_path), "16"],
+            cwd=str(paths["work"]), capture_output=True, text=True, check=False,
+        )
+        deleted_before_resume = branches - self.heads(origin)
+        with open(journal_path) as f:
+            journaled = [json.loads(line) for line in f]
+
+        results_path = self.work_dir / "resume.ndjson"
+        output_path = self.work_dir / "github-output"
+        os.environ["GITHUB_OUTPUT"] = str(output_path)
+        cwd = os.getcwd()
+        os.chdir(paths["work"])
+        try:
+            sweeper = BranchSweeper(
+                dry_run=False,
+                weeks_threshold=2,
+                default_branch="main",
+                protected_branches="develop",
+                repo="owner/repo",
+                results=[f"ndjson:{results_path}"],
+                summary_details="",
+                pull_request_lookup=False,
+                journal=str(journal_path),
+                resume=True,
+            )
+            exit_code = sweeper.run()
+        finally:
+            os.chdir(cwd)
+            os.environ.pop("GITHUB_OUTPUT", None)
+
+        with open(results_path) as f:
+            records = [json.loads(line) for line in f]
+        with open(output_path) as f:
+            outputs = dict(line.strip().split("=", 1) for line in f if "=" in line)
+        recorded = [record["branch"] for record in records]
+        resumed = [record for record in records if record.get("resumed")]
+        expected_deleted = {name for name in branches if name.startswith(("stale-", "old-"))}
+        evaluated = sweeper.timer.phases.get("merge_check", {}).get("calls", 0)
+
+        return all([
+            self.check(crashed.returncode == 3, "the first run died mid-sweep"),
+            self.check(any("pending" in entry for entry in journaled), "the journal holds pending deletions"),
+            self.check(exit_code == 0, "the resumed run succeeds"),
+            self.check(sorted(recorded) == sorted(branches), f"every branch recorded exactly once ({len(recorded)})"),
+            self.check(all(record["action"] in ("deleted", "already_deleted") for record in resumed),
+                       f"only deletions replayed from the journal ({len(resumed)})"),
+            self.check(not any("attempts" in record for record in resumed), "replayed retries are not counted again"),
+            self.check(evaluated <= len(branches) - len(deleted_before_resume),
+                       f"deleted branches not evaluated again ({evaluated} evaluated)"),
+            self.check(self.heads(origin) == branches - expected_deleted, "the remaining stale branches were deleted"),
+            self.check(outputs.get("deleted_count") == str(len(expected_deleted)),
+                       f"deleted_count covers the whole sweep ({outputs.get('deleted_count')})"),
+        ])
+
+    def sweep(self, name, resume, dry_run=False):
+        """Run a journaled sweep in the clone of a repository; return its records and the sweeper."""
+        journal_path = self.work_dir / f"{name}.journal.ndjson"
+        results_path = self.work_dir / f"{name}.ndjson"
+        cwd = os.getcwd()
+        os.chdir(self.work_dir / name / "work")
+        try:
+            sweeper = BranchSweeper(
+                dry_run=dry_run,
+                weeks_threshold=2,
+                default_branch="main",
+                protected_branches="develop",
+                repo="owner/repo",
+                results=[f"ndjson:{results_path}"],
+                summary_details="",
+                pull_request_lookup=False,
+                journal=str(journal_path),
+                resume=resume,
+            )
+            sweeper.run()
+        finally:
+            os.chdir(cwd)
+        with open(results_path) as f:
+            records = {record["branch"]: record for record in map(json.loads, f)}
+        return records, sweeper
+
+    def interrupt(self, name):
+        """Drop the completed entry of a journal, as if the runner died right before the run completed."""
+        path = self.work_dir / f"{name}.journal.ndjson"
+        path.write_text("".join(path.read_text().splitlines(keepends=True)[:-1]))
+
+    def merge_checks(self, sweeper):
+        """Merge checks a sweep ran."""
+        return sweeper.timer.phases.get("merge_check", {}).get("calls", 0)
+
+    def test_completed_journal(self):
+        """Resuming after time has passed decides skipped branches again, and a completed journal starts over."""
+        spec = RepositorySpec(
+            default_branch="main",
+            branches=[BranchSpec("stale-a", "merged", age_days=30), BranchSpec("soon", "merged", age_days=14)],
+            # Dating the fixture ahead keeps soon just short of the threshold for a few seconds
+            now=int(time.time()) + 8,
+        )
+        first = {}
+        for name in ("completed", "interrupted"):
+            build_repository(spec, self.work_dir / name)
+            first[name], _ = self.sweep(name, resume=False)
+        journal_path = self.work_dir / "completed.journal.ndjson"
+        last_entry = json.loads(journal_path.read_text().splitlines()[-1])
+        self.interrupt("interrupted")
+
+        time.sleep(max(0.0, spec.now + 1 - time.time()))
+        completed, completed_sweeper = self.sweep("completed", resume=True)
+        interrupted, interrupted_sweeper = self.sweep("interrupted", resume=True)
+        completed_resumed, interrupted_resumed = completed_sweeper.journal.resumed, interrupted_sweeper.journal.resumed
+        replayed = sorted(name for name, record in interrupted.items() if record.get("resumed"))
+
+        return all([
+            self.check(first["completed"]["soon"]["action"] == "skipped", "soon was not stale in the first run"),
+            self.check("completed" in last_entry, "a finished run marks its journal"),
+            self.check(not completed_resumed and not any(record.get("resumed") for record in completed.values()),
+                       "a completed journal starts over"),
+            self.check(interrupted_resumed and replayed == ["stale-a"], f"only the deletion is replayed ({replayed})"),
+            self.check(completed["soon"]["action"] == interrupted["soon"]["action"] == "deleted",
+                       "soon is deleted once it is stale, whichever journal was resumed"),
+            self.check(self.merge_checks(completed_sweeper) == 1 and self.merge_checks(interrupted_sweeper) == 0,
+                       "the resumed run decided soon from its journaled merge evidence"),
+            self.check(all(self.heads(self.work_dir / name / "origin.git") == {"main"} for name in first),
+                       "only the default branch is left"),
+        ])
+
+    def test_dry_run_resume(self):
+        """A resumed dry run decides every unchanged branch from its journaled merge evidence."""
+        branches = [BranchSpec(f"stale-{index}", "merged", age_days=30) for index in range(3)]
+        branches += [BranchSpec(f"fresh-{index}", "merged", age_days=3) for index in range(2)]
+        branches += [BranchSpec(f"open-{index}", "unmerged", age_days=5) for index in range(2)]
+        spec = RepositorySpec(default_branch="main", protected=["develop"], branches=branches)
+        paths = build_repository(spec, self.work_dir / "dry")
+        first, first_sweeper = self.sweep("dry", resume=False, dry_run=True)
+        self.interrupt("dry")
+        # A tip that moved since the interruption is checked again
+        origin = str(paths["origin"])
+        commit = subprocess.run(["git", "--git-dir", origin, "-c", "user.name=Tester",
+                                 "-c", "user.email=tester@example.com",
+                                 "commit-tree", "open-0^{tree}", "-p", "open-0", "-m", "More work"],
+                                capture_output=True, text=True, check=True).stdout.strip()
+        subprocess.run(["git", "--git-dir", origin, "update-ref", "refs/heads/open-0", commit], check=True)
+        resumed, resumed_sweeper = self.sweep("dry", resume=True, dry_run=True)
+        decisions = {name: record["action"] for name, record in resumed.items()}
+
+        return all([
+            self.check(resumed_sweeper.journal.resumed, "the dry run's journal was resumed"),
+            self.check(decisions == {name: record["action"] for name, record in first.items()},
+                       "the same decisions as the first run"),
+            self.check(self.merge_checks(first_sweeper) == 7 and self.merge_checks(resumed_sweeper) == 1,
+                       f"only the moved branch was checked again ({self.merge_checks(resumed_sweeper)} checks)"),
+            self.check(not any(record.get("resumed") for record in resumed.values()), "nothing was replayed"),
+        ])
+
+    def tests(self):
+        """The journal tests, in order."""
+        return [
+            ("Batched Sync", self.test_batched_sync),
+            ("Crash And Resume", self.test_crash_and_resume),
+            ("Completed Journal", self.test_completed_journal),
+            ("Dry Run Resume", self.test_dry_run_resume),
+        ]
+
+
+def main():
+    """Run the journal tests."""
+    return run_suite(RunJournalTester, "Test the crash-safe journal and --resume")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
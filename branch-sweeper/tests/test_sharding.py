@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_sharding.py
+
+"""
+Tests of sharded sweeps.
+
+Every shard runs in its own fresh repository with only the origin remote
+configured, like a matrix job on a new runner, so the refs it fetches show
+which part of the namespace it listed. A shard whose fetch fails must stop
+rather than evaluate stale refs.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from branch_sweeper import BranchSweeper
+from merge_shards import merge_shards
+from sharding import parse_shard, shard_of
+from synthetic_repository import BranchSpec, RepositorySpec, build_repository
+
+SHARDS = 3
+
+
+class ShardingTester(SweeperTester):
+    """Exercise sharded sweeps and the merge of their results."""
+
+    prefix = "sweeper-sharding-test-"
+
+    def git(self, args, cwd):
+        """Run git in a directory and return its stripped output."""
+        result = subprocess.run(["git"] + args, cwd=str(cwd), capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+
+    def test_partition(self):
+        """Every branch name lands in exactly one, stable shard, and shards are balanced."""
+        names = [f"feature/{index}" for index in range(3000)]
+        shards = [shard_of(name, 4) for name in names]
+        sizes = [shards.count(index) for index in range(1, 5)]
+
+        invalid = []
+        for spec in ("0/3", "4/3", "1", "a/b", "1/0"):
+            try:
+                parse_shard(spec)
+            except ValueError:
+                invalid.append(spec)
+
+        return all([
+            self.check(set(shards) == {1, 2, 3, 4}, "shards are numbered from 1 to N"),
+            self.check(shards == [shard_of(name, 4) for name in names], "the shard of a name is stable"),
+            self.check(min(sizes) > 0.8 * len(names) / 4, f"shards are balanced ({sizes})"),
+            self.check(parse_shard("2/4") == (2, 4) and parse_shard("") is None, "i/N parsed"),
+            self.check(len(invalid) == 5, f"invalid shards rejected ({', '.join(invalid)})"),
+        ])
+
+    def build(self, name):
+        """A repository with stale merged, fresh merged, old unmerged and recent unmerged branches."""
+        branches = [BranchSpec(f"stale-{index:02d}", "merged", age_days=20 + index) for index in range(15)]
+        branches += [BranchSpec(f"fresh-{index:02d}", "merged", age_days=3) for index in range(5)]
+        branches += [BranchSpec(f"old-{index:02d}", "unmerged", age_days=60 + index) for index in range(5)]
+        branches += [BranchSpec(f"open-{index:02d}", "unmerged", age_days=5) for index in range(5)]
+        spec = RepositorySpec(default_branch="main", protected=["develop"], branches=branches)
+        return build_repository(spec, self.work_dir / name)
+
+    def sweep(self, cwd, name, shard="", sweeper_class=BranchSweeper):
+        """Run a real sweep from cwd with JSON results; return (exit code, results path)."""
+        results_path = self.work_dir / f"{name}.json"
+        previous = os.getcwd()
+        os.chdir(cwd)
+        try:
+            sweeper = sweeper_class(
+                dry_run=False,
+                weeks_threshold=2,
+                default_branch="main",
+                protected_branches="develop",
+                repo="owner/repo",
+                results=[f"json:{results_path}"],
+                summary_details="",
+                pull_request_lookup=False,
+                lease="exit",
+                shard=shard,
+            )
+            exit_code = sweeper.run()
+        finally:
+            os.chdir(previous)
+        return exit_code, results_path
+
+    def actions(self, results_path):
+        """{branch: action} of a JSON results file."""
+        with open(results_path) as f:
+            return {record["branch"]: record["action"] for record in json.load(f)["records"]}
+
+    def test_sharded_sweep(self):
+        """N shards each list and delete their own slice; merged, they match an unsharded sweep."""
+        unsharded_paths = self.build("unsharded")
+        _, unsharded_results = self.sweep(unsharded_paths["work"], "unsharded")
+        expected = self.actions(unsharded_results)
+
+        paths = self.build("sharded")
+        origin = paths["origin"]
+        branches = self.git(["for-each-ref", "--format=%(refname:lstrip=2)", "refs/heads/"], origin).split()
+        results, fetched, exit_codes = [], {}, []
+        for index in range(1, SHARDS + 1):
+            runner = self.work_dir / f"runner-{index}"
+            runner.mkdir()
+            self.git(["init", "-q"], runner)
+            self.git(["remote", "add", "origin", str(origin)], runner)
+            exit_code, results_path = self.sweep(runner, f"shard-{index}", f"{index}/{SHARDS}")
+            exit_codes.append(exit_code)
+            results.append(str(results_path))
+            fetched[index] = set(self.git(["for-each-ref", "--format=%(refname:lstrip=3)", "refs/remotes/origin/"],
+                                          runner).split())
+
+        # Remote-tracking refs of deleted branches are gone again; the others must all be the shard's own
+        own = {index: {b for b in branches if shard_of(b, SHARDS) == index} for index in fetched}
+        listed_only_own = all(fetched[index] <= own[index] | {"main", "develop"} for index in fetched)
+        shard_actions = [self.actions(path) for path in results]
+        evaluated_own = all(set(shard_actions[index - 1]) == own[index] for index in own)
+        recorded = [branch for actions in shard_actions for branch in actions]
+
+        summary_path = self.work_dir / "merged-summary.md"
+        output_path = self.work_dir / "github-output"
+        merged_path = self.work_dir / "merged.json"
+        os.environ["GITHUB_OUTPUT"] = str(output_path)
+        try:
+            merge_code = merge_shards(results, str(summary_path), [f"json:{merged_path}"])
+        finally:
+            os.environ.pop("GITHUB_OUTPUT", None)
+        with open(output_path) as f:
+            outputs = dict(line.strip().split("=", 1) for line in f if "=" in line)
+
+        deleted = sorted(branch for branch, action in expected.items() if action == "deleted")
+        remaining = self.git(["for-each-ref", "--format=%(refname:lstrip=2)", "refs/heads/"], origin).split()
+        leftover_locks = self.git(["for-each-ref", "refs/janitor/"], origin)
+
+        return all([
+            self.check(exit_codes == [0] * SHARDS, "every shard succeeds"),
+            self.check(listed_only_own, "each shard fetched only its own branches and the merge targets"),
+            self.check(evaluated_own, "each shard evaluated exactly its own branches"),
+            self.check(len(recorded) == len(set(recorded)) == len(branches),
+                       f"every branch recorded by exactly one shard ({len(recorded)} records)"),
+            self.check(merge_code == 0 and self.actions(merged_path) == expected,
+                       "merged results equal the unsharded sweep"),
+            self.check(outputs.get("deleted_count") == str(len(deleted)) and len(deleted) == 20,
+                       f"deleted_count output is {outputs.get('deleted_count')}"),
+            self.check(not set(deleted) & set(remaining), "every shard deleted its stale branches"),
+            self.check("- Shards: 3" in summary_path.read_text(), "combined summary written"),
+            self.check(not leftover_locks, "per-shard leases released"),
+        ])
+
+    def test_failed_fetch(self):
+        """A shard whose fetch fails exits with an error and deletes nothing."""
+        class FailingFetchSweeper(BranchSweeper):
+            def _run_command(self, cmd, capture_output=True, input=None):
+                if cmd[:2] == ["git", "fetch"]:
+                    return subprocess.CompletedProcess(cmd, 128, "", "fatal: the remote end hung up unexpectedly")
+                return super()._run_command(cmd, capture_output, input)
+
+        paths = self.build("failed-fetch")
+        origin = paths["origin"]
+        before = self.git(["for-each-ref", "--format=%(refname)", "refs/heads/"], origin)
+        runner = self.work_dir / "failed-fetch-runner"
+        runner.mkdir()
+        self.git(["init", "-q"], runner)
+        self.git(["remote", "add", "origin", str(origin)], runner)
+        exit_code, _ = self.sweep(runner, "failed-fetch", f"1/{SHARDS}", FailingFetchSweeper)
+
+        return all([
+            self.check(exit_code == 1, "the shard fails"),
+            self.check(self.git(["for-each-ref", "--format=%(refname)", "refs/heads/"], origin) == before,
+                       "no branch was deleted"),
+            self.check(not self.git(["for-each-ref", "refs/janitor/"], origin), "the lease was released"),
+        ])
+
+    def test_incomplete_merge(self):
+        """Merging refuses missing, repeated or mismatched shards."""
+        def shard_file(name, shard):
+            path = self.work_dir / f"{name}.json"
+            path.write_text(json.dumps({"metadata": {"shard": shard}, "records": [], "counts": {}}))
+            return str(path)
+
+        one, two = shard_file("one-of-3", "1/3"), shard_file("two-of-3", "2/3")
+        three = shard_file("three-of-3", "3/3")
+        other = shard_file("two-of-4", "2/4")
+        unsharded = shard_file("unsharded", "")
+        summary = str(self.work_dir / "incomplete-summary.md")
+
+        return all([
+            self.check(merge_shards([one, two], summary) == 1, "a missing shard is an error"),
+            self.check(merge_shards([one, two, two, three], summary) == 1, "a repeated shard is an error"),
+            self.check(merge_shards([one, other, three], summary) == 1, "shards of another sweep are an error"),
+            self.check(merge_shards([unsharded], summary) == 1, "unsharded results are an error"),
+            self.check(merge_shards([three, one, two], summary) == 0, "shards merge in any order"),
+        ])
+
+    def tests(self):
+        """The sharding tests, in order."""
+        return [
+            ("Partition", self.test_partition),
+            ("Sharded Sweep", self.test_sharded_sweep),
+            ("Failed Fetch", self.test_failed_fetch),
+            ("Incomplete Merge", self.test_incomplete_merge),
+        ]
+
+
+def main():
+    """Run the sharding tests."""
+    return run_suite(ShardingTester, "Test sharded sweeps")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
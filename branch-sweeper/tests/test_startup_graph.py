@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_startup_graph.py
+
+"""
+Tests of the concurrent start-up phases.
+
+The graph scheduler is checked with sleeping phases; the sweeper's start-up
+is checked against a synthetic repository whose origin answers every fetch
+after a delay and a fake `gh` that answers every API call after a delay, so
+overlapping phases are visible in the wall time.
+"""
+
+import contextlib
+import io
+import json
+import os
+import stat
+import subprocess
+import sys
+import threading
+import time
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from branch_sweeper import BranchSweeper
+from startup_graph import StartupGraph
+from synthetic_repository import BranchSpec, RepositorySpec, build_repository
+from timing import PhaseTimer
+
+# Seconds every origin transfer and every API call takes
+DELAY = 1.0
+
+
+class StartupGraphTester(SweeperTester):
+    """Exercise the start-up dependency graph."""
+
+    prefix = "sweeper-startup-test-"
+
+    def test_overlap(self):
+        """Independent phases run together and a join waits for all of its dependencies."""
+        timer = PhaseTimer()
+        threads = {}
+
+        def phase(name, seconds):
+            def run():
+                threads[name] = threading.current_thread().name
+                time.sleep(seconds)
+                return name
+            return run
+
+        graph = StartupGraph(timer)
+        graph.add("fetch", phase("fetch", 0.4))
+        graph.add("api", phase("api", 0.3))
+        graph.add("index", phase("index", 0.1), after=["fetch", "api"])
+        results = graph.run()
+
+        return all([
+            self.check(results == {"fetch": "fetch", "api": "api", "index": "index"}, "every phase returned"),
+            self.check(graph.wall_seconds < 0.65, f"wall time {graph.wall_seconds:.2f}s is the critical path, "
+                                                  f"not the {graph.sequential_seconds:.2f}s sum"),
+            self.check(graph.spans["index"][0] >= max(graph.spans["fetch"][1], graph.spans["api"][1]),
+                       "the join started after both dependencies ended"),
+            self.check(graph.critical_path() == ["fetch", "index"], f"critical path {graph.critical_path()}"),
+            self.check(threads["fetch"] != threads["api"], "independent phases ran on different threads"),
+            self.check(timer.phases["fetch"]["calls"] == 1, "phases are timed"),
+        ])
+
+    def test_failure(self):
+        """A failing phase skips its dependents, lets the others finish and is re-raised."""
+        finished = []
+
+        def fail():
+            raise OSError("disk full")
+
+        graph = StartupGraph()
+        graph.add("results", fail)
+        graph.add("fetch", lambda: finished.append("fetch") or time.sleep(0.2))
+        graph.add("report", lambda: finished.append("report"), after=["results"])
+        graph.add("index", lambda: finished.append("index"), after=["report", "fetch"])
+        try:
+            graph.run()
+            raised = False
+        except OSError:
+            raised = True
+
+        cyclic = StartupGraph()
+        cyclic.add("a", lambda: None, after=["b"])
+        cyclic.add("b", lambda: None, after=["a"])
+        unknown = StartupGraph()
+        unknown.add("a", lambda: None, after=["missing"])
+        rejected = []
+        for graph_under_test in (cyclic, unknown):
+            try:
+                graph_under_test.run()
+            except ValueError:
+                rejected.append(True)
+
+        return all([
+            self.check(raised and graph.failed == "results", "the error is re-raised with its phase"),
+            self.check(finished == ["fetch"], "independent phases still ran, dependents did not"),
+            self.check(sorted(graph.skipped) == ["index", "report"], "dependents reported as skipped"),
+            self.check(len(rejected) == 2, "cycles and unknown dependencies are rejected"),
+        ])
+
+    def slow_environment(self, paths):
+        """Delay every transfer from the origin and put a slow fake gh first on PATH."""
+        bin_dir = self.work_dir / "bin"
+        bin_dir.mkdir(exist_ok=True)
+        upload_pack = bin_dir / "slow-upload-pack"
+        upload_pack.write_text(f"#!/bin/sh\nsleep {DELAY}\nexec git-upload-pack \"$@\"\n")
+        fake_gh = bin_dir / "gh"
+        fake_gh.write_text(
+            "#!/bin/sh\n"
+            f"sleep {DELAY}\n"
+            "case \"$*\" in\n"
+            "  *branches*) echo '[{\"name\": \"develop\", \"protected\": true}]' ;;\n"
+            "  *) echo '[]' ;;\n"
+            "esac\n"
+        )
+        for script in (upload_pack, fake_gh):
+            script.chmod(script.stat().st_mode | stat.S_IEXEC)
+        subprocess.run(["git", "config", "remote.origin.uploadpack", str(upload_pack)],
+                       cwd=paths["work"], check=True)
+        return bin_dir
+
+    def sweep(self, paths, name, **options):
+        """Dry-run a sweep and return the sweeper and {branch: (action, reason)}."""
+        results_path = self.work_dir / f"{name}.ndjson"
+        cwd = os.getcwd()
+        os.chdir(paths["work"])
+        try:
+            sweeper = BranchSweeper(
+                dry_run=True,
+                weeks_threshold=2,
+                repo="owner/repo",
+                results=[f"ndjson:{results_path}"],
+                summary_details="",
+                **options,
+            )
+            exit_code = sweeper.run()
+        finally:
+            os.chdir(cwd)
+
+        with open(results_path) as f:
+            records = [record for record in map(json.loads, f) if "branch" in record]
+        return exit_code, sweeper, {record["branch"]: (record["action"], record["reason"]) for record in records}
+
+    def test_sweeper_startup(self):
+        """Fetch and API discovery overlap, and the results match a sweep given everything up front."""
+        branches = [BranchSpec(f"stale-{index}", "merged", age_days=30) for index in range(3)]
+        branches += [BranchSpec(f"open-{index}", "unmerged", age_days=3) for index in range(3)]
+        spec = RepositorySpec(default_branch="main", protected=["develop"], branches=branches)
+        paths = build_repository(spec, self.work_dir / "repo")
+        bin_dir = self.slow_environment(paths)
+
+        path = os.environ["PATH"]
+        os.environ["PATH"] = f"{bin_dir}{os.pathsep}{path}"
+        try:
+            exit_code, sweeper, discovered = self.sweep(
+                paths, "discovered", default_branch="", protected_lookup=True, merge_engine="batched"
+            )
+        finally:
+            os.environ["PATH"] = path
+        _, _, configured = self.sweep(
+            paths, "configured", default_branch="main", protected_branches="develop", pull_request_lookup=False
+        )
+
+        startup = sweeper.startup
+        return all([
+            self.check(exit_code == 0, "sweep succeeds"),
+            self.check(sweeper.default_branch == "main", "default branch discovered"),
+            self.check("develop" in sweeper.protected_branches, "protected branches discovered through the API"),
+            self.check(startup.sequential_seconds > 4 * DELAY, f"{startup.sequential_seconds:.2f}s of start-up phases"),
+            self.check(startup.wall_seconds < 2.5 * DELAY,
+                       f"start-up took {startup.wall_seconds:.2f}s (critical path: {' -> '.join(startup.critical_path())})"),
+            self.check(discovered == configured, "same result for every branch as with a configured sweep"),
+            self.check(discovered.get("develop") == ("skipped", "protected"), "discovered protected branch skipped"),
+        ])
+
+    def test_failing_sweeper_phase(self):
+        """The sweeper names the start-up phase that failed."""
+        spec = RepositorySpec(default_branch="main", branches=[BranchSpec("stale-0", "merged", age_days=30)])
+        paths = build_repository(spec, self.work_dir / "failing")
+
+        class FullDiskSweeper(BranchSweeper):
+            def _fetch_all_branches(self):
+                raise OSError("No space left on device")
+
+        output = io.StringIO()
+        cwd = os.getcwd()
+        os.chdir(paths["work"])
+        try:
+            sweeper = FullDiskSweeper(dry_run=True, weeks_threshold=2, default_branch="main", repo="owner/repo",
+                                      summary_details="", pull_request_lookup=False)
+            with contextlib.redirect_stdout(output):
+                exit_code = sweeper.run()
+        finally:
+            os.chdir(cwd)
+
+        return all([
+            self.check(exit_code == 1, "the sweep fails"),
+            self.check("::error::Start-up phase 'fetch' failed: No space left on device" in output.getvalue(),
+                       "the error names the fetch phase"),
+        ])
+
+    def tests(self):
+        """The start-up graph tests, in order."""
+        return [
+            ("Overlapping Phases", self.test_overlap),
+            ("Failing Phase", self.test_failure),
+            ("Sweeper Start-up", self.test_sweeper_startup),
+            ("Failing Sweeper Phase", self.test_failing_sweeper_phase),
+        ]
+
+
+def main():
+    """Run the start-up graph tests."""
+    return run_suite(StartupGraphTester, "Test the concurrent start-up phases")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_summary_renderer.py
+
+"""
+Tests of the size-bounded summary.
+
+The rendered summary must count every category, bucket branch ages, list
+only the N oldest branches of a category however many there are, and the
+deleted_count output must keep its meaning in test mode and in other runs.
+"""
+
+import json
+import os
+import sys
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from branch_sweeper import BranchSweeper
+from summary_renderer import SummaryAggregator
+from synthetic_repository import build_local_repository, build_repository, scenario_spec
+
+DAY = 86400
+NOW = 1_700_000_000
+
+
+class SummaryRendererTester(SweeperTester):
+    """Exercise the summary aggregate and its Markdown."""
+
+    prefix = "sweeper-summary-test-"
+
+    def test_rendering(self):
+        """Counts, histogram and the oldest branches of each category."""
+        summary = SummaryAggregator(top_n=3, current_date=NOW, details_path="details.ndjson.gz")
+        for age in range(10):
+            summary.write({"branch": f"merged-{age}", "action": "would_delete", "reason": "merged & stale",
+                           "branch_age": f"{age} days", "commit_date": NOW - (20 + age * 40) * DAY})
+        summary.write({"branch": "stale", "action": "kept", "reason": "stale but unmerged",
+                       "commit_date": NOW - 3 * DAY})
+        summary.write({"branch": "develop", "action": "skipped", "reason": "protected"})
+        markdown = summary.render_markdown()
+
+        return all([
+            self.check(summary.counts == {"would_delete": 10, "stale_unmerged": 1, "skipped": 1},
+                       "stale unmerged branches have their own category"),
+            self.check("| Would Be Deleted (Dry Run) | 10 |" in markdown and "| Skipped Branches | 1 | - |" in markdown,
+                       "the overview counts every category"),
+            self.check("| Would Be Deleted (Dry Run) | 0 | 0 | 1 | 1 | 2 | 5 | 1 |" in markdown,
+                       "ages fall into the histogram buckets"),
+            self.check("10 branches (showing the 3 oldest)" in markdown and "- merged-9 (merged & stale: 9 days)" in
+                       markdown and "merged-6" not in markdown, "only the oldest branches are listed"),
+            self.check(markdown.index("merged-9") < markdown.index("merged-8") < markdown.index("merged-7"),
+                       "oldest first"),
+            self.check("- No branches deleted" not in markdown and summary.deleted_count == 10,
+                       "would-be deletions count as deletions"),
+            self.check("Full per-branch details for all 12 branches: `details.ndjson.gz`" in markdown,
+                       "the details artifact is named"),
+            self.check("- No branches deleted" in SummaryAggregator().render_markdown(), "an empty summary"),
+        ])
+
+    def test_bounded_size(self):
+        """The summary does not grow with the number of branches."""
+        sizes = []
+        for count in (100, 10000):
+            summary = SummaryAggregator(top_n=25, current_date=NOW)
+            for index in range(count):
+                summary.write({"branch": f"feature/{index:05d}", "action": "deleted", "reason": "merged & stale",
+                               "commit_date": NOW - (index % 400) * DAY})
+            sizes.append(len(summary.render_markdown()))
+        return self.check(abs(sizes[1] - sizes[0]) < 100, f"{sizes[0]} and {sizes[1]} bytes of Markdown")
+
+    def sweep(self, name, repo_dir, **options):
+        """Run a sweep in repo_dir; return its GitHub outputs."""
+        output_path = self.work_dir / f"{name}.output"
+        output_path.touch()
+        cwd = os.getcwd()
+        os.environ["GITHUB_OUTPUT"] = str(output_path)
+        os.chdir(repo_dir)
+        try:
+            BranchSweeper(weeks_threshold=4, default_branch="main", protected_branches="develop production",
+                          repo="owner/repo", summary_details="", pull_request_lookup=False, **options).run()
+        finally:
+            os.chdir(cwd)
+            os.environ.pop("GITHUB_OUTPUT", None)
+        return dict(line.split("=", 1) for line in output_path.read_text().splitlines())
+
+    def test_deleted_count_output(self):
+        """Test mode counts real deletions only; other runs also count would-be deletions."""
+        test_mode_dry = self.sweep("test-mode-dry", build_local_repository(scenario_spec(), self.work_dir / "a"),
+                                   dry_run=True, test_mode=True)
+        test_mode = self.sweep("test-mode", build_local_repository(scenario_spec(), self.work_dir / "b"),
+                               dry_run=False, test_mode=True)
+        dry = self.sweep("dry", build_repository(scenario_spec(), self.work_dir / "c")["work"], dry_run=True)
+
+        return all([
+            self.check(test_mode_dry["deleted_count"] == "0", "a test-mode dry run deletes nothing"),
+            self.check(test_mode["deleted_count"] == "5", "test mode counts its deletions"),
+            self.check(dry["deleted_count"] == "5", "a dry run counts the branches it would delete"),
+            self.check(json.dumps(sorted(dry)) == json.dumps(["deferred_count", "deleted_count", "unfinished_count"]),
+                       "outputs written"),
+        ])
+
+    def tests(self):
+        """The summary tests, in order."""
+        return [
+            ("Rendering", self.test_rendering),
+            ("Bounded Size", self.test_bounded_size),
+            ("Deleted Count Output", self.test_deleted_count_output),
+        ]
+
+
+def main():
+    """Run the summary tests."""
+    return run_suite(SummaryRendererTester, "Test the size-bounded summary")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
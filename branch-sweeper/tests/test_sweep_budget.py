@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_sweep_budget.py
+
+"""
+Tests of the time and deletion budgets.
+
+Branches are created with their ages shuffled against their names, so a
+sweep that walked them in listing order would not reach the oldest ones
+first; within the budget, the oldest deletable branches must be the ones
+handled, and the rest must be reported as deferred.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from branch_sweeper import BranchSweeper
+from sweep_budget import DELETION_BUDGET_REASON, TIME_BUDGET_REASON, SweepBudget, prioritized
+from synthetic_repository import BranchSpec, RepositorySpec, build_repository
+
+
+class SweepBudgetTester(SweeperTester):
+    """Exercise prioritized, budgeted sweeps."""
+
+    prefix = "sweeper-budget-test-"
+
+    def heads(self, origin):
+        """Branch names of the origin."""
+        result = subprocess.run(["git", "--git-dir", str(origin), "for-each-ref", "--format=%(refname:lstrip=2)",
+                                 "refs/heads/"], capture_output=True, text=True, check=True)
+        return set(result.stdout.split())
+
+    def sweep(self, name, hook=None, **options):
+        """Build a repository and sweep it; return (origin, exit code, records, outputs, summary)."""
+        # Names ascend while ages descend and ascend again, so listing order is not age order
+        ages = [25, 90, 40, 21, 70, 33, 120, 45, 28, 60]
+        branches = [BranchSpec(f"stale-{index:02d}", "merged", age_days=age) for index, age in enumerate(ages)]
+        branches += [BranchSpec(f"open-{index:02d}", "unmerged", age_days=3) for index in range(4)]
+        spec = RepositorySpec(default_branch="main", protected=["develop"], branches=branches)
+        paths = build_repository(spec, self.work_dir / name)
+
+        results_path = self.work_dir / f"{name}.ndjson"
+        output_path = self.work_dir / f"{name}.github-output"
+        os.environ["GITHUB_OUTPUT"] = str(output_path)
+        cwd = os.getcwd()
+        os.chdir(paths["work"])
+        try:
+            sweeper = BranchSweeper(
+                dry_run=False,
+                weeks_threshold=2,
+                default_branch="main",
+                protected_branches="develop",
+                repo="owner/repo",
+                results=[f"ndjson:{results_path}"],
+                summary_details="",
+                pull_request_lookup=False,
+                **options,
+            )
+            if hook:
+                hook(sweeper)
+            exit_code = sweeper.run()
+            with open("summary.md") as f:
+                summary = f.read()
+        finally:
+            os.chdir(cwd)
+            os.environ.pop("GITHUB_OUTPUT", None)
+
+        with open(results_path) as f:
+            records = [record for record in map(json.loads, f) if "branch" in record]
+        with open(output_path) as f:
+            outputs = dict(line.strip().split("=", 1) for line in f if "=" in line)
+        return paths["origin"], exit_code, records, outputs, summary
+
+    def test_priority_order(self):
+        """Protected branches come first, then branches older than a month, then stale, then recent ones."""
+        day = 86400
+        now = 100 * day
+        info = {
+            "recent": {"commit_date": now - 3 * day},
+            "stale-young": {"commit_date": now - 20 * day},
+            "stale-old": {"commit_date": now - 25 * day},
+            "ancient": {"commit_date": now - 300 * day},
+            "month-old": {"commit_date": now - 40 * day},
+            "main": {"commit_date": now - 1 * day},
+        }
+        order = list(prioritized(info, {"main"}, cutoff_date=now - 14 * day, month_cutoff_date=now - 30 * day))
+        used_up = SweepBudget(5.0)
+        # As if the run started six seconds ago
+        used_up.deadline.started -= 6.0
+        try:
+            SweepBudget(max_deletions=-1)
+            rejected = False
+        except ValueError:
+            rejected = True
+
+        return all([
+            self.check(order == ["main", "ancient", "month-old", "stale-old", "stale-young", "recent"],
+                       f"priority order ({', '.join(order)})"),
+            self.check(SweepBudget(max_deletions=2).exhausted(2) == DELETION_BUDGET_REASON, "deletion budget reached"),
+            self.check(SweepBudget(max_deletions=2).exhausted(1) == "", "deletion budget left"),
+            self.check(used_up.exhausted(0) == TIME_BUDGET_REASON, "time budget used up"),
+            self.check(SweepBudget(5.0).exhausted(0) == "", "time budget left"),
+            self.check(not SweepBudget().enabled and not SweepBudget().exhausted(1000), "no budget by default"),
+            self.check(rejected, "negative budgets are rejected"),
+        ])
+
+    def test_max_deletions(self):
+        """Only the oldest branches are deleted within the deletion budget; the rest is deferred."""
+        origin, exit_code, records, outputs, summary = self.sweep("deletions", max_deletions=4)
+        deleted = {record["branch"] for record in records if record["action"] == "deleted"}
+        deferred = [record for record in records if record["reason"] == DELETION_BUDGET_REASON]
+        heads = self.heads(origin)
+
+        oldest = {"stale-06", "stale-01", "stale-04", "stale-09"}
+        return all([
+            self.check(exit_code == 0, "sweep succeeds"),
+            self.check(deleted == oldest, f"the four oldest branches were deleted ({', '.join(sorted(deleted))})"),
+            self.check(not oldest & heads and "stale-00" in heads, "and only those are gone from the origin"),
+            self.check(len(deferred) == 10 and all(record.get("unfinished") for record in deferred),
+                       f"{len(deferred)} branches deferred"),
+            self.check(len(records) == 16, "every branch has a result record"),
+            self.check("Deferred to the next run: 10 branches (deletion budget reached), starting with stale-07"
+                       in summary, "summary names what the next run starts with"),
+            self.check(outputs.get("deferred_count") == "10", "deferred_count output set"),
+        ])
+
+    def test_time_budget(self):
+        """Evaluation stops once the time budget is used up, oldest first, and queued deletions finish."""
+        def slow_evaluation(sweeper):
+            evaluate = sweeper._evaluate_branch
+
+            def evaluate_slowly(branch_name, info):
+                time.sleep(0.5)
+                return evaluate(branch_name, info)
+            sweeper._evaluate_branch = evaluate_slowly
+
+        origin, exit_code, records, _, summary = self.sweep("time", hook=slow_evaluation, time_budget=4.0,
+                                                            delete_batch_size=50)
+        evaluated = [record["branch"] for record in records if not record.get("unfinished")]
+        deferred = [record for record in records if record["reason"] == TIME_BUDGET_REASON]
+        deleted = {record["branch"] for record in records if record["action"] == "deleted"}
+        heads = self.heads(origin)
+
+        return all([
+            self.check(exit_code == 0, "sweep succeeds"),
+            self.check(deferred and len(evaluated) + len(deferred) == 16,
+                       f"{len(evaluated)} branches evaluated, {len(deferred)} deferred"),
+            self.check("stale-06" in deleted and "stale-01" in deleted, "the oldest branches were handled first"),
+            self.check(not any(name.startswith("open-") for name in evaluated), "recent branches were left for later"),
+            self.check(not deleted & heads, "queued deletions were finished after the budget ran out"),
+            self.check(f"Deferred to the next run: {len(deferred)} branches (time budget used up)" in summary,
+                       "summary reports the deferred branches"),
+        ])
+
+    def test_policy_tiers(self):
+        """Branches are ordered by the thresholds of their policy rule, so a budget goes to what the rules delete."""
+        policy_path = self.work_dir / "policy.json"
+        policy_path.write_text(json.dumps({"rules": [
+            {"name": "archive", "regex": "stale-0[146]", "keep": True},
+            {"name": "bots", "match": "open-*", "unmerged_days": 2},
+        ]}))
+        evaluated = []
+
+        def record_order(sweeper):
+            evaluate = sweeper._evaluate_branch
+
+            def evaluate_in_order(branch_name, info):
+                evaluated.append(branch_name)
+                return evaluate(branch_name, info)
+            sweeper._evaluate_branch = evaluate_in_order
+
+        origin, exit_code, records, _, _ = self.sweep("policy", hook=record_order, max_deletions=6,
+                                                      policy=str(policy_path))
+        deleted = {record["branch"] for record in records if record["action"] == "deleted"}
+        deferred = {record["branch"] for record in records if record["reason"] == DELETION_BUDGET_REASON}
+
+        expected = {"stale-09", "stale-07", "stale-02", "stale-05", "open-00", "open-01"}
+        return all([
+            self.check(exit_code == 0, "sweep succeeds"),
+            self.check(deleted == expected,
+                       f"branches past their rule's cutoffs deleted ({', '.join(sorted(deleted))})"),
+            self.check("open-00" in evaluated and "stale-00" in deferred,
+                       "a branch its rule deletes unmerged comes before a merely stale one"),
+            self.check({"stale-01", "stale-04", "stale-06"} <= deferred,
+                       "branches the policy keeps are left for last, however old"),
+            self.check(not deleted & self.heads(origin), "and the deleted branches are gone from the origin"),
+        ])
+
+    def tests(self):
+        """The budget tests, in order."""
+        return [
+            ("Priority Order", self.test_priority_order),
+            ("Max Deletions", self.test_max_deletions),
+            ("Time Budget", self.test_time_budget),
+            ("Policy Tiers", self.test_policy_tiers),
+        ]
+
+
+def main():
+    """Run the budget tests."""
+    return run_suite(SweepBudgetTester, "Test time- and deletion-budgeted sweeps")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
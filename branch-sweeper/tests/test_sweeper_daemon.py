@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_sweeper_daemon.py
+
+"""
+Tests of the webhook-driven sweeper daemon.
+
+The daemon runs against a synthetic repository with a file:// origin and
+receives signed webhook payloads over HTTP, exactly as GitHub would send them.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from branch_sweeper import BranchSweeper
+import sweeper_daemon
+from sweeper_daemon import SweeperDaemon, TimerQueue
+from synthetic_repository import BranchSpec, RepositorySpec, build_repository
+
+REPO = "owner/repo"
+SECRET = "webhook-secret"
+
+
+class SweeperDaemonTester(SweeperTester):
+    """Exercise the sweeper daemon with webhook deliveries."""
+
+    prefix = "sweeper-daemon-test-"
+
+    def start_daemon(self, name, spec, protected=None, **options):
+        """Build a repository for the spec and start a daemon inside its clone.
+
+        protected, when given, is the list of protected branches each new sweeper reads.
+        """
+        paths = build_repository(spec, self.work_dir / name)
+        os.chdir(paths["work"])
+
+        def sweeper_factory():
+            return BranchSweeper(
+                dry_run=False,
+                weeks_threshold=2,
+                default_branch=spec.default_branch,
+                protected_branches=" ".join(spec.protected if protected is None else protected),
+                repo=REPO,
+                summary_details="",
+                pull_request_lookup=False,
+            )
+
+        options.setdefault("reconcile_on_start", False)
+        daemon = SweeperDaemon(
+            sweeper_factory, queue_path=str(self.work_dir / f"{name}-timers.json"), port=0, secret=SECRET,
+            repo=REPO, **options
+        )
+        daemon.start()
+        return daemon, paths
+
+    def deliver(self, daemon, event, payload, secret=SECRET):
+        """POST a webhook payload and return the response status."""
+        body = json.dumps(payload).encode("utf-8")
+        signature = "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        request = urllib.request.Request(
+            daemon.url, data=body, method="POST",
+            headers={"X-GitHub-Event": event, "X-Hub-Signature-256": signature, "Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def pull_request_closed(self, branch):
+        """A merged pull_request webhook payload for a branch."""
+        return {
+            "action": "closed",
+            "repository": {"full_name": REPO},
+            "pull_request": {"merged": True, "head": {"ref": branch, "repo": {"full_name": REPO}}},
+        }
+
+    def remote_branches(self, origin):
+        """Names of the branches in the bare origin."""
+        result = subprocess.run(
+            ["git", "--git-dir", str(origin), "for-each-ref", "--format=%(refname:short)", "refs/heads/"],
+            capture_output=True, text=True, check=False
+        )
+        return set(result.stdout.split())
+
+    def wait_for(self, condition, timeout=30.0):
+        """Poll until condition() holds or the timeout expires."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if condition():
+                return True
+            time.sleep(0.2)
+        return condition()
+
+    def test_timer_fires(self):
+        """A merged branch just short of the threshold is deleted when its timer fires."""
+        spec = RepositorySpec(
+            default_branch="main",
+            branches=[
+                BranchSpec("feature-soon", "merged", age_days=14),
+                BranchSpec("feature-later", "merged", age_days=3),
+            ],
+            # Dating the fixture ahead puts feature-soon's deadline a few seconds out
+            now=int(time.time()) + 5,
+        )
+        cwd = os.getcwd()
+        daemon, paths = self.start_daemon("fires", spec)
+        try:
+            statuses = [self.deliver(daemon, "pull_request", self.pull_request_closed(name))
+                        for name in ("feature-soon", "feature-later")]
+            scheduled = self.wait_for(lambda: daemon.evaluations >= 2 and "feature-later" in daemon.timers.timers)
+            deleted = self.wait_for(lambda: "feature-soon" not in self.remote_branches(paths["origin"]))
+            later_due = daemon.timers.timers.get("feature-later", 0)
+        finally:
+            daemon.stop()
+            os.chdir(cwd)
+
+        return all([
+            self.check(statuses == [202, 202], "webhooks accepted"),
+            self.check(scheduled, "both branches evaluated and scheduled"),
+            self.check(deleted, "feature-soon deleted once its timer fired"),
+            self.check("feature-later" in self.remote_branches(paths["origin"]), "feature-later kept"),
+            self.check(later_due > time.time() + 10 * 86400, "feature-later scheduled about 11 days out"),
+        ])
+
+    def test_signature_and_delete(self):
+        """Unsigned payloads are rejected, delete events cancel timers and timers survive a restart."""
+        spec = RepositorySpec(default_branch="main", branches=[BranchSpec("feature-a", "merged", age_days=3)])
+        cwd = os.getcwd()
+        daemon, paths = self.start_daemon("delete", spec)
+        timer_file = daemon.timers.path
+        try:
+            rejected = self.deliver(daemon, "pull_request", self.pull_request_closed("feature-a"), secret="wrong")
+            self.deliver(daemon, "pull_request", self.pull_request_closed("feature-a"))
+            scheduled = self.wait_for(lambda: "feature-a" in daemon.timers.timers)
+            persisted = "feature-a" in TimerQueue(timer_file).timers
+
+            subprocess.run(["git", "--git-dir", str(paths["origin"]), "update-ref", "-d", "refs/heads/feature-a"],
+                           check=True)
+            self.deliver(daemon, "delete", {"ref": "feature-a", "ref_type": "branch", "repository": {"full_name": REPO}})
+            cancelled = self.wait_for(lambda: "feature-a" not in daemon.timers.timers)
+        finally:
+            daemon.stop()
+            os.chdir(cwd)
+
+        return all([
+            self.check(rejected == 401, "payload with a bad signature rejected"),
+            self.check(scheduled, "merged branch scheduled"),
+            self.check(persisted, "timer written to the timer file"),
+            self.check(cancelled, "delete event cancelled the timer"),
+            self.check(not TimerQueue(timer_file).timers, "cancellation persisted"),
+        ])
+
+    def test_reconcile(self):
+        """The start-up reconcile sweeps everything due and schedules the rest."""
+        spec = RepositorySpec(
+            default_branch="main",
+            protected=["develop"],
+            branches=[
+                BranchSpec("feature-stale", "merged", age_days=30),
+                BranchSpec("feature-fresh", "merged", age_days=2),
+                BranchSpec("feature-open", "unmerged", age_days=10),
+            ],
+        )
+        cwd = os.getcwd()
+        daemon, paths = self.start_daemon("reconcile", spec, reconcile_on_start=True)
+        try:
+            reconciled = self.wait_for(lambda: daemon.last_reconcile is not None, timeout=60.0)
+            timers = dict(daemon.timers.timers)
+        finally:
+            daemon.stop()
+            os.chdir(cwd)
+
+        remote = self.remote_branches(paths["origin"])
+        return all([
+            self.check(reconciled, "reconcile sweep completed"),
+            self.check("feature-stale" not in remote, "stale merged branch deleted"),
+            self.check(set(timers) == {"feature-fresh", "feature-open"}, "kept branches scheduled"),
+            self.check(timers.get("feature-open", 0) > timers.get("feature-fresh", 0),
+                       "unmerged branch due after the merged one"),
+        ])
+
+    def test_fresh_sweeper_after_reconcile(self):
+        """A reconcile drops the evaluation sweeper: protection is looked up again and results start over."""
+        spec = RepositorySpec(
+            default_branch="main",
+            branches=[BranchSpec("feature-a", "merged", age_days=3), BranchSpec("feature-b", "merged", age_days=3)],
+        )
+        protected = ["main"]
+        cwd = os.getcwd()
+        daemon, _ = self.start_daemon("refresh", spec, protected=protected)
+        try:
+            self.deliver(daemon, "pull_request", self.pull_request_closed("feature-a"))
+            self.wait_for(lambda: "feature-a" in daemon.timers.timers)
+            first_sweeper = daemon.sweeper
+
+            # feature-b becomes protected and the next webhook triggers a reconcile after its evaluation
+            protected.append("feature-b")
+            daemon.next_reconcile = time.time()
+            self.deliver(daemon, "pull_request", self.pull_request_closed("feature-b"))
+            reconciled = self.wait_for(lambda: daemon.last_reconcile is not None, timeout=60.0)
+            dropped = daemon.sweeper is None
+            first_total = first_sweeper.summary.total
+
+            self.deliver(daemon, "pull_request", self.pull_request_closed("feature-a"))
+            evaluated = self.wait_for(lambda: daemon.sweeper is not None and daemon.sweeper.summary.total == 1)
+            second_sweeper = daemon.sweeper
+        finally:
+            daemon.stop()
+            os.chdir(cwd)
+
+        return all([
+            self.check(reconciled and dropped, "the reconcile dropped the evaluation sweeper"),
+            self.check(first_total == 2, "the first sweeper held both evaluations"),
+            self.check(evaluated and second_sweeper is not first_sweeper, "a fresh sweeper holds only the new one"),
+            self.check("feature-b" in second_sweeper.protected_branches, "protection looked up again"),
+            self.check(set(daemon.timers.timers) == {"feature-a"}, "the newly protected branch lost its timer"),
+        ])
+
+    def test_secret_required(self):
+        """A daemon without a webhook secret refuses to start unless unsigned payloads are allowed."""
+        try:
+            SweeperDaemon(BranchSweeper, queue_path=str(self.work_dir / "unsigned-timers.json"), port=0)
+            refused = False
+        except ValueError:
+            refused = True
+        daemon = SweeperDaemon(BranchSweeper, queue_path=str(self.work_dir / "unsigned-timers.json"), port=0,
+                               allow_unsigned=True)
+        daemon.server.server_close()
+        return all([
+            self.check(refused, "no secret refused"),
+            self.check(daemon.allow_unsigned and not daemon.secret, "unsigned payloads allowed explicitly"),
+        ])
+
+    def test_unmerged_days(self):
+        """The daemon's --unmerged-days reaches its sweepers and is validated like the sweeper's."""
+        started = []
+        serve_forever = SweeperDaemon.serve_forever
+        # Capture the configured daemon instead of serving webhooks
+        SweeperDaemon.serve_forever = lambda daemon: started.append(daemon) or 0
+        arguments = ["false", "2", "main", "develop", REPO, "--port", "0", "--secret", SECRET,
+                     "--timer-file", str(self.work_dir / "cli-timers.json")]
+        try:
+            exit_code = sweeper_daemon.main(arguments + ["--unmerged-days", "45"])
+            rejected = sweeper_daemon.main(arguments + ["--unmerged-days", "0"])
+        finally:
+            SweeperDaemon.serve_forever = serve_forever
+            for daemon in started:
+                daemon.server.server_close()
+        sweeper = started[0].sweeper_factory() if started else None
+
+        return all([
+            self.check(exit_code == 0 and len(started) == 1, "the daemon starts with --unmerged-days"),
+            self.check(sweeper is not None and sweeper.unmerged_days == 45, "its sweepers use the configured days"),
+            self.check(rejected == 1, "a non-positive --unmerged-days is rejected"),
+        ])
+
+    def tests(self):
+        """The daemon tests, in order."""
+        return [
+            ("Timer Fires", self.test_timer_fires),
+            ("Signature And Delete Event", self.test_signature_and_delete),
+            ("Reconcile", self.test_reconcile),
+            ("Fresh Sweeper After Reconcile", self.test_fresh_sweeper_after_reconcile),
+            ("Secret Required", self.test_secret_required),
+            ("Unmerged Days", self.test_unmerged_days),
+        ]
+
+
+def main():
+    """Run the sweeper daemon tests."""
+    return run_suite(SweeperDaemonTester, "Test the webhook-driven sweeper daemon")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_synthetic_repository.py
+
+"""
+Tests of the fast-import repository fixtures.
+
+The scenario built from one fast-import stream must lead the test-mode
+sweeper to the same verdicts as the repository TestRepositorySetup builds
+one commit at a time, and the merge style of every branch of a random spec
+must be what git sees.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from branch_sweeper import BranchSweeper
+from synthetic_repository import build_local_repository, build_repository, random_spec, scenario_spec
+from test_repository_setup import TestRepositorySetup
+
+
+class SyntheticRepositoryTester(SweeperTester):
+    """Compare the fast-import fixtures with the repositories they replace."""
+
+    prefix = "sweeper-synthetic-test-"
+
+    def sweep(self, repo_dir, name, dry_run):
+        """Run a test-mode sweep in repo_dir; return the decisions and the branches left."""
+        results_path = self.work_dir / f"{name}.ndjson"
+        cwd = os.getcwd()
+        os.chdir(repo_dir)
+        try:
+            BranchSweeper(dry_run=dry_run, weeks_threshold=4, default_branch="main",
+                          protected_branches="develop production", repo="owner/repo", test_mode=True,
+                          results=[f"ndjson:{results_path}"], summary_details="").run()
+            remaining = subprocess.run(["git", "branch", "--format=%(refname:short)"], capture_output=True,
+                                       text=True, check=True).stdout.split()
+        finally:
+            os.chdir(cwd)
+        with open(results_path) as f:
+            decisions = {record["branch"]: (record["action"], record["reason"], record.get("merged"))
+                         for record in map(json.loads, f)}
+        return decisions, sorted(remaining)
+
+    def build_both(self, name):
+        """Build the scenario with TestRepositorySetup and with fast-import; return both paths."""
+        setup_dir = self.work_dir / f"{name}-setup"
+        TestRepositorySetup(setup_dir).setup()
+        return setup_dir, build_local_repository(scenario_spec(), self.work_dir / f"{name}-fast-import")
+
+    def test_scenario_equivalence(self):
+        """Both scenario repositories get the same verdicts, in a dry run and when deleting."""
+        setup_dir, fast_dir = self.build_both("dry-run")
+        setup_decisions, setup_branches = self.sweep(setup_dir, "setup-dry-run", dry_run=True)
+        fast_decisions, fast_branches = self.sweep(fast_dir, "fast-import-dry-run", dry_run=True)
+
+        setup_dir, fast_dir = self.build_both("delete")
+        setup_deleted, setup_left = self.sweep(setup_dir, "setup-delete", dry_run=False)
+        fast_deleted, fast_left = self.sweep(fast_dir, "fast-import-delete", dry_run=False)
+
+        differences = {branch: (setup_decisions.get(branch), fast_decisions.get(branch))
+                       for branch in set(setup_decisions) | set(fast_decisions)
+                       if setup_decisions.get(branch) != fast_decisions.get(branch)}
+        return all([
+            self.check(setup_branches == fast_branches and len(fast_branches) == 10, "the same branches"),
+            self.check(not differences, f"the same dry-run verdicts, except {differences}" if differences else
+                       "the same dry-run verdicts"),
+            self.check(sum(action == "would_delete" for action, _, _ in fast_decisions.values()) == 5,
+                       "five branches would be deleted"),
+            self.check(setup_deleted == fast_deleted and setup_left == fast_left,
+                       "the same deletions and the same branches left"),
+            self.check(fast_left == ["bugfix-recent", "develop", "feature-recent", "main", "production"],
+                       "recent and protected branches survive"),
+        ])
+
+    def test_merge_kinds(self):
+        """Merged branches are ancestors of their target; squashed and unmerged ones are not."""
+        spec = random_spec(40, protected_count=3, seed=7)
+        paths = build_repository(spec, self.work_dir / "random")
+
+        def git(*args):
+            return subprocess.run(["git"] + list(args), cwd=paths["work"], capture_output=True, text=True)
+
+        wrong = []
+        for branch in spec.branches:
+            target = branch.target if branch.target in spec.protected_with_default else spec.default_branch
+            merged = git("merge-base", "--is-ancestor", f"origin/{branch.name}", f"origin/{target}").returncode == 0
+            if merged != (branch.kind in ("merged", "pr_merged")):
+                wrong.append(branch.name)
+        remote_branches = git("for-each-ref", "--format=%(refname)", "refs/remotes/origin").stdout.split()
+        tip_age = int(git("log", "-1", "--format=%ct", f"origin/{spec.branches[0].name}").stdout)
+
+        return all([
+            self.check(not wrong, f"merge kinds seen by git, except {wrong}" if wrong else "merge kinds seen by git"),
+            self.check(len(remote_branches) == 40 + 3 + 1, "every branch is on the origin (plus origin/HEAD)"),
+            self.check(spec.now - tip_age == spec.branches[0].age_days * 86400, "tips carry their age"),
+        ])
+
+    def tests(self):
+        """The synthetic repository tests, in order."""
+        return [
+            ("Scenario Equivalence", self.test_scenario_equivalence),
+            ("Merge Kinds", self.test_merge_kinds),
+        ]
+
+
+def main():
+    """Run the synthetic repository tests."""
+    return run_suite(SyntheticRepositoryTester, "Test the fast-import repository fixtures")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
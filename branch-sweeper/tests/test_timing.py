@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_timing.py
+
+"""
+Tests of the phase timings and the profiler.
+
+Phases must accumulate calls, items and time per thread, the console and
+Markdown tables must list them in the order they were first seen, and a
+profiled sweep must write its phase table to the summary and its profile
+files next to it.
+"""
+
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from branch_sweeper import BranchSweeper
+from synthetic_repository import build_local_repository, scenario_spec
+from timing import PhaseTimer, render_markdown_table, render_table
+
+
+class TimingTester(SweeperTester):
+    """Exercise the phase timer, the table renderers and the profiler."""
+
+    prefix = "sweeper-timing-test-"
+
+    def test_phases(self):
+        """Calls, items and wall time accumulate per phase; nesting is tracked per thread."""
+        observed = []
+        timer = PhaseTimer(observer=lambda name, wall: observed.append(name))
+        seen_inside = []
+
+        with timer.phase("startup"):
+            time.sleep(0.02)
+        for _ in range(3):
+            with timer.phase("merge_check", items=2):
+                with timer.phase("merge_index"):
+                    seen_inside.append(timer.current_phase)
+        timer.count("list_refs", 40)
+
+        other_thread = []
+        with timer.phase("delete"):
+            thread = threading.Thread(target=lambda: other_thread.append(timer.current_phase))
+            thread.start()
+            thread.join()
+
+        return all([
+            self.check(list(timer.phases) == ["startup", "merge_index", "merge_check", "list_refs", "delete"],
+                       "phases kept in the order they were first seen"),
+            self.check(timer.phases["startup"]["wall"] >= 0.02, "wall time measured"),
+            self.check(timer.phases["merge_check"]["calls"] == 3 and timer.phases["merge_check"]["items"] == 6,
+                       "calls and items accumulate"),
+            self.check(timer.phases["list_refs"] == {"wall": 0.0, "cpu": 0.0, "calls": 0, "items": 40},
+                       "count() adds items without timing"),
+            self.check(seen_inside == ["merge_index"] * 3 and timer.current_phase == "",
+                       "the innermost phase is current"),
+            self.check(other_thread == [""], "phases are tracked per thread"),
+            self.check(observed.count("merge_check") == 3 and "list_refs" not in observed,
+                       "the observer sees every timed call"),
+        ])
+
+    def test_tables(self):
+        """The shared renderers align console columns and build collapsible Markdown tables."""
+        header = ["Name", "Count"]
+        rows = [["a-long-name", "1"], ["b", "12345"]]
+        console = render_table(header, rows).splitlines()
+        markdown = render_markdown_table("Title", "Caption", header, rows)
+
+        timer = PhaseTimer()
+        with timer.phase("startup", items=1):
+            pass
+
+        return all([
+            self.check(console == ["Name         Count", "-----------  -----", "a-long-name      1",
+                                   "b            12345"], "first column left-aligned, the rest right-aligned"),
+            self.check(markdown.splitlines()[:6] == ["### Title", "<details>", "<summary>Caption</summary>", "",
+                                                     "| Name | Count |", "|---|---:|"],
+                       "Markdown heading, caption and header"),
+            self.check("| b | 12345 |" in markdown and markdown.endswith("</details>\n"), "Markdown rows"),
+            self.check(timer.render_table().splitlines()[0].split() == ["Phase", "Wall", "(s)", "CPU", "(s)", "Calls",
+                                                                        "Items"], "phase table header"),
+            self.check("### Timing" in timer.render_markdown() and "| startup |" in timer.render_markdown(),
+                       "phase Markdown table"),
+        ])
+
+    def test_profiled_sweep(self):
+        """A profiled sweep writes pstats, collapsed stacks and the phase table."""
+        repo = build_local_repository(scenario_spec(), self.work_dir / "local")
+        prefix = self.work_dir / "profile"
+
+        cwd = os.getcwd()
+        os.chdir(repo)
+        try:
+            sweeper = BranchSweeper(dry_run=True, weeks_threshold=4, default_branch="main",
+                                    protected_branches="develop production", repo="owner/repo", test_mode=True,
+                                    summary_details="", profile_output=str(prefix))
+            exit_code = sweeper.run()
+            summary = open("summary.md").read()
+        finally:
+            os.chdir(cwd)
+
+        stats = pstats.Stats(f"{prefix}.pstats")
+        return all([
+            self.check(exit_code == 0, "sweep succeeds"),
+            self.check(any(function == "_run" for _, _, function in stats.stats), "pstats cover the run"),
+            self.check(os.path.exists(f"{prefix}.collapsed") == hasattr(signal, "setitimer"),
+                       "collapsed stacks written where sampling is available"),
+            self.check("### Timing" in summary and "| test_mode |" in summary and "| summary |" not in summary,
+                       "the summary holds the phases timed before it was written"),
+            self.check(sweeper.timer.phases["test_mode"]["calls"] == 1 and sweeper.timer.phases["summary"]["calls"] == 1,
+                       "each phase of the run timed once"),
+        ])
+
+    def tests(self):
+        """The timing tests, in order."""
+        return [
+            ("Phases", self.test_phases),
+            ("Tables", self.test_tables),
+            ("Profiled Sweep", self.test_profiled_sweep),
+        ]
+
+
+def main():
+    """Run the timing tests."""
+    return run_suite(TimingTester, "Test the phase timings and the profiler")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
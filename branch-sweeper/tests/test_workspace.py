@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# filepath: /home/roytrix/Documents/source-code/repo-janitor/branch-sweeper/tests/test_workspace.py
+
+"""
+Tests of the shared-object-store workspace and multi-repository sweeps.
+
+An upstream built from a synthetic repository and a fork of it with one
+extra commit are served from file:// URLs; both belong to one project
+family and must share a single reference store, which drops the objects of
+deleted branches once its scheduled prune is due.
+"""
+
+import gzip
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Puts the tests and scripts directories on the Python path for the imports below
+from sweeper_testing import SweeperTester, run_suite  # isort: skip
+from sweep_repositories import sweep_repositories
+from synthetic_repository import BranchSpec, RepositorySpec, build_repository
+from workspace import LAST_PRUNE_KEY, WorkspaceManager
+
+UPSTREAM = "acme/widgets"
+FORK = "someone/widgets"
+
+
+class WorkspaceTester(SweeperTester):
+    """Exercise the workspace manager."""
+
+    prefix = "sweeper-workspace-test-"
+
+    def git(self, args, git_dir, env=None):
+        """Run git against a repository and return its stripped output."""
+        result = subprocess.run(["git", "--git-dir", str(git_dir)] + args, capture_output=True, text=True,
+                                check=True, env=env)
+        return result.stdout.strip()
+
+    def object_count(self, git_dir):
+        """Number of objects stored in a repository itself (not borrowed through alternates)."""
+        stats = dict(line.split(": ") for line in self.git(["count-objects", "-v"], git_dir).splitlines())
+        return int(stats["count"]) + int(stats["in-pack"])
+
+    def build_family(self, name):
+        """Serve an upstream and a fork with one extra, old, unmerged commit; return the URL template."""
+        remotes = self.work_dir / name / "remotes"
+        branches = [BranchSpec(f"stale-{index}", "merged", age_days=30 + index) for index in range(5)]
+        branches += [BranchSpec(f"open-{index}", "unmerged", age_days=3) for index in range(3)]
+        paths = build_repository(RepositorySpec(default_branch="main", branches=branches), self.work_dir / name)
+
+        upstream = remotes / f"{UPSTREAM}.git"
+        fork = remotes / f"{FORK}.git"
+        for target in (upstream, fork):
+            subprocess.run(["git", "clone", "-q", "--bare", str(paths["origin"]), str(target)], check=True)
+
+        old = f"@{int(time.time()) - 60 * 86400} +0000"
+        env = dict(os.environ, GIT_AUTHOR_NAME="Fork", GIT_AUTHOR_EMAIL="fork@example.com",
+                   GIT_COMMITTER_NAME="Fork", GIT_COMMITTER_EMAIL="fork@example.com",
+                   GIT_AUTHOR_DATE=old, GIT_COMMITTER_DATE=old)
+        commit = self.git(["commit-tree", "main^{tree}", "-p", "main", "-m", "Fork-only work"], fork, env)
+        self.git(["update-ref", "refs/heads/fork-old", commit], fork)
+        return f"file://{remotes}/{{repo}}.git"
+
+    def test_shared_store(self):
+        """Clones of one family borrow their objects from one store and only fetch what is missing."""
+        url_template = self.build_family("shared")
+        workspace_root = self.work_dir / "shared-workspace"
+        workspace = WorkspaceManager(str(workspace_root), url_template)
+
+        upstream_clone = workspace.checkout(UPSTREAM, UPSTREAM)
+        store = workspace.store_path(UPSTREAM)
+        store_objects = self.object_count(store)
+        fork_clone = workspace.checkout(FORK, UPSTREAM)
+        fork_objects_added = self.object_count(store) - store_objects
+
+        alternates = (fork_clone / ".git" / "objects" / "info" / "alternates").read_text()
+        clone_objects = [self.object_count(clone / ".git") for clone in (upstream_clone, fork_clone)]
+        fork_branch = self.git(["rev-parse", "--verify", "origin/fork-old"], fork_clone / ".git")
+        workspace.close()
+        fsck = subprocess.run(["git", "--git-dir", str(store), "fsck", "--connectivity-only"],
+                              capture_output=True, text=True, check=False)
+
+        return all([
+            self.check(str(store.resolve()) in alternates, "the fork's clone borrows objects from the store"),
+            self.check(clone_objects == [0, 0], f"clones store no objects of their own ({clone_objects})"),
+            self.check(0 < fork_objects_added <= 2, f"the fork added only {fork_objects_added} new objects to the store"),
+            self.check(bool(fork_branch), "the fork's own branch is available in its clone"),
+            self.check(not (workspace_root / "clones").exists() or not any((workspace_root / "clones").iterdir()),
+                       "clones are removed when the run ends"),
+            self.check(fsck.returncode == 0, "the persistent store is intact for the next run"),
+        ])
+
+    def test_multi_repository_sweep(self):
+        """Each repository of a family is swept in its own clone with its own results."""
+        url_template = self.build_family("sweep")
+        output_dir = self.work_dir / "sweep-results"
+        cwd = os.getcwd()
+        with WorkspaceManager("", url_template) as workspace:
+            exit_code = sweep_repositories(
+                [f"{UPSTREAM}={UPSTREAM}", f"{FORK}={UPSTREAM}"], workspace, str(output_dir),
+                dry_run=True, weeks_threshold=2, pull_request_lookup=False,
+            )
+            workspace_root = workspace.root
+
+        actions = {}
+        for repo in (UPSTREAM, FORK):
+            details = output_dir / f"{repo.replace('/', '__')}.summary-details.ndjson.gz"
+            with gzip.open(details, "rt") as f:
+                actions[repo] = {record["branch"]: record["action"] for record in map(json.loads, f)
+                                 if "branch" in record}
+        would_delete = {repo: sorted(b for b, action in result.items() if action == "would_delete")
+                        for repo, result in actions.items()}
+        stale = [f"stale-{index}" for index in range(5)]
+
+        return all([
+            self.check(exit_code == 0, "every repository swept"),
+            self.check(os.getcwd() == cwd, "the working directory is restored"),
+            self.check(would_delete[UPSTREAM] == stale, "upstream: stale merged branches found"),
+            self.check(would_delete[FORK] == sorted(stale + ["fork-old"]), "fork: its own old branch found too"),
+            self.check((output_dir / f"{FORK.replace('/', '__')}.summary.md").exists(), "summaries kept per repository"),
+            self.check(not workspace_root.exists(), "the temporary workspace is removed"),
+        ])
+
+    def test_scheduled_prune(self):
+        """A store keeps the objects of deleted branches until its prune is due, then drops them."""
+        url_template = self.build_family("prune")
+        upstream = self.work_dir / "prune" / "remotes" / f"{UPSTREAM}.git"
+        open_commit = self.git(["rev-parse", "refs/heads/open-0"], upstream)
+        workspace = WorkspaceManager(str(self.work_dir / "prune-workspace"), url_template)
+        store = workspace.store_path(UPSTREAM)
+
+        def present():
+            return subprocess.run(["git", "--git-dir", str(store), "cat-file", "-e", open_commit],
+                                  capture_output=True, check=False).returncode == 0
+
+        workspace.checkout(UPSTREAM, UPSTREAM)
+        self.git(["update-ref", "-d", "refs/heads/open-0"], upstream)
+        workspace.checkout(UPSTREAM, UPSTREAM)
+        workspace.close()
+        kept_before_due = present()
+
+        # Make the last prune look older than the interval
+        self.git(["config", LAST_PRUNE_KEY, str(int(time.time()) - workspace.prune_interval - 1)], store)
+        workspace.close()
+        last_prune = int(self.git(["config", "--get", LAST_PRUNE_KEY], store))
+
+        return all([
+            self.check(kept_before_due, "a new store is not pruned before its interval"),
+            self.check(not present(), "the deleted branch's commit is pruned once due"),
+            self.check(time.time() - last_prune < 60, "the prune time is recorded"),
+            self.check(self.git(["rev-parse", f"refs/members/{UPSTREAM}/heads/open-1"], store) != "",
+                       "the remaining branches are kept"),
+        ])
+
+    def test_failure_isolation(self):
+        """A repository whose sweep raises is reported and the others are still swept."""
+        url_template = self.build_family("isolation")
+        output_dir = self.work_dir / "isolation-results"
+        with WorkspaceManager("", url_template) as workspace:
+            checkout = workspace.checkout
+
+            def failing_checkout(repo, family=""):
+                if repo == UPSTREAM:
+                    raise OSError("disk full")
+                return checkout(repo, family)
+
+            workspace.checkout = failing_checkout
+            exit_code = sweep_repositories(
+                [f"{UPSTREAM}={UPSTREAM}", f"{FORK}={UPSTREAM}"], workspace, str(output_dir),
+                dry_run=True, weeks_threshold=2, pull_request_lookup=False,
+            )
+
+        return all([
+            self.check(exit_code == 1, "the run reports the failure"),
+            self.check((output_dir / f"{FORK.replace('/', '__')}.summary.md").exists(),
+                       "the repository after the failing one is swept"),
+        ])
+
+    def tests(self):
+        """The workspace tests, in order."""
+        return [
+            ("Shared Object Store", self.test_shared_store),
+            ("Multi-Repository Sweep", self.test_multi_repository_sweep),
+            ("Scheduled Prune", self.test_scheduled_prune),
+            ("Failure Isolation", self.test_failure_isolation),
+        ]
+
+
+def main():
+    """Run the workspace tests."""
+    return run_suite(WorkspaceTester, "Test the shared-object-store workspace")
+
+
+if __name__ == "__main__":
+    sys.exit(main())